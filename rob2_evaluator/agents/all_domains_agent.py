@@ -0,0 +1,216 @@
+from rob2_evaluator.agents.domain_agent import CONTEXT_TEMPLATE, passage_id, render_context
+from rob2_evaluator.schema.rob2_schema import (
+    AllDomainsJudgement,
+    GenericDomainJudgement,
+    SignalsOnlyJudgement,
+)
+from rob2_evaluator.config.model_config import ModelConfig
+from rob2_evaluator.utils.llm import acall_llm, call_llm
+from rob2_evaluator.llm.models import ModelProvider
+from typing import List, Dict, Any, Optional
+import logging
+
+from jinja2 import Template
+from pydantic import ValidationError
+
+# 位于共享文档上下文之后，一次列出所有领域的信号问题
+ALL_DOMAINS_TEMPLATE = Template(
+    """
+
+## Domains
+Evaluate the risk of bias for **each** of the following domains using the materials above.
+
+{% for d in domains %}
+### {{ d.key }}: {{ d.title }}
+Signal Questions:
+{% for s in d.signals -%}
+{{ s.id }}: {{ s.text }} (options: {{ s.options | join('/') }})
+{% endfor %}
+{% if include_overall %}
+Domain-level risk of bias judgment options: {{ d.domain_options | join('/') }}
+{% endif %}
+
+{% endfor %}
+## Analysis Steps
+1.  For each domain and each of its Signal Questions, provide an answer, a detailed reason, and supporting evidence.
+{% if include_overall %}
+2.  Provide an overall risk assessment for each domain, including the reason and supporting evidence.
+{% else %}
+2.  Answer NA for a conditional question ("If ... to x.y") when its condition is not met. The domain-level judgements are derived from your answers, so do not provide them.
+{% endif %}
+{% if cite_passages %}
+3.  **Crucially**: When providing evidence (`evidence` field), you **must** cite the passage by its ID (the `P<n>` in the `[P<n> | Page X]` marker), e.g. `"passage": "P12"`, optionally with `span`: the first few words (at most 8) of the supporting sentence. Do **not** copy the passage text.
+{% else %}
+3.  **Crucially**: When providing evidence (`evidence` field), you **must** quote the text **exactly** as it appears in the Evaluation Materials and include the corresponding `page_idx` (the number X from the `[Page X]` marker).
+{% endif %}
+
+## Required Output Format
+Return **only** a valid JSON object with one entry per domain key listed above:
+
+```json
+{
+  "domains": {
+    {% for d in domains %}
+    "{{ d.key }}": {
+      "signals": {
+        "<signal id>": {
+          "answer": "<One of the signal's options>",
+          "reason": "<Your detailed reasoning for the answer>",
+          "evidence": [{{ evidence_format }}]
+        }
+{% if include_overall %}
+      },
+      "overall": {
+        "risk": "<Select one: {{ d.domain_options | join('/') }}>",
+        "reason": "<Your detailed reasoning for the overall domain judgment>",
+        "evidence": [{{ evidence_format }}]
+      }
+{% else %}
+      }
+{% endif %}
+    }{{ "," if not loop.last }}
+    {% endfor %}
+  }
+}
+```
+""",
+    trim_blocks=True,
+    lstrip_blocks=True,
+)
+
+
+class AllDomainsAgent:
+    """
+    单次调用评估全部领域：文档上下文只发送一次，模型返回包含各领域信号与总体判断的 JSON。
+    各领域分别按 GenericDomainJudgement（rules 模式下为 SignalsOnlyJudgement）及其 schema（信号编号、选项）校验，
+    未通过校验的领域返回 None，由调用方回退到逐领域评估。
+    证据引用方式（逐字引用或段落编号）沿用领域代理的 evidence_mode。
+    """
+
+    def __init__(
+        self,
+        model_name: Optional[str] = None,
+        model_provider: Optional[ModelProvider] = None,
+    ):
+        config = ModelConfig()
+        # 优先使用传入的参数，其次使用配置值
+        self.model_name = model_name or config.get_model_name()
+        self.model_provider = model_provider or config.get_model_provider()
+
+    def evaluate(
+        self, items: List[Dict[str, Any]], domain_agents: List[Any]
+    ) -> List[Optional[Dict[str, Any]]]:
+        """
+        Args:
+            items: 文档内容
+            domain_agents: 各领域的 DomainAgent，提供 schema 与结果格式
+
+        Returns:
+            与 domain_agents 对应的结果列表，校验失败的领域为 None
+        """
+        result: AllDomainsJudgement = call_llm(
+            prompt=self._build_prompt(items, domain_agents),
+            model_name=self.model_name,
+            model_provider=self.model_provider,
+            pydantic_model=AllDomainsJudgement,
+        )
+        return self._domain_results(result, items, domain_agents)
+
+    async def aevaluate(
+        self, items: List[Dict[str, Any]], domain_agents: List[Any]
+    ) -> List[Optional[Dict[str, Any]]]:
+        """evaluate 的异步版本，LLM 调用经 acall_llm 发出"""
+        result: AllDomainsJudgement = await acall_llm(
+            prompt=self._build_prompt(items, domain_agents),
+            model_name=self.model_name,
+            model_provider=self.model_provider,
+            pydantic_model=AllDomainsJudgement,
+        )
+        return self._domain_results(result, items, domain_agents)
+
+    def _domain_results(
+        self,
+        result: AllDomainsJudgement,
+        items: List[Dict[str, Any]],
+        domain_agents: List[Any],
+    ) -> List[Optional[Dict[str, Any]]]:
+        passages = None
+        if self._cite_passages(domain_agents):
+            passages = {passage_id(item, idx): item for idx, item in enumerate(items)}
+        results = []
+        for agent in domain_agents:
+            judgement = self.validate_domain(
+                agent.schema,
+                result.domains.get(agent.domain_key),
+                include_overall=agent.judgement_mode == "llm",
+            )
+            if judgement is None:
+                logging.warning(
+                    f"合并评估中领域 {agent.schema['domain_name']} 未通过校验，将单独评估"
+                )
+                results.append(None)
+            else:
+                results.append(agent._to_result(judgement, passages))
+        return results
+
+    @staticmethod
+    def validate_domain(
+        schema: Dict[str, Any], data: Any, include_overall: bool = True
+    ) -> Optional[GenericDomainJudgement]:
+        """
+        校验单个领域的输出：结构合法、信号编号齐全且答案与风险等级在可选范围内；
+        include_overall 为 False（rules 模式）时只校验信号答案
+        """
+        if not isinstance(data, dict):
+            return None
+        model = GenericDomainJudgement if include_overall else SignalsOnlyJudgement
+        try:
+            judgement = model.model_validate(data)
+        except ValidationError:
+            return None
+
+        expected = {signal["id"]: signal["options"] for signal in schema["signals"]}
+        if set(judgement.signals) != set(expected):
+            return None
+        for signal_id, signal in judgement.signals.items():
+            if signal.answer not in expected[signal_id]:
+                return None
+        if include_overall and judgement.overall.risk not in schema["domain_options"]:
+            return None
+        return judgement
+
+    @staticmethod
+    def _cite_passages(domain_agents: List[Any]) -> bool:
+        """证据引用方式与领域代理一致（同一次评估的代理使用相同的选项）"""
+        return any(agent.evidence_mode == "passage" for agent in domain_agents)
+
+    def _build_prompt(
+        self, items: List[Dict[str, Any]], domain_agents: List[Any]
+    ) -> str:
+        # 与逐领域模式使用相同的上下文前缀，两种模式之间同样可以命中前缀缓存
+        cite_passages = self._cite_passages(domain_agents)
+        prefix = CONTEXT_TEMPLATE.render(
+            context=render_context(items, cite_passages), cite_passages=cite_passages
+        )
+        domains = [
+            {
+                # DomainKey 为 str 枚举，渲染时取其值
+                "key": getattr(agent.domain_key, "value", agent.domain_key),
+                "title": agent.schema["domain_name"],
+                "signals": agent.schema["signals"],
+                "domain_options": agent.schema["domain_options"],
+            }
+            for agent in domain_agents
+        ]
+        evidence_format = (
+            '{"passage": "<Passage ID, e.g. P12>", "span": "<First few words (optional)>"}'
+            if cite_passages
+            else '{"text": "<Exact quote>", "page_idx": <Integer page number>}'
+        )
+        return prefix + ALL_DOMAINS_TEMPLATE.render(
+            domains=domains,
+            cite_passages=cite_passages,
+            evidence_format=evidence_format,
+            # rules 模式下领域风险由本地判定算法计算，不要求模型输出 overall
+            include_overall=all(agent.judgement_mode == "llm" for agent in domain_agents),
+        )
@@ -1,8 +1,16 @@
-from rob2_evaluator.utils.llm import call_llm
+from rob2_evaluator.utils.llm import acall_llm, call_llm
+from rob2_evaluator.utils.tokens import context_budget, count_tokens, group_by_token_budget
 from rob2_evaluator.llm.models import ModelProvider
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
 from typing import List, Dict, Any
 from rob2_evaluator.config.model_config import ModelConfig
 from typing import Optional
+import asyncio
+import logging
+
+# 分段投票时并发处理的分段数上限
+SEGMENT_PARALLELISM = 4
 
 
 class AnalysisTypeAgent:
@@ -14,15 +22,117 @@ class AnalysisTypeAgent:
         self,
         model_name: Optional[str] = None,
         model_provider: Optional[ModelProvider] = None,
+        max_context_tokens: Optional[int] = None,
     ):
+        """
+        Args:
+            max_context_tokens: 单次调用中文档内容的 token 上限；默认由模型的上下文长度决定。
+                超出上限的文档分段判断后投票
+        """
         config = ModelConfig()
         # 优先使用传入的参数，其次使用配置值
         self.model_name = model_name or config.get_model_name()
         self.model_provider = model_provider or config.get_model_provider()
+        self.max_context_tokens = max_context_tokens
 
     def infer_analysis_type(self, items: List[Dict[str, Any]]) -> str:
+        budget = self._context_budget()
+        if self._total_tokens(items) > budget:
+            return self._infer_by_segments(items, budget)
+
+        context = "\n".join([item.get("text", "") for item in items])
+        return self._parse(self._call(self._build_prompt(context)))
+
+    async def ainfer_analysis_type(self, items: List[Dict[str, Any]]) -> str:
+        """infer_analysis_type 的异步版本，LLM 调用经 acall_llm 发出"""
+        budget = self._context_budget()
+        if self._total_tokens(items) > budget:
+            return await self._ainfer_by_segments(items, budget)
+
         context = "\n".join([item.get("text", "") for item in items])
-        prompt = f"""
+        return self._parse(await self._acall(self._build_prompt(context)))
+
+    def llm_requests(self, items: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """infer_analysis_type 将发出的 LLM 调用（call_llm 的参数），供批处理模式预先提交"""
+        budget = self._context_budget()
+        if self._total_tokens(items) > budget:
+            prompts = [
+                self._build_prompt(context, allow_unclear=True)
+                for context in self._segment_contexts(items, budget)
+            ]
+        else:
+            prompts = [self._build_prompt("\n".join(item.get("text", "") for item in items))]
+        return [{"prompt": prompt, **self._call_options()} for prompt in prompts]
+
+    def _context_budget(self) -> int:
+        return context_budget(
+            self.model_name,
+            count_tokens(self._build_prompt(""), self.model_name),
+            self.max_context_tokens,
+        )
+
+    def _total_tokens(self, items: List[Dict[str, Any]]) -> int:
+        return sum(self._item_tokens(item.get("text", "")) for item in items)
+
+    def _item_tokens(self, text: str) -> int:
+        # 段落之间的换行符
+        return count_tokens(text, self.model_name) + 1
+
+    def _segment_contexts(self, items: List[Dict[str, Any]], budget: int) -> List[str]:
+        groups = group_by_token_budget(
+            items, list(range(len(items))), budget, len(items), self._item_tokens
+        )
+        return ["\n".join(items[idx].get("text", "") for idx in group) for group in groups]
+
+    def _infer_by_segments(self, items: List[Dict[str, Any]], budget: int) -> str:
+        """
+        长文档：各分段分别判断（未提及分析方法的分段回答 unclear），
+        对明确的回答投票，平票或全部 unclear 时取 assignment
+        """
+        contexts = self._segment_contexts(items, budget)
+        with ThreadPoolExecutor(
+            max_workers=min(SEGMENT_PARALLELISM, len(contexts))
+        ) as executor:
+            answers = list(
+                executor.map(
+                    lambda context: self._call(
+                        self._build_prompt(context, allow_unclear=True)
+                    ),
+                    contexts,
+                )
+            )
+        return self._vote(answers)
+
+    async def _ainfer_by_segments(self, items: List[Dict[str, Any]], budget: int) -> str:
+        contexts = self._segment_contexts(items, budget)
+        answers = await asyncio.gather(
+            *(
+                self._acall(self._build_prompt(context, allow_unclear=True))
+                for context in contexts
+            )
+        )
+        return self._vote(answers)
+
+    def _vote(self, answers: List[Any]) -> str:
+        votes = Counter(
+            self._parse(answer)
+            for answer in answers
+            if "unclear" not in str(answer).strip().lower()
+        )
+        logging.info(f"分析类型分段投票（{len(answers)} 段）: {dict(votes)}")
+        return "adherence" if votes["adherence"] > votes["assignment"] else "assignment"
+
+    @staticmethod
+    def _build_prompt(context: str, allow_unclear: bool = False) -> str:
+        if allow_unclear:
+            answer_line = (
+                "This text is an excerpt of a longer study. Answer with only "
+                "'assignment' or 'adherence', or 'unclear' if the excerpt does not "
+                "describe the analysis."
+            )
+        else:
+            answer_line = "Answer with only 'assignment' or 'adherence'."
+        return f"""
 You are an expert in ROB2 risk of bias assessment.
 Given the following study content, determine which analysis type is most appropriate for Domain 2:
 - 'assignment' (effect of assignment to intervention, i.e., intention-to-treat analysis)
@@ -31,13 +141,23 @@ Given the following study content, determine which analysis type is most appropr
 Text:
 {context}
 
-Answer with only 'assignment' or 'adherence'.
+{answer_line}
 """
-        result = call_llm(
-            prompt=prompt,
-            model_name=self.model_name,
-            model_provider=self.model_provider,
-            pydantic_model=None,
-        )
+
+    def _call_options(self) -> Dict[str, Any]:
+        return {
+            "model_name": self.model_name,
+            "model_provider": self.model_provider,
+            "pydantic_model": None,
+        }
+
+    def _call(self, prompt: str) -> Any:
+        return call_llm(prompt=prompt, **self._call_options())
+
+    async def _acall(self, prompt: str) -> Any:
+        return await acall_llm(prompt=prompt, **self._call_options())
+
+    @staticmethod
+    def _parse(result: Any) -> str:
         answer = str(result).strip().lower()
         return "adherence" if "adherence" in answer else "assignment"
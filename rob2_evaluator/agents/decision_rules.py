@@ -0,0 +1,193 @@
+"""
+RoB 2 官方判定算法：由信号问题答案确定领域风险，并按条件链将不适用的问题置为 NA。
+
+参考 Sterne JAC et al. RoB 2: a revised tool for assessing risk of bias in randomised
+trials. BMJ 2019;366:l4898，以及 RoB 2 完整指南（2019-08-22 版）中各领域的判定流程图。
+"""
+
+from typing import Callable, Dict, List, Tuple
+
+LOW = "Low risk"
+SOME_CONCERNS = "Some concerns"
+HIGH = "High risk"
+
+YES = {"Y", "PY"}
+NO = {"N", "PN"}
+YES_NI = YES | {"NI"}
+NO_NI = NO | {"NI"}
+
+Answers = Dict[str, str]
+
+
+def _is(answers: Answers, signal_id: str, allowed: set) -> bool:
+    return answers.get(signal_id, "NI") in allowed
+
+
+# 条件问题：signal_id -> 该问题适用的前提（对应 DOMAIN_SCHEMAS 中 "If ... to x.y" 的描述）
+SIGNAL_CONDITIONS: Dict[str, Dict[str, Callable[[Answers], bool]]] = {
+    "randomization": {},
+    "deviation_assignment": {
+        "q2_3": lambda a: _is(a, "q2_1", YES_NI) or _is(a, "q2_2", YES_NI),
+        "q2_4": lambda a: _is(a, "q2_3", YES),
+        "q2_5": lambda a: _is(a, "q2_4", YES_NI),
+        "q2_7": lambda a: _is(a, "q2_6", NO_NI),
+    },
+    "deviation_adherence": {
+        "q2_3": lambda a: _is(a, "q2_1", YES_NI) or _is(a, "q2_2", YES_NI),
+        "q2_6": lambda a: _is(a, "q2_3", NO_NI)
+        or _is(a, "q2_4", YES_NI)
+        or _is(a, "q2_5", YES_NI),
+    },
+    "missing_data": {
+        "q3_2": lambda a: _is(a, "q3_1", NO_NI),
+        # 3.2 没有 NI 选项；回答 NI（或被改写为 NI 的 NA）时同样继续判断 3.3
+        "q3_3": lambda a: _is(a, "q3_2", NO_NI),
+        "q3_4": lambda a: _is(a, "q3_3", YES_NI),
+    },
+    "measurement": {
+        "q4_3": lambda a: _is(a, "q4_1", NO_NI) and _is(a, "q4_2", NO_NI),
+        "q4_4": lambda a: _is(a, "q4_3", YES_NI),
+        "q4_5": lambda a: _is(a, "q4_4", YES_NI),
+    },
+    "selection": {},
+}
+
+# 前提成立时仍可回答 NA 的问题（"if applicable"，如不存在协议外干预、无需实施或依从的干预），
+# NA 视为不存在问题
+NA_ALLOWED: Dict[str, set] = {
+    "deviation_adherence": {"q2_3", "q2_4", "q2_5"},
+}
+
+
+def propagate_na(domain_key: str, signal_ids: List[str], answers: Answers) -> Answers:
+    """
+    按条件链修正答案：前提不成立的问题置为 NA；
+    前提成立却回答 NA 的问题视为信息不足（NI），NA_ALLOWED 中的问题除外。
+    signal_ids 需按问题顺序排列。
+    """
+    conditions = SIGNAL_CONDITIONS[domain_key]
+    na_allowed = NA_ALLOWED.get(domain_key, set())
+    resolved: Answers = {}
+    for signal_id in signal_ids:
+        answer = answers.get(signal_id, "NI")
+        condition = conditions.get(signal_id)
+        if condition is not None and not condition(resolved):
+            answer = "NA"
+        elif answer == "NA" and signal_id not in na_allowed:
+            answer = "NI"
+        resolved[signal_id] = answer
+    return resolved
+
+
+def _randomization(a: Answers) -> str:
+    if _is(a, "q1_2", NO):
+        return HIGH
+    if _is(a, "q1_2", YES):
+        if _is(a, "q1_1", NO):
+            return SOME_CONCERNS
+        return SOME_CONCERNS if _is(a, "q1_3", YES) else LOW
+    # 1.2 为 NI
+    return HIGH if _is(a, "q1_3", YES) else SOME_CONCERNS
+
+
+def _worst(*risks: str) -> str:
+    if HIGH in risks:
+        return HIGH
+    if SOME_CONCERNS in risks:
+        return SOME_CONCERNS
+    return LOW
+
+
+def _deviation_assignment(a: Answers) -> str:
+    # 第一部分：试验情境导致的偏离（2.1–2.5）
+    if _is(a, "q2_1", NO) and _is(a, "q2_2", NO):
+        part1 = LOW
+    elif _is(a, "q2_3", NO):
+        part1 = LOW
+    elif not _is(a, "q2_3", YES):
+        part1 = SOME_CONCERNS
+    elif _is(a, "q2_4", NO):
+        part1 = SOME_CONCERNS
+    elif _is(a, "q2_5", YES):
+        part1 = SOME_CONCERNS
+    else:
+        part1 = HIGH
+
+    # 第二部分：分析方法（2.6–2.7）
+    if _is(a, "q2_6", YES):
+        part2 = LOW
+    elif _is(a, "q2_7", NO):
+        part2 = SOME_CONCERNS
+    else:
+        part2 = HIGH
+    return _worst(part1, part2)
+
+
+def _deviation_adherence(a: Answers) -> str:
+    aware = _is(a, "q2_1", YES_NI) or _is(a, "q2_2", YES_NI)
+    cointervention_problem = aware and not _is(a, "q2_3", YES | {"NA"})
+    implementation_problem = _is(a, "q2_4", YES_NI)
+    adherence_problem = _is(a, "q2_5", YES_NI)
+
+    if not (cointervention_problem or implementation_problem or adherence_problem):
+        return LOW
+    if _is(a, "q2_6", YES):
+        return SOME_CONCERNS
+    return HIGH
+
+
+def _missing_data(a: Answers) -> str:
+    if _is(a, "q3_1", YES):
+        return LOW
+    if _is(a, "q3_2", YES):
+        return LOW
+    if _is(a, "q3_3", NO):
+        return LOW
+    if _is(a, "q3_4", NO):
+        return SOME_CONCERNS
+    return HIGH
+
+
+def _measurement(a: Answers) -> str:
+    if _is(a, "q4_1", YES) or _is(a, "q4_2", YES):
+        return HIGH
+    # 4.2 为 NI 时最好也只能是 Some concerns
+    best = LOW if _is(a, "q4_2", NO) else SOME_CONCERNS
+    if _is(a, "q4_3", NO):
+        return best
+    if _is(a, "q4_4", NO):
+        return best
+    if _is(a, "q4_5", NO):
+        return SOME_CONCERNS
+    return HIGH
+
+
+def _selection(a: Answers) -> str:
+    if _is(a, "q5_2", YES) or _is(a, "q5_3", YES):
+        return HIGH
+    if _is(a, "q5_2", NO) and _is(a, "q5_3", NO):
+        return LOW if _is(a, "q5_1", YES) else SOME_CONCERNS
+    return SOME_CONCERNS
+
+
+DOMAIN_RULES: Dict[str, Callable[[Answers], str]] = {
+    "randomization": _randomization,
+    "deviation_assignment": _deviation_assignment,
+    "deviation_adherence": _deviation_adherence,
+    "missing_data": _missing_data,
+    "measurement": _measurement,
+    "selection": _selection,
+}
+
+
+def judge_domain(
+    domain_key: str, signal_ids: List[str], answers: Answers
+) -> Tuple[Answers, str]:
+    """
+    应用领域判定算法
+
+    Returns:
+        (修正 NA 后的答案, 领域风险)
+    """
+    resolved = propagate_na(domain_key, signal_ids, answers)
+    return resolved, DOMAIN_RULES[domain_key](resolved)
@@ -1,183 +1,671 @@
+from rob2_evaluator.agents.decision_rules import judge_domain
 from rob2_evaluator.schema.rob2_schema import (
     DOMAIN_SCHEMAS,
+    EvidenceItem,
     GenericDomainJudgement,
+    SignalsOnlyJudgement,
 )
 from rob2_evaluator.config.model_config import ModelConfig
-from rob2_evaluator.utils.llm import call_llm
+from rob2_evaluator.utils.llm import acall_llm, cached_response, call_llm, track_fallbacks
+from rob2_evaluator.utils.json_stream import DomainStreamValidator
+from rob2_evaluator.utils.tokens import context_budget, count_tokens, group_by_token_budget
 from rob2_evaluator.llm.models import ModelProvider
-from typing import List, Dict, Any, Optional
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List, Dict, Any, Optional, Tuple
+import asyncio
+import contextvars
+import logging
+import re
 
 from jinja2 import Template
+from langchain_core.messages import HumanMessage
 
+# llm：模型同时给出信号答案与领域风险；rules：模型只回答信号问题，领域风险由 RoB 2 判定算法本地计算
+JUDGEMENT_MODES = ("llm", "rules")
 
-class DomainAgent:
-    def __init__(
-        self,
-        domain_key: str,
-        model_name: Optional[str] = None,
-        model_provider: Optional[ModelProvider] = None,
-    ):
-        self.domain_key = domain_key
-        self.schema = DOMAIN_SCHEMAS[domain_key]
+# quote：模型逐字引用证据并给出页码；passage：模型只引用段落编号，证据文本与页码在本地展开
+EVIDENCE_MODES = ("quote", "passage")
 
-        config = ModelConfig()
-        # 优先使用传入的参数，其次使用配置值
-        self.model_name = model_name or config.get_model_name()
-        self.model_provider = model_provider or config.get_model_provider()
-
-    def evaluate(self, items: List[Dict[str, Any]]):
-        signals_schema = self.schema["signals"]
-        prompt = self._build_prompt(items, signals_schema)
-
-        # 调用 LLM，使用更新后的 Pydantic 模型进行解析
-        result: GenericDomainJudgement = call_llm(
-            prompt=prompt,
-            model_name=self.model_name,
-            model_provider=self.model_provider,
-            pydantic_model=GenericDomainJudgement,
-            domain_key=self.domain_key,
-        )
-
-        # 直接处理包含 page_idx 的结果
-        processed_signals = {}
-        for signal_id, signal_data in result.signals.items():
-            processed_evidence = []
-            for ev in signal_data.evidence:
-                # ev 已经是 EvidenceItem
-                processed_evidence.append(
-                    {
-                        "text": ev.text,
-                        "page_idx": ev.page_idx if ev.page_idx is not None else -1,
-                    }
-                )
+# 共享前缀：只包含文档上下文，不含任何领域信息
+CONTEXT_TEMPLATE = Template(
+    """
+# ROB2 Domain Evaluation Expert
 
-            processed_signals[signal_id] = {
-                "answer": signal_data.answer,
-                "reason": signal_data.reason,
-                "evidence": processed_evidence,
-            }
+## Task Background
+You are an expert in the ROB2 framework, specializing in assessing risk of bias in randomized controlled trials (RCTs). Your task is to analyze the provided study content and evaluate the risk of bias for the domain specified after the materials.
 
-        processed_overall_evidence = []
-        for ev in result.overall.evidence:
-            processed_overall_evidence.append(
-                {
-                    "text": ev.text,
-                    "page_idx": ev.page_idx if ev.page_idx is not None else -1,
-                }
-            )
+## Evaluation Materials
+{% if cite_passages %}
+The following content has been extracted from the study. Each text block is marked with its passage ID and source page number using the format `[P<n> | Page X]`.
+{% else %}
+The following content has been extracted from the study. Each text block is clearly marked with its source page number using the format `[Page X]`.
+{% endif %}
 
-        return {
-            "domain": self.schema["domain_name"],
-            "signals": processed_signals,
-            "overall": {
-                "risk": result.overall.risk,
-                "reason": result.overall.reason,
-                "evidence": processed_overall_evidence,
-            },
-        }
+{{ context }}
+""",
+    trim_blocks=True,
+    lstrip_blocks=True,
+)
 
-    def _build_prompt(
-        self, items: List[Dict[str, Any]], signals_schema: List[Dict[str, Any]]
-    ) -> str:
-        """使用 Jinja2 模板构建 prompt，要求 LLM 返回 page_idx"""
-        # 构建带有页码标记的上下文
-        context_lines = []
-        for item in items:
-            page = item.get("page_idx", "?")  # 如果意外缺失 page_idx，用 '?' 替代
-            # 这里将 page_idx 加 1（如果是数字）
-            if isinstance(page, int):
-                page_display = page
-            else:
-                page_display = page
-            text = item.get("text", "")
-            context_lines.append(f"[Page {page_display}] {text}")
-        context = "\n\n".join(context_lines)  # 使用双换行符分隔段落可能更清晰
-
-        # 获取 schema 信息
-        signal_options = signals_schema[0]["options"]  # 假设所有信号选项相同
-        domain_options = self.schema["domain_options"]
-        domain_title = self.schema["domain_name"]
-
-        # 更新后的 Jinja2 模板字符串
-        prompt_template = """
+# 长文档 map-reduce 的合并阶段：以各分段提取的信号答案与证据代替文档上下文
+MERGE_TEMPLATE = Template(
+    """
 # ROB2 Domain Evaluation Expert
 
 ## Task Background
-You are an expert in the ROB2 framework, specializing in assessing risk of bias in randomized controlled trials (RCTs). Your task is to analyze the provided study content and evaluate the risk of bias for the domain: "{{ domain_title }}".
+You are an expert in the ROB2 framework, specializing in assessing risk of bias in randomized controlled trials (RCTs). The study was too long to assess in a single pass, so it was split into {{ segments | length }} consecutive segments and the signal questions were answered for each segment separately. Merge these findings into a single evaluation of the domain specified after the materials.
+
+A segment that does not report on a question answers NI; answer from the segments that do. When segments disagree, prefer the answer backed by the most specific evidence.
 
 ## Evaluation Materials
-The following content has been extracted from the study. Each text block is clearly marked with its source page number using the format `[Page X]`.
+{% if cite_passages %}
+The following findings were extracted from the study segments. Each piece of evidence is marked with its passage ID and source page number using the format `[P<n> | Page X]`.
+{% else %}
+The following findings were extracted from the study segments. Each piece of evidence is clearly marked with its source page number using the format `[Page X]`.
+{% endif %}
+{% for segment in segments %}
 
-{{ context }}
+### Segment {{ loop.index }}
+{% for signal_id, signal in segment.items() %}
+- {{ signal_id }}: {{ signal.answer }}. {{ signal.reason }}
+{% for ev in signal.evidence %}
+  - [{% if cite_passages and ev.passage %}{{ ev.passage }} | {% endif %}Page {{ ev.page_idx }}] {{ ev.text }}
+{% endfor %}
+{% endfor %}
+{% endfor %}
+""",
+    trim_blocks=True,
+    lstrip_blocks=True,
+)
+
+# map 阶段并发处理的分段数上限
+MAP_PARALLELISM = 4
+
+# 上下文中每个段落的 [Page X] 标记与分隔符约占的 token 数
+ITEM_MARKER_TOKENS = 8
+
+# 领域相关部分，位于共享前缀之后
+DOMAIN_TEMPLATE = Template(
+    """
+
+## Domain
+Evaluate the risk of bias for the domain: "{{ domain_title }}".
 
 ## Analysis Steps
 1.  Carefully read all the provided material, paying close attention to the `[Page X]` markers.
 2.  For each Signal Question below, provide an answer, a detailed reason, and supporting evidence.
+{% if include_overall %}
 3.  Provide an overall risk assessment for the domain, including the reason and supporting evidence.
 4.  **Crucially**: When providing evidence (`evidence` field), you **must**:
+{% if cite_passages %}
+    *   Cite the passage by its ID (the `P<n>` in the `[P<n> | Page X]` marker), e.g. `"passage": "P12"`. Do **not** copy the passage text.
+    *   Optionally add `span`: the first few words (at most 8) of the supporting sentence within that passage.
+{% else %}
+    *   Quote the text **exactly** as it appears in the Evaluation Materials.
+    *   Include the corresponding `page_idx` (the number X from the `[Page X]` marker) for **each** piece of evidence cited. Find the text segment in the material above and report its associated page number.
+{% endif %}
+{% else %}
+3.  Answer NA for a conditional question ("If ... to x.y") when its condition is not met. The domain-level judgement is derived from your answers, so do not provide one.
+4.  **Crucially**: When providing evidence (`evidence` field), you **must**:
+{% if cite_passages %}
+    *   Cite the passage by its ID (the `P<n>` in the `[P<n> | Page X]` marker), e.g. `"passage": "P12"`. Do **not** copy the passage text.
+    *   Optionally add `span`: the first few words (at most 8) of the supporting sentence within that passage.
+{% else %}
     *   Quote the text **exactly** as it appears in the Evaluation Materials.
     *   Include the corresponding `page_idx` (the number X from the `[Page X]` marker) for **each** piece of evidence cited. Find the text segment in the material above and report its associated page number.
+{% endif %}
+{% endif %}
 
 ## Signal Questions
 {% for s in signals_schema -%}
-{{ s.id }}: {{ s.text }}
+{{ s.id }}: {{ s.text }} (options: {{ s.options | join('/') }})
 {% endfor %}
-
-Answer options for each signal: {{ signal_options | join('/') }}
+{% if include_overall %}
 
 ## Overall Risk Assessment
 Domain-level risk of bias judgment options:
 {% for opt in domain_options -%}
 - {{ opt }}
 {% endfor %}
+{% endif %}
 
 ## Required Output Format
+{% if cite_passages %}
+Return **only** a valid JSON object adhering strictly to the following structure. Every evidence item must cite a passage ID from the Evaluation Materials.
+{% else %}
 Return **only** a valid JSON object adhering strictly to the following structure. Ensure all evidence includes both `text` and the correct `page_idx`.
+{% endif %}
 
 ```json
 {
   "signals": {
     {% for s in signals_schema -%}
     "{{ s.id }}": {
-      "answer": "<Select one: {{ signal_options | join('/') }}>",
+      "answer": "<Select one: {{ s.options | join('/') }}>",
       "reason": "<Your detailed reasoning for the answer>",
       "evidence": [
         {
+{% if cite_passages %}
+          "passage": "<Passage ID, e.g. P12>",
+          "span": "<First few words of the supporting sentence (optional)>"
+        }
+        // Add more evidence items if needed, each citing a passage ID
+{% else %}
           "text": "<Exact quote from the Evaluation Materials>",
           "page_idx": <Integer page number corresponding to the quote's source>
         }
         // Add more evidence items if needed, each with text and page_idx
+{% endif %}
       ]
     }{% if not loop.last %},{% endif %}
     {% endfor %}
+{% if include_overall %}
   },
   "overall": {
     "risk": "<Select one: {{ domain_options | join('/') }}>",
     "reason": "<Your detailed reasoning for the overall domain judgment>",
     "evidence": [
       {
+{% if cite_passages %}
+        "passage": "<Passage ID, e.g. P12>",
+        "span": "<First few words of the supporting sentence (optional)>"
+{% else %}
         "text": "<Exact quote supporting the overall judgment>",
         "page_idx": <Integer page number corresponding to the quote's source>
+{% endif %}
       }
       // Add more evidence items if needed
     ]
   }
+{% else %}
+  }
+{% endif %}
 }
 ```
-"""
-        template = Template(
-            prompt_template, trim_blocks=True, lstrip_blocks=True
-        )  # trim/lstrip helps clean up whitespace
-        prompt = template.render(
-            context=context,
+""",
+    trim_blocks=True,
+    lstrip_blocks=True,
+)
+
+
+def render_context(items: List[Dict[str, Any]], cite_passages: bool = False) -> str:
+    """构建带有页码标记（cite_passages 时还有段落编号）的上下文，相同输入总是得到相同的字符串"""
+    context_lines = []
+    for idx, item in enumerate(items):
+        page = item.get("page_idx", "?")  # 如果意外缺失 page_idx，用 '?' 替代
+        text = item.get("text", "")
+        if cite_passages:
+            context_lines.append(f"[{passage_id(item, idx)} | Page {page}] {text}")
+        else:
+            context_lines.append(f"[Page {page}] {text}")
+    return "\n\n".join(context_lines)  # 使用双换行符分隔段落可能更清晰
+
+
+def passage_id(item: Dict[str, Any], idx: int) -> str:
+    """段落编号：优先使用 assign_passage_ids 分配的文档级编号，否则按位置编号"""
+    return item.get("passage_id") or f"P{idx + 1}"
+
+
+def assign_passage_ids(items: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    为一篇文档的全部段落分配稳定的短编号（P1、P2 ...），返回带 passage_id 的副本。
+    在检索等筛选之前调用，使各领域看到同一段落时编号一致。
+    """
+    return [{**item, "passage_id": f"P{idx + 1}"} for idx, item in enumerate(items)]
+
+
+def expand_citation(
+    passage: Dict[str, Any], span: Optional[str]
+) -> str:
+    """
+    将段落引用展开为证据文本：span 为支持句的开头几个词时返回该句，
+    否则返回整个段落
+    """
+    text = passage.get("text", "")
+    if span:
+        needle = " ".join(span.split()).casefold()
+        for sentence in re.split(r"(?<=[.!?])\s+", text):
+            if needle in " ".join(sentence.split()).casefold():
+                return sentence.strip()
+    return text
+
+
+class DomainAgent:
+    def __init__(
+        self,
+        domain_key: str,
+        model_name: Optional[str] = None,
+        model_provider: Optional[ModelProvider] = None,
+        judgement_mode: str = "llm",
+        stream: bool = False,
+        on_signal: Optional[Callable[[str, Dict[str, Any]], None]] = None,
+        evidence_mode: str = "quote",
+        max_context_tokens: Optional[int] = None,
+        sample_index: int = 0,
+    ):
+        """
+        Args:
+            judgement_mode: "llm" 由模型给出领域风险；"rules" 由本地判定算法计算
+            stream: 流式接收输出并增量校验，明显无效时提前中止并重试
+            on_signal: 流式模式下每个信号问题解析完成时的回调（信号编号, 内容）
+            evidence_mode: "quote" 逐字引用证据；"passage" 按段落编号引用，本地展开为文本与页码
+            max_context_tokens: 单次调用中文档上下文的 token 上限；默认由模型的上下文长度决定。
+                超出上限的文档按分段提取信号答案、再合并的方式（map-reduce）评估
+            sample_index: 投票时的样本序号，使同一 prompt 的各次采样在响应缓存中互不覆盖
+        """
+        self.domain_key = domain_key
+        self.schema = DOMAIN_SCHEMAS[domain_key]
+
+        config = ModelConfig()
+        # 优先使用传入的参数，其次使用配置值
+        self.model_name = model_name or config.get_model_name()
+        self.model_provider = model_provider or config.get_model_provider()
+        if judgement_mode not in JUDGEMENT_MODES:
+            raise ValueError(f"不支持的判定模式: {judgement_mode}")
+        self.judgement_mode = judgement_mode
+        self.stream = stream
+        self.on_signal = on_signal
+        if evidence_mode not in EVIDENCE_MODES:
+            raise ValueError(f"不支持的证据引用模式: {evidence_mode}")
+        self.evidence_mode = evidence_mode
+        self.max_context_tokens = max_context_tokens
+        self.sample_index = sample_index
+
+    def evaluate(self, items: List[Dict[str, Any]]):
+        signals_schema = self.schema["signals"]
+        items = self._prepare_items(items)
+        if not self.fits_context(items):
+            return self._evaluate_map_reduce(items, signals_schema)
+
+        return self._judge(self._build_messages(items, signals_schema), items)
+
+    async def aevaluate(self, items: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """evaluate 的异步版本，LLM 调用经 acall_llm 发出"""
+        signals_schema = self.schema["signals"]
+        items = self._prepare_items(items)
+        if not self.fits_context(items):
+            return await self._aevaluate_map_reduce(items, signals_schema)
+
+        return await self._ajudge(self._build_messages(items, signals_schema), items)
+
+    def llm_requests(self, items: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        evaluate 将发出的 LLM 调用（call_llm 的参数，不含流式校验），供批处理模式预先提交。
+        长文档的合并调用以各分段结果为输入：分段结果尚未全部进入 LLM 响应缓存时只返回分段调用
+        """
+        signals_schema = self.schema["signals"]
+        items = self._prepare_items(items)
+        if self.fits_context(items):
+            prompt = self._build_messages(items, signals_schema)
+        else:
+            segments = self._segments(items)
+            requests = [
+                self._extract_call_options(segment, signals_schema) for segment in segments
+            ]
+            responses = [cached_response(**request) for request in requests]
+            if any(response is None for response in responses):
+                return requests
+            findings = [
+                self._segment_findings(response, segment)
+                for response, segment in zip(responses, segments)
+            ]
+            prompt = self._merge_prompt(findings, signals_schema)
+        options = self._judge_call_options()
+        options.pop("stream_validator")
+        return [{"prompt": prompt, **options}]
+
+    def _prepare_items(self, items: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        if self.evidence_mode == "passage":
+            # 分段之前固定编号，各分段与合并阶段引用的编号一致
+            items = [
+                {**item, "passage_id": passage_id(item, idx)}
+                for idx, item in enumerate(items)
+            ]
+        return items
+
+    def _judge(self, prompt: Any, items: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        调用 LLM 得出领域判断并转换为结果字典；items 用于展开段落引用。
+        调用失败而使用默认响应时，结果带有 fallback 标记
+        """
+        with track_fallbacks() as fallbacks:
+            # 调用 LLM，使用更新后的 Pydantic 模型进行解析
+            result: GenericDomainJudgement = call_llm(
+                prompt=prompt, **self._judge_call_options()
+            )
+        return self._judgement_result(result, items, fallbacks.count > 0)
+
+    async def _ajudge(self, prompt: Any, items: List[Dict[str, Any]]) -> Dict[str, Any]:
+        with track_fallbacks() as fallbacks:
+            result: GenericDomainJudgement = await acall_llm(
+                prompt=prompt, **self._judge_call_options()
+            )
+        return self._judgement_result(result, items, fallbacks.count > 0)
+
+    def _judge_call_options(self) -> Dict[str, Any]:
+        return {
+            "model_name": self.model_name,
+            "model_provider": self.model_provider,
+            "pydantic_model": (
+                SignalsOnlyJudgement
+                if self.judgement_mode == "rules"
+                else GenericDomainJudgement
+            ),
+            "domain_key": self.domain_key,
+            "stream_validator": self._stream_validator() if self.stream else None,
+            "cache_salt": self._cache_salt(),
+        }
+
+    def _judgement_result(
+        self, result: GenericDomainJudgement, items: List[Dict[str, Any]], fallback: bool
+    ) -> Dict[str, Any]:
+        passages = None
+        if self.evidence_mode == "passage":
+            passages = {passage_id(item, idx): item for idx, item in enumerate(items)}
+        return self._mark_fallback(self._to_result(result, passages), fallback)
+
+    @staticmethod
+    def _mark_fallback(output: Dict[str, Any], fallback: bool) -> Dict[str, Any]:
+        """结果含有默认响应时加上 fallback 标记（不写入缓存、不参与投票）"""
+        if fallback:
+            output["fallback"] = True
+        return output
+
+    def _cache_salt(self) -> Optional[str]:
+        return f"sample-{self.sample_index}" if self.sample_index else None
+
+    def context_token_budget(self) -> int:
+        """单次调用中可用于文档上下文的 token 数"""
+        prefix, suffix = self._build_prompt_parts([], self.schema["signals"])
+        overhead = count_tokens(prefix + suffix, self.model_name)
+        return context_budget(self.model_name, overhead, self.max_context_tokens)
+
+    def _item_tokens(self, text: str) -> int:
+        return count_tokens(text, self.model_name) + ITEM_MARKER_TOKENS
+
+    def fits_context(self, items: List[Dict[str, Any]]) -> bool:
+        """文档上下文能否在一次调用中完整发送"""
+        total = sum(self._item_tokens(item.get("text", "")) for item in items)
+        return total <= self.context_token_budget()
+
+    def _segments(self, items: List[Dict[str, Any]]) -> List[List[Dict[str, Any]]]:
+        """按 token 预算将文档切分为连续的分段；单个超长段落自成一段"""
+        groups = group_by_token_budget(
+            items,
+            list(range(len(items))),
+            self.context_token_budget(),
+            max_items=len(items),
+            counter=self._item_tokens,
+        )
+        return [[items[idx] for idx in group] for group in groups]
+
+    def _evaluate_map_reduce(
+        self, items: List[Dict[str, Any]], signals_schema: List[Dict[str, Any]]
+    ) -> Dict[str, Any]:
+        """
+        长文档评估：map 阶段各分段并发地只回答信号问题并给出证据，
+        reduce 阶段将各分段的答案与证据（远小于原文）合并为一次领域判断。
+        任一分段调用使用了默认响应时，合并结果同样带有 fallback 标记
+        """
+        segments = self._segments(items)
+        logging.info(
+            f"{self.schema['domain_name']}: 文档超出上下文预算，分 {len(segments)} 段评估"
+        )
+        with track_fallbacks() as fallbacks, ThreadPoolExecutor(
+            max_workers=min(MAP_PARALLELISM, len(segments))
+        ) as executor:
+            # 线程池不继承 ContextVar，各分段在当前上下文的副本中运行，回退计入同一计数器
+            futures = [
+                executor.submit(
+                    contextvars.copy_context().run,
+                    self._extract_signals,
+                    segment,
+                    signals_schema,
+                )
+                for segment in segments
+            ]
+            findings = [future.result() for future in futures]
+        result = self._judge(self._merge_prompt(findings, signals_schema), items)
+        return self._mark_fallback(result, fallbacks.count > 0)
+
+    async def _aevaluate_map_reduce(
+        self, items: List[Dict[str, Any]], signals_schema: List[Dict[str, Any]]
+    ) -> Dict[str, Any]:
+        """异步 map-reduce：各分段同时发出，并发由提供商信号量限制"""
+        segments = self._segments(items)
+        logging.info(
+            f"{self.schema['domain_name']}: 文档超出上下文预算，分 {len(segments)} 段评估"
+        )
+        with track_fallbacks() as fallbacks:
+            # gather 创建的任务继承当前上下文，分段的回退计入同一计数器
+            findings = await asyncio.gather(
+                *(self._aextract_signals(segment, signals_schema) for segment in segments)
+            )
+        result = await self._ajudge(self._merge_prompt(list(findings), signals_schema), items)
+        return self._mark_fallback(result, fallbacks.count > 0)
+
+    def _merge_prompt(
+        self, findings: List[Dict[str, Dict[str, Any]]], signals_schema: List[Dict[str, Any]]
+    ) -> str:
+        _, suffix = self._build_prompt_parts([], signals_schema)
+        cite_passages = self.evidence_mode == "passage"
+        return (
+            MERGE_TEMPLATE.render(segments=findings, cite_passages=cite_passages)
+            + suffix
+        )
+
+    def _extract_signals(
+        self, segment: List[Dict[str, Any]], signals_schema: List[Dict[str, Any]]
+    ) -> Dict[str, Dict[str, Any]]:
+        """map 阶段：对一个分段只回答信号问题，返回 {信号编号: {answer, reason, evidence}}"""
+        result: SignalsOnlyJudgement = call_llm(
+            **self._extract_call_options(segment, signals_schema)
+        )
+        return self._segment_findings(result, segment)
+
+    async def _aextract_signals(
+        self, segment: List[Dict[str, Any]], signals_schema: List[Dict[str, Any]]
+    ) -> Dict[str, Dict[str, Any]]:
+        result: SignalsOnlyJudgement = await acall_llm(
+            **self._extract_call_options(segment, signals_schema)
+        )
+        return self._segment_findings(result, segment)
+
+    def _extract_call_options(
+        self, segment: List[Dict[str, Any]], signals_schema: List[Dict[str, Any]]
+    ) -> Dict[str, Any]:
+        return {
+            "prompt": self._build_messages(segment, signals_schema, include_overall=False),
+            "model_name": self.model_name,
+            "model_provider": self.model_provider,
+            "pydantic_model": SignalsOnlyJudgement,
+            "domain_key": self.domain_key,
+            "cache_salt": self._cache_salt(),
+        }
+
+    def _segment_findings(
+        self, result: SignalsOnlyJudgement, segment: List[Dict[str, Any]]
+    ) -> Dict[str, Dict[str, Any]]:
+        passages = None
+        if self.evidence_mode == "passage":
+            passages = {passage_id(item, idx): item for idx, item in enumerate(segment)}
+        return {
+            signal_id: {
+                "answer": signal.answer,
+                "reason": signal.reason,
+                "evidence": [self._process_evidence(ev, passages) for ev in signal.evidence],
+            }
+            for signal_id, signal in result.signals.items()
+        }
+
+    def _stream_validator(self) -> DomainStreamValidator:
+        def on_signal(signal_id: str, data: Dict[str, Any]) -> None:
+            logging.debug(f"{self.schema['domain_name']} {signal_id}: {data.get('answer')}")
+            if self.on_signal is not None:
+                self.on_signal(signal_id, data)
+
+        return DomainStreamValidator(
+            self.schema,
+            include_overall=self.judgement_mode == "llm",
+            on_signal=on_signal,
+        )
+
+    def _to_result(
+        self,
+        result: GenericDomainJudgement,
+        passages: Optional[Dict[str, Dict[str, Any]]] = None,
+    ) -> Dict[str, Any]:
+        """
+        将 LLM 返回的领域判断转换为评估结果字典（rules 模式下领域风险由本地算法得出）
+
+        Args:
+            passages: 段落编号到段落的映射，提供时按段落引用展开证据
+        """
+        # 直接处理包含 page_idx 的结果
+        processed_signals = {}
+        for signal_id, signal_data in result.signals.items():
+            processed_evidence = [
+                self._process_evidence(ev, passages) for ev in signal_data.evidence
+            ]
+
+            processed_signals[signal_id] = {
+                "answer": signal_data.answer,
+                "reason": signal_data.reason,
+                "evidence": processed_evidence,
+            }
+
+        if self.judgement_mode == "rules":
+            return self._apply_rules(processed_signals)
+
+        processed_overall_evidence = [
+            self._process_evidence(ev, passages) for ev in result.overall.evidence
+        ]
+
+        return {
+            "domain": self.schema["domain_name"],
+            "signals": processed_signals,
+            "overall": {
+                "risk": result.overall.risk,
+                "reason": result.overall.reason,
+                "evidence": processed_overall_evidence,
+            },
+        }
+
+    @staticmethod
+    def _process_evidence(
+        ev: EvidenceItem, passages: Optional[Dict[str, Dict[str, Any]]] = None
+    ) -> Dict[str, Any]:
+        """证据条目转换为 {text, page_idx}；段落引用按原文展开，页码取自段落本身"""
+        if passages is not None and ev.passage:
+            passage = passages.get(ev.passage.strip().strip("[]").upper())
+            if passage is not None:
+                page = passage.get("page_idx")
+                return {
+                    "text": expand_citation(passage, ev.span),
+                    "page_idx": page if isinstance(page, int) else -1,
+                    "passage": ev.passage.strip().strip("[]").upper(),
+                }
+            logging.warning(f"证据引用了不存在的段落: {ev.passage}")
+        # ev 已经是 EvidenceItem
+        return {
+            "text": ev.text or ev.span or "",
+            "page_idx": ev.page_idx if ev.page_idx is not None else -1,
+        }
+
+    def _apply_rules(self, signals: Dict[str, Dict[str, Any]]) -> Dict[str, Any]:
+        """按 RoB 2 判定算法修正不适用问题并计算领域风险"""
+        signal_ids = [signal["id"] for signal in self.schema["signals"]]
+        answers, risk = judge_domain(
+            self.domain_key,
+            signal_ids,
+            {signal_id: data["answer"] for signal_id, data in signals.items()},
+        )
+
+        processed_signals = {}
+        overall_evidence = []
+        for signal_id in signal_ids:
+            data = signals.get(
+                signal_id,
+                {"answer": "NI", "reason": "No information available", "evidence": []},
+            )
+            if answers[signal_id] != data["answer"]:
+                data = {**data, "answer": answers[signal_id]}
+            processed_signals[signal_id] = data
+            for ev in data["evidence"]:
+                if ev not in overall_evidence:
+                    overall_evidence.append(ev)
+
+        return {
+            "domain": self.schema["domain_name"],
+            "signals": processed_signals,
+            "overall": {
+                "risk": risk,
+                "reason": "Derived from the signalling answers by the RoB 2 algorithm: "
+                + ", ".join(f"{sid}={answers[sid]}" for sid in signal_ids),
+                "evidence": overall_evidence,
+            },
+        }
+
+    def _build_prompt_parts(
+        self,
+        items: List[Dict[str, Any]],
+        signals_schema: List[Dict[str, Any]],
+        include_overall: Optional[bool] = None,
+    ) -> Tuple[str, str]:
+        """
+        构建 prompt 的两部分：
+        前缀只包含文档上下文，同一文档的各领域逐字节相同，可命中服务商的前缀缓存；
+        后缀包含领域标题、信号问题与输出格式。
+        include_overall 默认由判定模式决定，map 阶段传入 False 只要求回答信号问题。
+        """
+        cite_passages = self.evidence_mode == "passage"
+        prefix = CONTEXT_TEMPLATE.render(
+            context=render_context(items, cite_passages), cite_passages=cite_passages
+        )
+
+        if include_overall is None:
+            include_overall = self.judgement_mode == "llm"
+        # 每个信号问题列出各自的选项（只有条件问题可以回答 NA）
+        suffix = DOMAIN_TEMPLATE.render(
+            include_overall=include_overall,
+            cite_passages=cite_passages,
             signals_schema=signals_schema,
-            signal_options=signal_options,
-            domain_options=domain_options,
-            domain_title=domain_title,
+            domain_options=self.schema["domain_options"],
+            domain_title=self.schema["domain_name"],
         )
+        return prefix, suffix
+
+    def _build_prompt(
+        self, items: List[Dict[str, Any]], signals_schema: List[Dict[str, Any]]
+    ) -> str:
+        """使用 Jinja2 模板构建 prompt，要求 LLM 返回 page_idx"""
+        return "".join(self._build_prompt_parts(items, signals_schema))
 
-        # print(f"DEBUG: Generated Prompt:\n{prompt[:1000]}...")
-        return prompt
+    def _build_messages(
+        self,
+        items: List[Dict[str, Any]],
+        signals_schema: List[Dict[str, Any]],
+        include_overall: Optional[bool] = None,
+    ):
+        """
+        Anthropic 需要显式的缓存断点：文档上下文作为单独的内容块并标记 cache_control；
+        OpenAI 与 Ollama 自动复用相同前缀，直接发送完整字符串。
+        """
+        prefix, suffix = self._build_prompt_parts(items, signals_schema, include_overall)
+        if self.model_provider != ModelProvider.ANTHROPIC:
+            return prefix + suffix
+        return [
+            HumanMessage(
+                content=[
+                    {
+                        "type": "text",
+                        "text": prefix,
+                        "cache_control": {"type": "ephemeral"},
+                    },
+                    {"type": "text", "text": suffix},
+                ]
+            )
+        ]
 
 
 # 简单使用示例
@@ -9,12 +9,12 @@ from rob2_evaluator.schema.rob2_schema import (
 class DomainDeviationAssignmentAgent(DomainAgent):
     """Domain 2: Deviations from intended interventions (effect of assignment) expert"""
 
-    def __init__(self):
-        super().__init__(DomainKey.DEVIATION_ASSIGNMENT)
+    def __init__(self, **kwargs):
+        super().__init__(DomainKey.DEVIATION_ASSIGNMENT, **kwargs)
 
 
 class DomainDeviationAdherenceAgent(DomainAgent):
     """Domain 2: Deviations from intended interventions (effect of adherence) expert"""
 
-    def __init__(self):
-        super().__init__(DomainKey.DEVIATION_ADHERENCE)
+    def __init__(self, **kwargs):
+        super().__init__(DomainKey.DEVIATION_ADHERENCE, **kwargs)
@@ -7,5 +7,5 @@ from rob2_evaluator.schema.rob2_schema import (
 class DomainMeasurementAgent(DomainAgent):
     """Domain 2: Measurement of the outcome expert using LLM for structured ROB2 assessment."""
 
-    def __init__(self):
-        super().__init__(DomainKey.MEASUREMENT)
+    def __init__(self, **kwargs):
+        super().__init__(DomainKey.MEASUREMENT, **kwargs)
@@ -7,5 +7,5 @@ from rob2_evaluator.schema.rob2_schema import (
 class DomainMissingDataAgent(DomainAgent):
     """Domain 3: Missing outcome data expert using LLM for structured ROB2 assessment."""
 
-    def __init__(self):
-        super().__init__(DomainKey.MISSING_DATA)
+    def __init__(self, **kwargs):
+        super().__init__(DomainKey.MISSING_DATA, **kwargs)
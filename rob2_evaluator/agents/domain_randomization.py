@@ -7,5 +7,5 @@ from rob2_evaluator.schema.rob2_schema import (
 class DomainRandomizationAgent(DomainAgent):
     """Domain 1: Randomization process expert using LLM for structured ROB2 assessment."""
 
-    def __init__(self):
-        super().__init__(DomainKey.RANDOMIZATION)
+    def __init__(self, **kwargs):
+        super().__init__(DomainKey.RANDOMIZATION, **kwargs)
@@ -7,5 +7,5 @@ from rob2_evaluator.schema.rob2_schema import (
 class DomainSelectionAgent(DomainAgent):
     """Domain 5: Selection of the reported result expert using LLM for structured ROB2 assessment."""
 
-    def __init__(self):
-        super().__init__(DomainKey.SELECTION)
+    def __init__(self, **kwargs):
+        super().__init__(DomainKey.SELECTION, **kwargs)
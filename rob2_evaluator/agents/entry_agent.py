@@ -1,16 +1,78 @@
-from rob2_evaluator.utils.llm import call_llm
+from rob2_evaluator.utils.llm import acall_llm, call_llm, track_fallbacks
+from rob2_evaluator.utils.tokens import group_by_token_budget
 from rob2_evaluator.llm.models import ModelProvider
-from typing import List, Dict, Any
+from rob2_evaluator.schema.rob2_schema import RelevantPassages
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, asdict
+from typing import List, Dict, Any, Tuple
+import asyncio
+import logging
 import re
+import threading
 from typing import Optional
 from rob2_evaluator.config.model_config import ModelConfig
 
+CLASSIFICATION_MODES = ("single", "multi")
+
+# 相关性判断提示词版本，修改对应提示词时需同步递增，使旧的缓存结果失效
+PROMPT_VERSIONS = {"single": "single-v1", "multi": "multi-v1"}
+
+
+@dataclass
+class FilterStats:
+    """入口筛选统计：候选项中本地判定与交给 LLM 的数量"""
+
+    candidates: int = 0
+    section_included: int = 0
+    section_excluded: int = 0
+    auto_accepted: int = 0
+    auto_rejected: int = 0
+    cache_hits: int = 0
+    llm_items: int = 0
+    llm_calls: int = 0
+    # LLM 调用失败的分类单元数（其中各项按相关保留，不写入缓存）
+    llm_fallbacks: int = 0
+
+    @property
+    def locally_decided(self) -> int:
+        """章节路由、预筛选与判断结果缓存在本地判定的候选项数"""
+        return (
+            self.section_included
+            + self.section_excluded
+            + self.auto_accepted
+            + self.auto_rejected
+            + self.cache_hits
+        )
+
+    @property
+    def locally_decided_ratio(self) -> float:
+        """无需 LLM 即完成判定的候选项比例"""
+        if not self.candidates:
+            return 0.0
+        return self.locally_decided / self.candidates
+
+    def merge(self, other: "FilterStats") -> None:
+        for key, value in asdict(other).items():
+            setattr(self, key, getattr(self, key) + value)
+
 
 class EntryAgent:
     """
     入口专家：对原始json数组进行粗过滤，使用LLM判断每项是否与ROB2主题相关。
     相关项及其前后各1项一并保留，保证原文结构。
     会在遇到参考文献部分时停止处理，并对短文本进行批量处理。
+    各分类单元的 LLM 调用可在 max_concurrency 限制下并发执行，结果按原顺序合并。
+
+    classification_mode:
+        - "single": 每次调用判断一项（短文本按 batch_size 合并），返回 yes/no
+        - "multi": 按 token 预算把多段编号文本放进一次调用，返回相关段落编号，
+          判断结果逐段生效
+
+    可选的 section_router（SectionRouter）按章节标题整节保留或丢弃，
+    可选的 prefilter（如 LexicalPreFilter）在 LLM 之前直接判定置信度高的项，
+    只有不确定的项才调用 LLM；累计统计见 stats。
+    可选的 verdict_cache（RelevanceCache）跨文档复用已有的 LLM 判断结果，
+    单项模式按分类单元文本缓存，多段模式按段落文本缓存。
     """
 
     def __init__(
@@ -20,6 +82,13 @@ class EntryAgent:
         model_provider: Optional[ModelProvider] = None,
         short_text_threshold: int = 100,
         batch_size: int = 3,
+        max_concurrency: int = 1,
+        classification_mode: str = "single",
+        passage_token_budget: int = 2000,
+        max_passages_per_call: int = 40,
+        prefilter=None,
+        section_router=None,
+        verdict_cache=None,
     ):
         self.context_window = context_window
         config = ModelConfig()
@@ -28,9 +97,41 @@ class EntryAgent:
         self.model_provider = model_provider or config.get_model_provider()
         self.short_text_threshold = short_text_threshold
         self.batch_size = batch_size
+        if max_concurrency < 1:
+            raise ValueError(f"max_concurrency 必须大于 0: {max_concurrency}")
+        self.max_concurrency = max_concurrency
+        if classification_mode not in CLASSIFICATION_MODES:
+            raise ValueError(f"不支持的分类模式: {classification_mode}")
+        self.classification_mode = classification_mode
+        self.passage_token_budget = passage_token_budget
+        self.max_passages_per_call = max_passages_per_call
+        self.prefilter = prefilter
+        self.section_router = section_router
+        self.verdict_cache = verdict_cache
+        self.stats = FilterStats()
+        self._stats_lock = threading.Lock()
 
     def is_relevant_llm(self, item: Dict[str, Any]) -> bool:
-        prompt = f"""
+        result = call_llm(
+            prompt=self._relevance_prompt(item),
+            model_name=self.model_name,
+            model_provider=self.model_provider,
+            pydantic_model=None,
+        )
+        return self._parse_relevance(result)
+
+    async def ais_relevant_llm(self, item: Dict[str, Any]) -> bool:
+        result = await acall_llm(
+            prompt=self._relevance_prompt(item),
+            model_name=self.model_name,
+            model_provider=self.model_provider,
+            pydantic_model=None,
+        )
+        return self._parse_relevance(result)
+
+    @staticmethod
+    def _relevance_prompt(item: Dict[str, Any]) -> str:
+        return f"""
 # Role
 You are an expert reviewer specializing in ROB2 (Risk of Bias 2) assessment for randomized controlled trials.
 
@@ -57,26 +158,327 @@ Not relevant (no): "The study was conducted between January and June 2018."
 
 Answer only 'yes' or 'no'.
 """
-        result = call_llm(
-            prompt=prompt,
+
+    @staticmethod
+    def _parse_relevance(result: Any) -> bool:
+        answer = str(result).strip().lower()
+        return answer.startswith("yes")
+
+    def classify_passages(self, passages: List[Dict[str, Any]]) -> List[bool]:
+        """一次调用判断多段编号文本，返回与 passages 一一对应的相关性结果"""
+        result: RelevantPassages = call_llm(
+            prompt=self._passages_prompt(passages),
             model_name=self.model_name,
             model_provider=self.model_provider,
-            pydantic_model=None,
+            pydantic_model=RelevantPassages,
         )
-        answer = str(result).strip().lower()
-        return answer.startswith("yes")
+        return self._parse_passages(result, len(passages))
+
+    async def aclassify_passages(self, passages: List[Dict[str, Any]]) -> List[bool]:
+        result: RelevantPassages = await acall_llm(
+            prompt=self._passages_prompt(passages),
+            model_name=self.model_name,
+            model_provider=self.model_provider,
+            pydantic_model=RelevantPassages,
+        )
+        return self._parse_passages(result, len(passages))
+
+    @staticmethod
+    def _passages_prompt(passages: List[Dict[str, Any]]) -> str:
+        numbered = "\n\n".join(
+            f"[{n}] {passage.get('text', '')}"
+            for n, passage in enumerate(passages, start=1)
+        )
+        return f"""
+# Role
+You are an expert reviewer specializing in ROB2 (Risk of Bias 2) assessment for randomized controlled trials.
+
+# Task
+Below are {len(passages)} numbered passages from a trial report. Identify every passage that is relevant to ROB2 risk of bias assessment.
+
+# Context
+The ROB2 tool evaluates bias in these domains:
+- Randomization process
+- Deviations from intended interventions
+- Missing outcome data
+- Measurement of outcomes
+- Selection of reported results
+
+# Examples
+Relevant: "Participants were randomly assigned to treatment groups using a computer-generated sequence."
+Not relevant: "The study was conducted between January and June 2018."
+
+# Passages
+{numbered}
+
+# Output
+Return only a JSON object of the form {{"relevant_ids": [<passage numbers>]}}.
+Use an empty list if no passage is relevant.
+"""
+
+    @staticmethod
+    def _parse_passages(result: RelevantPassages, count: int) -> List[bool]:
+        relevant_ids = set(result.relevant_ids)
+        return [n in relevant_ids for n in range(1, count + 1)]
 
     def is_references_section(self, item: Dict[str, Any]) -> bool:
-        """检查当前项是否为参考文献部分的标题"""
+        """检查当前项是否为参考文献部分的标题（或 docling 解析结果中位于参考文献章节内）"""
         if item.get("text_level") == 1:
             text = item.get("text", "").strip()
             return bool(re.search(r"REFERENCES\s*", text, re.IGNORECASE))
-        return False
+        # docling 解析结果不设置 text_level，而是为每项附带所属标题路径
+        return any(
+            re.fullmatch(r"\s*(references|bibliography)\s*", heading, re.IGNORECASE)
+            for heading in item.get("headings") or []
+        )
 
     def filter_relevant(
         self, content_list: List[Dict[str, Any]]
     ) -> List[Dict[str, Any]]:
+        stats = FilterStats()
+        units, verdicts = self._plan_llm_units(content_list, stats)
+        results = self._classify_units(content_list, units)
+        return self._select_relevant(content_list, units, results, verdicts, stats)
+
+    async def afilter_relevant(
+        self, content_list: List[Dict[str, Any]]
+    ) -> List[Dict[str, Any]]:
+        """filter_relevant 的异步版本：分类单元经 acall_llm 判断，同时在途的至多 max_concurrency 个"""
+        stats = FilterStats()
+        units, verdicts = self._plan_llm_units(content_list, stats)
+        results = await self._aclassify_units(content_list, units)
+        return self._select_relevant(content_list, units, results, verdicts, stats)
+
+    def llm_requests(self, content_list: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        filter_relevant 将发出的 LLM 调用（call_llm 的参数），供批处理模式预先提交；
+        本地判定与相关性缓存命中的项不产生调用
+        """
+        units, _ = self._plan_llm_units(content_list, FilterStats())
+        return [self._unit_request(content_list, unit) for unit in units]
+
+    def _unit_request(
+        self, content_list: List[Dict[str, Any]], unit: List[int]
+    ) -> Dict[str, Any]:
+        """与 _classify_unit_llm 对该单元发出的调用一致"""
+        if self.classification_mode == "multi":
+            prompt = self._passages_prompt([content_list[j] for j in unit])
+            pydantic_model = RelevantPassages
+        else:
+            if len(unit) == 1:
+                item = content_list[unit[0]]
+            else:
+                item = {"text": self._unit_text(content_list, unit)}
+            prompt = self._relevance_prompt(item)
+            pydantic_model = None
+        return {
+            "prompt": prompt,
+            "model_name": self.model_name,
+            "model_provider": self.model_provider,
+            "pydantic_model": pydantic_model,
+        }
+
+    def _plan_llm_units(
+        self, content_list: List[Dict[str, Any]], stats: FilterStats
+    ) -> Tuple[List[List[int]], Dict[int, bool]]:
+        """本地判定与查缓存之后，返回仍需 LLM 判断的分类单元与已确定的判断结果"""
+        candidates = self._candidate_indices(content_list)
+        stats.candidates = len(candidates)
+
+        # 本地判定（章节路由、预筛选），已判定的项不再交给 LLM
+        decided = self._route(content_list, candidates, stats)
+
+        # 多段模式按段落查缓存，命中的段落不再参与分组
+        if self.classification_mode == "multi":
+            self._apply_cached(
+                content_list,
+                [[j] for j in candidates if j not in decided],
+                decided,
+                stats,
+            )
+
+        units = self._plan_pending_units(content_list, candidates, decided)
+        verdicts = dict(decided)
+        # 单项模式按分类单元查缓存（短文本批次以合并文本为键）
+        if self.classification_mode == "single":
+            units = self._apply_cached(content_list, units, verdicts, stats)
+        return units, verdicts
+
+    def _select_relevant(
+        self,
+        content_list: List[Dict[str, Any]],
+        units: List[List[int]],
+        results: List[Optional[List[bool]]],
+        verdicts: Dict[int, bool],
+        stats: FilterStats,
+    ) -> List[Dict[str, Any]]:
+        """合并 LLM 判断结果、写入缓存与统计，返回相关项及其上下文"""
+        for unit, unit_verdicts in zip(units, results):
+            if unit_verdicts is None:
+                # 调用失败时保留这些项交给领域评估，而不是当作无关丢弃
+                stats.llm_fallbacks += 1
+                unit_verdicts = [True] * len(unit)
+            verdicts.update(zip(unit, unit_verdicts))
+        self._store_cached(content_list, units, results)
+        stats.llm_items = sum(len(unit) for unit in units)
+        stats.llm_calls = len(units)
+        self._record_stats(stats)
+
         relevant_indices = set()
+        for j, is_relevant in verdicts.items():
+            if not is_relevant:
+                continue
+            # 相关项保留前后各 context_window 项
+            for offset in range(-self.context_window, self.context_window + 1):
+                neighbor_idx = j + offset
+                if 0 <= neighbor_idx < len(content_list):
+                    relevant_indices.add(neighbor_idx)
+
+        return [content_list[i] for i in sorted(relevant_indices)]
+
+    def _candidate_indices(self, content_list: List[Dict[str, Any]]) -> List[int]:
+        """需要判定的候选项下标（参考文献部分之前）"""
+        if self.classification_mode == "multi":
+            indices = []
+            for i, item in enumerate(content_list):
+                if self.is_references_section(item):
+                    break
+                indices.append(i)
+            return indices
+        return [j for unit in self._plan_units(content_list) for j in unit]
+
+    def _route(
+        self,
+        content_list: List[Dict[str, Any]],
+        candidates: List[int],
+        stats: FilterStats,
+    ) -> Dict[int, bool]:
+        """对候选项做本地判定，返回已确定结论的下标到相关性的映射"""
+        decided: Dict[int, bool] = {}
+
+        if self.section_router is not None:
+            sections = self.section_router.route(content_list)
+            for j in candidates:
+                if sections[j] == "include":
+                    decided[j] = True
+                    stats.section_included += 1
+                elif sections[j] == "exclude":
+                    decided[j] = False
+                    stats.section_excluded += 1
+
+        pending = [j for j in candidates if j not in decided]
+        if self.prefilter is not None and pending:
+            decisions = self.prefilter.decide([content_list[j] for j in pending])
+            for j, decision in zip(pending, decisions):
+                if decision is not None:
+                    decided[j] = decision
+                    if decision:
+                        stats.auto_accepted += 1
+                    else:
+                        stats.auto_rejected += 1
+        return decided
+
+    def _plan_pending_units(
+        self,
+        content_list: List[Dict[str, Any]],
+        candidates: List[int],
+        decided: Dict[int, bool],
+    ) -> List[List[int]]:
+        """为尚未判定的候选项规划 LLM 分类单元"""
+        if self.classification_mode == "multi":
+            return group_by_token_budget(
+                content_list,
+                [j for j in candidates if j not in decided],
+                budget=self.passage_token_budget,
+                max_items=self.max_passages_per_call,
+            )
+
+        # 单项模式沿用原有批次划分，只从批次中剔除已判定的项
+        units = []
+        for unit in self._plan_units(content_list):
+            pending = [j for j in unit if j not in decided]
+            if pending:
+                units.append(pending)
+        return units
+
+    @property
+    def _cache_model(self) -> str:
+        provider = getattr(self.model_provider, "value", self.model_provider)
+        return f"{provider}:{self.model_name}"
+
+    @staticmethod
+    def _unit_text(content_list: List[Dict[str, Any]], unit: List[int]) -> str:
+        return "\n".join(content_list[j].get("text", "") for j in unit)
+
+    def _apply_cached(
+        self,
+        content_list: List[Dict[str, Any]],
+        units: List[List[int]],
+        verdicts: Dict[int, bool],
+        stats: FilterStats,
+    ) -> List[List[int]]:
+        """用缓存结果填充 verdicts，返回未命中缓存的单元"""
+        if self.verdict_cache is None:
+            return units
+        version = PROMPT_VERSIONS[self.classification_mode]
+        remaining = []
+        for unit in units:
+            cached = self.verdict_cache.get_verdict(
+                self._unit_text(content_list, unit), self._cache_model, version
+            )
+            if cached is None:
+                remaining.append(unit)
+                continue
+            verdicts.update((j, cached) for j in unit)
+            stats.cache_hits += len(unit)
+        return remaining
+
+    def _store_cached(
+        self,
+        content_list: List[Dict[str, Any]],
+        units: List[List[int]],
+        results: List[Optional[List[bool]]],
+    ) -> None:
+        """
+        将 LLM 判断结果写入缓存。
+
+        调用失败时 call_llm 返回的默认值（"no" 或空的 RelevantPassages）不是模型的判断，
+        这些单元的结果为 None，不写入缓存，否则之后的运行会一直沿用失败时的结论。
+        """
+        if self.verdict_cache is None:
+            return
+        version = PROMPT_VERSIONS[self.classification_mode]
+        for unit, unit_verdicts in zip(units, results):
+            if unit_verdicts is None:
+                # 回退默认值，留给下次运行重新判断
+                continue
+            if self.classification_mode == "multi":
+                entries = [([j], v) for j, v in zip(unit, unit_verdicts)]
+            else:
+                entries = [(unit, unit_verdicts[0])]
+            for key_unit, verdict in entries:
+                self.verdict_cache.set_verdict(
+                    self._unit_text(content_list, key_unit),
+                    self._cache_model,
+                    version,
+                    verdict,
+                )
+
+    def _record_stats(self, stats: FilterStats) -> None:
+        with self._stats_lock:
+            self.stats.merge(stats)
+        logging.info(
+            f"入口筛选: 候选 {stats.candidates} 项，本地判定 "
+            f"{stats.locally_decided} 项"
+            f"（{stats.locally_decided_ratio:.0%}），LLM 调用 {stats.llm_calls} 次"
+        )
+
+    def _plan_units(self, content_list: List[Dict[str, Any]]) -> List[List[int]]:
+        """
+        规划分类单元：每个单元是一次 LLM 判断覆盖的下标列表。
+        单元划分只依赖文本长度与参考文献位置，与判断结果无关，因此可以先规划再并发判断。
+        """
+        units = []
         i = 0
 
         while i < len(content_list):
@@ -84,8 +486,7 @@ Answer only 'yes' or 'no'.
             if self.is_references_section(content_list[i]):
                 break
 
-            current_item = content_list[i]
-            current_text = current_item.get("text", "")
+            current_text = content_list[i].get("text", "")
 
             # 处理短文本：批量合并评估
             if len(
@@ -98,34 +499,76 @@ Answer only 'yes' or 'no'.
                 ):
                     break
 
-                # 创建合并项目用于评估
-                combined_text = "\n".join(
-                    [
-                        content_list[j].get("text", "")
-                        for j in range(i, i + self.batch_size)
-                    ]
-                )
-                combined_item = {"text": combined_text}
-
-                if self.is_relevant_llm(combined_item):
-                    # 如果合并项相关，所有包含项都视为相关
-                    for j in range(i, i + self.batch_size):
-                        for offset in range(
-                            -self.context_window, self.context_window + 1
-                        ):
-                            neighbor_idx = j + offset
-                            if 0 <= neighbor_idx < len(content_list):
-                                relevant_indices.add(neighbor_idx)
-
+                units.append(list(range(i, i + self.batch_size)))
                 i += self.batch_size  # 跳过已处理的批次
             else:
                 # 处理单个项目
-                if self.is_relevant_llm(current_item):
-                    for offset in range(-self.context_window, self.context_window + 1):
-                        neighbor_idx = i + offset
-                        if 0 <= neighbor_idx < len(content_list):
-                            relevant_indices.add(neighbor_idx)
-
+                units.append([i])
                 i += 1  # 处理下一项
 
-        return [content_list[i] for i in sorted(relevant_indices)]
+        return units
+
+    def _classify_unit(
+        self, content_list: List[Dict[str, Any]], unit: List[int]
+    ) -> Optional[List[bool]]:
+        """判断单个分类单元，返回单元内每一项的相关性；LLM 调用失败返回默认值时返回 None"""
+        with track_fallbacks() as fallbacks:
+            verdicts = self._classify_unit_llm(content_list, unit)
+        return None if fallbacks.count else verdicts
+
+    async def _aclassify_unit(
+        self, content_list: List[Dict[str, Any]], unit: List[int]
+    ) -> Optional[List[bool]]:
+        with track_fallbacks() as fallbacks:
+            verdicts = await self._aclassify_unit_llm(content_list, unit)
+        return None if fallbacks.count else verdicts
+
+    def _classify_unit_llm(
+        self, content_list: List[Dict[str, Any]], unit: List[int]
+    ) -> List[bool]:
+        if self.classification_mode == "multi":
+            return self.classify_passages([content_list[j] for j in unit])
+
+        if len(unit) == 1:
+            return [self.is_relevant_llm(content_list[unit[0]])]
+
+        # 创建合并项目用于评估，如果合并项相关，所有包含项都视为相关
+        combined_text = "\n".join([content_list[j].get("text", "") for j in unit])
+        return [self.is_relevant_llm({"text": combined_text})] * len(unit)
+
+    async def _aclassify_unit_llm(
+        self, content_list: List[Dict[str, Any]], unit: List[int]
+    ) -> List[bool]:
+        if self.classification_mode == "multi":
+            return await self.aclassify_passages([content_list[j] for j in unit])
+
+        if len(unit) == 1:
+            return [await self.ais_relevant_llm(content_list[unit[0]])]
+
+        combined_text = "\n".join([content_list[j].get("text", "") for j in unit])
+        return [await self.ais_relevant_llm({"text": combined_text})] * len(unit)
+
+    def _classify_units(
+        self, content_list: List[Dict[str, Any]], units: List[List[int]]
+    ) -> List[Optional[List[bool]]]:
+        """在 max_concurrency 限制下并发判断所有单元，结果与 units 顺序一致"""
+        workers = min(self.max_concurrency, len(units))
+        if workers <= 1:
+            return [self._classify_unit(content_list, unit) for unit in units]
+
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            return list(
+                executor.map(lambda unit: self._classify_unit(content_list, unit), units)
+            )
+
+    async def _aclassify_units(
+        self, content_list: List[Dict[str, Any]], units: List[List[int]]
+    ) -> List[Optional[List[bool]]]:
+        """异步判断所有单元，同时在途的至多 max_concurrency 个，结果与 units 顺序一致"""
+        limit = asyncio.Semaphore(self.max_concurrency)
+
+        async def classify(unit: List[int]) -> Optional[List[bool]]:
+            async with limit:
+                return await self._aclassify_unit(content_list, unit)
+
+        return list(await asyncio.gather(*(classify(unit) for unit in units)))
@@ -0,0 +1,237 @@
+"""多样本 / 多模型自一致性投票"""
+
+from collections import Counter
+from itertools import islice
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Dict, List, Optional, Sequence
+import asyncio
+import logging
+
+from rob2_evaluator.agents.decision_rules import HIGH, LOW, SOME_CONCERNS
+from rob2_evaluator.agents.domain_agent import DomainAgent
+
+# 风险平票时取更保守（更高）的等级
+RISK_SEVERITY = {LOW: 0, SOME_CONCERNS: 1, HIGH: 2}
+
+
+def is_decided(votes: Counter, remaining: int) -> bool:
+    """剩余样本全部投给第二名也无法追平第一名时，多数已确定"""
+    ranked = votes.most_common(2)
+    if not ranked:
+        return remaining == 0
+    runner_up = ranked[1][1] if len(ranked) > 1 else 0
+    return ranked[0][1] > runner_up + remaining
+
+
+class VotingDomainAgent:
+    """
+    同一领域的 k 个 DomainAgent（同一模型的 k 次采样，或 k 个不同模型）并发评估，
+    按信号答案与领域风险分别多数投票。
+
+    全部样本同时发出（受 max_concurrency 限制），每收到一个结果就检查各项多数是否已确定，
+    全部确定后立即返回：aevaluate 取消仍在途的请求，evaluate 取消尚未开始的请求，
+    已发出的请求在后台结束但不再等待。
+    同步线程无法中止已发出的请求，waves=True 时 evaluate 改为按轮发出样本，每轮恰好构成多数，
+    一轮结束仍未确定才发出下一轮：多数一致时省去其余请求，但有分歧时延迟成倍增加。
+    结果中每个信号与 overall 附带 agreement（多数票占有效样本的比例），
+    顶层 votes 记录实际使用与请求的样本数。
+    """
+
+    def __init__(
+        self,
+        agents: Sequence[DomainAgent],
+        max_concurrency: Optional[int] = None,
+        waves: bool = False,
+    ):
+        if not agents:
+            raise ValueError("至少需要一个投票代理")
+        keys = {agent.domain_key for agent in agents}
+        if len(keys) != 1:
+            raise ValueError(f"投票代理必须属于同一领域: {keys}")
+        self.agents = list(agents)
+        self.max_concurrency = max_concurrency or len(self.agents)
+        self.waves = waves
+
+    @property
+    def domain_key(self) -> str:
+        return self.agents[0].domain_key
+
+    @property
+    def schema(self) -> Dict[str, Any]:
+        return self.agents[0].schema
+
+    @property
+    def judgement_mode(self) -> str:
+        return self.agents[0].judgement_mode
+
+    @property
+    def evidence_mode(self) -> str:
+        return self.agents[0].evidence_mode
+
+    def fits_context(self, items: List[Dict[str, Any]]) -> bool:
+        return all(agent.fits_context(items) for agent in self.agents)
+
+    def _to_result(self, *args, **kwargs) -> Dict[str, Any]:
+        # all_domains 模式的单次合并结果不参与投票，按第一个代理转换
+        return self.agents[0]._to_result(*args, **kwargs)
+
+    def llm_requests(self, items: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """全部样本将发出的 LLM 调用（批处理模式中各样本都提交，不提前结束）"""
+        return [request for agent in self.agents for request in agent.llm_requests(items)]
+
+    def _wave_size(self) -> int:
+        """evaluate 按轮发出时每轮的样本数：恰好构成多数，全部一致时无需再发请求"""
+        return min(len(self.agents) // 2 + 1, self.max_concurrency)
+
+    def evaluate(self, items: List[Dict[str, Any]]) -> Dict[str, Any]:
+        completed: Dict[int, Dict[str, Any]] = {}
+        fallbacks: List[Dict[str, Any]] = []
+        unstarted = iter(enumerate(self.agents))
+        workers = self._wave_size() if self.waves else self.max_concurrency
+        batch = workers if self.waves else len(self.agents)
+        executor = ThreadPoolExecutor(max_workers=workers)
+        futures: Dict[Any, int] = {}
+
+        def launch(count: int) -> None:
+            for idx, agent in islice(unstarted, count):
+                futures[executor.submit(agent.evaluate, items)] = idx
+
+        try:
+            launch(batch)
+            finished = 0
+            while futures:
+                done, _ = wait(futures, return_when=FIRST_COMPLETED)
+                for future in done:
+                    self._collect(futures.pop(future), future, completed, fallbacks)
+                finished += len(done)
+                if self._all_decided(list(completed.values()), len(self.agents) - finished):
+                    break
+                if not futures:
+                    # 本轮样本全部返回而多数仍未确定，才发出下一轮
+                    launch(batch)
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+        return self._finish(completed, fallbacks)
+
+    async def aevaluate(self, items: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """evaluate 的异步版本：全部样本同时发出，多数确定后取消仍在途的请求"""
+        limit = asyncio.Semaphore(self.max_concurrency)
+
+        async def run(agent: DomainAgent) -> Dict[str, Any]:
+            async with limit:
+                return await agent.aevaluate(items)
+
+        completed: Dict[int, Dict[str, Any]] = {}
+        fallbacks: List[Dict[str, Any]] = []
+        tasks = {
+            asyncio.ensure_future(run(agent)): idx
+            for idx, agent in enumerate(self.agents)
+        }
+        pending = set(tasks)
+        try:
+            while pending:
+                done, pending = await asyncio.wait(
+                    pending, return_when=asyncio.FIRST_COMPLETED
+                )
+                for task in done:
+                    self._collect(tasks[task], task, completed, fallbacks)
+                if self._all_decided(list(completed.values()), len(pending)):
+                    break
+        finally:
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+        return self._finish(completed, fallbacks)
+
+    def _collect(
+        self,
+        idx: int,
+        outcome: Any,
+        completed: Dict[int, Dict[str, Any]],
+        fallbacks: List[Dict[str, Any]],
+    ) -> None:
+        """记录一个已完成样本（Future 或 Task）的结果"""
+        try:
+            result = outcome.result()
+        except Exception as e:
+            logging.warning(f"{self.domain_key} 投票样本失败: {e}")
+            return
+        if result.get("fallback"):
+            # 默认判断不是模型的回答，不参与投票
+            fallbacks.append(result)
+            return
+        completed[idx] = result
+
+    def _finish(
+        self, completed: Dict[int, Dict[str, Any]], fallbacks: List[Dict[str, Any]]
+    ) -> Dict[str, Any]:
+        # 按样本顺序排列，平票时结果与完成先后无关
+        results = [completed[idx] for idx in sorted(completed)]
+
+        if not results and fallbacks:
+            return fallbacks[0]
+        if not results:
+            raise RuntimeError(f"{self.domain_key} 的全部投票样本均失败")
+        logging.info(
+            f"{self.schema['domain_name']}: 使用 {len(results)}/{len(self.agents)} 个样本完成投票"
+        )
+        return self._merge(results)
+
+    def _signal_votes(self, results: List[Dict[str, Any]]) -> Dict[str, Counter]:
+        votes: Dict[str, Counter] = {
+            signal["id"]: Counter() for signal in self.schema["signals"]
+        }
+        for result in results:
+            for signal_id, data in result.get("signals", {}).items():
+                if signal_id in votes:
+                    votes[signal_id][data["answer"]] += 1
+        return votes
+
+    def _all_decided(self, results: List[Dict[str, Any]], remaining: int) -> bool:
+        if remaining == 0:
+            return True
+        if not all(is_decided(v, remaining) for v in self._signal_votes(results).values()):
+            return False
+        if self.judgement_mode == "rules":
+            # 领域风险由多数答案本地推导，无需单独投票
+            return True
+        risks = Counter(result["overall"]["risk"] for result in results)
+        return is_decided(risks, remaining)
+
+    def _merge(self, results: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """多数答案取第一个持该答案的样本的理由与证据；平票时取样本顺序靠前者"""
+        total = len(results)
+        signals = {}
+        for signal_id, votes in self._signal_votes(results).items():
+            if not votes:
+                continue
+            top = max(votes.values())
+            source = next(
+                r["signals"][signal_id]
+                for r in results
+                if signal_id in r["signals"]
+                and votes[r["signals"][signal_id]["answer"]] == top
+            )
+            signals[signal_id] = {**source, "agreement": round(top / total, 3)}
+
+        risk_votes = Counter(result["overall"]["risk"] for result in results)
+        if self.judgement_mode == "rules":
+            # 由多数答案重新推导领域风险，理由与证据随之更新
+            merged = self.agents[0]._apply_rules(signals)
+        else:
+            top = max(risk_votes.values())
+            risk = max(
+                (r for r, count in risk_votes.items() if count == top),
+                key=lambda r: RISK_SEVERITY.get(r, 1),
+            )
+            source = next(r["overall"] for r in results if r["overall"]["risk"] == risk)
+            merged = {
+                "domain": self.schema["domain_name"],
+                "signals": signals,
+                "overall": {**source, "risk": risk},
+            }
+
+        risk = merged["overall"]["risk"]
+        merged["overall"]["agreement"] = round(risk_votes.get(risk, 0) / total, 3)
+        merged["votes"] = {"samples": total, "requested": len(self.agents)}
+        return merged
@@ -1,5 +1,6 @@
-from typing import List
+from typing import List, Optional, Sequence, Tuple
 from rob2_evaluator.agents.domain_agent import DomainAgent
+from rob2_evaluator.agents.voting import VotingDomainAgent
 from rob2_evaluator.agents.domain_randomization import DomainRandomizationAgent
 from rob2_evaluator.agents.domain_deviation import (
     DomainDeviationAdherenceAgent,
@@ -13,20 +14,72 @@ from rob2_evaluator.agents.domain_missing_data import DomainMissingDataAgent
 class DomainAgentFactory:
     """领域专家代理工厂"""
 
+    # Domain 2（偏离既定干预）专家在结果列表中的位置
+    DEVIATION_POSITION = 1
+
     @staticmethod
-    def create_agents(analysis_type: str) -> List[DomainAgent]:
-        """根据分析类型创建对应的领域专家代理列表"""
-        base_agents = [
-            DomainRandomizationAgent(),
-            DomainMissingDataAgent(),
-            DomainMeasurementAgent(),
-            DomainSelectionAgent(),
+    def _create(
+        agent_cls,
+        voters: Optional[Sequence[Tuple[Optional[str], Optional[str]]]],
+        agent_options,
+    ) -> DomainAgent:
+        """
+        voters 为 (模型名, 提供商) 列表时创建投票代理，每个投票者一个 DomainAgent；
+        None 表示使用配置的默认模型（同一模型多次采样）
+        """
+        if not voters:
+            return agent_cls(**agent_options)
+        return VotingDomainAgent(
+            [
+                agent_cls(
+                    model_name=model_name,
+                    model_provider=provider,
+                    sample_index=idx,
+                    **agent_options,
+                )
+                for idx, (model_name, provider) in enumerate(voters)
+            ]
+        )
+
+    @staticmethod
+    def create_base_agents(voters=None, **agent_options) -> List[DomainAgent]:
+        """
+        创建与分析类型无关的领域专家代理（Domain 1、3、4、5）
+
+        agent_options 原样传给各 DomainAgent（如 judgement_mode、stream）；
+        给出 voters 时每个领域由多个样本投票评估
+        """
+        return [
+            DomainAgentFactory._create(agent_cls, voters, agent_options)
+            for agent_cls in (
+                DomainRandomizationAgent,
+                DomainMissingDataAgent,
+                DomainMeasurementAgent,
+                DomainSelectionAgent,
+            )
         ]
 
-        # 根据分析类型添加相应的偏差专家
+    @staticmethod
+    def create_deviation_agent(
+        analysis_type: str, voters=None, **agent_options
+    ) -> DomainAgent:
+        """根据分析类型创建 Domain 2 偏差专家"""
         if analysis_type == "assignment":
-            base_agents.insert(1, DomainDeviationAssignmentAgent())
-        else:  # adherence
-            base_agents.insert(1, DomainDeviationAdherenceAgent())
+            agent_cls = DomainDeviationAssignmentAgent
+        else:
+            # adherence
+            agent_cls = DomainDeviationAdherenceAgent
+        return DomainAgentFactory._create(agent_cls, voters, agent_options)
+
+    @staticmethod
+    def create_agents(analysis_type: str, **agent_options) -> List[DomainAgent]:
+        """根据分析类型创建对应的领域专家代理列表"""
+        base_agents = DomainAgentFactory.create_base_agents(**agent_options)
+
+        # 根据分析类型添加相应的偏差专家
+        base_agents.insert(
+            DomainAgentFactory.DEVIATION_POSITION,
+            DomainAgentFactory.create_deviation_agent(analysis_type, **agent_options),
+        )
 
         return base_agents
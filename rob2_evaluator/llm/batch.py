@@ -0,0 +1,312 @@
+"""Provider batch APIs: submit many chat requests as one asynchronous job and read back the results"""
+
+import json
+import logging
+import time
+from abc import ABC, abstractmethod
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+
+from langchain_core.messages import AIMessage
+
+from rob2_evaluator.llm.models import ModelProvider
+from rob2_evaluator.utils.tokens import RESPONSE_TOKEN_RESERVE
+
+logger = logging.getLogger(__name__)
+
+# Seconds between status polls; batch jobs take minutes to hours to complete
+DEFAULT_POLL_INTERVAL = 60.0
+
+# Both providers complete (or expire) batch jobs within 24 hours
+DEFAULT_BATCH_TIMEOUT = 24 * 3600.0
+
+# Job states reported by BatchClient.status
+IN_PROGRESS = "in_progress"
+ENDED = "ended"
+FAILED = "failed"
+
+_ROLES = {"human": "user", "ai": "assistant", "system": "system"}
+
+
+class BatchJobError(RuntimeError):
+    """A batch job failed as a whole or did not end in time"""
+
+
+@dataclass
+class BatchRequest:
+    """One chat request of a batch job; custom_id must be unique within the job"""
+
+    custom_id: str
+    model_name: str
+    prompt: Any
+    json_mode: bool = False
+    params: Dict[str, Any] = field(default_factory=dict)
+
+
+@dataclass
+class BatchResult:
+    """The outcome of one request: the completion text, or the error that replaced it"""
+
+    custom_id: str
+    text: Optional[str] = None
+    error: Optional[str] = None
+    # LangChain usage_metadata (input tokens include cache reads and writes)
+    usage: Optional[Dict[str, Any]] = None
+
+    @property
+    def succeeded(self) -> bool:
+        return self.text is not None
+
+    def as_message(self) -> AIMessage:
+        """The result as a chat message, so usage_tracker can record it like a live response"""
+        return AIMessage(content=self.text or "", usage_metadata=self.usage)
+
+
+def _text_content(content: Any) -> str:
+    if isinstance(content, str):
+        return content
+    return "".join(
+        block.get("text", "") if isinstance(block, dict) else str(block)
+        for block in content
+    )
+
+
+def _messages(prompt: Any) -> List[Any]:
+    """(role, content) pairs of a prompt: a plain string or a list of LangChain messages"""
+    if isinstance(prompt, str):
+        return [("user", prompt)]
+    return [(_ROLES.get(getattr(m, "type", "human"), "user"), m.content) for m in prompt]
+
+
+def _usage_metadata(
+    input_tokens: int, output_tokens: int, cache_read: int = 0, cache_creation: int = 0
+) -> Dict[str, Any]:
+    return {
+        "input_tokens": input_tokens,
+        "output_tokens": output_tokens,
+        "total_tokens": input_tokens + output_tokens,
+        "input_token_details": {"cache_read": cache_read, "cache_creation": cache_creation},
+    }
+
+
+class BatchClient(ABC):
+    """Submits requests as one provider batch job, polls it and reads back per-request results"""
+
+    provider: ModelProvider
+
+    @abstractmethod
+    def submit(self, requests: List[BatchRequest]) -> str:
+        """Creates the job and returns its id"""
+        pass
+
+    @abstractmethod
+    def status(self, batch_id: str) -> str:
+        """IN_PROGRESS, ENDED (results can be read) or FAILED"""
+        pass
+
+    @abstractmethod
+    def results(self, batch_id: str) -> List[BatchResult]:
+        pass
+
+    def run(
+        self,
+        requests: List[BatchRequest],
+        poll_interval: float = DEFAULT_POLL_INTERVAL,
+        timeout: float = DEFAULT_BATCH_TIMEOUT,
+    ) -> List[BatchResult]:
+        """Submits the requests, waits for the job to end and returns its results"""
+        batch_id = self.submit(requests)
+        logger.info(f"{self.provider.value} batch {batch_id}: {len(requests)} requests submitted")
+        deadline = time.monotonic() + timeout
+        while True:
+            state = self.status(batch_id)
+            if state == ENDED:
+                return self.results(batch_id)
+            if state == FAILED:
+                raise BatchJobError(f"{self.provider.value} batch {batch_id} failed")
+            if time.monotonic() >= deadline:
+                raise BatchJobError(
+                    f"{self.provider.value} batch {batch_id} did not end within {timeout:.0f}s"
+                )
+            time.sleep(poll_interval)
+
+
+class OpenAIBatchClient(BatchClient):
+    """OpenAI Batch API: a JSONL file of /v1/chat/completions requests, results as an output file"""
+
+    provider = ModelProvider.OPENAI
+    ENDPOINT = "/v1/chat/completions"
+
+    def __init__(self, client: Any = None, completion_window: str = "24h"):
+        if client is None:
+            from openai import OpenAI
+
+            client = OpenAI()
+        self.client = client
+        self.completion_window = completion_window
+
+    def _body(self, request: BatchRequest) -> Dict[str, Any]:
+        body = {
+            "model": request.model_name,
+            "messages": [
+                {"role": role, "content": _text_content(content)}
+                for role, content in _messages(request.prompt)
+            ],
+            **request.params,
+        }
+        if request.json_mode:
+            body["response_format"] = {"type": "json_object"}
+        return body
+
+    def submit(self, requests: List[BatchRequest]) -> str:
+        lines = [
+            json.dumps(
+                {
+                    "custom_id": request.custom_id,
+                    "method": "POST",
+                    "url": self.ENDPOINT,
+                    "body": self._body(request),
+                },
+                ensure_ascii=False,
+            )
+            for request in requests
+        ]
+        input_file = self.client.files.create(
+            file=("requests.jsonl", "\n".join(lines).encode("utf-8")), purpose="batch"
+        )
+        batch = self.client.batches.create(
+            input_file_id=input_file.id,
+            endpoint=self.ENDPOINT,
+            completion_window=self.completion_window,
+        )
+        return batch.id
+
+    def status(self, batch_id: str) -> str:
+        state = self.client.batches.retrieve(batch_id).status
+        # Expired and cancelled jobs still return the requests that completed
+        if state in ("completed", "expired", "cancelled"):
+            return ENDED
+        if state == "failed":
+            return FAILED
+        return IN_PROGRESS
+
+    def results(self, batch_id: str) -> List[BatchResult]:
+        batch = self.client.batches.retrieve(batch_id)
+        results = []
+        for file_id in (batch.output_file_id, batch.error_file_id):
+            if not file_id:
+                continue
+            for line in self.client.files.content(file_id).text.splitlines():
+                if line.strip():
+                    results.append(self._parse_line(json.loads(line)))
+        return results
+
+    @staticmethod
+    def _parse_line(entry: Dict[str, Any]) -> BatchResult:
+        custom_id = entry["custom_id"]
+        response = entry.get("response") or {}
+        if entry.get("error") or response.get("status_code") != 200:
+            error = entry.get("error") or (response.get("body") or {}).get("error")
+            return BatchResult(custom_id, error=json.dumps(error, ensure_ascii=False))
+        body = response["body"]
+        usage = body.get("usage")
+        if usage:
+            details = usage.get("prompt_tokens_details") or {}
+            usage = _usage_metadata(
+                usage.get("prompt_tokens", 0),
+                usage.get("completion_tokens", 0),
+                cache_read=details.get("cached_tokens", 0) or 0,
+            )
+        text = body["choices"][0]["message"].get("content") or ""
+        return BatchResult(custom_id, text=text, usage=usage)
+
+
+class AnthropicBatchClient(BatchClient):
+    """Anthropic Message Batches API; content blocks (incl. cache_control breakpoints) are sent as-is"""
+
+    provider = ModelProvider.ANTHROPIC
+
+    def __init__(self, client: Any = None, max_tokens: int = RESPONSE_TOKEN_RESERVE):
+        if client is None:
+            from anthropic import Anthropic
+
+            client = Anthropic()
+        self.client = client
+        self.max_tokens = max_tokens
+
+    def _params(self, request: BatchRequest) -> Dict[str, Any]:
+        messages = _messages(request.prompt)
+        params: Dict[str, Any] = {
+            "model": request.model_name,
+            "max_tokens": self.max_tokens,
+            "messages": [
+                {"role": role, "content": content}
+                for role, content in messages
+                if role != "system"
+            ],
+            **request.params,
+        }
+        system = [_text_content(content) for role, content in messages if role == "system"]
+        if system:
+            params["system"] = "\n\n".join(system)
+        return params
+
+    def submit(self, requests: List[BatchRequest]) -> str:
+        batch = self.client.messages.batches.create(
+            requests=[
+                {"custom_id": request.custom_id, "params": self._params(request)}
+                for request in requests
+            ]
+        )
+        return batch.id
+
+    def status(self, batch_id: str) -> str:
+        batch = self.client.messages.batches.retrieve(batch_id)
+        return ENDED if batch.processing_status == "ended" else IN_PROGRESS
+
+    def results(self, batch_id: str) -> List[BatchResult]:
+        results = []
+        for entry in self.client.messages.batches.results(batch_id):
+            result = entry.result
+            if result.type != "succeeded":
+                error = getattr(result, "error", None)
+                message = getattr(getattr(error, "error", None), "message", None)
+                results.append(BatchResult(entry.custom_id, error=message or result.type))
+                continue
+            message = result.message
+            usage = message.usage
+            cache_read = usage.cache_read_input_tokens or 0
+            cache_creation = usage.cache_creation_input_tokens or 0
+            results.append(
+                BatchResult(
+                    entry.custom_id,
+                    text="".join(
+                        block.text for block in message.content if block.type == "text"
+                    ),
+                    usage=_usage_metadata(
+                        usage.input_tokens + cache_read + cache_creation,
+                        usage.output_tokens,
+                        cache_read=cache_read,
+                        cache_creation=cache_creation,
+                    ),
+                )
+            )
+        return results
+
+
+BATCH_CLIENTS = {
+    ModelProvider.OPENAI: OpenAIBatchClient,
+    ModelProvider.ANTHROPIC: AnthropicBatchClient,
+}
+
+
+def supports_batch(model_provider: Any) -> bool:
+    return getattr(model_provider, "value", model_provider) in {p.value for p in BATCH_CLIENTS}
+
+
+def create_batch_client(model_provider: Any) -> BatchClient:
+    """Batch client for the provider, configured from the SDK's usual environment variables"""
+    provider = ModelProvider(getattr(model_provider, "value", model_provider))
+    if provider not in BATCH_CLIENTS:
+        raise ValueError(f"{provider.value} has no batch API")
+    return BATCH_CLIENTS[provider]()
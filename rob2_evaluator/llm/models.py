@@ -1,13 +1,20 @@
 import os
+import threading
+import time
+import anthropic
+import httpx
 from langchain_anthropic import ChatAnthropic
 from langchain_deepseek import ChatDeepSeek
 from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain_groq import ChatGroq
 from langchain_openai import ChatOpenAI
 from langchain_ollama import ChatOllama
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import cached_property
 from enum import Enum
 from pydantic import BaseModel
-from typing import Tuple, List, Dict, Any, Optional
+from typing import Tuple, List, Dict, Any, Iterator, Optional
 
 
 class ModelProvider(str, Enum):
@@ -21,12 +28,18 @@ class ModelProvider(str, Enum):
     OLLAMA = "Ollama"
 
 
+# Context window assumed for models missing from the registry
+DEFAULT_CONTEXT_LENGTH = 8192
+
+
 class LLMModel(BaseModel):
     """Represents an LLM model configuration"""
 
     display_name: str
     model_name: str
     provider: ModelProvider
+    # Maximum tokens (prompt + completion) the model accepts in one call
+    context_length: int = DEFAULT_CONTEXT_LENGTH
 
     def to_choice_tuple(self) -> Tuple[str, str, str]:
         """Convert to format needed for questionary choices"""
@@ -60,108 +73,132 @@ AVAILABLE_MODELS = [
         display_name="[anthropic] claude-3.5-haiku",
         model_name="claude-3-5-haiku-latest",
         provider=ModelProvider.ANTHROPIC,
+        context_length=200_000,
     ),
     LLMModel(
         display_name="[anthropic] claude-3.5-sonnet",
         model_name="claude-3-5-sonnet-latest",
         provider=ModelProvider.ANTHROPIC,
+        context_length=200_000,
     ),
     LLMModel(
         display_name="[anthropic] claude-3.7-sonnet",
         model_name="claude-3-7-sonnet-latest",
         provider=ModelProvider.ANTHROPIC,
+        context_length=200_000,
     ),
     LLMModel(
         display_name="[deepseek] deepseek-r1",
         model_name="deepseek-reasoner",
         provider=ModelProvider.DEEPSEEK,
+        context_length=64_000,
     ),
     LLMModel(
         display_name="[deepseek] deepseek-v3",
         model_name="deepseek-chat",
         provider=ModelProvider.DEEPSEEK,
+        context_length=64_000,
     ),
     LLMModel(
         display_name="[gemini] gemini-2.0-flash",
         model_name="gemini-2.0-flash",
         provider=ModelProvider.GEMINI,
+        context_length=1_048_576,
     ),
     LLMModel(
         display_name="[gemini] gemini-2.5-pro",
         model_name="gemini-2.5-pro-exp-03-25",
         provider=ModelProvider.GEMINI,
+        context_length=1_048_576,
     ),
     LLMModel(
         display_name="[groq] llama-4-scout-17b",
         model_name="meta-llama/llama-4-scout-17b-16e-instruct",
         provider=ModelProvider.GROQ,
+        context_length=131_072,
     ),
     LLMModel(
         display_name="[groq] llama-4-maverick-17b",
         model_name="meta-llama/llama-4-maverick-17b-128e-instruct",
         provider=ModelProvider.GROQ,
+        context_length=131_072,
     ),
     LLMModel(
         display_name="[openai] gpt-4.5",
         model_name="gpt-4.5-preview",
         provider=ModelProvider.OPENAI,
+        context_length=128_000,
     ),
     LLMModel(
         display_name="[openai] gpt-4o",
         model_name="gpt-4o",
         provider=ModelProvider.OPENAI,
+        context_length=128_000,
     ),
     LLMModel(
-        display_name="[openai] o3", model_name="o3", provider=ModelProvider.OPENAI
+        display_name="[openai] o3",
+        model_name="o3",
+        provider=ModelProvider.OPENAI,
+        context_length=200_000,
     ),
     LLMModel(
         display_name="[openai] o4-mini",
         model_name="o4-mini",
         provider=ModelProvider.OPENAI,
+        context_length=200_000,
     ),
 ]
 
-# Define Ollama models separately
+# Define Ollama models separately; context_length is the model's native window, which is
+# also requested as num_ctx
 OLLAMA_MODELS = [
     LLMModel(
         display_name="[ollama] gemma3 (4B)",
         model_name="gemma3:4b",
         provider=ModelProvider.OLLAMA,
+        context_length=131_072,
     ),
     LLMModel(
         display_name="[ollama] qwen2.5 (7B)",
         model_name="qwen2.5",
         provider=ModelProvider.OLLAMA,
+        context_length=32_768,
     ),
     LLMModel(
         display_name="[ollama] llama3.1 (8B)",
-        model_name="gemma3",
+        model_name="llama3.1",
         provider=ModelProvider.OLLAMA,
+        context_length=131_072,
     ),
     LLMModel(
         display_name="[ollama] gemma3 (12B)",
         model_name="gemma3:12b",
         provider=ModelProvider.OLLAMA,
+        context_length=131_072,
     ),
     LLMModel(
         display_name="[ollama] mistral-small3.1 (24B)",
         model_name="mistral-small3.1",
         provider=ModelProvider.OLLAMA,
+        context_length=131_072,
     ),
     LLMModel(
         display_name="[ollama] gemma3 (27B)",
-        model_name="gemma3",
+        model_name="gemma3:27b",
         provider=ModelProvider.OLLAMA,
+        context_length=131_072,
     ),
     LLMModel(
         display_name="[ollama] qwen2.5 (32B)",
         model_name="qwen2.5:32b",
         provider=ModelProvider.OLLAMA,
+        context_length=32_768,
     ),
     LLMModel(
         display_name="[ollama] llama-3.3 (70B)",
         model_name="llama3.3:70b-instruct-q4_0",
         provider=ModelProvider.OLLAMA,
+        context_length=131_072,
     ),
 ]
 
@@ -178,9 +215,173 @@ def get_model_info(model_name: str) -> LLMModel | None:
     return next((model for model in all_models if model.model_name == model_name), None)
 
 
-def get_model(
-    model_name: str, model_provider: ModelProvider
+def get_context_length(model_name: str) -> int:
+    """Get the context length of a model, DEFAULT_CONTEXT_LENGTH if it is not registered"""
+    model_info = get_model_info(model_name)
+    return model_info.context_length if model_info else DEFAULT_CONTEXT_LENGTH
+
+
+# Keep-alive connections per pooled client; should match the number of concurrent LLM calls
+DEFAULT_POOL_SIZE = 20
+
+# Hard per-request ceiling enforced by the HTTP clients, so a stuck request cannot hang forever;
+# call_llm applies tighter adaptive timeouts on top of it
+DEFAULT_REQUEST_TIMEOUT = 600.0
+
+_clients: Dict[Tuple[Any, ...], Any] = {}
+_clients_lock = threading.Lock()
+_pool_size = DEFAULT_POOL_SIZE
+_request_timeout = DEFAULT_REQUEST_TIMEOUT
+
+
+def configure_client_pool(pool_size: int) -> None:
+    """Set the connection pool size of LLM clients; cached clients are dropped and rebuilt on demand"""
+    global _pool_size
+    if pool_size < 1:
+        raise ValueError(f"pool_size must be positive: {pool_size}")
+    with _clients_lock:
+        _pool_size = pool_size
+        _clients.clear()
+
+
+def configure_request_timeout(seconds: float) -> None:
+    """Set the hard request timeout of LLM clients; cached clients are dropped and rebuilt on demand"""
+    global _request_timeout
+    if seconds <= 0:
+        raise ValueError(f"request timeout must be positive: {seconds}")
+    with _clients_lock:
+        _request_timeout = seconds
+        _clients.clear()
+
+
+def clear_client_pool() -> None:
+    """Drop all cached LLM clients (e.g. after API keys change)"""
+    with _clients_lock:
+        _clients.clear()
+
+
+def get_model(model_name: str, model_provider: ModelProvider, **params: Any) -> Any:
+    """
+    Get a chat client for the model, reusing one instance per (provider, model, params).
+
+    Clients are thread-safe and keep their HTTP connection pools alive, so calls from
+    different threads and documents share connections instead of re-handshaking.
+    """
+    provider = getattr(model_provider, "value", model_provider)
+    key = (provider, model_name, tuple(sorted((k, repr(v)) for k, v in params.items())))
+    with _clients_lock:
+        client = _clients.get(key)
+        if client is None:
+            client = _create_model(
+                model_name, model_provider, _pool_size, _request_timeout, **params
+            )
+            if client is not None:
+                _clients[key] = client
+        return client
+
+
+def _http_limits(pool_size: int) -> httpx.Limits:
+    return httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size)
+
+
+# Monotonic deadline of the LLM requests sent from the current context, see request_deadline
+_request_deadline: ContextVar[Optional[float]] = ContextVar("llm_request_deadline", default=None)
+
+
+@contextmanager
+def request_deadline(seconds: float) -> Iterator[None]:
+    """
+    Bound the HTTP requests sent from this context to the next `seconds`.
+
+    The deadline is enforced by the clients' transport rather than by an argument to the chat
+    model, because LangChain drops per-call kwargs inside with_structured_output. A request
+    that runs past it fails with an httpx timeout and its connection is closed, so the
+    provider stops generating instead of holding a pooled connection until the hard timeout.
+    """
+    token = _request_deadline.set(time.monotonic() + seconds)
+    try:
+        yield
+    finally:
+        _request_deadline.reset(token)
+
+
+# Providers whose sync clients send requests through _DeadlineTransport
+_DEADLINE_PROVIDERS = frozenset(
+    provider.value
+    for provider in (
+        ModelProvider.GROQ,
+        ModelProvider.OPENAI,
+        ModelProvider.DEEPSEEK,
+        ModelProvider.OLLAMA,
+    )
+)
+
+
+def honours_request_deadline(model_provider: ModelProvider) -> bool:
+    """Whether request_deadline bounds the sync requests of this provider's clients"""
+    return getattr(model_provider, "value", model_provider) in _DEADLINE_PROVIDERS
+
+
+class _DeadlineTransport(httpx.HTTPTransport):
+    """Connection-pooling transport that shortens each request's timeouts to the context deadline."""
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        deadline = _request_deadline.get()
+        if deadline is not None:
+            remaining = max(deadline - time.monotonic(), 0.001)
+            timeouts = request.extensions.get("timeout", {})
+            request.extensions["timeout"] = {
+                kind: remaining if timeouts.get(kind) is None else min(timeouts[kind], remaining)
+                for kind in ("connect", "read", "write", "pool")
+            }
+        return super().handle_request(request)
+
+
+def _http_client(pool_size: int, request_timeout: float) -> httpx.Client:
+    return httpx.Client(
+        transport=_DeadlineTransport(limits=_http_limits(pool_size)), timeout=request_timeout
+    )
+
+
+def _async_http_client(pool_size: int, request_timeout: float) -> httpx.AsyncClient:
+    # Async calls are bounded by cancelling the task, which closes the request itself
+    return httpx.AsyncClient(limits=_http_limits(pool_size), timeout=request_timeout)
+
+
+class _PooledChatAnthropic(ChatAnthropic):
+    """
+    ChatAnthropic whose SDK clients use the configured pool size. The SDK requires its own
+    httpx client classes, so requests are not bounded by request_deadline.
+    """
+
+    pool_size: int = DEFAULT_POOL_SIZE
+
+    @cached_property
+    def _client(self) -> anthropic.Client:
+        params = self._client_params
+        http_client = anthropic.DefaultHttpxClient(
+            limits=_http_limits(self.pool_size), timeout=params["timeout"]
+        )
+        return anthropic.Client(**params, http_client=http_client)
+
+    @cached_property
+    def _async_client(self) -> anthropic.AsyncClient:
+        params = self._client_params
+        http_client = anthropic.DefaultAsyncHttpxClient(
+            limits=_http_limits(self.pool_size), timeout=params["timeout"]
+        )
+        return anthropic.AsyncClient(**params, http_client=http_client)
+
+
+def _create_model(
+    model_name: str,
+    model_provider: ModelProvider,
+    pool_size: int,
+    request_timeout: float = DEFAULT_REQUEST_TIMEOUT,
+    **params: Any,
 ) -> ChatOpenAI | ChatGroq | ChatOllama | None:
+    # An explicit timeout in params overrides the configured one
+    params = {"timeout": request_timeout, **params}
     if model_provider == ModelProvider.GROQ:
         api_key = os.getenv("GROQ_API_KEY")
         if not api_key:
@@ -191,7 +392,13 @@ def get_model(
             raise ValueError(
                 "Groq API key not found.  Please make sure GROQ_API_KEY is set in your .env file."
             )
-        return ChatGroq(model=model_name, api_key=api_key)
+        return ChatGroq(
+            model=model_name,
+            api_key=api_key,
+            http_client=_http_client(pool_size, params["timeout"]),
+            http_async_client=_async_http_client(pool_size, params["timeout"]),
+            **params,
+        )
     elif model_provider == ModelProvider.OPENAI:
         # Get and validate API key
         api_key = os.getenv("OPENAI_API_KEY")
@@ -203,7 +410,13 @@ def get_model(
             raise ValueError(
                 "OpenAI API key not found.  Please make sure OPENAI_API_KEY is set in your .env file."
             )
-        return ChatOpenAI(model=model_name, api_key=api_key)
+        return ChatOpenAI(
+            model=model_name,
+            api_key=api_key,
+            http_client=_http_client(pool_size, params["timeout"]),
+            http_async_client=_async_http_client(pool_size, params["timeout"]),
+            **params,
+        )
     elif model_provider == ModelProvider.ANTHROPIC:
         api_key = os.getenv("ANTHROPIC_API_KEY")
         if not api_key:
@@ -213,7 +426,9 @@ def get_model(
             raise ValueError(
                 "Anthropic API key not found.  Please make sure ANTHROPIC_API_KEY is set in your .env file."
             )
-        return ChatAnthropic(model=model_name, api_key=api_key)
+        return _PooledChatAnthropic(
+            model=model_name, api_key=api_key, pool_size=pool_size, **params
+        )
     elif model_provider == ModelProvider.DEEPSEEK:
         api_key = os.getenv("DEEPSEEK_API_KEY")
         if not api_key:
@@ -223,7 +438,13 @@ def get_model(
             raise ValueError(
                 "DeepSeek API key not found.  Please make sure DEEPSEEK_API_KEY is set in your .env file."
             )
-        return ChatDeepSeek(model=model_name, api_key=api_key)
+        return ChatDeepSeek(
+            model=model_name,
+            api_key=api_key,
+            http_client=_http_client(pool_size, params["timeout"]),
+            http_async_client=_async_http_client(pool_size, params["timeout"]),
+            **params,
+        )
     elif model_provider == ModelProvider.GEMINI:
         api_key = os.getenv("GOOGLE_API_KEY")
         if not api_key:
@@ -233,11 +454,20 @@ def get_model(
             raise ValueError(
                 "Google API key not found.  Please make sure GOOGLE_API_KEY is set in your .env file."
             )
-        return ChatGoogleGenerativeAI(model=model_name, api_key=api_key)
+        # The Gemini SDK manages its own transport, so the pool size does not apply here
+        return ChatGoogleGenerativeAI(model=model_name, api_key=api_key, **params)
     elif model_provider == ModelProvider.OLLAMA:
         # For Ollama, we use a base URL instead of an API key
         base_url = os.getenv("OLLAMA_BASE_URL", "http://localhost:11434")
+        # Ollama truncates prompts to num_ctx silently, so request the model's full window
         return ChatOllama(
             model=model_name,
             base_url=base_url,
+            num_ctx=get_context_length(model_name),
+            client_kwargs={
+                "limits": _http_limits(pool_size),
+                "timeout": params.pop("timeout"),
+            },
+            sync_client_kwargs={"transport": _DeadlineTransport(limits=_http_limits(pool_size))},
+            **params,
         )
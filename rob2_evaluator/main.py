@@ -1,6 +1,9 @@
 from pathlib import Path
-import json
-from typing import List, Dict, Any
+import argparse
+import asyncio
+import logging
+import sys
+from typing import List, Dict, Any, Optional
 
 from rob2_evaluator.utils.cache import cache_result
 
@@ -14,6 +17,7 @@ class ROB2Evaluator:
         content_processor=None,
         evaluation_service=None,
         cache_dir: str = ".cache",
+        content_list_processor=None,
     ):
         # 如果没有提供依赖，则使用默认实现（保持向后兼容）
         if document_processor is None:
@@ -28,11 +32,16 @@ class ROB2Evaluator:
             from rob2_evaluator.services.evaluation_service import EvaluationService
 
             evaluation_service = EvaluationService()
+        if content_list_processor is None:
+            from rob2_evaluator.processors.rob2_processor import JSONDocumentProcessor
+
+            content_list_processor = JSONDocumentProcessor()
 
         # 所有依赖在构造时就确定，不再有懒加载
         self.document_processor = document_processor
         self.content_processor = content_processor
         self.evaluation_service = evaluation_service
+        self.content_list_processor = content_list_processor
 
         # 其他服务保持不变
         from rob2_evaluator.services.report_service import ReportService
@@ -41,11 +50,19 @@ class ROB2Evaluator:
         self.report_service = ReportService()
         self.cache = FileCache(cache_dir)
 
+    def select_document_processor(self, input_path: Path):
+        """根据文件类型选择文档处理器：.json 为已解析的 content_list，其余按 PDF 处理"""
+        if Path(input_path).suffix.lower() == ".json":
+            return self.content_list_processor
+        return self.document_processor
+
     @cache_result()
     def process_file(self, input_path: Path) -> List[Dict[str, Any]]:
         """处理单个文件的完整评估流程"""
         # 文档处理
-        text_items = self.document_processor.process_document(input_path)
+        text_items = self.select_document_processor(input_path).process_document(
+            input_path
+        )
 
         # 内容处理
         relevant_items = self.content_processor.process_content(text_items)
@@ -53,6 +70,15 @@ class ROB2Evaluator:
         # 执行评估 - 不再需要检查是否为None
         return self.evaluation_service.evaluate(relevant_items)
 
+    @cache_result()
+    async def aprocess_file(self, input_path: Path) -> List[Dict[str, Any]]:
+        """process_file 的异步版本：文档解析在线程中执行，筛选与评估的 LLM 调用经 acall_llm 发出"""
+        text_items = await asyncio.to_thread(
+            self.select_document_processor(input_path).process_document, input_path
+        )
+        relevant_items = await self.content_processor.aprocess_content(text_items)
+        return await self.evaluation_service.aevaluate(relevant_items)
+
     def generate_report(
         self,
         results: List[Dict[str, Any]],
@@ -62,9 +88,480 @@ class ROB2Evaluator:
         self.report_service.generate_report(results=results, output_path=output_path)
 
 
+def build_arg_parser() -> argparse.ArgumentParser:
+    """构建 rob2-eval 命令行参数解析器"""
+    parser = argparse.ArgumentParser(
+        prog="rob2-eval",
+        description="批量执行 ROB2 偏倚风险评估（PDF 或 content_list JSON）",
+    )
+    parser.add_argument(
+        "input",
+        type=Path,
+        help="单个 PDF/JSON 文件、包含文件的目录，或每行一个路径的清单文件",
+    )
+    parser.add_argument(
+        "-o",
+        "--output",
+        default="rob2_results.json",
+        help="汇总输出文件，按扩展名选择格式（.json 或 .csv）",
+    )
+    parser.add_argument(
+        "-j",
+        "--workers",
+        type=int,
+        default=4,
+        help="文档级并发数（默认 4）",
+    )
+    parser.add_argument(
+        "--domain-workers",
+        type=int,
+        default=5,
+        help="单篇文档内并发执行的领域评估数（默认 5，1 为串行）",
+    )
+    parser.add_argument(
+        "--entry-concurrency",
+        type=int,
+        default=4,
+        help="单篇文档内并发执行的相关性判断调用数（默认 4，1 为串行）",
+    )
+    parser.add_argument(
+        "--llm-pool-size",
+        type=int,
+        default=None,
+        help="每个 LLM 客户端的 HTTP 连接池大小，同步与异步客户端均适用（默认按 文档并发数 ×（领域并发数 + 相关性判断并发数）计算；Gemini 由其 SDK 自行管理连接，不受此项影响）",
+    )
+    parser.add_argument(
+        "--entry-mode",
+        choices=["single", "multi"],
+        default="single",
+        help="相关性判断方式：single 每次判断一项；multi 按 token 预算一次判断多段编号文本",
+    )
+    parser.add_argument(
+        "--entry-token-budget",
+        type=int,
+        default=2000,
+        help="multi 模式下每次调用的段落 token 预算（默认 2000）",
+    )
+    parser.add_argument(
+        "--section-routing",
+        action="store_true",
+        help="按章节标题路由：方法、结果整节保留，引言、讨论、致谢、附录整节丢弃，其余才调用 LLM",
+    )
+    parser.add_argument(
+        "--lexical-prefilter",
+        action="store_true",
+        help="在 LLM 相关性判断之前启用本地词法预筛选，仅不确定的项调用 LLM",
+    )
+    parser.add_argument(
+        "--prefilter-accept",
+        type=float,
+        default=3.0,
+        help="预筛选直接判为相关的分数阈值（默认 3.0）",
+    )
+    parser.add_argument(
+        "--prefilter-reject",
+        type=float,
+        default=-1.0,
+        help="预筛选直接判为无关的分数阈值（默认 -1.0）",
+    )
+    parser.add_argument(
+        "--sequential-analysis-type",
+        action="store_true",
+        help="先完成 Domain 2 分析类型推断再启动各领域（默认与四个无关领域并行）",
+    )
+    parser.add_argument(
+        "--rule-judgement",
+        action="store_true",
+        help="模型只回答信号问题，领域风险按 RoB 2 官方判定算法本地计算（减少输出 token）",
+    )
+    parser.add_argument(
+        "--stream",
+        action="store_true",
+        help="领域评估流式接收输出并增量校验 JSON，出现无效键、非法答案或失控输出时提前中止重试",
+    )
+    parser.add_argument(
+        "--cite-passages",
+        action="store_true",
+        help="上下文中的段落带编号，模型按编号引用证据而不是逐字引用，证据文本与页码在本地展开",
+    )
+    parser.add_argument(
+        "--no-evidence-alignment",
+        action="store_true",
+        help="不将证据引用与原文对齐（默认对齐：修正页码，附加 match_score 与 verified 标记）",
+    )
+    parser.add_argument(
+        "--max-context-tokens",
+        type=int,
+        default=None,
+        help="单次调用中文档上下文的 token 上限（默认按模型上下文长度），超出时分段评估后合并",
+    )
+    parser.add_argument(
+        "--samples",
+        type=int,
+        default=1,
+        help="每个领域用默认模型并发采样的次数，大于 1 时按多数投票（多数确定后提前结束）",
+    )
+    parser.add_argument(
+        "--vote-models",
+        nargs="+",
+        default=None,
+        metavar="MODEL",
+        help="用多个模型并发评估每个领域并多数投票（模型名须在模型列表中）",
+    )
+    parser.add_argument(
+        "--all-domains",
+        action="store_true",
+        help="一次调用评估全部领域（适合长上下文模型），未通过校验的领域回退到逐领域评估",
+    )
+    parser.add_argument(
+        "--passage-retrieval",
+        action="store_true",
+        help="各领域只接收按 BM25 检索到的相关段落及其邻近段落，而不是全部筛选结果",
+    )
+    parser.add_argument(
+        "--passage-top-k",
+        type=int,
+        default=15,
+        help="每个领域检索的命中段落数上限（默认 15）",
+    )
+    parser.add_argument(
+        "--passage-token-budget",
+        type=int,
+        default=2000,
+        help="每个领域上下文的 token 预算（默认 2000）",
+    )
+    parser.add_argument(
+        "--pipeline",
+        action="store_true",
+        help="按阶段流水线执行：解析、筛选、评估各用独立线程池，阶段间有界队列",
+    )
+    parser.add_argument(
+        "--parse-workers",
+        type=int,
+        default=1,
+        help="流水线模式下的文档解析线程数（默认 1）",
+    )
+    parser.add_argument(
+        "--filter-workers",
+        type=int,
+        default=None,
+        help="流水线模式下的相关内容筛选线程数（默认与 --workers 相同）",
+    )
+    parser.add_argument(
+        "--queue-size",
+        type=int,
+        default=4,
+        help="流水线阶段间队列容量（默认 4）",
+    )
+    parser.add_argument(
+        "--async",
+        dest="async_mode",
+        action="store_true",
+        help="以单个事件循环异步执行：-j 篇文档同时评估，LLM 调用经 ainvoke 发出而不占用线程",
+    )
+    parser.add_argument(
+        "--provider-concurrency",
+        type=int,
+        default=None,
+        help="异步模式下每个 LLM 提供商同时在途的请求数上限（默认 64）",
+    )
+    parser.add_argument(
+        "--batch-api",
+        action="store_true",
+        help="经服务商批处理 API（OpenAI、Anthropic）分阶段提交整个语料的 LLM 调用，费用约为实时调用的一半，需等待任务完成",
+    )
+    parser.add_argument(
+        "--batch-poll-interval",
+        type=float,
+        default=60,
+        help="批处理模式下查询任务状态的间隔（秒，默认 60）",
+    )
+    parser.add_argument(
+        "--request-timeout",
+        type=float,
+        default=600,
+        help="单次 LLM 请求的超时上限（秒，默认 600）；实际超时按各模型观测到的 p95 延迟自适应收紧",
+    )
+    parser.add_argument(
+        "--hedge",
+        action="store_true",
+        help="对冲请求：请求超过该模型 p95 延迟（或 --hedge-delay）仍未返回时再发一个相同请求，先返回有效结果者胜出",
+    )
+    parser.add_argument(
+        "--hedge-delay",
+        type=float,
+        default=None,
+        help="对冲请求的固定延迟（秒），默认取观测到的 p95 延迟；给出时隐含 --hedge",
+    )
+    parser.add_argument(
+        "--hedge-model",
+        default=None,
+        help="对冲请求发往的备用模型（默认同一模型）；给出时隐含 --hedge",
+    )
+    parser.add_argument(
+        "--cache-dir",
+        default=".cache",
+        help="结果缓存目录（默认 .cache），已缓存的文档会被直接跳过",
+    )
+    parser.add_argument(
+        "--no-llm-cache",
+        action="store_true",
+        help="不使用 LLM 响应缓存（默认缓存于 <cache-dir>/llm_responses.sqlite，重跑时相同调用不再请求模型）",
+    )
+    parser.add_argument(
+        "--refresh-llm-cache",
+        action="store_true",
+        help="忽略已缓存的 LLM 响应重新调用模型，并以新结果覆盖缓存",
+    )
+    parser.add_argument(
+        "--llm-cache-size",
+        type=int,
+        default=50_000,
+        help="LLM 响应缓存的最大条目数，超出时淘汰最久未使用的条目（默认 50000）",
+    )
+    parser.add_argument(
+        "--llm-cache-max-age-days",
+        type=float,
+        default=30,
+        help="LLM 响应缓存条目的有效天数（默认 30）",
+    )
+    parser.add_argument(
+        "--no-verdict-cache",
+        action="store_true",
+        help="不使用相关性判断结果缓存（默认缓存于 <cache-dir>/relevance.sqlite，跨文档共享）",
+    )
+    parser.add_argument(
+        "--verdict-cache-size",
+        type=int,
+        default=100_000,
+        help="相关性判断结果缓存的最大条目数，超出时淘汰最久未使用的条目（默认 100000）",
+    )
+    return parser
+
+
+def build_evaluator(args: argparse.Namespace) -> ROB2Evaluator:
+    """根据命令行参数组装评估器"""
+    from rob2_evaluator.agents.entry_agent import EntryAgent
+    from rob2_evaluator.processors.rob2_processor import ROB2ContentProcessor
+    from rob2_evaluator.services.evaluation_service import EvaluationService
+
+    prefilter = None
+    if args.lexical_prefilter:
+        from rob2_evaluator.retrieval import LexicalPreFilter
+
+        prefilter = LexicalPreFilter(
+            accept_threshold=args.prefilter_accept,
+            reject_threshold=args.prefilter_reject,
+        )
+
+    section_router = None
+    if args.section_routing:
+        from rob2_evaluator.retrieval import SectionRouter
+
+        section_router = SectionRouter()
+
+    if not args.no_llm_cache:
+        from rob2_evaluator.utils.cache import LLMResponseCache
+        from rob2_evaluator.utils.llm import set_response_cache
+
+        set_response_cache(
+            LLMResponseCache(
+                str(Path(args.cache_dir) / "llm_responses.sqlite"),
+                max_entries=args.llm_cache_size,
+                max_age_seconds=args.llm_cache_max_age_days * 24 * 3600,
+                refresh=args.refresh_llm_cache,
+            )
+        )
+
+    verdict_cache = None
+    if not args.no_verdict_cache:
+        from rob2_evaluator.utils.cache import RelevanceCache
+
+        verdict_cache = RelevanceCache(
+            str(Path(args.cache_dir) / "relevance.sqlite"),
+            max_entries=args.verdict_cache_size,
+        )
+
+    entry_agent = EntryAgent(
+        max_concurrency=args.entry_concurrency,
+        classification_mode=args.entry_mode,
+        passage_token_budget=args.entry_token_budget,
+        prefilter=prefilter,
+        section_router=section_router,
+        verdict_cache=verdict_cache,
+    )
+
+    passage_retriever = None
+    if args.passage_retrieval:
+        from rob2_evaluator.retrieval import PassageRetriever
+
+        passage_retriever = PassageRetriever(
+            top_k=args.passage_top_k, token_budget=args.passage_token_budget
+        )
+
+    voters = None
+    if args.vote_models:
+        from rob2_evaluator.llm.models import get_model_info
+
+        voters = []
+        for model_name in args.vote_models:
+            model_info = get_model_info(model_name)
+            if model_info is None:
+                raise ValueError(f"未知的模型: {model_name}")
+            voters.append((model_info.model_name, model_info.provider))
+    elif args.samples > 1:
+        voters = [(None, None)] * args.samples
+
+    evaluation_service = EvaluationService(
+        max_parallel_domains=args.domain_workers,
+        overlap_analysis_type=not args.sequential_analysis_type,
+        passage_retriever=passage_retriever,
+        evaluation_mode="all_domains" if args.all_domains else "per_domain",
+        judgement_mode="rules" if args.rule_judgement else "llm",
+        stream_domains=args.stream,
+        evidence_mode="passage" if args.cite_passages else "quote",
+        align_evidence=not args.no_evidence_alignment,
+        max_context_tokens=args.max_context_tokens,
+        voters=voters,
+    )
+    return ROB2Evaluator(
+        content_processor=ROB2ContentProcessor(entry_agent),
+        evaluation_service=evaluation_service,
+        cache_dir=args.cache_dir,
+    )
+
+
+def configure_timeouts(args: argparse.Namespace) -> None:
+    """设置 LLM 请求的超时上限与对冲策略"""
+    from rob2_evaluator.llm.models import configure_request_timeout, get_model_info
+    from rob2_evaluator.utils.latency import HedgePolicy, latency_tracker
+    from rob2_evaluator.utils.llm import set_hedge_policy
+
+    configure_request_timeout(args.request_timeout)
+    latency_tracker.max_timeout = args.request_timeout
+    latency_tracker.min_timeout = min(latency_tracker.min_timeout, args.request_timeout)
+    if not (args.hedge or args.hedge_delay is not None or args.hedge_model):
+        return
+
+    secondary = None
+    if args.hedge_model:
+        model_info = get_model_info(args.hedge_model)
+        if model_info is None:
+            raise ValueError(f"未知的模型: {args.hedge_model}")
+        secondary = (model_info.model_name, model_info.provider)
+    set_hedge_policy(HedgePolicy(delay=args.hedge_delay, secondary=secondary))
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """rob2-eval 命令行入口"""
+    from rob2_evaluator.services.batch_service import BatchService
+
+    parser = build_arg_parser()
+    args = parser.parse_args(argv)
+    if args.async_mode and args.pipeline:
+        parser.error("--async 与 --pipeline 不能同时使用")
+    if args.batch_api and (args.async_mode or args.pipeline):
+        parser.error("--batch-api 不能与 --async 或 --pipeline 同时使用")
+    if args.batch_api and args.all_domains:
+        parser.error("--batch-api 只支持逐领域评估，不能与 --all-domains 同时使用")
+    if args.batch_api and (args.no_llm_cache or args.refresh_llm_cache):
+        parser.error("--batch-api 需要 LLM 响应缓存，不能与 --no-llm-cache 或 --refresh-llm-cache 同时使用")
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(message)s")
+
+    inputs = BatchService.collect_inputs(args.input)
+    if not inputs:
+        print(f"未找到可处理的文件: {args.input}")
+        return 1
+
+    from rob2_evaluator.llm.models import configure_client_pool
+
+    configure_client_pool(
+        args.llm_pool_size
+        or args.workers * (args.domain_workers + args.entry_concurrency)
+    )
+    configure_timeouts(args)
+    evaluator = build_evaluator(args)
+    pipeline = None
+    if args.pipeline:
+        from rob2_evaluator.services.pipeline_service import PipelineService
+
+        pipeline = PipelineService(
+            evaluator,
+            parse_workers=args.parse_workers,
+            filter_workers=args.filter_workers or args.workers,
+            evaluate_workers=args.workers,
+            queue_size=args.queue_size,
+        )
+    elif args.batch_api:
+        from rob2_evaluator.services.batch_api_service import BatchAPIService
+
+        pipeline = BatchAPIService(evaluator, poll_interval=args.batch_poll_interval)
+    batch_service = BatchService(evaluator, max_workers=args.workers, pipeline=pipeline)
+    if args.async_mode:
+        if args.provider_concurrency:
+            from rob2_evaluator.utils.resilience import provider_concurrency
+
+            provider_concurrency.configure(args.provider_concurrency)
+        records = asyncio.run(batch_service.arun(inputs))
+    else:
+        records = batch_service.run(inputs)
+    batch_service.write_output(records, args.output)
+
+    entry_stats = evaluator.content_processor.entry_agent.stats
+    print(
+        f"入口筛选: 候选 {entry_stats.candidates} 项，本地判定 "
+        f"{entry_stats.locally_decided} 项"
+        f"（{entry_stats.locally_decided_ratio:.1%}，其中缓存命中 "
+        f"{entry_stats.cache_hits} 项），LLM 调用 {entry_stats.llm_calls} 次"
+    )
+
+    if args.batch_api:
+        batch_stats = pipeline.stats
+        print(
+            f"批处理调用: 提交 {batch_stats.submitted} 个，成功 {batch_stats.succeeded}，"
+            f"失败 {batch_stats.errored}，未通过校验 {batch_stats.invalid}（后两者在评估时实时调用）"
+        )
+
+    from rob2_evaluator.utils.usage import usage_tracker
+
+    usage = usage_tracker.total()
+    if usage.calls:
+        print(
+            f"LLM 用量: {usage.calls} 次调用，输入 {usage.input_tokens} tokens"
+            f"（前缀缓存命中 {usage.cached_input_tokens}，{usage.cache_hit_rate:.1%}），"
+            f"输出 {usage.output_tokens} tokens"
+        )
+    if usage.timeouts or usage.hedges:
+        print(f"LLM 请求超时 {usage.timeouts} 次，发出对冲请求 {usage.hedges} 次")
+    if usage.json_repairs:
+        print(
+            f"JSON 本地修复 {usage.json_repairs} 次"
+            f"（占结构化响应 {usage.json_repair_rate:.1%}），免去重新生成"
+        )
+    if usage.retries or usage.fallbacks:
+        print(
+            f"LLM 重试 {usage.retries} 次，重试耗尽或熔断后使用默认结果 {usage.fallbacks} 次"
+            "（相关文档未写入缓存，见输出中的 fallback_domains）"
+        )
+
+    from rob2_evaluator.utils.llm import get_response_cache
+
+    response_cache = get_response_cache()
+    if response_cache is not None:
+        stats = response_cache.stats()
+        print(
+            f"LLM 响应缓存: 命中 {stats['hits']} 次，未命中 {stats['misses']} 次"
+            f"（{stats['hit_rate']:.1%}），共 {stats['entries']} 条"
+        )
+
+    failed = [r for r in records if r["status"] == "error"]
+    print(
+        f"完成 {len(records)} 篇文档（缓存命中 "
+        f"{sum(r['status'] == 'cached' for r in records)}，失败 {len(failed)}），"
+        f"结果已写入: {args.output}"
+    )
+    return 1 if failed else 0
+
+
 if __name__ == "__main__":
-    evaluator = ROB2Evaluator()
-    results = evaluator.process_file(Path("examples/2.Angelone.pdf"))
-    print(json.dumps(results, indent=4, ensure_ascii=False))
-    # 生成评估报告
-    evaluator.generate_report(results, output_path="output.docx")
+    sys.exit(main())
@@ -1,6 +1,7 @@
 from rob2_evaluator.processors.base_processor import DocumentProcessor, ContentProcessor
 from rob2_evaluator.processors.rob2_processor import (
     PDFDocumentProcessor,
+    JSONDocumentProcessor,
     ROB2ContentProcessor,
 )
 
@@ -8,5 +9,6 @@ __all__ = [
     "DocumentProcessor",
     "ContentProcessor",
     "PDFDocumentProcessor",
+    "JSONDocumentProcessor",
     "ROB2ContentProcessor",
 ]
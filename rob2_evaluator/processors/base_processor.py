@@ -1,4 +1,5 @@
 from abc import ABC, abstractmethod
+import asyncio
 from typing import List, Dict, Any
 from pathlib import Path
 
@@ -19,3 +20,9 @@ class ContentProcessor(ABC):
     def process_content(self, content: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
         """处理内容并返回处理后的结果"""
         pass
+
+    async def aprocess_content(
+        self, content: List[Dict[str, Any]]
+    ) -> List[Dict[str, Any]]:
+        """process_content 的异步版本，默认在线程中执行同步实现"""
+        return await asyncio.to_thread(self.process_content, content)
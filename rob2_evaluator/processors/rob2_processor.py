@@ -3,6 +3,7 @@ from rob2_evaluator.services.pdf_service import PDFService
 from rob2_evaluator.agents.entry_agent import EntryAgent
 from typing import List, Dict, Any, Optional
 from pathlib import Path
+import json
 
 
 class PDFDocumentProcessor(DocumentProcessor):
@@ -15,6 +16,17 @@ class PDFDocumentProcessor(DocumentProcessor):
         return self.pdf_service.parse_document(file_path)
 
 
+class JSONDocumentProcessor(DocumentProcessor):
+    """content_list JSON 文档处理器实现（已解析好的文本块数组）"""
+
+    def process_document(self, file_path: Path) -> List[Dict[str, Any]]:
+        with open(file_path, "r", encoding="utf-8") as f:
+            content = json.load(f)
+        if not isinstance(content, list):
+            raise ValueError(f"content_list 文件格式错误，应为数组: {file_path}")
+        return content
+
+
 class ROB2ContentProcessor(ContentProcessor):
     """ROB2内容处理器实现"""
 
@@ -24,3 +36,8 @@ class ROB2ContentProcessor(ContentProcessor):
     def process_content(self, content: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
         """处理并过滤内容"""
         return self.entry_agent.filter_relevant(content)
+
+    async def aprocess_content(
+        self, content: List[Dict[str, Any]]
+    ) -> List[Dict[str, Any]]:
+        return await self.entry_agent.afilter_relevant(content)
@@ -0,0 +1,15 @@
+from .bm25 import BM25Index, tokenize
+from .evidence_aligner import EvidenceAligner
+from .lexical_filter import LexicalPreFilter
+from .passage_index import PassageIndex, PassageRetriever
+from .section_router import SectionRouter
+
+__all__ = [
+    "BM25Index",
+    "tokenize",
+    "EvidenceAligner",
+    "LexicalPreFilter",
+    "PassageIndex",
+    "PassageRetriever",
+    "SectionRouter",
+]
@@ -0,0 +1,63 @@
+"""BM25 scoring over a small in-memory corpus, vectorized with NumPy"""
+
+import re
+from typing import Dict, Iterable, List
+
+import numpy as np
+
+_TOKEN_PATTERN = re.compile(r"[a-z0-9]+(?:[-'][a-z0-9]+)*")
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercases a text and splits it into word tokens (hyphenated words kept whole)."""
+    return _TOKEN_PATTERN.findall((text or "").lower())
+
+
+class BM25Index:
+    """
+    Okapi BM25 index over a list of texts.
+
+    The term-frequency matrix is built once as a dense (docs x vocab) float32
+    array; a query is scored against every document with a single matrix product.
+    Intended for per-document corpora (hundreds of passages), not whole collections.
+    """
+
+    def __init__(self, texts: Iterable[str], k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        docs = [tokenize(text) for text in texts]
+        self.vocab: Dict[str, int] = {}
+        for tokens in docs:
+            for token in tokens:
+                self.vocab.setdefault(token, len(self.vocab))
+
+        self.size = len(docs)
+        tf = np.zeros((self.size, max(len(self.vocab), 1)), dtype=np.float32)
+        for row, tokens in enumerate(docs):
+            for token in tokens:
+                tf[row, self.vocab[token]] += 1.0
+
+        doc_len = tf.sum(axis=1)
+        avg_len = float(doc_len.mean()) if self.size else 0.0
+        df = (tf > 0).sum(axis=0)
+        self.idf = np.log1p((self.size - df + 0.5) / (df + 0.5)).astype(np.float32)
+
+        # 预先计算每个 (文档, 词) 的 BM25 权重，查询时只需按词求和
+        norm = k1 * (1.0 - b + b * doc_len / avg_len) if avg_len else np.ones(self.size)
+        self.weights = (tf * (k1 + 1.0)) / (tf + norm[:, None].astype(np.float32))
+        self.weights *= self.idf[None, :]
+
+    def query_vector(self, tokens: Iterable[str]) -> np.ndarray:
+        """Builds a term-count vector for the query over the index vocabulary."""
+        vector = np.zeros(self.weights.shape[1], dtype=np.float32)
+        for token in tokens:
+            col = self.vocab.get(token)
+            if col is not None:
+                vector[col] += 1.0
+        return vector
+
+    def scores(self, query: str) -> np.ndarray:
+        """Returns the BM25 score of every document for a free-text query."""
+        if self.size == 0:
+            return np.zeros(0, dtype=np.float32)
+        return self.weights @ self.query_vector(tokenize(query))
@@ -0,0 +1,111 @@
+"""证据引用与原文对齐：校验引用、修正页码"""
+
+import re
+from collections import defaultdict
+from typing import Any, Dict, List, Optional, Tuple
+
+# 中日韩文字不以空格分词，按单字切分
+_CJK = "\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7af\uf900-\ufaff"
+# 连字符、断行处的差异在 PDF 解析结果中很常见，对齐时按 Unicode 词字符切词
+_WORD_PATTERN = re.compile(rf"[{_CJK}]|(?:(?![{_CJK}])\w)+")
+
+
+def _words(text: str) -> List[str]:
+    return _WORD_PATTERN.findall((text or "").casefold())
+
+
+class EvidenceAligner:
+    """
+    单篇文档的词 n-gram 倒排索引，用于把模型返回的证据引用定位到原文段落。
+
+    引用的 n-gram 集合在各段落中的包含率即匹配分数：
+    只访问引用中出现的 n-gram 的倒排表，代价与引用长度和倒排表长度相关，
+    与文档长度无关。不足 n 个词的引用改用单词的位置倒排表按相对位置匹配。
+    分数不低于 min_score 的引用视为已验证，页码以所在段落为准。
+    """
+
+    def __init__(
+        self, items: List[Dict[str, Any]], n: int = 3, min_score: float = 0.6
+    ):
+        if n < 1:
+            raise ValueError(f"n 必须大于 0: {n}")
+        self.items = items
+        self.n = n
+        self.min_score = min_score
+        self._tokens = [_words(item.get("text", "")) for item in items]
+        self._postings: Dict[Tuple[str, ...], List[int]] = defaultdict(list)
+        # 词 -> {段落下标: 词在段落中的位置}
+        self._positions: Dict[str, Dict[int, List[int]]] = defaultdict(dict)
+        for idx, tokens in enumerate(self._tokens):
+            for gram in set(self._ngrams(tokens)):
+                self._postings[gram].append(idx)
+            for pos, token in enumerate(tokens):
+                self._positions[token].setdefault(idx, []).append(pos)
+
+    def _ngrams(self, tokens: List[str]) -> List[Tuple[str, ...]]:
+        return [tuple(tokens[i : i + self.n]) for i in range(len(tokens) - self.n + 1)]
+
+    def locate(self, quote: str) -> Tuple[Optional[int], float]:
+        """
+        定位引用所在段落
+
+        Returns:
+            (段落下标, 匹配分数 0～1)，找不到时段落下标为 None
+        """
+        tokens = _words(quote)
+        if not tokens:
+            return None, 0.0
+
+        if len(tokens) < self.n:
+            return self._locate_phrase(tokens)
+
+        grams = set(self._ngrams(tokens))
+        hits: Dict[int, int] = defaultdict(int)
+        for gram in grams:
+            for idx in self._postings.get(gram, ()):
+                hits[idx] += 1
+        if not hits:
+            return None, 0.0
+        # 分数相同时取靠前的段落
+        best = min(hits, key=lambda idx: (-hits[idx], idx))
+        return best, hits[best] / len(grams)
+
+    def _locate_phrase(self, tokens: List[str]) -> Tuple[Optional[int], float]:
+        """
+        过短的引用无法构成 n-gram，按连续词序列精确匹配：
+        从出现段落最少的词的位置表出发，按相对位置核对整个序列
+        """
+        postings = [self._positions.get(token, {}) for token in tokens]
+        offset = min(range(len(tokens)), key=lambda k: len(postings[k]))
+        # 位置表按段落顺序建立，命中多个段落时取靠前者
+        for idx, positions in postings[offset].items():
+            doc_tokens = self._tokens[idx]
+            for pos in positions:
+                start = pos - offset
+                if start >= 0 and doc_tokens[start : start + len(tokens)] == tokens:
+                    return idx, 1.0
+        return None, 0.0
+
+    def align(self, evidence: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        返回补充了 match_score、verified 的证据条目；
+        已验证的引用以所在段落的 page_idx 修正或补全页码
+        """
+        idx, score = self.locate(evidence.get("text", ""))
+        aligned = {**evidence, "match_score": round(score, 3)}
+        aligned["verified"] = idx is not None and score >= self.min_score
+        if aligned["verified"]:
+            page = self.items[idx].get("page_idx")
+            if isinstance(page, int):
+                aligned["page_idx"] = page
+        return aligned
+
+    def align_result(self, result: Dict[str, Any]) -> Dict[str, Any]:
+        """对一个领域结果中的信号与总体证据逐条对齐（原地更新并返回）"""
+        for signal in (result.get("signals") or {}).values():
+            if isinstance(signal, dict) and signal.get("evidence"):
+                signal["evidence"] = [self.align(ev) for ev in signal["evidence"]]
+        overall = result.get("overall")
+        if isinstance(overall, dict) and overall.get("evidence"):
+            overall["evidence"] = [self.align(ev) for ev in overall["evidence"]]
+        return result
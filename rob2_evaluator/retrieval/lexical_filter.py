@@ -0,0 +1,117 @@
+"""入口专家前置的本地词法预筛选"""
+
+import re
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from rob2_evaluator.retrieval.bm25 import BM25Index
+from rob2_evaluator.schema.rob2_schema import DOMAIN_SCHEMAS
+
+# ROB2 相关术语：(正则, 权重)。权重 2 为几乎必然相关的方法学表述
+POSITIVE_LEXICON: List[Tuple[str, float]] = [
+    (r"random(ly|i[sz]ed|i[sz]ation)", 2.0),
+    (r"allocation conceal", 2.0),
+    (r"conceal(ed|ment)", 1.5),
+    (r"intention[- ]to[- ]treat|\bitt\b", 2.0),
+    (r"per[- ]protocol|as[- ]treated", 2.0),
+    (r"(double|single|triple)[- ]blind|blind(ed|ing)|mask(ed|ing)", 2.0),
+    (r"sealed|opaque|envelopes?", 1.5),
+    (r"computer[- ]generated|random number|block(ed)? randomi|stratif", 2.0),
+    (r"lost to follow[- ]?up|loss to follow[- ]?up|attrition|drop[- ]?outs?", 2.0),
+    (r"withdr(ew|awn|awal)|discontinu", 1.5),
+    (r"missing (outcome )?data|imputation|imputed|last observation carried", 2.0),
+    (r"protocol deviation|non[- ]?adherence|adheren|complian", 1.5),
+    (r"outcome assessors?|assessors? (were|was)", 1.5),
+    (r"pre[- ]?specified|prespecified|trial regist|clinicaltrials\.gov|registered", 1.5),
+    (r"statistical analysis|analysis plan|sample size|power calculation", 1.0),
+    (r"placebo|control group|usual care", 1.0),
+    (r"baseline (characteristics|differences|imbalance)", 1.5),
+    (r"primary (outcome|end ?point)|secondary outcome", 1.0),
+    (r"follow[- ]?up", 0.5),
+    (r"consort|flow diagram", 1.0),
+]
+
+# 明显无关的内容：作者单位、通讯信息、基金、版权、利益冲突等
+NEGATIVE_LEXICON: List[Tuple[str, float]] = [
+    (r"department of|school of medicine|university|institute|hospital\b", 1.0),
+    (r"correspond(ence|ing author)|reprint requests?|e-?mail|@", 1.5),
+    (r"funded by|funding|grants?\b|supported (in part )?by", 1.5),
+    (r"conflicts? of interest|competing interests?|disclos", 1.5),
+    (r"copyright|all rights reserved|\bdoi\b|licen[cs]e", 1.5),
+    (r"acknowledg", 1.5),
+    (r"received .{0,40}(accepted|revised)", 1.5),
+    (r"\b(md|phd|mph|msc|rn)\b", 1.0),
+]
+
+
+def _compile(lexicon: List[Tuple[str, float]]) -> List[Tuple[re.Pattern, float]]:
+    return [(re.compile(pattern, re.IGNORECASE), weight) for pattern, weight in lexicon]
+
+
+def _default_query() -> str:
+    """BM25 查询：各领域信号问题文本"""
+    return " ".join(
+        signal["text"] for schema in DOMAIN_SCHEMAS.values() for signal in schema["signals"]
+    )
+
+
+class LexicalPreFilter:
+    """
+    本地词法预筛选：ROB2 词表打分 + 文档内 BM25 相关度。
+
+    分数 = 正向词权重之和 - 负向词权重之和 + bm25_weight × 归一化 BM25 分数。
+    分数 >= accept_threshold 的项直接判为相关，<= reject_threshold 的项直接判为无关，
+    只有中间的不确定区间交给 LLM 判断。
+    """
+
+    def __init__(
+        self,
+        accept_threshold: float = 3.0,
+        reject_threshold: float = -1.0,
+        bm25_weight: float = 1.0,
+        positive_lexicon: Optional[List[Tuple[str, float]]] = None,
+        negative_lexicon: Optional[List[Tuple[str, float]]] = None,
+        query: Optional[str] = None,
+    ):
+        if reject_threshold >= accept_threshold:
+            raise ValueError("reject_threshold 必须小于 accept_threshold")
+        self.accept_threshold = accept_threshold
+        self.reject_threshold = reject_threshold
+        self.bm25_weight = bm25_weight
+        self.positive = _compile(positive_lexicon or POSITIVE_LEXICON)
+        self.negative = _compile(negative_lexicon or NEGATIVE_LEXICON)
+        self.query = query or _default_query()
+
+    def _lexicon_score(self, text: str) -> float:
+        score = sum(weight for pattern, weight in self.positive if pattern.search(text))
+        score -= sum(weight for pattern, weight in self.negative if pattern.search(text))
+        return score
+
+    def score(self, items: List[Dict[str, Any]]) -> np.ndarray:
+        """计算一篇文档中各项的预筛选分数"""
+        texts = [item.get("text", "") for item in items]
+        scores = np.array([self._lexicon_score(text) for text in texts], dtype=np.float32)
+        if texts and self.bm25_weight:
+            bm25 = BM25Index(texts).scores(self.query)
+            peak = float(bm25.max()) if bm25.size else 0.0
+            if peak > 0:
+                scores += self.bm25_weight * (bm25 / peak)
+        return scores
+
+    def decide(self, items: List[Dict[str, Any]]) -> List[Optional[bool]]:
+        """
+        对各项给出预筛选结论
+
+        Returns:
+            与 items 对应的列表：True 直接相关，False 直接无关，None 需要 LLM 判断
+        """
+        decisions: List[Optional[bool]] = []
+        for score in self.score(items):
+            if score >= self.accept_threshold:
+                decisions.append(True)
+            elif score <= self.reject_threshold:
+                decisions.append(False)
+            else:
+                decisions.append(None)
+        return decisions
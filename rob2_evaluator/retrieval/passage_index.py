@@ -0,0 +1,144 @@
+"""按领域检索证据段落，缩小各领域提示词的上下文"""
+
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from rob2_evaluator.retrieval.bm25 import BM25Index
+from rob2_evaluator.schema.rob2_schema import DOMAIN_SCHEMAS
+from rob2_evaluator.utils.tokens import estimate_tokens
+
+# 信号问题之外的检索扩展词：论文中描述方法学的常见用语往往不出现在问题文本里
+DOMAIN_QUERY_TERMS: Dict[str, str] = {
+    "randomization": (
+        "randomly randomised randomized randomization computer-generated random "
+        "number table block stratified minimization sealed opaque envelopes "
+        "central telephone pharmacy concealment baseline characteristics"
+    ),
+    "deviation_assignment": (
+        "blind blinded blinding double-blind masked placebo open-label "
+        "intention-to-treat itt per-protocol modified crossover contamination "
+        "protocol deviations"
+    ),
+    "deviation_adherence": (
+        "blind blinded blinding double-blind masked placebo adherence compliance "
+        "non-adherence co-interventions per-protocol as-treated discontinued "
+        "instrumental variable"
+    ),
+    "missing_data": (
+        "lost follow-up withdrew withdrawn dropout dropouts attrition missing "
+        "imputation imputed sensitivity analysis completed flow diagram consort"
+    ),
+    "measurement": (
+        "outcome assessor assessors blinded masked questionnaire scale measured "
+        "primary secondary endpoint validated self-reported adjudication committee"
+    ),
+    "selection": (
+        "statistical analysis plan protocol registered registration "
+        "clinicaltrials.gov prespecified pre-specified primary secondary outcomes "
+        "post hoc subgroup sensitivity analyses"
+    ),
+}
+
+
+def domain_query(domain_key: str) -> str:
+    """领域检索查询：领域名称 + 信号问题文本 + 扩展词"""
+    schema = DOMAIN_SCHEMAS[domain_key]
+    parts = [schema["domain_name"]]
+    parts.extend(signal["text"] for signal in schema["signals"])
+    parts.append(DOMAIN_QUERY_TERMS.get(domain_key, ""))
+    return " ".join(parts)
+
+
+class PassageIndex:
+    """单篇文档的段落索引，BM25 只构建一次，供各领域分别检索"""
+
+    def __init__(
+        self,
+        items: List[Dict[str, Any]],
+        top_k: int,
+        token_budget: int,
+        neighbors: int,
+    ):
+        self.items = items
+        self.top_k = top_k
+        self.token_budget = token_budget
+        self.neighbors = neighbors
+        self.tokens = [estimate_tokens(item.get("text", "")) for item in items]
+        self.index = BM25Index([item.get("text", "") for item in items])
+
+    @property
+    def total_tokens(self) -> int:
+        return sum(self.tokens)
+
+    def select_indices(self, domain_key: str) -> List[int]:
+        """
+        返回领域相关段落的下标（原文顺序）
+
+        按 BM25 分数从高到低取至多 top_k 个命中段落，每个命中段落连同前后各
+        neighbors 项一起加入，超出 token_budget 的段落跳过。
+        整篇文档不超过预算时直接返回全部段落。
+        """
+        if self.total_tokens <= self.token_budget:
+            return list(range(len(self.items)))
+
+        scores = self.index.scores(domain_query(domain_key))
+        selected: set = set()
+        used = 0
+        seeds = 0
+        for idx in np.argsort(-scores, kind="stable"):
+            if seeds >= self.top_k or scores[idx] <= 0:
+                break
+            idx = int(idx)
+            # 已作为邻近段落加入的命中段落同样占一个名额，并扩展自己的邻近段落
+            if idx not in selected:
+                if used + self.tokens[idx] > self.token_budget:
+                    continue
+                selected.add(idx)
+                used += self.tokens[idx]
+            seeds += 1
+            # 邻近段落提供上下文，预算不足时放弃
+            for offset in range(1, self.neighbors + 1):
+                for neighbor in (idx - offset, idx + offset):
+                    if 0 <= neighbor < len(self.items) and neighbor not in selected:
+                        if used + self.tokens[neighbor] <= self.token_budget:
+                            selected.add(neighbor)
+                            used += self.tokens[neighbor]
+        return sorted(selected)
+
+    def select(self, domain_key: str) -> List[Dict[str, Any]]:
+        """返回领域相关段落（原文顺序）"""
+        return [self.items[i] for i in self.select_indices(domain_key)]
+
+
+class PassageRetriever:
+    """
+    按领域检索段落：每篇文档构建一次 PassageIndex，
+    各领域代理只接收各自 top-k 段落及其邻近段落，而不是完整的筛选结果。
+    """
+
+    def __init__(
+        self,
+        top_k: int = 15,
+        token_budget: int = 2000,
+        neighbors: int = 1,
+    ):
+        if top_k < 1:
+            raise ValueError(f"top_k 必须大于 0: {top_k}")
+        if token_budget < 1:
+            raise ValueError(f"token_budget 必须大于 0: {token_budget}")
+        self.top_k = top_k
+        self.token_budget = token_budget
+        self.neighbors = max(0, neighbors)
+
+    def build(self, items: List[Dict[str, Any]]) -> PassageIndex:
+        return PassageIndex(items, self.top_k, self.token_budget, self.neighbors)
+
+
+def select_for_domain(
+    index: Optional[PassageIndex], domain_key: Optional[str], items: List[Dict[str, Any]]
+) -> List[Dict[str, Any]]:
+    """未启用检索或领域未知时返回全部段落"""
+    if index is None or domain_key not in DOMAIN_SCHEMAS:
+        return items
+    return index.select(domain_key)
@@ -0,0 +1,141 @@
+"""基于章节标题的入口路由"""
+
+import re
+from typing import Any, Dict, List, Optional, Tuple
+
+INCLUDE = "include"
+EXCLUDE = "exclude"
+CLASSIFY = "classify"
+
+# 整节保留：方法与结果部分几乎总包含 ROB2 证据
+INCLUDE_PATTERNS = [
+    r"\bmethods?\b",
+    r"\bmethodology\b",
+    r"\bmaterials?\b",
+    r"\bresults?\b",
+    r"\bfindings\b",
+    r"\bstatistical analys[ie]s\b",
+    r"\bdata analys[ie]s\b",
+    r"\bsample size\b",
+    r"\brandomi[sz]ation\b",
+    r"\ballocation\b",
+    r"\bblinding\b|\bmasking\b",
+    r"\b(study|trial) design\b|\bdesign\b",
+    r"\bparticipants?\b|\bsubjects\b|\bpatients\b",
+    r"\binterventions?\b|\btreatments?\b",
+    r"\boutcomes?\b|\bmeasures?\b|\bassessments?\b",
+    r"\bprocedures?\b",
+    r"\bfollow[- ]?up\b",
+]
+
+# 整节丢弃：不含偏倚评估所需的方法学信息
+EXCLUDE_PATTERNS = [
+    r"\bintroduction\b",
+    r"\bbackground\b",
+    r"\bdiscussion\b",
+    r"\bconclusions?\b",
+    r"\backnowledge?ments?\b",
+    r"\bappendix\b|\bappendices\b",
+    r"\breferences\b|\bbibliography\b|\bliterature cited\b",
+    r"\bfunding\b|\bfinancial support\b",
+    r"\bconflicts? of interest\b|\bcompeting interests?\b|\bdisclosures?\b",
+    r"\bauthor(s'?)? contributions?\b",
+    r"\bsupplementary\b",
+]
+
+# 被丢弃章节中仍含有这些强方法学表述的项改为交给 LLM 判断，
+# 避免 PDF 版面顺序错乱（如随机化描述落在引言标题之后）时丢失证据
+RESCUE_PATTERNS = [
+    r"random(ly|i[sz]ed|i[sz]ation)",
+    r"allocation|conceal",
+    r"blind(ed|ing)|mask(ed|ing)",
+    r"intention[- ]to[- ]treat|per[- ]protocol",
+    r"lost to follow[- ]?up|withdr(ew|awn)|drop[- ]?outs?",
+]
+
+# 去掉 "2."、"2.1"、"II." 之类的章节编号
+_NUMBERING = re.compile(r"^\s*(?:[0-9]+(?:\.[0-9]+)*|[ivxlc]+)[.)]?\s+", re.IGNORECASE)
+
+
+class SectionRouter:
+    """
+    将章节标题路径映射为 include / exclude / classify 决策。
+
+    标题路径从最内层向外逐级匹配，第一个命中规则的标题决定结果；
+    同时命中保留与丢弃规则（如 "Results and Discussion"）视为不确定，继续向外层查找。
+    超过 max_heading_words 个词的"标题"通常是论文题目，不参与匹配。
+    被丢弃章节中命中 rescue_patterns 的项降级为 classify。
+    """
+
+    def __init__(
+        self,
+        include_patterns: Optional[List[str]] = None,
+        exclude_patterns: Optional[List[str]] = None,
+        rescue_patterns: Optional[List[str]] = None,
+        max_heading_words: int = 8,
+    ):
+        self.include = [
+            re.compile(p, re.IGNORECASE) for p in include_patterns or INCLUDE_PATTERNS
+        ]
+        self.exclude = [
+            re.compile(p, re.IGNORECASE) for p in exclude_patterns or EXCLUDE_PATTERNS
+        ]
+        self.rescue = re.compile(
+            "|".join(f"(?:{p})" for p in rescue_patterns or RESCUE_PATTERNS),
+            re.IGNORECASE,
+        )
+        self.max_heading_words = max_heading_words
+
+    @staticmethod
+    def normalize_heading(heading: str) -> str:
+        return _NUMBERING.sub("", heading or "").strip().casefold()
+
+    def classify_heading(self, heading: str) -> str:
+        """单个标题的决策"""
+        text = self.normalize_heading(heading)
+        if not text or len(text.split()) > self.max_heading_words:
+            return CLASSIFY
+        included = any(p.search(text) for p in self.include)
+        excluded = any(p.search(text) for p in self.exclude)
+        if included and not excluded:
+            return INCLUDE
+        if excluded and not included:
+            return EXCLUDE
+        return CLASSIFY
+
+    def classify_path(self, headings: List[str]) -> str:
+        """标题路径（由外到内）的决策"""
+        for heading in reversed(headings):
+            decision = self.classify_heading(heading)
+            if decision != CLASSIFY:
+                return decision
+        return CLASSIFY
+
+    def heading_paths(self, content_list: List[Dict[str, Any]]) -> List[List[str]]:
+        """
+        计算每一项所属的标题路径：
+        docling 解析结果直接使用 item["headings"]；
+        content_list 格式中带 text_level 的项本身是标题，其后各项归属该标题。
+        """
+        paths: List[List[str]] = []
+        current: List[Tuple[int, str]] = []
+        for item in content_list:
+            if item.get("headings"):
+                paths.append(list(item["headings"]))
+                continue
+            level = item.get("text_level")
+            if level:
+                current = [(lvl, text) for lvl, text in current if lvl < level]
+                current.append((level, item.get("text", "")))
+            paths.append([text for _, text in current])
+        return paths
+
+    def route(self, content_list: List[Dict[str, Any]]) -> List[str]:
+        """返回与 content_list 对应的决策列表"""
+        decisions = []
+        for item, path in zip(content_list, self.heading_paths(content_list)):
+            decision = self.classify_path(path)
+            if decision == EXCLUDE and self.rescue.search(item.get("text", "")):
+                decision = CLASSIFY
+            decisions.append(decision)
+        return decisions
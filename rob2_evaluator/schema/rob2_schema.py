@@ -5,11 +5,21 @@ from enum import Enum
 
 # === 统一的证据条目模型定义 ===
 class EvidenceItem(BaseModel):
-    text: str = Field(description="Excerpt from original text supporting the judgment.")
+    text: str = Field(
+        description="Excerpt from original text supporting the judgment.", default=""
+    )
     page_idx: Optional[int] = Field(
         description="The page number where this evidence text was found in the input context.",
         default=None,
     )
+    passage: Optional[str] = Field(
+        description="ID of the cited passage (e.g. P12) when evidence is cited by passage.",
+        default=None,
+    )
+    span: Optional[str] = Field(
+        description="First few words of the supporting sentence within the cited passage.",
+        default=None,
+    )
 
 
 # === 统一的领域信号与评判结构定义 ===
@@ -30,6 +40,27 @@ class GenericDomainJudgement(BaseModel):
     overall: DomainJudgement
 
 
+# 领域风险由本地判定算法计算时，模型只需回答信号问题
+class SignalsOnlyJudgement(BaseModel):
+    signals: Dict[str, SignalJudgement]
+
+
+# === 单次调用评估全部领域的结构，各领域内容再分别按 GenericDomainJudgement 校验 ===
+class AllDomainsJudgement(BaseModel):
+    domains: Dict[str, Any] = Field(
+        description="Domain key mapped to that domain's signals and overall judgement.",
+        default_factory=dict,
+    )
+
+
+# === 入口专家多段落相关性判断结构 ===
+class RelevantPassages(BaseModel):
+    relevant_ids: List[int] = Field(
+        description="Numbers of the passages relevant to ROB2 assessment.",
+        default_factory=list,
+    )
+
+
 class DomainKey(str, Enum):
     RANDOMIZATION = "randomization"
     DEVIATION_ASSIGNMENT = "deviation_assignment"
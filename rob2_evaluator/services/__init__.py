@@ -1,5 +1,16 @@
 from rob2_evaluator.services.pdf_service import PDFService
 from rob2_evaluator.services.evaluation_service import EvaluationService
 from rob2_evaluator.services.report_service import ReportService
+from rob2_evaluator.services.batch_service import BatchService
+from rob2_evaluator.services.pipeline_service import PipelineService, StagePipeline
+from rob2_evaluator.services.batch_api_service import BatchAPIService
 
-__all__ = ["PDFService", "EvaluationService", "ReportService"]
+__all__ = [
+    "PDFService",
+    "EvaluationService",
+    "ReportService",
+    "BatchService",
+    "PipelineService",
+    "StagePipeline",
+    "BatchAPIService",
+]
@@ -0,0 +1,292 @@
+"""批处理 API 模式：整个语料的 LLM 调用按阶段提交为服务商批处理任务"""
+
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+import logging
+
+from rob2_evaluator.factories import DomainAgentFactory
+from rob2_evaluator.llm.batch import (
+    DEFAULT_BATCH_TIMEOUT,
+    DEFAULT_POLL_INTERVAL,
+    BatchClient,
+    BatchRequest,
+    BatchResult,
+    create_batch_client,
+    supports_batch,
+)
+from rob2_evaluator.utils.cache import contains_fallback
+from rob2_evaluator.utils.llm import (
+    get_response_cache,
+    parse_response_text,
+    response_cache_key,
+)
+from rob2_evaluator.utils.usage import usage_tracker
+
+# 单个批处理任务的请求数上限（低于 OpenAI 与 Anthropic 的限制）
+DEFAULT_MAX_BATCH_SIZE = 10_000
+
+
+@dataclass
+class BatchJobStats:
+    """批处理调用统计：提交数，以及成功写入缓存、服务商报错、未通过校验的数量"""
+
+    submitted: int = 0
+    succeeded: int = 0
+    errored: int = 0
+    invalid: int = 0
+
+
+class BatchAPIService:
+    """
+    以服务商批处理 API（OpenAI Batch、Anthropic Message Batches）评估整个语料：
+    费用约为实时调用的一半，代价是每个阶段都要等待批处理任务完成（数分钟到数小时）。
+
+    每个阶段先渲染全部文档将发出的 LLM 调用，按提供商提交为批处理任务，
+    结果经与 call_llm 相同的 pydantic 校验后写入 LLM 响应缓存；最后按正常流程评估各文档，
+    调用全部命中缓存。阶段依次为入口筛选、分析类型与 Domain 1、3、4、5、Domain 2
+    （依赖分析类型）；长文档的合并调用依赖分段结果，在同一阶段的下一轮提交。
+    批处理中失败或未通过校验的调用，以及不支持批处理的提供商，在最后的评估中实时调用。
+
+    run 的返回值与 PipelineService.run 一致，可作为 BatchService 的 pipeline 使用。
+    """
+
+    def __init__(
+        self,
+        evaluator,
+        clients: Optional[Dict[str, BatchClient]] = None,
+        poll_interval: float = DEFAULT_POLL_INTERVAL,
+        timeout: float = DEFAULT_BATCH_TIMEOUT,
+        max_batch_size: int = DEFAULT_MAX_BATCH_SIZE,
+    ):
+        """
+        Args:
+            evaluator: ROB2Evaluator，提供各阶段处理器与结果缓存
+            clients: 提供商名到 BatchClient 的映射，缺少的提供商按需以环境变量配置创建
+            poll_interval: 查询批处理任务状态的间隔（秒）
+            timeout: 等待单个批处理任务完成的上限（秒）
+            max_batch_size: 单个批处理任务的请求数上限，超出时拆分为多个任务
+        """
+        if evaluator.evaluation_service.evaluation_mode != "per_domain":
+            raise ValueError("批处理模式只支持逐领域评估")
+        if max_batch_size < 1:
+            raise ValueError(f"max_batch_size 必须大于 0: {max_batch_size}")
+        self.evaluator = evaluator
+        self.clients: Dict[str, BatchClient] = dict(clients or {})
+        self.poll_interval = poll_interval
+        self.timeout = timeout
+        self.max_batch_size = max_batch_size
+        self.stats = BatchJobStats()
+        self.logger = logging.getLogger(self.__class__.__name__)
+
+    def run(self, inputs: List[Path]) -> Dict[Path, Dict[str, Any]]:
+        """
+        分阶段批量评估所有输入，成功且不含默认判断的结果写入评估器缓存
+
+        Returns:
+            文件路径到结果的映射：{"status": "ok", "result": ...}
+            或 {"status": "error", "stage": 阶段名, "error": 错误信息}
+        """
+        response_cache = get_response_cache()
+        if response_cache is None or response_cache.refresh:
+            # 批处理结果经响应缓存交给评估流程，不读取缓存时无法使用
+            raise ValueError("批处理模式需要启用（且不刷新）LLM 响应缓存")
+        evaluator = self.evaluator
+        service = evaluator.evaluation_service
+        outcomes: Dict[Path, Dict[str, Any]] = {}
+
+        documents = self._each(
+            "parse",
+            {path: path for path in inputs},
+            lambda path: evaluator.select_document_processor(path).process_document(path),
+            outcomes,
+        )
+
+        entry_agent = evaluator.content_processor.entry_agent
+        self._run_phase("filter", documents, entry_agent.llm_requests, outcomes)
+        relevant = self._each(
+            "filter", documents, evaluator.content_processor.process_content, outcomes
+        )
+
+        prepared = self._each("evaluate", relevant, service._prepare, outcomes)
+        self._run_phase("evaluate", prepared, self._base_requests, outcomes)
+        self._run_phase("evaluate", prepared, self._deviation_requests, outcomes)
+
+        # 与实时模式相同的评估流程，批处理结果均从 LLM 响应缓存读取
+        results = self._each("evaluate", relevant, service.evaluate, outcomes)
+        cache = getattr(evaluator, "cache", None)
+        for path, result in results.items():
+            outcomes[path] = {"status": "ok", "result": result}
+            if cache is not None and not contains_fallback(result):
+                cache.save_result(path, result)
+        return outcomes
+
+    def _each(
+        self,
+        stage: str,
+        documents: Dict[Path, Any],
+        func: Callable[[Any], Any],
+        outcomes: Dict[Path, Dict[str, Any]],
+    ) -> Dict[Path, Any]:
+        """对尚未失败的文档逐个执行 func，失败的文档记入 outcomes"""
+        results = {}
+        for path, payload in documents.items():
+            if path in outcomes:
+                continue
+            try:
+                results[path] = func(payload)
+            except Exception as e:
+                self.logger.error(f"{stage} 阶段失败 {path}: {e}")
+                outcomes[path] = {"status": "error", "stage": stage, "error": str(e)}
+        return results
+
+    def _base_requests(self, prepared: Any) -> List[Dict[str, Any]]:
+        """分析类型推断与 Domain 1、3、4、5 的调用"""
+        items, index = prepared
+        service = self.evaluator.evaluation_service
+        requests = service.analysis_type_agent.llm_requests(items)
+        for agent in DomainAgentFactory.create_base_agents(**service._agent_options()):
+            requests.extend(agent.llm_requests(service._select_items(agent, items, index)))
+        return requests
+
+    def _deviation_requests(self, prepared: Any) -> List[Dict[str, Any]]:
+        """Domain 2 的调用；分析类型已由上一阶段写入缓存（批处理失败时实时推断）"""
+        items, index = prepared
+        service = self.evaluator.evaluation_service
+        analysis_type = service.analysis_type_agent.infer_analysis_type(items)
+        agent = DomainAgentFactory.create_deviation_agent(
+            analysis_type, **service._agent_options()
+        )
+        return agent.llm_requests(service._select_items(agent, items, index))
+
+    def _run_phase(
+        self,
+        stage: str,
+        documents: Dict[Path, Any],
+        requests_for: Callable[[Any], List[Dict[str, Any]]],
+        outcomes: Dict[Path, Dict[str, Any]],
+    ) -> None:
+        """
+        收集各文档尚未缓存的调用并批量提交，直到不再产生新的调用
+        （长文档的合并调用在其分段结果写入缓存后的下一轮出现）；每个调用至多提交一次
+        """
+        cache = get_response_cache()
+        submitted = set()
+        while True:
+            pending: Dict[str, Dict[str, Any]] = {}
+            for path, payload in documents.items():
+                if path in outcomes:
+                    continue
+                try:
+                    requests = requests_for(payload)
+                except Exception as e:
+                    self.logger.error(f"{stage} 阶段失败 {path}: {e}")
+                    outcomes[path] = {"status": "error", "stage": stage, "error": str(e)}
+                    continue
+                for request in requests:
+                    if not supports_batch(request["model_provider"]):
+                        continue
+                    key = response_cache_key(
+                        cache,
+                        request["prompt"],
+                        request["model_name"],
+                        request["model_provider"],
+                        request.get("pydantic_model"),
+                        request.get("model_params"),
+                        request.get("cache_salt"),
+                    )
+                    if key not in submitted and not cache.contains(key):
+                        pending[key] = request
+            if not pending:
+                return
+            self.logger.info(f"{stage} 阶段: 提交 {len(pending)} 个批处理调用")
+            self._submit(pending)
+            submitted.update(pending)
+
+    def _submit(self, requests: Dict[str, Dict[str, Any]]) -> None:
+        """按提供商拆分为批处理任务并同时等待，结果写入 LLM 响应缓存（以缓存键作为 custom_id）"""
+        jobs = defaultdict(list)
+        for key, request in requests.items():
+            provider = getattr(request["model_provider"], "value", request["model_provider"])
+            jobs[provider].append(key)
+        chunks = [
+            (provider, keys[start : start + self.max_batch_size])
+            for provider, keys in jobs.items()
+            for start in range(0, len(keys), self.max_batch_size)
+        ]
+        self.stats.submitted += len(requests)
+
+        def run(chunk) -> Optional[List[BatchResult]]:
+            provider, keys = chunk
+            try:
+                return self._client(provider).run(
+                    [self._batch_request(key, requests[key]) for key in keys],
+                    poll_interval=self.poll_interval,
+                    timeout=self.timeout,
+                )
+            except Exception as e:
+                self.logger.error(f"{provider} 批处理任务失败（{len(keys)} 个调用）: {e}")
+                return None
+
+        with ThreadPoolExecutor(max_workers=len(chunks)) as executor:
+            outcomes = list(executor.map(run, chunks))
+        for (_, keys), results in zip(chunks, outcomes):
+            if results is None:
+                self.stats.errored += len(keys)
+            else:
+                self._store({key: requests[key] for key in keys}, results)
+
+    def _client(self, provider: str) -> BatchClient:
+        if provider not in self.clients:
+            self.clients[provider] = create_batch_client(provider)
+        return self.clients[provider]
+
+    @staticmethod
+    def _batch_request(key: str, request: Dict[str, Any]) -> BatchRequest:
+        from rob2_evaluator.llm.models import get_model_info
+
+        pydantic_model = request.get("pydantic_model")
+        model_info = get_model_info(request["model_name"])
+        # 与 call_llm 一致：不支持 JSON 模式的模型从 markdown 代码块中提取 JSON
+        json_mode = pydantic_model is not None and not (
+            model_info and not model_info.has_json_mode()
+        )
+        return BatchRequest(
+            custom_id=key,
+            model_name=request["model_name"],
+            prompt=request["prompt"],
+            json_mode=json_mode,
+            params=dict(request.get("model_params") or {}),
+        )
+
+    def _store(self, requests: Dict[str, Dict[str, Any]], results: List[BatchResult]) -> None:
+        """校验批处理结果并写入 LLM 响应缓存；失败与无效的调用留待实时评估"""
+        cache = get_response_cache()
+        returned = 0
+        for result in results:
+            request = requests.get(result.custom_id)
+            if request is None:
+                continue
+            returned += 1
+            if not result.succeeded:
+                self.logger.warning(f"批处理调用失败 {result.custom_id}: {result.error}")
+                self.stats.errored += 1
+                continue
+            usage_tracker.record(request["model_name"], result.as_message())
+            try:
+                response = parse_response_text(
+                    result.text,
+                    request["model_name"],
+                    request.get("pydantic_model"),
+                    request.get("domain_key"),
+                )
+            except Exception as e:
+                self.logger.warning(f"批处理结果未通过校验 {result.custom_id}: {e}")
+                self.stats.invalid += 1
+                continue
+            cache.set_response(result.custom_id, response)
+            self.stats.succeeded += 1
+        # 任务结束时仍未处理（如过期）的调用
+        self.stats.errored += len(requests) - returned
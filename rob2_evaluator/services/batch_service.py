@@ -0,0 +1,240 @@
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+from typing import List, Dict, Any, Optional, Tuple
+import asyncio
+import json
+import logging
+
+import pandas as pd
+
+from rob2_evaluator.utils.resilience import circuit_breakers
+
+
+class BatchService:
+    """批量评估服务：并发处理文献集合，跳过已缓存文档并生成汇总输出"""
+
+    SUPPORTED_SUFFIXES = {".pdf", ".json"}
+
+    def __init__(
+        self,
+        evaluator,
+        max_workers: int = 4,
+        skip_cached: bool = True,
+        pipeline=None,
+    ):
+        """
+        初始化批量评估服务
+
+        Args:
+            evaluator: 提供 process_file（异步模式为 aprocess_file）与 cache 的评估器（通常为 ROB2Evaluator）
+            max_workers: 文档级并发数
+            skip_cached: 是否在提交前直接读取缓存命中的文档
+            pipeline: 可选的 PipelineService，提供时按阶段流水线执行未命中缓存的文档
+        """
+        if max_workers < 1:
+            raise ValueError(f"max_workers 必须大于 0: {max_workers}")
+        self.evaluator = evaluator
+        self.max_workers = max_workers
+        self.skip_cached = skip_cached
+        self.pipeline = pipeline
+        self.logger = logging.getLogger(self.__class__.__name__)
+
+    @classmethod
+    def collect_inputs(cls, source: Path) -> List[Path]:
+        """
+        收集待处理文件
+
+        Args:
+            source: 单个文件、目录（递归查找 PDF/JSON）或清单文件（每行一个路径，# 开头为注释）
+
+        Returns:
+            去重后的文件路径列表（目录输入按路径排序，清单输入保持原顺序）
+        """
+        source = Path(source)
+        if source.is_dir():
+            paths = sorted(
+                p
+                for p in source.rglob("*")
+                if p.is_file() and p.suffix.lower() in cls.SUPPORTED_SUFFIXES
+            )
+        elif source.suffix.lower() in cls.SUPPORTED_SUFFIXES:
+            paths = [source]
+        else:
+            paths = []
+            for line in source.read_text(encoding="utf-8").splitlines():
+                line = line.strip()
+                if not line or line.startswith("#"):
+                    continue
+                path = Path(line)
+                # 清单中的相对路径以清单所在目录为基准
+                if not path.is_absolute():
+                    path = source.parent / path
+                paths.append(path)
+
+        return list(dict.fromkeys(paths))
+
+    def run(self, inputs: List[Path]) -> List[Dict[str, Any]]:
+        """
+        并发评估所有输入文件
+
+        Args:
+            inputs: 文件路径列表
+
+        Returns:
+            与输入顺序一致的记录列表，每条包含 study、source、status、results/error
+        """
+        # 先在主线程中筛出缓存命中的文档，避免占用并发槽位
+        records, pending = self._split_cached(inputs)
+
+        if self.pipeline is not None:
+            outcomes = self.pipeline.run([path for _, path in pending])
+            for idx, path in pending:
+                outcome = outcomes[path]
+                if outcome["status"] == "ok":
+                    records[idx] = self._make_record(
+                        path, "ok", results=outcome["result"]
+                    )
+                else:
+                    records[idx] = self._make_record(
+                        path, "error", error=f"{outcome['stage']}: {outcome['error']}"
+                    )
+            return [records[idx] for idx in range(len(inputs))]
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = {
+                executor.submit(self._process_file, path): (idx, path)
+                for idx, path in pending
+            }
+            for done, future in enumerate(as_completed(futures), start=1):
+                idx, path = futures[future]
+                try:
+                    records[idx] = self._make_record(
+                        path, "ok", results=future.result()
+                    )
+                except Exception as e:
+                    self.logger.error(f"评估失败 {path}: {e}")
+                    records[idx] = self._make_record(path, "error", error=str(e))
+                self.logger.info(f"[{done}/{len(pending)}] 已完成: {path}")
+
+        return [records[idx] for idx in range(len(inputs))]
+
+    async def arun(self, inputs: List[Path]) -> List[Dict[str, Any]]:
+        """
+        run 的异步版本：同时评估至多 max_workers 篇文档，
+        调用评估器的 aprocess_file，所有 LLM 请求共享一个事件循环
+        """
+        records, pending = self._split_cached(inputs)
+
+        limit = asyncio.Semaphore(self.max_workers)
+        done = 0
+
+        async def process(idx: int, path: Path) -> None:
+            nonlocal done
+            async with limit:
+                try:
+                    records[idx] = self._make_record(
+                        path, "ok", results=await self._aprocess_file(path)
+                    )
+                except Exception as e:
+                    self.logger.error(f"评估失败 {path}: {e}")
+                    records[idx] = self._make_record(path, "error", error=str(e))
+            done += 1
+            self.logger.info(f"[{done}/{len(pending)}] 已完成: {path}")
+
+        await asyncio.gather(*(process(idx, path) for idx, path in pending))
+        return [records[idx] for idx in range(len(inputs))]
+
+    def _split_cached(
+        self, inputs: List[Path]
+    ) -> Tuple[Dict[int, Dict[str, Any]], List[Tuple[int, Path]]]:
+        """返回缓存命中文档的记录（按输入下标）与待评估的 (下标, 路径) 列表"""
+        records: Dict[int, Dict[str, Any]] = {}
+        pending = []
+        for idx, path in enumerate(inputs):
+            cached = self._load_cached(path) if self.skip_cached else None
+            if cached is not None:
+                records[idx] = self._make_record(path, "cached", results=cached)
+            else:
+                pending.append((idx, path))
+
+        self.logger.info(
+            f"共 {len(inputs)} 篇文档，缓存命中 {len(records)}，待评估 {len(pending)}"
+        )
+        return records, pending
+
+    async def _aprocess_file(self, path: Path) -> List[Dict[str, Any]]:
+        waited = await circuit_breakers.await_until_closed()
+        if waited:
+            self.logger.warning(f"LLM 提供商熔断，暂停 {waited:.0f} 秒后继续: {path}")
+        return await self.evaluator.aprocess_file(path)
+
+    def _process_file(self, path: Path) -> List[Dict[str, Any]]:
+        """提供商熔断期间暂停开始新文档，恢复探测后再评估"""
+        waited = circuit_breakers.wait_until_closed()
+        if waited:
+            self.logger.warning(f"LLM 提供商熔断，暂停 {waited:.0f} 秒后继续: {path}")
+        return self.evaluator.process_file(path)
+
+    def write_output(self, records: List[Dict[str, Any]], output_path: str) -> None:
+        """
+        写出汇总结果
+
+        Args:
+            records: run 返回的记录列表
+            output_path: 输出路径，.csv 输出每篇一行的风险汇总，其余输出完整 JSON
+        """
+        output = Path(output_path)
+        if output.suffix.lower() == ".csv":
+            df = pd.DataFrame([self._summary_row(record) for record in records])
+            df.to_csv(output, index=False, encoding="utf-8")
+        else:
+            with open(output, "w", encoding="utf-8") as f:
+                json.dump(records, f, ensure_ascii=False, indent=2)
+
+        print(f"批量结果已生成: {output}")
+
+    def _load_cached(self, path: Path) -> Optional[List[Dict[str, Any]]]:
+        """读取文档的缓存结果，文件不可读时视为未命中"""
+        cache = getattr(self.evaluator, "cache", None)
+        if cache is None:
+            return None
+        try:
+            return cache.get_cached_result(path)
+        except OSError:
+            return None
+
+    @staticmethod
+    def _make_record(
+        path: Path,
+        status: str,
+        results: Optional[List[Dict[str, Any]]] = None,
+        error: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        record = {"study": Path(path).stem, "source": str(path), "status": status}
+        if results is not None:
+            record["results"] = results
+            fallback_domains = [
+                entry.get("domain") for entry in results if entry.get("fallback")
+            ]
+            if fallback_domains:
+                # LLM 调用失败、使用默认判断的领域
+                record["fallback_domains"] = fallback_domains
+        if error is not None:
+            record["error"] = error
+        return record
+
+    @staticmethod
+    def _summary_row(record: Dict[str, Any]) -> Dict[str, Any]:
+        """将单篇记录展开为 CSV 行：各领域风险与总体风险"""
+        row = {"Study": record["study"], "Status": record["status"]}
+        for entry in record.get("results", []):
+            domain = entry.get("domain", "")
+            if domain == "Overall risk of bias":
+                row["Overall"] = entry.get("judgement", {}).get("overall")
+            else:
+                row[domain] = entry.get("overall", {}).get("risk")
+        if record.get("fallback_domains"):
+            row["Fallback"] = "; ".join(record["fallback_domains"])
+        if "error" in record:
+            row["Error"] = record["error"]
+        return row
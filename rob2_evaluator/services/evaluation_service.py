@@ -1,9 +1,17 @@
-from typing import List, Dict, Any, Optional
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Any, Optional, Tuple
 from rob2_evaluator.agents.aggregator import Aggregator
+from rob2_evaluator.agents.all_domains_agent import AllDomainsAgent
 from rob2_evaluator.agents.analysis_type_agent import AnalysisTypeAgent
+from rob2_evaluator.agents.domain_agent import assign_passage_ids
 from rob2_evaluator.factories import DomainAgentFactory
+from rob2_evaluator.retrieval.evidence_aligner import EvidenceAligner
+from rob2_evaluator.retrieval.passage_index import select_for_domain
+import asyncio
 import logging
 
+EVALUATION_MODES = ("per_domain", "all_domains")
+
 
 class EvaluationService:
     """评估服务，负责协调分析类型判断和专家代理评估过程"""
@@ -12,26 +20,357 @@ class EvaluationService:
         self,
         analysis_type_agent: Optional[AnalysisTypeAgent] = None,
         aggregator: Optional[Aggregator] = None,
+        max_parallel_domains: int = 5,
+        overlap_analysis_type: bool = True,
+        passage_retriever=None,
+        evaluation_mode: str = "per_domain",
+        all_domains_agent: Optional[AllDomainsAgent] = None,
+        judgement_mode: str = "llm",
+        stream_domains: bool = False,
+        evidence_mode: str = "quote",
+        align_evidence: bool = True,
+        max_context_tokens: Optional[int] = None,
+        voters: Optional[List[Tuple[Optional[str], Optional[str]]]] = None,
     ):
-        self.analysis_type_agent = analysis_type_agent or AnalysisTypeAgent()
+        """
+        Args:
+            analysis_type_agent: Domain 2 分析类型判断代理
+            aggregator: 总体风险汇总专家
+            max_parallel_domains: 单篇文档内并发执行的 LLM 调用数上限，1 表示串行
+            overlap_analysis_type: 是否在推断分析类型的同时启动与之无关的四个领域，
+                仅 Domain 2 等待分析类型结果
+            passage_retriever: 可选的 PassageRetriever，每篇文档构建一次段落索引，
+                各领域只接收检索到的段落；分析类型推断仍使用全部内容
+            evaluation_mode: "per_domain" 每个领域一次调用；"all_domains" 先推断分析类型，
+                再用一次调用评估全部领域，未通过校验的领域回退到逐领域评估
+            all_domains_agent: all_domains 模式使用的合并评估代理
+            judgement_mode: 领域代理的判定模式，"rules" 时模型只回答信号问题，
+                领域风险由 RoB 2 判定算法本地计算
+            stream_domains: 领域代理流式接收输出并增量校验，无效输出提前中止
+            evidence_mode: "passage" 时为文档段落分配编号，领域代理按编号引用证据
+            align_evidence: 将各领域返回的证据引用与原文对齐，修正页码并标记无法定位的引用
+            max_context_tokens: 单次调用中文档上下文的 token 上限（默认由模型上下文长度决定），
+                超出时领域代理分段评估后合并，分析类型分段判断后投票
+            voters: (模型名, 提供商) 列表，给出时每个领域由这些样本并发评估后多数投票，
+                多数确定即提前结束；(None, None) 表示默认模型的一次采样
+        """
+        if max_parallel_domains < 1:
+            raise ValueError(f"max_parallel_domains 必须大于 0: {max_parallel_domains}")
+        self.analysis_type_agent = analysis_type_agent or AnalysisTypeAgent(
+            max_context_tokens=max_context_tokens
+        )
         self.aggregator = aggregator or Aggregator()
-        self.domain_agents = None
+        self.max_parallel_domains = max_parallel_domains
+        self.overlap_analysis_type = overlap_analysis_type
+        self.passage_retriever = passage_retriever
+        if evaluation_mode not in EVALUATION_MODES:
+            raise ValueError(f"不支持的评估模式: {evaluation_mode}")
+        self.evaluation_mode = evaluation_mode
+        self.all_domains_agent = all_domains_agent
+        self.judgement_mode = judgement_mode
+        self.stream_domains = stream_domains
+        self.evidence_mode = evidence_mode
+        self.align_evidence = align_evidence
+        self.max_context_tokens = max_context_tokens
+        self.voters = voters
+        if evaluation_mode == "all_domains" and all_domains_agent is None:
+            self.all_domains_agent = AllDomainsAgent()
 
     def evaluate(self, content_items: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
         """执行评估流程"""
-        # 首先推断分析类型
-        analysis_type = self.analysis_type_agent.infer_analysis_type(content_items)
-        logging.info(f"推断的 Domain 2 分析类型: {analysis_type}")
+        content_items, index = self._prepare(content_items)
+
+        if self.evaluation_mode == "all_domains":
+            domain_results = self._evaluate_combined(content_items, index)
+        elif self.overlap_analysis_type and self.max_parallel_domains > 1:
+            domain_results = self._evaluate_overlapped(content_items, index)
+        else:
+            # 首先推断分析类型
+            analysis_type = self.analysis_type_agent.infer_analysis_type(content_items)
+            logging.info(f"推断的 Domain 2 分析类型: {analysis_type}")
+
+            # 根据分析类型创建领域代理（每篇文档独立创建，批量处理时分析类型可能不同）
+            domain_agents = DomainAgentFactory.create_agents(
+                analysis_type, **self._agent_options()
+            )
+
+            # 执行领域评估
+            domain_results = self._evaluate_domains(
+                domain_agents, content_items, index
+            )
+
+        return self._finalize(content_items, domain_results)
+
+    async def aevaluate(self, content_items: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        evaluate 的异步版本：各代理的 LLM 调用经 acall_llm 发出，不占用线程。
+        单篇文档内同时进行的领域评估至多 max_parallel_domains 个，
+        全局在途请求数由按提供商共享的信号量限制。
+        """
+        content_items, index = self._prepare(content_items)
+        limit = asyncio.Semaphore(self.max_parallel_domains)
+
+        if self.evaluation_mode == "all_domains":
+            domain_results = await self._aevaluate_combined(content_items, index, limit)
+        elif self.overlap_analysis_type and self.max_parallel_domains > 1:
+            domain_results = await self._aevaluate_overlapped(content_items, index, limit)
+        else:
+            analysis_type = await self.analysis_type_agent.ainfer_analysis_type(
+                content_items
+            )
+            logging.info(f"推断的 Domain 2 分析类型: {analysis_type}")
+            domain_agents = DomainAgentFactory.create_agents(
+                analysis_type, **self._agent_options()
+            )
+            domain_results = await self._aevaluate_domains(
+                domain_agents, content_items, index, limit
+            )
+
+        return self._finalize(content_items, domain_results)
 
-        # 根据分析类型创建领域代理
-        if not self.domain_agents:
-            self.domain_agents = DomainAgentFactory.create_agents(analysis_type)
+    def _prepare(
+        self, content_items: List[Dict[str, Any]]
+    ) -> Tuple[List[Dict[str, Any]], Any]:
+        """评估前的文档级准备：段落编号与检索索引"""
+        if self.evidence_mode == "passage":
+            # 检索之前统一编号，各领域看到的同一段落编号一致
+            content_items = assign_passage_ids(content_items)
 
-        # 执行领域评估
-        domain_results = [agent.evaluate(content_items) for agent in self.domain_agents]
+        index = None
+        if self.passage_retriever is not None:
+            index = self.passage_retriever.build(content_items)
+        return content_items, index
+
+    def _finalize(
+        self, content_items: List[Dict[str, Any]], domain_results: List[Dict[str, Any]]
+    ) -> List[Dict[str, Any]]:
+        """证据对齐并追加总体风险"""
+        if self.align_evidence:
+            aligner = EvidenceAligner(content_items)
+            for result in domain_results:
+                aligner.align_result(result)
 
         # 汇总评估结果
         overall_result = self.aggregator.evaluate(domain_results)
         domain_results.append(overall_result)
 
         return domain_results
+
+    def _agent_options(self) -> Dict[str, Any]:
+        """创建领域代理时传入的选项"""
+        return {
+            "judgement_mode": self.judgement_mode,
+            "stream": self.stream_domains,
+            "evidence_mode": self.evidence_mode,
+            "max_context_tokens": self.max_context_tokens,
+            "voters": self.voters,
+        }
+
+    @staticmethod
+    def _select_items(
+        agent: Any, content_items: List[Dict[str, Any]], index=None
+    ) -> List[Dict[str, Any]]:
+        """领域检索结果（未启用检索时为全部内容）"""
+        items = select_for_domain(index, getattr(agent, "domain_key", None), content_items)
+        if index is not None:
+            logging.info(
+                f"领域 {agent.domain_key} 使用 {len(items)}/{len(content_items)} 项内容"
+            )
+        return items
+
+    @classmethod
+    def _run_agent(
+        cls, agent: Any, content_items: List[Dict[str, Any]], index=None
+    ) -> Dict[str, Any]:
+        """以领域检索结果（未启用检索时为全部内容）执行单个领域代理"""
+        return agent.evaluate(cls._select_items(agent, content_items, index))
+
+    @classmethod
+    async def _arun_agent(
+        cls,
+        agent: Any,
+        content_items: List[Dict[str, Any]],
+        index=None,
+        limit: Optional[asyncio.Semaphore] = None,
+    ) -> Dict[str, Any]:
+        items = cls._select_items(agent, content_items, index)
+        if limit is None:
+            return await agent.aevaluate(items)
+        async with limit:
+            return await agent.aevaluate(items)
+
+    def _evaluate_domains(
+        self,
+        domain_agents: List[Any],
+        content_items: List[Dict[str, Any]],
+        index=None,
+    ) -> List[Dict[str, Any]]:
+        """并发执行各领域评估，结果顺序与 DomainAgentFactory 定义的顺序一致"""
+        workers = min(self.max_parallel_domains, len(domain_agents))
+        if workers <= 1:
+            return [
+                self._run_agent(agent, content_items, index) for agent in domain_agents
+            ]
+
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            # executor.map 按提交顺序返回结果，任一领域异常会在此处重新抛出
+            return list(
+                executor.map(
+                    lambda agent: self._run_agent(agent, content_items, index),
+                    domain_agents,
+                )
+            )
+
+    def _evaluate_overlapped(
+        self, content_items: List[Dict[str, Any]], index=None
+    ) -> List[Dict[str, Any]]:
+        """
+        分析类型推断与 Domain 1、3、4、5 同时执行，Domain 2 在分析类型确定后再启动，
+        从关键路径上去掉一次完整的 LLM 往返。
+        """
+        with ThreadPoolExecutor(max_workers=self.max_parallel_domains) as executor:
+            # 先提交分析类型推断，保证其最先获得执行槽位
+            analysis_future = executor.submit(
+                self.analysis_type_agent.infer_analysis_type, content_items
+            )
+            futures = [
+                executor.submit(self._run_agent, agent, content_items, index)
+                for agent in DomainAgentFactory.create_base_agents(
+                    **self._agent_options()
+                )
+            ]
+
+            analysis_type = analysis_future.result()
+            logging.info(f"推断的 Domain 2 分析类型: {analysis_type}")
+
+            deviation_agent = DomainAgentFactory.create_deviation_agent(
+                analysis_type, **self._agent_options()
+            )
+            futures.insert(
+                DomainAgentFactory.DEVIATION_POSITION,
+                executor.submit(
+                    self._run_agent, deviation_agent, content_items, index
+                ),
+            )
+
+            return [future.result() for future in futures]
+
+    @staticmethod
+    def _combined_items(
+        content_items: List[Dict[str, Any]], domain_agents: List[Any], index=None
+    ) -> List[Dict[str, Any]]:
+        """合并评估发送的内容：启用段落检索时为各领域检索结果的并集"""
+        if index is None:
+            return content_items
+        selected = set()
+        for agent in domain_agents:
+            selected.update(index.select_indices(agent.domain_key))
+        return [content_items[i] for i in sorted(selected)]
+
+    def _evaluate_combined(
+        self, content_items: List[Dict[str, Any]], index=None
+    ) -> List[Dict[str, Any]]:
+        """
+        单次调用评估全部领域。启用段落检索时发送各领域检索结果的并集；
+        合并结果中未通过校验的领域按逐领域方式重新评估。
+        """
+        analysis_type = self.analysis_type_agent.infer_analysis_type(content_items)
+        logging.info(f"推断的 Domain 2 分析类型: {analysis_type}")
+        domain_agents = DomainAgentFactory.create_agents(
+            analysis_type, **self._agent_options()
+        )
+
+        items = self._combined_items(content_items, domain_agents, index)
+        if not all(agent.fits_context(items) for agent in domain_agents):
+            # 单次调用放不下全文时，逐领域评估（各领域自行分段合并）
+            logging.info("文档超出上下文预算，改为逐领域评估")
+            return self._evaluate_domains(domain_agents, content_items, index)
+
+        results = self.all_domains_agent.evaluate(items, domain_agents)
+        failed = [i for i, result in enumerate(results) if result is None]
+        if failed:
+            retried = self._evaluate_domains(
+                [domain_agents[i] for i in failed], content_items, index
+            )
+            for i, result in zip(failed, retried):
+                results[i] = result
+        return results
+
+    async def _aevaluate_domains(
+        self,
+        domain_agents: List[Any],
+        content_items: List[Dict[str, Any]],
+        index=None,
+        limit: Optional[asyncio.Semaphore] = None,
+    ) -> List[Dict[str, Any]]:
+        """异步执行各领域评估，结果顺序与 domain_agents 一致，任一领域异常会重新抛出"""
+        return list(
+            await asyncio.gather(
+                *(
+                    self._arun_agent(agent, content_items, index, limit)
+                    for agent in domain_agents
+                )
+            )
+        )
+
+    async def _aevaluate_overlapped(
+        self,
+        content_items: List[Dict[str, Any]],
+        index,
+        limit: asyncio.Semaphore,
+    ) -> List[Dict[str, Any]]:
+        """_evaluate_overlapped 的异步版本：分析类型推断最先获得执行槽位"""
+
+        async def deviation() -> Dict[str, Any]:
+            async with limit:
+                analysis_type = await self.analysis_type_agent.ainfer_analysis_type(
+                    content_items
+                )
+            logging.info(f"推断的 Domain 2 分析类型: {analysis_type}")
+            agent = DomainAgentFactory.create_deviation_agent(
+                analysis_type, **self._agent_options()
+            )
+            return await self._arun_agent(agent, content_items, index, limit)
+
+        results = await asyncio.gather(
+            deviation(),
+            *(
+                self._arun_agent(agent, content_items, index, limit)
+                for agent in DomainAgentFactory.create_base_agents(
+                    **self._agent_options()
+                )
+            ),
+        )
+        domain_results = list(results[1:])
+        domain_results.insert(DomainAgentFactory.DEVIATION_POSITION, results[0])
+        return domain_results
+
+    async def _aevaluate_combined(
+        self,
+        content_items: List[Dict[str, Any]],
+        index=None,
+        limit: Optional[asyncio.Semaphore] = None,
+    ) -> List[Dict[str, Any]]:
+        """_evaluate_combined 的异步版本"""
+        analysis_type = await self.analysis_type_agent.ainfer_analysis_type(content_items)
+        logging.info(f"推断的 Domain 2 分析类型: {analysis_type}")
+        domain_agents = DomainAgentFactory.create_agents(
+            analysis_type, **self._agent_options()
+        )
+
+        items = self._combined_items(content_items, domain_agents, index)
+        if not all(agent.fits_context(items) for agent in domain_agents):
+            logging.info("文档超出上下文预算，改为逐领域评估")
+            return await self._aevaluate_domains(
+                domain_agents, content_items, index, limit
+            )
+
+        results = await self.all_domains_agent.aevaluate(items, domain_agents)
+        failed = [i for i, result in enumerate(results) if result is None]
+        if failed:
+            retried = await self._aevaluate_domains(
+                [domain_agents[i] for i in failed], content_items, index, limit
+            )
+            for i, result in zip(failed, retried):
+                results[i] = result
+        return results
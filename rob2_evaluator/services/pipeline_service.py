@@ -0,0 +1,193 @@
+from pathlib import Path
+from queue import Queue
+from typing import Any, Callable, Dict, Hashable, List, Optional, Tuple
+import logging
+import threading
+
+from rob2_evaluator.utils.cache import contains_fallback
+from rob2_evaluator.utils.resilience import circuit_breakers
+
+# 阶段结束标记：上游全部工作线程退出后向下游每个工作线程各投递一个
+_STOP = object()
+
+
+class StagePipeline:
+    """
+    多阶段流水线：每个阶段是独立的工作线程池，阶段之间用有界队列连接。
+
+    队列满时上游阻塞（背压），因此任意时刻在途文档数不超过
+    各阶段队列容量与工作线程数之和，内存占用保持平稳。
+    某一阶段抛出异常的任务不再进入后续阶段，并以 error 状态返回。
+    """
+
+    def __init__(
+        self,
+        stages: List[Tuple[str, Callable[[Any], Any], int]],
+        queue_size: int = 4,
+    ):
+        """
+        Args:
+            stages: (阶段名称, 处理函数, 工作线程数) 列表，按执行顺序排列
+            queue_size: 每个阶段输入队列的容量
+        """
+        if not stages:
+            raise ValueError("流水线至少需要一个阶段")
+        for name, _, workers in stages:
+            if workers < 1:
+                raise ValueError(f"阶段 {name} 的工作线程数必须大于 0: {workers}")
+        if queue_size < 1:
+            raise ValueError(f"queue_size 必须大于 0: {queue_size}")
+        self.stages = stages
+        self.queue_size = queue_size
+        self.logger = logging.getLogger(self.__class__.__name__)
+
+    def run(
+        self,
+        jobs: List[Tuple[Hashable, Any]],
+        on_complete: Optional[Callable[[Hashable, Dict[str, Any]], None]] = None,
+    ) -> Dict[Hashable, Dict[str, Any]]:
+        """
+        执行流水线
+
+        Args:
+            jobs: (任务键, 第一阶段输入) 列表
+            on_complete: 每个任务结束（成功或失败）时在工作线程中回调
+
+        Returns:
+            任务键到 {"status": "ok", "result": ...} 或
+            {"status": "error", "stage": ..., "error": ...} 的映射
+        """
+        queues = [Queue(maxsize=self.queue_size) for _ in self.stages]
+        outcomes: Dict[Hashable, Dict[str, Any]] = {}
+        lock = threading.Lock()
+        remaining = [workers for _, _, workers in self.stages]
+
+        def finish(key: Hashable, outcome: Dict[str, Any]) -> None:
+            with lock:
+                outcomes[key] = outcome
+            if on_complete is not None:
+                try:
+                    on_complete(key, outcome)
+                except Exception as e:
+                    self.logger.error(f"完成回调出错 {key}: {e}")
+
+        def worker(stage_idx: int) -> None:
+            name, func, _ = self.stages[stage_idx]
+            inbox = queues[stage_idx]
+            is_last = stage_idx == len(self.stages) - 1
+            while True:
+                item = inbox.get()
+                if item is _STOP:
+                    break
+                key, payload = item
+                try:
+                    result = func(payload)
+                except Exception as e:
+                    self.logger.error(f"阶段 {name} 处理失败 {key}: {e}")
+                    finish(key, {"status": "error", "stage": name, "error": str(e)})
+                    continue
+                if is_last:
+                    finish(key, {"status": "ok", "result": result})
+                else:
+                    # 下游队列满时在此阻塞，形成背压
+                    queues[stage_idx + 1].put((key, result))
+
+            # 本阶段最后一个退出的线程负责通知下游结束
+            with lock:
+                remaining[stage_idx] -= 1
+                last_worker = remaining[stage_idx] == 0
+            if last_worker and not is_last:
+                for _ in range(self.stages[stage_idx + 1][2]):
+                    queues[stage_idx + 1].put(_STOP)
+
+        threads = [
+            threading.Thread(
+                target=worker, args=(stage_idx,), name=f"pipeline-{name}-{n}"
+            )
+            for stage_idx, (name, _, workers) in enumerate(self.stages)
+            for n in range(workers)
+        ]
+        for thread in threads:
+            thread.daemon = True
+            thread.start()
+
+        # 主线程作为输入源，第一阶段队列满时同样阻塞
+        for job in jobs:
+            queues[0].put(job)
+        for _ in range(self.stages[0][2]):
+            queues[0].put(_STOP)
+
+        for thread in threads:
+            thread.join()
+        return outcomes
+
+
+def _when_providers_available(func: Callable[[Any], Any]) -> Callable[[Any], Any]:
+    """LLM 阶段在任一提供商熔断期间暂停领取新文档，避免整批结果变成默认判断"""
+
+    def run(payload: Any) -> Any:
+        circuit_breakers.wait_until_closed()
+        return func(payload)
+
+    return run
+
+
+class PipelineService:
+    """文档评估流水线：解析（CPU）→ 相关内容筛选（LLM）→ 领域评估（LLM）"""
+
+    def __init__(
+        self,
+        evaluator,
+        parse_workers: int = 1,
+        filter_workers: int = 4,
+        evaluate_workers: int = 4,
+        queue_size: int = 4,
+    ):
+        """
+        Args:
+            evaluator: ROB2Evaluator，提供各阶段处理器与结果缓存
+            parse_workers: 文档解析线程数（docling 为 CPU 密集型，通常取 1～CPU 核数）
+            filter_workers: EntryAgent 相关内容筛选线程数
+            evaluate_workers: 领域评估线程数
+            queue_size: 阶段间队列容量，控制在途文档数
+        """
+        self.evaluator = evaluator
+        self.pipeline = StagePipeline(
+            [
+                ("parse", self._parse, parse_workers),
+                (
+                    "filter",
+                    _when_providers_available(evaluator.content_processor.process_content),
+                    filter_workers,
+                ),
+                (
+                    "evaluate",
+                    _when_providers_available(evaluator.evaluation_service.evaluate),
+                    evaluate_workers,
+                ),
+            ],
+            queue_size=queue_size,
+        )
+
+    def _parse(self, input_path: Path) -> List[Dict[str, Any]]:
+        processor = self.evaluator.select_document_processor(input_path)
+        return processor.process_document(input_path)
+
+    def run(self, inputs: List[Path]) -> Dict[Path, Dict[str, Any]]:
+        """
+        流水线评估所有输入，成功的结果写入评估器缓存
+
+        Returns:
+            文件路径到流水线结果（见 StagePipeline.run）的映射
+        """
+        cache = getattr(self.evaluator, "cache", None)
+
+        def save(path: Path, outcome: Dict[str, Any]) -> None:
+            if (
+                outcome["status"] == "ok"
+                and cache is not None
+                and not contains_fallback(outcome["result"])
+            ):
+                cache.save_result(path, outcome["result"])
+
+        return self.pipeline.run([(path, path) for path in inputs], on_complete=save)
@@ -2,6 +2,11 @@
 
 import json
 import hashlib
+import inspect
+import re
+import sqlite3
+import threading
+import time
 from pathlib import Path
 from typing import Any, Dict, Optional
 from functools import wraps
@@ -52,25 +57,270 @@ class FileCache:
             print(f"保存缓存出错: {e}")
 
 
+def contains_fallback(result: Any) -> bool:
+    """评估结果中是否有领域因 LLM 调用失败而使用了默认判断（此类结果不应缓存）"""
+    return isinstance(result, list) and any(
+        isinstance(entry, dict) and entry.get("fallback") for entry in result
+    )
+
+
 def cache_result(cache_instance: Optional[FileCache] = None):
-    """处理结果缓存装饰器"""
+    """处理结果缓存装饰器（同时支持同步方法与协程方法）"""
     if cache_instance is None:
         cache_instance = FileCache()
 
     def decorator(func):
+        if inspect.iscoroutinefunction(func):
+
+            @wraps(func)
+            async def async_wrapper(self, input_path: Path, *args, **kwargs):
+                cache = getattr(self, "cache", None) or cache_instance
+                cached_result = cache.get_cached_result(input_path)
+                if cached_result is not None:
+                    print(f"使用缓存结果: {input_path}")
+                    return cached_result
+
+                result = await func(self, input_path, *args, **kwargs)
+                if not contains_fallback(result):
+                    cache.save_result(input_path, result)
+                return result
+
+            return async_wrapper
+
         @wraps(func)
         def wrapper(self, input_path: Path, *args, **kwargs):
+            # 优先使用实例自身的缓存（如 ROB2Evaluator.cache），保证与 cache_dir 一致
+            cache = getattr(self, "cache", None) or cache_instance
+
             # 尝试从缓存获取结果
-            cached_result = cache_instance.get_cached_result(input_path)
+            cached_result = cache.get_cached_result(input_path)
             if cached_result is not None:
                 print(f"使用缓存结果: {input_path}")
                 return cached_result
 
-            # 如果没有缓存，执行原函数并保存结果
+            # 如果没有缓存，执行原函数并保存结果（含默认判断的结果不缓存，下次重新评估）
             result = func(self, input_path, *args, **kwargs)
-            cache_instance.save_result(input_path, result)
+            if not contains_fallback(result):
+                cache.save_result(input_path, result)
             return result
 
         return wrapper
 
     return decorator
+
+
+class SQLiteLRUCache:
+    """
+    基于 SQLite（WAL 模式）的持久化键值缓存，按最近访问时间做 LRU 淘汰。
+
+    值以 JSON 存储；同一实例可在多线程间共享。
+    给出 max_age_seconds 时，写入时间早于该期限的条目视为过期并被清除。
+    """
+
+    def __init__(
+        self,
+        db_path: str,
+        max_entries: int = 100_000,
+        max_age_seconds: Optional[float] = None,
+    ):
+        if max_entries < 1:
+            raise ValueError(f"max_entries 必须大于 0: {max_entries}")
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.max_entries = max_entries
+        self.max_age_seconds = max_age_seconds
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.db_path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS entries ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, "
+            "created REAL NOT NULL, accessed REAL NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_entries_accessed ON entries(accessed)"
+        )
+        self._conn.commit()
+
+    def get(self, key: str) -> Optional[Any]:
+        """读取缓存值，命中时刷新访问时间；过期条目视为未命中并删除"""
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, created FROM entries WHERE key = ?", (key,)
+            ).fetchone()
+            if row is not None and self._expired(row[1], now):
+                self._conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+                self._conn.commit()
+                row = None
+            if row is None:
+                self.misses += 1
+                return None
+            self._conn.execute(
+                "UPDATE entries SET accessed = ? WHERE key = ?", (now, key)
+            )
+            self._conn.commit()
+            self.hits += 1
+        return json.loads(row[0])
+
+    def contains(self, key: str) -> bool:
+        """是否存在未过期的条目；不刷新访问时间，也不计入命中统计"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT created FROM entries WHERE key = ?", (key,)
+            ).fetchone()
+        return row is not None and not self._expired(row[0], time.time())
+
+    def set(self, key: str, value: Any) -> None:
+        """写入缓存值，超出容量时淘汰最久未访问的条目"""
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO entries (key, value, created, accessed) "
+                "VALUES (?, ?, ?, ?)",
+                (key, json.dumps(value, ensure_ascii=False), now, now),
+            )
+            self._evict(now)
+            self._conn.commit()
+
+    def _expired(self, created: float, now: float) -> bool:
+        return self.max_age_seconds is not None and now - created > self.max_age_seconds
+
+    def _evict(self, now: float) -> None:
+        if self.max_age_seconds is not None:
+            self._conn.execute(
+                "DELETE FROM entries WHERE created < ?", (now - self.max_age_seconds,)
+            )
+        (count,) = self._conn.execute("SELECT COUNT(*) FROM entries").fetchone()
+        overflow = count - self.max_entries
+        if overflow > 0:
+            self._conn.execute(
+                "DELETE FROM entries WHERE key IN ("
+                "SELECT key FROM entries ORDER BY accessed ASC LIMIT ?)",
+                (overflow,),
+            )
+
+    def __len__(self) -> int:
+        with self._lock:
+            (count,) = self._conn.execute("SELECT COUNT(*) FROM entries").fetchone()
+        return count
+
+    def stats(self) -> Dict[str, Any]:
+        """条目数与本进程内的命中统计"""
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+class RelevanceCache(SQLiteLRUCache):
+    """
+    入口专家相关性判断结果缓存，跨文档共享。
+
+    键由规范化文本的哈希、模型与提示词版本组成，
+    因此只修改领域提示词时重跑整个语料不会再产生入口阶段的 LLM 调用。
+    """
+
+    @staticmethod
+    def normalize_text(text: str) -> str:
+        """合并空白并统一大小写，使排版差异不影响命中"""
+        return re.sub(r"\s+", " ", text or "").strip().casefold()
+
+    def make_key(self, text: str, model: str, prompt_version: str) -> str:
+        text_hash = hashlib.sha256(self.normalize_text(text).encode("utf-8")).hexdigest()
+        return f"{prompt_version}:{model}:{text_hash}"
+
+    def get_verdict(self, text: str, model: str, prompt_version: str) -> Optional[bool]:
+        return self.get(self.make_key(text, model, prompt_version))
+
+    def set_verdict(
+        self, text: str, model: str, prompt_version: str, verdict: bool
+    ) -> None:
+        self.set(self.make_key(text, model, prompt_version), bool(verdict))
+
+
+class LLMResponseCache(SQLiteLRUCache):
+    """
+    LLM 调用结果缓存，由 call_llm 在调用模型前查询。
+
+    键为提供商、模型、渲染后的 prompt、输出 schema 与采样参数的哈希，
+    任何一项变化都不会命中旧结果；失败后返回的默认响应不写入缓存。
+    refresh 为 True 时不读取缓存、只写入新结果（强制重新调用并覆盖）。
+    """
+
+    def __init__(
+        self,
+        db_path: str,
+        max_entries: int = 50_000,
+        max_age_seconds: Optional[float] = 30 * 24 * 3600,
+        refresh: bool = False,
+    ):
+        super().__init__(db_path, max_entries, max_age_seconds)
+        self.refresh = refresh
+
+    @staticmethod
+    def _prompt_payload(prompt: Any) -> Any:
+        """字符串原样使用；消息列表取每条消息的类型与内容（含 cache_control 等内容块属性）"""
+        if isinstance(prompt, str):
+            return prompt
+        if isinstance(prompt, (list, tuple)):
+            return [
+                {"type": getattr(m, "type", None), "content": getattr(m, "content", m)}
+                for m in prompt
+            ]
+        return str(prompt)
+
+    def make_key(
+        self,
+        provider: Any,
+        model: str,
+        prompt: Any,
+        pydantic_model: Any = None,
+        params: Optional[Dict[str, Any]] = None,
+    ) -> str:
+        schema = (
+            pydantic_model.model_json_schema() if pydantic_model is not None else None
+        )
+        payload = json.dumps(
+            {
+                "provider": getattr(provider, "value", provider),
+                "model": model,
+                "prompt": self._prompt_payload(prompt),
+                "schema": schema,
+                "params": params or {},
+            },
+            sort_keys=True,
+            ensure_ascii=False,
+            default=str,
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get_response(self, key: str, pydantic_model: Any = None) -> Optional[Any]:
+        """读取缓存的响应，按 pydantic_model 还原；无法还原时视为未命中"""
+        if self.refresh:
+            self.misses += 1
+            return None
+        value = self.get(key)
+        if value is None:
+            return None
+        if pydantic_model is None:
+            return value
+        try:
+            return pydantic_model.model_validate(value)
+        except Exception:
+            return None
+
+    def set_response(self, key: str, response: Any) -> None:
+        if hasattr(response, "model_dump"):
+            response = response.model_dump()
+        self.set(key, response)
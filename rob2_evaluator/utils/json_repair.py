@@ -0,0 +1,206 @@
+"""
+LLM 输出中 JSON 的容错定位与修复
+
+在 pydantic 校验之前修正常见的格式问题（推理模型的 <think> 块、无语言标记的代码块、
+裸 JSON、尾随逗号、注释、字符串内的换行、未闭合的字符串与括号），
+用一次微秒级的字符串处理代替一次完整的重新生成。
+"""
+
+import json
+import re
+from typing import Any, List, Optional, Tuple
+
+# 推理模型（deepseek-reasoner、qwq 等）在回答之前输出的思考过程；未闭合时延伸到文本末尾
+_THINK_BLOCK = re.compile(r"<think>.*?(?:</think>|$)", re.DOTALL | re.IGNORECASE)
+
+# 代码块，语言标记可有可无；未闭合的代码块延伸到文本末尾
+_FENCE = re.compile(r"```[\w-]*[ \t]*\n?(.*?)(?:```|$)", re.DOTALL)
+
+# ```json 代码块，原有的严格提取方式
+_JSON_FENCE = re.compile(r"```json(.*?)```", re.DOTALL)
+
+_CLOSERS = {"{": "}", "[": "]"}
+
+# _loads 解析失败的标记（null 是合法的解析结果）
+_INVALID = object()
+
+
+def strip_reasoning(text: str) -> str:
+    """去掉 <think> 思考过程，返回去除首尾空白的回答"""
+    return _THINK_BLOCK.sub("", text or "").strip()
+
+
+def _object_end(text: str, start: int) -> Optional[int]:
+    """从 start 处的 { 开始按括号配对（跳过字符串内容），返回闭合位置之后的下标；未闭合时为 None"""
+    depth = 0
+    in_string = escape = False
+    for i in range(start, len(text)):
+        ch = text[i]
+        if in_string:
+            if escape:
+                escape = False
+            elif ch == "\\":
+                escape = True
+            elif ch == '"':
+                in_string = False
+        elif ch == '"':
+            in_string = True
+        elif ch in "{[":
+            depth += 1
+        elif ch in "}]":
+            depth -= 1
+            if depth == 0:
+                return i + 1
+    return None
+
+
+def locate_json(text: str) -> Optional[str]:
+    """
+    定位回答中的第一个 JSON 对象：优先取以 { 开头的代码块内容，
+    否则取正文中第一个 { 到与之配对的 }（未闭合时到文本末尾）；找不到时返回 None
+    """
+    text = strip_reasoning(text)
+    for match in _FENCE.finditer(text):
+        body = match.group(1).strip()
+        if body.startswith("{"):
+            return body
+    start = text.find("{")
+    if start == -1:
+        return None
+    end = _object_end(text, start)
+    return text[start:end] if end is not None else text[start:]
+
+
+def is_truncated(text: str) -> bool:
+    """回答中的 JSON 对象是否在闭合之前就结束了（修复时需要补全括号，可能丢失未完成的成员）"""
+    candidate = locate_json(text)
+    return candidate is not None and _object_end(candidate, 0) is None
+
+
+def _drop_trailing_comma(out: List[str]) -> None:
+    while out and out[-1].isspace():
+        out.pop()
+    if out and out[-1] == ",":
+        out.pop()
+
+
+def _close(out: List[str], stack: List[str]) -> str:
+    """去掉末尾的逗号，为悬空的键补 null，再按嵌套顺序补全闭合括号"""
+    out = list(out)
+    _drop_trailing_comma(out)
+    text = "".join(out)
+    if text.endswith(":"):
+        text += " null"
+    return text + "".join(reversed(stack))
+
+
+def repair_json(candidate: str) -> str:
+    """
+    修复常见的 JSON 格式问题：// 与 /* */ 注释、尾随逗号、字符串内的原始换行、
+    多余的闭合括号、顶层对象之后的多余内容，以及截断导致的未闭合字符串与括号。
+
+    补全后仍无效时（如截断在 true 或键名的中间），回退到最近一个逗号之前再补全。
+    返回修复后的文本，不保证一定是合法 JSON。
+    """
+    out: List[str] = []
+    stack: List[str] = []
+    # 每个逗号之前的位置，以及当时尚未闭合的括号
+    safe_points: List[Tuple[int, Tuple[str, ...]]] = []
+    in_string = escape = False
+    i, n = 0, len(candidate)
+    while i < n:
+        ch = candidate[i]
+        if in_string:
+            if escape:
+                escape = False
+            elif ch == "\\":
+                escape = True
+            elif ch == '"':
+                in_string = False
+            elif ch == "\n":
+                ch = "\\n"
+            out.append(ch)
+            i += 1
+            continue
+
+        if candidate.startswith("//", i):
+            end = candidate.find("\n", i)
+            i = n if end == -1 else end
+            continue
+        if candidate.startswith("/*", i):
+            end = candidate.find("*/", i + 2)
+            i = n if end == -1 else end + 2
+            continue
+
+        if ch == '"':
+            in_string = True
+        elif ch in _CLOSERS:
+            stack.append(_CLOSERS[ch])
+        elif ch in "}]":
+            _drop_trailing_comma(out)
+            safe_points = [(pos, s) for pos, s in safe_points if pos <= len(out)]
+            i += 1
+            if not stack or stack[-1] != ch:
+                # 多余或不匹配的闭合括号
+                continue
+            stack.pop()
+            out.append(ch)
+            if not stack:
+                # 顶层对象已闭合，忽略其后的内容
+                break
+            continue
+        elif ch == ",":
+            safe_points.append((len(out), tuple(stack)))
+        out.append(ch)
+        i += 1
+
+    if in_string:
+        if escape:
+            out.pop()
+        out.append('"')
+
+    repaired = _close(out, stack)
+    if _loads(repaired) is not _INVALID:
+        return repaired
+    for pos, open_brackets in reversed(safe_points):
+        shortened = _close(out[:pos], list(open_brackets))
+        if _loads(shortened) is not _INVALID:
+            return shortened
+    return repaired
+
+
+def _loads(text: str) -> Any:
+    try:
+        return json.loads(text)
+    except (json.JSONDecodeError, TypeError):
+        return _INVALID
+
+
+def parse_json_response(text: str) -> Tuple[Any, bool]:
+    """
+    从 LLM 回答中解析 JSON 对象
+
+    Returns:
+        (解析结果, 是否经过修复)；整段文本或 ```json 代码块本身即合法 JSON 时不算修复
+
+    Raises:
+        ValueError: 修复后仍找不到可解析的 JSON 对象
+    """
+    text = text or ""
+    data = _loads(text.strip())
+    if data is _INVALID:
+        fenced = _JSON_FENCE.search(text)
+        if fenced is not None:
+            data = _loads(fenced.group(1).strip())
+    if data is not _INVALID:
+        return data, False
+
+    candidate = locate_json(text)
+    if candidate is None:
+        raise ValueError("no JSON object found in the response")
+    data = _loads(candidate)
+    if data is _INVALID:
+        data = _loads(repair_json(candidate))
+    if data is _INVALID:
+        raise ValueError("no valid JSON object found in the response")
+    return data, True
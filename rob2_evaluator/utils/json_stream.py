@@ -0,0 +1,228 @@
+"""流式 LLM 输出的增量 JSON 解析与校验"""
+
+import json
+from typing import Any, Callable, Dict, List, Optional, Union
+
+PathItem = Union[str, int]
+
+
+class StreamAborted(Exception):
+    """流式输出已可判定无效，提前中止生成"""
+
+
+class JSONStreamListener:
+    """增量解析事件回调，子类按需覆盖；抛出 StreamAborted 即中止解析"""
+
+    def on_progress(self, total_chars: int) -> None:
+        pass
+
+    def on_key(self, path: List[PathItem], key: str) -> None:
+        pass
+
+    def on_string_growth(self, path: List[PathItem], length: int) -> None:
+        pass
+
+    def on_value(self, path: List[PathItem], value: Any) -> None:
+        pass
+
+
+class _Frame:
+    __slots__ = ("is_object", "start", "key", "expect_key", "index")
+
+    def __init__(self, is_object: bool, start: int):
+        self.is_object = is_object
+        self.start = start
+        self.key: Optional[str] = None
+        self.expect_key = is_object
+        self.index = 0
+
+
+class IncrementalJSONParser:
+    """
+    逐块接收文本并增量解析第一个顶层 JSON 对象。
+
+    对象之前的内容（如说明文字、```json 代码块标记）被跳过；
+    每个键、字符串或标量值、以及闭合的对象/数组都会以其路径通知 listener，
+    顶层对象闭合后 done 为 True，result 为解析结果。
+    """
+
+    def __init__(self, listener: Optional[JSONStreamListener] = None):
+        self.listener = listener or JSONStreamListener()
+        self.buffer = ""
+        self.done = False
+        self.result: Any = None
+        self._pos = 0
+        self._stack: List[_Frame] = []
+        self._started = False
+        self._in_string = False
+        self._escape = False
+        self._string_start = 0
+        self._scalar_start: Optional[int] = None
+
+    def feed(self, chunk: str) -> None:
+        if self.done or not chunk:
+            return
+        self.buffer += chunk
+        self.listener.on_progress(len(self.buffer))
+
+        buffer = self.buffer
+        i = self._pos
+        while i < len(buffer) and not self.done:
+            self._step(buffer, i)
+            i += 1
+        self._pos = i
+
+        if self._in_string:
+            self.listener.on_string_growth(
+                self._value_path(), len(buffer) - self._string_start
+            )
+
+    def _path(self) -> List[PathItem]:
+        path: List[PathItem] = []
+        for frame in self._stack:
+            if frame.is_object:
+                if frame.key is not None:
+                    path.append(frame.key)
+            else:
+                path.append(frame.index)
+        return path
+
+    def _value_path(self) -> List[PathItem]:
+        """当前位置的值路径（正在解析键时为所属对象的路径）"""
+        path = self._path()
+        top = self._stack[-1] if self._stack else None
+        if top is not None and top.is_object and top.expect_key and top.key is not None:
+            path = path[:-1]
+        return path
+
+    @staticmethod
+    def _loads(raw: str) -> Any:
+        try:
+            return json.loads(raw)
+        except json.JSONDecodeError as e:
+            raise StreamAborted(f"invalid JSON: {e.msg}") from e
+
+    def _step(self, buffer: str, i: int) -> None:
+        c = buffer[i]
+
+        if not self._started:
+            # 跳过顶层对象之前的内容
+            if c == "{":
+                self._started = True
+                self._stack.append(_Frame(True, i))
+            return
+
+        if self._in_string:
+            if self._escape:
+                self._escape = False
+            elif c == "\\":
+                self._escape = True
+            elif c == '"':
+                self._in_string = False
+                value = self._loads(buffer[self._string_start : i + 1])
+                top = self._stack[-1]
+                if top.is_object and top.expect_key:
+                    top.key = value
+                    top.expect_key = False
+                    self.listener.on_key(self._path()[:-1], value)
+                else:
+                    self.listener.on_value(self._path(), value)
+            return
+
+        if self._scalar_start is not None and c in ",}] \t\r\n":
+            raw = buffer[self._scalar_start : i]
+            self._scalar_start = None
+            self.listener.on_value(self._path(), self._loads(raw))
+
+        if c in " \t\r\n:":
+            return
+        if c == '"':
+            self._in_string = True
+            self._string_start = i
+        elif c in "{[":
+            self._stack.append(_Frame(c == "{", i))
+        elif c in "}]":
+            frame = self._stack.pop()
+            if frame.is_object != (c == "}"):
+                raise StreamAborted("invalid JSON: mismatched brackets")
+            value = self._loads(buffer[frame.start : i + 1])
+            if not self._stack:
+                self.done = True
+                self.result = value
+            self.listener.on_value(self._path(), value)
+        elif c == ",":
+            top = self._stack[-1]
+            if top.is_object:
+                top.expect_key = True
+                top.key = None
+            else:
+                top.index += 1
+        elif self._scalar_start is None:
+            self._scalar_start = i
+
+
+class DomainStreamValidator(JSONStreamListener):
+    """
+    按领域 schema 校验流式输出的 GenericDomainJudgement：
+    出现未定义的键、不在选项范围内的答案或风险等级、过长的输出时立即中止；
+    每个信号问题的对象闭合时通过 on_signal 回调（信号编号, 内容）。
+    """
+
+    SIGNAL_FIELDS = {"answer", "reason", "evidence"}
+    OVERALL_FIELDS = {"risk", "reason", "evidence"}
+
+    def __init__(
+        self,
+        schema: Dict[str, Any],
+        include_overall: bool = True,
+        on_signal: Optional[Callable[[str, Dict[str, Any]], None]] = None,
+        max_chars: int = 20000,
+        max_string_chars: int = 4000,
+        max_evidence_items: int = 20,
+    ):
+        self.options = {
+            signal["id"]: {opt.upper() for opt in signal["options"]}
+            for signal in schema["signals"]
+        }
+        self.domain_options = {opt.lower() for opt in schema["domain_options"]}
+        self.root_fields = {"signals", "overall"} if include_overall else {"signals"}
+        self.on_signal = on_signal
+        self.max_chars = max_chars
+        self.max_string_chars = max_string_chars
+        self.max_evidence_items = max_evidence_items
+
+    def on_progress(self, total_chars: int) -> None:
+        if total_chars > self.max_chars:
+            raise StreamAborted(f"runaway output: more than {self.max_chars} chars")
+
+    def on_key(self, path: List[PathItem], key: str) -> None:
+        if path == []:
+            allowed = self.root_fields
+        elif path == ["signals"]:
+            allowed = self.options.keys()
+        elif len(path) == 2 and path[0] == "signals":
+            allowed = self.SIGNAL_FIELDS
+        elif path == ["overall"]:
+            allowed = self.OVERALL_FIELDS
+        else:
+            return
+        if key not in allowed:
+            raise StreamAborted(f"unexpected key {key!r} at {path}")
+
+    def on_string_growth(self, path: List[PathItem], length: int) -> None:
+        if length > self.max_string_chars:
+            raise StreamAborted(f"runaway string at {path}")
+
+    def on_value(self, path: List[PathItem], value: Any) -> None:
+        if len(path) == 3 and path[0] == "signals" and path[2] == "answer":
+            if str(value).strip().upper() not in self.options[path[1]]:
+                raise StreamAborted(f"invalid answer {value!r} for {path[1]}")
+        elif path == ["overall", "risk"]:
+            if str(value).strip().lower() not in self.domain_options:
+                raise StreamAborted(f"invalid risk {value!r}")
+        elif len(path) == 4 and path[2] == "evidence" and isinstance(path[3], int):
+            if path[3] >= self.max_evidence_items:
+                raise StreamAborted(f"too many evidence items for {path[1]}")
+        elif len(path) == 2 and path[0] == "signals" and isinstance(value, dict):
+            if self.on_signal is not None:
+                self.on_signal(path[1], value)
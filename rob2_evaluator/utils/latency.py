@@ -0,0 +1,97 @@
+"""LLM 调用延迟统计：按模型的延迟分位数、自适应超时与对冲请求策略"""
+
+import math
+import threading
+from collections import deque
+from dataclasses import dataclass
+from typing import Deque, Dict, Optional, Tuple
+
+# 每个模型保留的最近延迟样本数
+DEFAULT_WINDOW = 200
+
+# 样本数达到该值之前不根据分位数设置超时或对冲
+DEFAULT_MIN_SAMPLES = 20
+
+
+class LLMTimeoutError(TimeoutError):
+    """请求未在自适应超时内返回（视为暂时性故障，参与退避重试与熔断）"""
+
+
+class LatencyTracker:
+    """
+    按模型记录最近 window 次成功调用的延迟（秒），可在多线程间共享。
+
+    自适应超时为 p95 延迟的 timeout_multiplier 倍，限制在 [min_timeout, max_timeout]；
+    样本不足 min_samples 时使用 max_timeout。
+    """
+
+    def __init__(
+        self,
+        window: int = DEFAULT_WINDOW,
+        min_samples: int = DEFAULT_MIN_SAMPLES,
+        timeout_multiplier: float = 3.0,
+        min_timeout: float = 30.0,
+        max_timeout: float = 600.0,
+    ):
+        if min_timeout > max_timeout:
+            raise ValueError(f"min_timeout 不能大于 max_timeout: {min_timeout} > {max_timeout}")
+        self.window = window
+        self.min_samples = min_samples
+        self.timeout_multiplier = timeout_multiplier
+        self.min_timeout = min_timeout
+        self.max_timeout = max_timeout
+        self._lock = threading.Lock()
+        self._samples: Dict[str, Deque[float]] = {}
+
+    def record(self, model: str, seconds: float) -> None:
+        with self._lock:
+            samples = self._samples.get(model)
+            if samples is None:
+                samples = self._samples[model] = deque(maxlen=self.window)
+            samples.append(seconds)
+
+    def percentile(self, model: str, quantile: float = 0.95) -> Optional[float]:
+        """最近样本的延迟分位数（最近秩法），样本不足 min_samples 时返回 None"""
+        with self._lock:
+            samples = sorted(self._samples.get(model, ()))
+        if not samples or len(samples) < self.min_samples:
+            return None
+        rank = max(math.ceil(quantile * len(samples)), 1)
+        return samples[rank - 1]
+
+    def timeout_for(self, model: str) -> float:
+        p95 = self.percentile(model, 0.95)
+        if p95 is None:
+            return self.max_timeout
+        return min(max(p95 * self.timeout_multiplier, self.min_timeout), self.max_timeout)
+
+    def reset(self) -> None:
+        with self._lock:
+            self._samples.clear()
+
+
+@dataclass
+class HedgePolicy:
+    """
+    对冲请求策略：请求在 delay 秒内未返回时，再发出一个相同的请求，
+    先得到有效响应者胜出，另一个被取消。
+
+    Attributes:
+        delay: 固定的对冲延迟（秒）；None 时取该模型观测到的 quantile 分位延迟，
+            样本不足时不对冲
+        quantile: 未给出 delay 时使用的延迟分位数
+        secondary: 对冲请求发往的 (模型名, 提供商)；None 时发往同一模型
+    """
+
+    delay: Optional[float] = None
+    quantile: float = 0.95
+    secondary: Optional[Tuple[str, str]] = None
+
+    def delay_for(self, model: str, tracker: LatencyTracker) -> Optional[float]:
+        if self.delay is not None:
+            return self.delay
+        return tracker.percentile(model, self.quantile)
+
+
+# 全局延迟统计，call_llm 与 acall_llm 共享
+latency_tracker = LatencyTracker()
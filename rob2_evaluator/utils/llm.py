@@ -1,13 +1,67 @@
 """Helper functions for LLM"""
 
-import json
-from typing import TypeVar, Type, Optional, Any
+import asyncio
+import logging
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, wait
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import TypeVar, Type, Optional, Any, Callable, Dict, Iterator, List, Tuple
 from pydantic import BaseModel
+from rob2_evaluator.utils.cache import LLMResponseCache
+from rob2_evaluator.utils.json_repair import is_truncated, parse_json_response, strip_reasoning
+from rob2_evaluator.utils.latency import HedgePolicy, LLMTimeoutError, latency_tracker
 from rob2_evaluator.utils.progress import progress
-from rob2_evaluator.schema.rob2_schema import DefaultResponseFactory
+from rob2_evaluator.utils.resilience import (
+    CircuitBreaker,
+    backoff_delay,
+    circuit_breakers,
+    is_request_error,
+    is_transient,
+    provider_concurrency,
+    retry_after_seconds,
+)
+from rob2_evaluator.utils.usage import usage_tracker
+from rob2_evaluator.utils.json_stream import (
+    IncrementalJSONParser,
+    JSONStreamListener,
+    StreamAborted,
+)
+from rob2_evaluator.schema.rob2_schema import DOMAIN_SCHEMAS, DefaultResponseFactory
 
 T = TypeVar("T", bound=BaseModel)
 
+logger = logging.getLogger(__name__)
+
+
+# Disk-backed response cache consulted by call_llm; None disables call-level caching
+_response_cache: Optional[LLMResponseCache] = None
+
+
+def set_response_cache(cache: Optional[LLMResponseCache]) -> None:
+    """Installs (or with None removes) the response cache shared by all call_llm calls."""
+    global _response_cache
+    _response_cache = cache
+
+
+def get_response_cache() -> Optional[LLMResponseCache]:
+    return _response_cache
+
+
+# Hedged-request policy applied by call_llm/acall_llm to non-streaming calls; None disables hedging
+_hedge_policy: Optional[HedgePolicy] = None
+
+
+def set_hedge_policy(policy: Optional[HedgePolicy]) -> None:
+    """Installs (or with None removes) the hedged-request policy shared by all LLM calls."""
+    global _hedge_policy
+    _hedge_policy = policy
+
+
+def get_hedge_policy() -> Optional[HedgePolicy]:
+    return _hedge_policy
+
 
 def call_llm(
     prompt: Any,
@@ -17,6 +71,10 @@ def call_llm(
     agent_name: Optional[str] = None,
     max_retries: int = 3,
     domain_key: Optional[str] = None,
+    stream_validator: Optional[JSONStreamListener] = None,
+    model_params: Optional[Dict[str, Any]] = None,
+    use_cache: bool = True,
+    cache_salt: Optional[str] = None,
 ) -> T:
     """
     Makes an LLM call with retry logic, handling both JSON supported and non-JSON supported models.
@@ -29,76 +87,806 @@ def call_llm(
         agent_name: Optional name of the agent for progress updates
         max_retries: Maximum number of retries (default: 3)
         domain_key: Optional domain key for creating default responses
+        stream_validator: If given (structured output only), the response is streamed and
+            parsed incrementally; the listener may raise StreamAborted to stop a bad
+            generation early, which then counts as a failed attempt
+        model_params: Sampling parameters passed to the chat client (e.g. temperature)
+        use_cache: Set to False to bypass the response cache for this call
+        cache_salt: Distinguishes otherwise identical calls in the response cache,
+            e.g. independent samples of the same prompt
 
     Returns:
         An instance of the specified Pydantic model
     """
+    cache, cache_key, cached = _lookup_cache(
+        prompt, model_name, model_provider, pydantic_model, model_params, use_cache, cache_salt
+    )
+    if cached is not None:
+        return cached
+
+    result, succeeded = _call_llm_uncached(
+        prompt,
+        model_name,
+        model_provider,
+        pydantic_model,
+        agent_name,
+        max_retries,
+        domain_key,
+        stream_validator,
+        model_params or {},
+    )
+    _store_response(cache, cache_key, result, succeeded)
+    return result
+
+
+async def acall_llm(
+    prompt: Any,
+    model_name: str,
+    model_provider: str,
+    pydantic_model: Type[T] = None,
+    agent_name: Optional[str] = None,
+    max_retries: int = 3,
+    domain_key: Optional[str] = None,
+    stream_validator: Optional[JSONStreamListener] = None,
+    model_params: Optional[Dict[str, Any]] = None,
+    use_cache: bool = True,
+    cache_salt: Optional[str] = None,
+) -> T:
+    """
+    Async twin of call_llm built on the chat client's ainvoke/astream; takes the same arguments.
+
+    Requests in flight are bounded per provider by the shared provider_concurrency
+    semaphores, so a single event loop can keep many calls outstanding without a thread
+    per call. A slot is held only while a request is in flight, not during backoff.
+    """
+    cache, cache_key, cached = _lookup_cache(
+        prompt, model_name, model_provider, pydantic_model, model_params, use_cache, cache_salt
+    )
+    if cached is not None:
+        return cached
+
+    result, succeeded = await _acall_llm_uncached(
+        prompt,
+        model_name,
+        model_provider,
+        pydantic_model,
+        agent_name,
+        max_retries,
+        domain_key,
+        stream_validator,
+        model_params or {},
+    )
+    _store_response(cache, cache_key, result, succeeded)
+    return result
+
+
+def _lookup_cache(
+    prompt: Any,
+    model_name: str,
+    model_provider: str,
+    pydantic_model: Optional[Type[T]],
+    model_params: Optional[Dict[str, Any]],
+    use_cache: bool,
+    cache_salt: Optional[str],
+) -> Tuple[Optional[LLMResponseCache], Optional[str], Any]:
+    """Returns (cache, key, cached response or None); the cache is None when caching is off."""
+    cache = _response_cache if use_cache else None
+    if cache is None:
+        return None, None, None
+    cache_key = response_cache_key(
+        cache, prompt, model_name, model_provider, pydantic_model, model_params, cache_salt
+    )
+    return cache, cache_key, cache.get_response(cache_key, pydantic_model)
+
+
+def response_cache_key(
+    cache: LLMResponseCache,
+    prompt: Any,
+    model_name: str,
+    model_provider: str,
+    pydantic_model: Optional[Type[T]] = None,
+    model_params: Optional[Dict[str, Any]] = None,
+    cache_salt: Optional[str] = None,
+) -> str:
+    """
+    The key under which call_llm caches a call with these arguments, so that responses
+    obtained outside call_llm (e.g. from provider batch jobs) are replayed as cache hits.
+    """
+    params = dict(model_params or {})
+    if cache_salt:
+        params["_salt"] = cache_salt
+    return cache.make_key(model_provider, model_name, prompt, pydantic_model, params)
+
+
+def cached_response(
+    prompt: Any,
+    model_name: str,
+    model_provider: str,
+    pydantic_model: Optional[Type[T]] = None,
+    model_params: Optional[Dict[str, Any]] = None,
+    cache_salt: Optional[str] = None,
+    **_: Any,
+) -> Any:
+    """
+    The cached result of a call_llm call with these arguments, or None when it is not cached
+    (or caching is off); extra call_llm keyword arguments are accepted and ignored.
+    """
+    _, _, cached = _lookup_cache(
+        prompt, model_name, model_provider, pydantic_model, model_params, True, cache_salt
+    )
+    return cached
+
+
+def _store_response(
+    cache: Optional[LLMResponseCache], cache_key: Optional[str], result: Any, succeeded: bool
+) -> None:
+    # Fallback defaults are not real answers and must not be replayed on the next run
+    if cache is not None and succeeded:
+        cache.set_response(cache_key, result)
+
+
+def _prepare_call(
+    model_name: str,
+    model_provider: str,
+    pydantic_model: Optional[Type[T]],
+    model_params: Dict[str, Any],
+    domain_key: Optional[str] = None,
+) -> Tuple[Any, Callable[[Any], Any]]:
+    """
+    Returns the chat client (wrapped for structured output where the model supports JSON mode)
+    and a parser that records token usage and turns its response into the result,
+    raising when the response is unusable. domain_key lets the parser reject a judgement
+    recovered from truncated output that no longer answers every signal question.
+    """
     from rob2_evaluator.llm.models import get_model, get_model_info
 
     model_info = get_model_info(model_name)
-    llm = get_model(model_name, model_provider)
-    
+    llm = get_model(model_name, model_provider, **model_params)
+
     # 如果不需要结构化输出，直接返回字符串
     if pydantic_model is None:
-        for attempt in range(max_retries):
-            try:
-                result = llm.invoke(prompt)
-                # 兼容langchain返回结构
-                if hasattr(result, "content"):
-                    return result.content.strip()
-                return str(result).strip()
-            except Exception as e:
-                if agent_name:
-                    progress.update_status(
-                        agent_name, None, f"Error - retry {attempt + 1}/{max_retries}"
-                    )
-                if attempt == max_retries - 1:
-                    return "no"
-        return "no"
 
-    # For non-JSON support models, we can use structured output
-    if not (model_info and not model_info.has_json_mode()):
-        llm = llm.with_structured_output(
+        def parse_text(result: Any) -> str:
+            usage_tracker.record(model_name, result)
+            # 兼容langchain返回结构；推理模型的 <think> 块不属于回答
+            if hasattr(result, "content"):
+                return strip_reasoning(_chunk_text(result))
+            return strip_reasoning(str(result))
+
+        return llm, parse_text
+
+    # For non-JSON support models, we need to extract and parse the JSON manually
+    if model_info and not model_info.has_json_mode():
+
+        def parse_markdown(result: Any) -> T:
+            usage_tracker.record(model_name, result)
+            return _parse_json(_chunk_text(result), model_name, pydantic_model, domain_key)
+
+        return llm, parse_markdown
+
+    # include_raw keeps the raw message so token usage (incl. cached tokens) can be recorded
+    llm = llm.with_structured_output(
+        pydantic_model,
+        method="json_mode",
+        include_raw=True,
+    )
+
+    def parse_structured(result: Dict[str, Any]) -> T:
+        usage_tracker.record(model_name, result["raw"])
+        if result["parsing_error"] is None:
+            usage_tracker.record_json(model_name, repaired=False)
+            return result["parsed"]
+        # Repair the raw text locally before counting the attempt as failed
+        try:
+            return _parse_json(
+                _chunk_text(result["raw"]), model_name, pydantic_model, domain_key
+            )
+        except Exception:
+            raise result["parsing_error"]
+
+    return llm, parse_structured
+
+
+def _call_llm_uncached(
+    prompt: Any,
+    model_name: str,
+    model_provider: str,
+    pydantic_model: Optional[Type[T]],
+    agent_name: Optional[str],
+    max_retries: int,
+    domain_key: Optional[str],
+    stream_validator: Optional[JSONStreamListener],
+    model_params: Dict[str, Any],
+) -> Tuple[Any, bool]:
+    """Calls the model; returns (result, succeeded), where succeeded is False for fallback defaults."""
+    breaker = circuit_breakers.get(model_provider)
+    if pydantic_model is not None and stream_validator is not None:
+        from rob2_evaluator.llm.models import get_model
+
+        return _call_llm_streaming(
+            get_model(model_name, model_provider, **model_params),
+            prompt,
+            model_name,
+            model_provider,
             pydantic_model,
-            method="json_mode",
+            stream_validator,
+            agent_name,
+            max_retries,
+            domain_key,
+            breaker,
         )
 
+    primary = _contender(model_name, model_provider, pydantic_model, model_params, domain_key)
+    hedge = _hedge_contender(primary, pydantic_model, model_params, domain_key)
+
     # Call the LLM with retries
+    error: Any = "no attempts"
     for attempt in range(max_retries):
+        if not breaker.acquire(_probe_wait()):
+            error = "circuit open"
+            break
         try:
-            # Call the LLM
-            result = llm.invoke(prompt)
-
-            # For non-JSON support models, we need to extract and parse the JSON manually
-            if model_info and not model_info.has_json_mode():
-                parsed_result = extract_json_from_response(result.content)
-                if parsed_result:
-                    return pydantic_model(**parsed_result)
-            else:
-                return result
-
+            return _invoke_hedged(primary, hedge, prompt), True
         except Exception as e:
-            if agent_name:
-                progress.update_status(
-                    agent_name, None, f"Error - retry {attempt + 1}/{max_retries}"
-                )
-
-            if attempt == max_retries - 1:
-                print(f"Error in LLM call after {max_retries} attempts: {e}")
-                # 优先使用领域schema的默认响应
-                if domain_key:
-                    return DefaultResponseFactory.create_response(
-                        pydantic_model, domain_key
-                    )
-                # Fallback to basic default for non-domain models
-                return create_basic_default(pydantic_model)
+            error = e
+            delay = _after_failure(e, attempt, max_retries, breaker, model_name, agent_name)
+            if delay is None:
+                break
+            if delay:
+                time.sleep(delay)
 
     # 最终兜底也保持一致
+    default = _fallback_default(pydantic_model, domain_key)
+    return _fallback(default, model_name, model_provider, error), False
+
+
+async def _acall_llm_uncached(
+    prompt: Any,
+    model_name: str,
+    model_provider: str,
+    pydantic_model: Optional[Type[T]],
+    agent_name: Optional[str],
+    max_retries: int,
+    domain_key: Optional[str],
+    stream_validator: Optional[JSONStreamListener],
+    model_params: Dict[str, Any],
+) -> Tuple[Any, bool]:
+    """Async counterpart of _call_llm_uncached; each request holds a provider slot while in flight."""
+    breaker = circuit_breakers.get(model_provider)
+    if pydantic_model is not None and stream_validator is not None:
+        from rob2_evaluator.llm.models import get_model
+
+        return await _acall_llm_streaming(
+            get_model(model_name, model_provider, **model_params),
+            prompt,
+            model_name,
+            model_provider,
+            pydantic_model,
+            stream_validator,
+            agent_name,
+            max_retries,
+            domain_key,
+            breaker,
+            provider_concurrency.semaphore(model_provider),
+        )
+
+    primary = _contender(model_name, model_provider, pydantic_model, model_params, domain_key)
+    hedge = _hedge_contender(primary, pydantic_model, model_params, domain_key)
+
+    error: Any = "no attempts"
+    for attempt in range(max_retries):
+        if not await breaker.aacquire(_probe_wait()):
+            error = "circuit open"
+            break
+        try:
+            return await _ainvoke_hedged(primary, hedge, prompt), True
+        except Exception as e:
+            error = e
+            delay = _after_failure(e, attempt, max_retries, breaker, model_name, agent_name)
+            if delay is None:
+                break
+            if delay:
+                await asyncio.sleep(delay)
+
+    default = _fallback_default(pydantic_model, domain_key)
+    return _fallback(default, model_name, model_provider, error), False
+
+
+class _Contender:
+    """One way of answering a request: a prepared chat client, its parser and its provider's breaker."""
+
+    def __init__(self, model_name: str, model_provider: Any, llm: Any, parse: Callable[[Any], Any]):
+        from rob2_evaluator.llm.models import honours_request_deadline
+
+        self.model_name = model_name
+        self.model_provider = model_provider
+        self.llm = llm
+        self.parse = parse
+        self.breaker = circuit_breakers.get(model_provider)
+        # Whether the transport closes this client's requests at their deadline
+        self.bounded = honours_request_deadline(model_provider)
+
+    def invoke(self, prompt: Any, timeout: float) -> Any:
+        """
+        Blocking request bounded by `timeout` at the HTTP transport, which closes the
+        connection when the deadline passes. The resulting LLMTimeoutError is not yet counted
+        in usage: the caller records it once it actually gives up on this request.
+        """
+        from rob2_evaluator.llm.models import request_deadline
+
+        start = time.monotonic()
+        try:
+            with request_deadline(timeout):
+                response = self.llm.invoke(prompt)
+        except Exception as e:
+            if is_transient(e) and time.monotonic() - start >= timeout:
+                raise LLMTimeoutError(self._timeout_message(timeout)) from e
+            raise
+        latency_tracker.record(self.model_name, time.monotonic() - start)
+        return self.parse(response)
+
+    async def ainvoke(
+        self, prompt: Any, timeout: float, started: Optional[asyncio.Event] = None
+    ) -> Any:
+        # The timeout starts once a provider slot is held, so queueing is not mistaken for a hang
+        async with provider_concurrency.semaphore(self.model_provider):
+            if started is not None:
+                started.set()
+            start = time.monotonic()
+            try:
+                response = await asyncio.wait_for(self.llm.ainvoke(prompt), timeout)
+            except asyncio.TimeoutError:
+                raise self.timeout_error(timeout) from None
+        latency_tracker.record(self.model_name, time.monotonic() - start)
+        return self.parse(response)
+
+    def timeout_error(self, timeout: float) -> LLMTimeoutError:
+        usage_tracker.record_timeout(self.model_name)
+        return LLMTimeoutError(self._timeout_message(timeout))
+
+    def _timeout_message(self, timeout: float) -> str:
+        return f"{self.model_name} did not respond within {timeout:.1f}s"
+
+
+def _contender(
+    model_name: str,
+    model_provider: Any,
+    pydantic_model: Optional[Type[T]],
+    model_params: Dict[str, Any],
+    domain_key: Optional[str] = None,
+) -> _Contender:
+    return _Contender(
+        model_name,
+        model_provider,
+        *_prepare_call(model_name, model_provider, pydantic_model, model_params, domain_key),
+    )
+
+
+def _hedge_contender(
+    primary: _Contender,
+    pydantic_model: Optional[Type[T]],
+    model_params: Dict[str, Any],
+    domain_key: Optional[str] = None,
+) -> Optional[_Contender]:
+    """The contender that receives hedged duplicates, or None when hedging is off."""
+    policy = _hedge_policy
+    if policy is None:
+        return None
+    if policy.secondary is None:
+        return primary
+    model_name, model_provider = policy.secondary
+    return _contender(model_name, model_provider, pydantic_model, model_params, domain_key)
+
+
+def _hedge_delay(primary: _Contender, hedge: Optional[_Contender], timeout: float) -> Optional[float]:
+    if hedge is None or _hedge_policy is None:
+        return None
+    delay = _hedge_policy.delay_for(primary.model_name, latency_tracker)
+    # Hedging at or after the timeout would never fire
+    return delay if delay is not None and delay < timeout else None
+
+
+def _start_thread(contender: _Contender, prompt: Any, timeout: float) -> Future:
+    """Runs a blocking request on a daemon thread, so an abandoned one cannot delay shutdown."""
+    future: Future = Future()
+
+    def run() -> None:
+        if not future.set_running_or_notify_cancel():
+            return
+        try:
+            future.set_result(contender.invoke(prompt, timeout))
+        except BaseException as e:
+            future.set_exception(e)
+
+    threading.Thread(target=run, name=f"llm-{contender.model_name}", daemon=True).start()
+    return future
+
+
+def _invoke_hedged(primary: _Contender, hedge: Optional[_Contender], prompt: Any) -> Any:
+    """
+    Sends the request under the primary model's adaptive timeout. Without a hedge, a client
+    whose transport enforces the deadline is called on the caller's thread. Otherwise the
+    request runs on a worker thread, and if it is still outstanding after the hedge delay a
+    duplicate goes to the hedge contender; the first valid response wins. Blocking requests
+    cannot be interrupted, so a loser is abandoned; where the transport enforces deadlines it
+    is still closed at its own. Raises LLMTimeoutError (transient) when no request answers in
+    time, or the first error when all of them fail.
+    """
+    timeout = latency_tracker.timeout_for(primary.model_name)
+    delay = _hedge_delay(primary, hedge, timeout)
+    if delay is None and primary.bounded:
+        try:
+            value = primary.invoke(prompt, timeout)
+        except LLMTimeoutError:
+            usage_tracker.record_timeout(primary.model_name)
+            raise
+        primary.breaker.record_success()
+        return value
+
+    now = time.monotonic()
+    hedge_at = None if delay is None else now + delay
+    pending = {_start_thread(primary, prompt, timeout): (primary, now + timeout)}
+    hedge_future: Optional[Future] = None
+    hedge_probe = False
+    errors: List[Exception] = []
+    try:
+        while pending:
+            wake = min(deadline for _, deadline in pending.values())
+            if hedge_at is not None:
+                wake = min(wake, hedge_at)
+            done, _ = wait(
+                pending, timeout=max(wake - time.monotonic(), 0), return_when=FIRST_COMPLETED
+            )
+            for future in done:
+                contender, _ = pending.pop(future)
+                try:
+                    value = future.result()
+                except LLMTimeoutError:
+                    error: Exception = contender.timeout_error(timeout)
+                except Exception as e:
+                    error = e
+                else:
+                    contender.breaker.record_success()
+                    if future is hedge_future:
+                        hedge_future = None
+                    return value
+                if future is hedge_future:
+                    hedge_future = None
+                    _settle_hedge(hedge, hedge_probe, error)
+                errors.append(error)
+
+            now = time.monotonic()
+            for future, (contender, deadline) in list(pending.items()):
+                if now >= deadline:
+                    del pending[future]
+                    error = contender.timeout_error(timeout)
+                    if future is hedge_future:
+                        hedge_future = None
+                        _settle_hedge(hedge, hedge_probe, error)
+                    errors.append(error)
+            if hedge_at is not None and now >= hedge_at:
+                hedge_at = None
+                admission = hedge.breaker.admit() if pending else None
+                if admission is not None:
+                    usage_tracker.record_hedge(primary.model_name)
+                    hedge_probe = admission == CircuitBreaker.HALF_OPEN
+                    hedge_future = _start_thread(hedge, prompt, timeout)
+                    pending[hedge_future] = (hedge, now + timeout)
+        raise errors[0]
+    finally:
+        if hedge_future is not None:
+            # The hedge lost the race and is abandoned without an outcome
+            _settle_hedge(hedge, hedge_probe, None)
+
+
+def _settle_hedge(hedge: _Contender, probing: bool, error: Optional[Exception]) -> None:
+    """
+    Reports a hedge that did not win to its provider's breaker like any failed call. A hedge
+    that lost the race, or whose error says nothing about the provider, releases the
+    half-open probe slot it held for the next caller.
+    """
+    if error is not None and _record_error(hedge.breaker, error):
+        return
+    if probing:
+        hedge.breaker.release_probe()
+
+
+async def _ainvoke_hedged(primary: _Contender, hedge: Optional[_Contender], prompt: Any) -> Any:
+    """
+    Async counterpart of _invoke_hedged. The hedge delay counts from when the primary request
+    acquires its provider slot, and the losing request is cancelled.
+    """
+    timeout = latency_tracker.timeout_for(primary.model_name)
+    delay = _hedge_delay(primary, hedge, timeout)
+    started = asyncio.Event()
+    tasks = {asyncio.ensure_future(primary.ainvoke(prompt, timeout, started)): primary}
+    timer = None
+    if delay is not None:
+
+        async def hedge_timer() -> None:
+            await started.wait()
+            await asyncio.sleep(delay)
+
+        timer = asyncio.ensure_future(hedge_timer())
+
+    hedge_task: Optional[asyncio.Future] = None
+    hedge_probe = False
+    errors: List[Exception] = []
+    try:
+        while tasks:
+            waitables = set(tasks) if timer is None else {*tasks, timer}
+            done, _ = await asyncio.wait(waitables, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task is timer:
+                    continue
+                contender = tasks.pop(task)
+                try:
+                    value = task.result()
+                except Exception as e:
+                    if task is hedge_task:
+                        hedge_task = None
+                        _settle_hedge(hedge, hedge_probe, e)
+                    errors.append(e)
+                    continue
+                contender.breaker.record_success()
+                if task is hedge_task:
+                    hedge_task = None
+                return value
+            if timer in done:
+                timer = None
+                admission = hedge.breaker.admit() if tasks else None
+                if admission is not None:
+                    usage_tracker.record_hedge(primary.model_name)
+                    hedge_probe = admission == CircuitBreaker.HALF_OPEN
+                    hedge_task = asyncio.ensure_future(hedge.ainvoke(prompt, timeout))
+                    tasks[hedge_task] = hedge
+        raise errors[0]
+    finally:
+        if hedge_task is not None:
+            # The hedge lost the race and is cancelled below without an outcome
+            _settle_hedge(hedge, hedge_probe, None)
+        leftovers = list(tasks) + ([timer] if timer is not None else [])
+        for task in leftovers:
+            task.cancel()
+        await asyncio.gather(*leftovers, return_exceptions=True)
+
+
+def _fallback_default(pydantic_model: Optional[Type[T]], domain_key: Optional[str]) -> Any:
+    # 非结构化调用（yes/no 类判断）兜底为 "no"
+    if pydantic_model is None:
+        return "no"
+    return _default_response(pydantic_model, domain_key)
+
+
+def _default_response(pydantic_model: Type[T], domain_key: Optional[str]) -> T:
+    # 优先使用领域schema的默认响应
     if domain_key:
         return DefaultResponseFactory.create_response(pydantic_model, domain_key)
+    # Fallback to basic default for non-domain models
     return create_basic_default(pydantic_model)
 
 
+def _probe_wait() -> float:
+    """
+    How long a call waits while another call probes a half-open circuit: at most the
+    probe's own request timeout, so calls queue behind the probe instead of falling back.
+    """
+    return latency_tracker.max_timeout
+
+
+def _after_failure(
+    error: Exception,
+    attempt: int,
+    max_retries: int,
+    breaker: CircuitBreaker,
+    model_name: str,
+    agent_name: Optional[str],
+) -> Optional[float]:
+    """
+    Records a failed attempt and returns how long to wait before the next one, or None when
+    retrying cannot help. Transient errors (rate limits, timeouts, 5xx) are retried after a
+    jittered exponential backoff that honours Retry-After; request errors (auth failures,
+    unknown models, rejected requests) are not retried; other errors (e.g. unparsable
+    output) are retried at once.
+    """
+    _record_error(breaker, error)
+    if agent_name:
+        progress.update_status(
+            agent_name, None, f"Error - retry {attempt + 1}/{max_retries}"
+        )
+    if is_request_error(error):
+        logger.warning(f"{model_name} rejected the request, not retrying: {error}")
+        return None
+    if attempt < max_retries - 1:
+        usage_tracker.record_retry(model_name)
+        if is_transient(error):
+            return backoff_delay(attempt, retry_after_seconds(error))
+    return 0.0
+
+
+def _record_error(breaker: CircuitBreaker, error: Exception) -> bool:
+    """
+    Reports a failed call to the provider's breaker; returns whether anything was recorded.
+    Transient and request errors count as failures, so a dead key or a wrong model name
+    opens the circuit. Unusable output means the provider did answer, which counts as a
+    success. Any other error says nothing about the provider and leaves the breaker as is.
+    """
+    if is_transient(error) or is_request_error(error):
+        breaker.record_failure()
+    elif isinstance(error, (ValueError, StreamAborted)):
+        breaker.record_success()
+    else:
+        return False
+    return True
+
+
+class FallbackCount:
+    """Number of call_llm fallbacks observed by a track_fallbacks block"""
+
+    def __init__(self):
+        self.count = 0
+
+
+# A context variable rather than a thread-local, so that concurrent asyncio tasks on one
+# thread each see their own tracker; tasks started inside a block inherit it
+_fallback_counter: ContextVar[Optional[FallbackCount]] = ContextVar(
+    "llm_fallback_counter", default=None
+)
+
+
+@contextmanager
+def track_fallbacks() -> Iterator[FallbackCount]:
+    """Counts the call_llm/acall_llm calls made inside the block (current thread or task) that fell back to defaults."""
+    counter = FallbackCount()
+    token = _fallback_counter.set(counter)
+    try:
+        yield counter
+    finally:
+        _fallback_counter.reset(token)
+
+
+def _fallback(default: T, model_name: str, model_provider: Any, error: Any) -> T:
+    """Returns the fallback default, making the failure visible in logs, usage stats and trackers."""
+    logger.warning(
+        f"LLM call to {getattr(model_provider, 'value', model_provider)}/{model_name} "
+        f"failed, using default response: {error}"
+    )
+    usage_tracker.record_fallback(model_name)
+    counter = _fallback_counter.get()
+    if counter is not None:
+        counter.count += 1
+    return default
+
+
+def _call_llm_streaming(
+    llm,
+    prompt: Any,
+    model_name: str,
+    model_provider: Any,
+    pydantic_model: Type[T],
+    stream_validator: JSONStreamListener,
+    agent_name: Optional[str],
+    max_retries: int,
+    domain_key: Optional[str],
+    breaker: CircuitBreaker,
+) -> Tuple[Any, bool]:
+    """Streams the response, validating the JSON as it arrives and aborting bad generations early."""
+    error: Any = "no attempts"
+    for attempt in range(max_retries):
+        if not breaker.acquire(_probe_wait()):
+            error = "circuit open"
+            break
+        parser = IncrementalJSONParser(stream_validator)
+        message = None
+        delay = 0.0
+        stream = llm.stream(prompt)
+        try:
+            for chunk in stream:
+                message = chunk if message is None else message + chunk
+                parser.feed(_chunk_text(chunk))
+                if parser.done:
+                    break
+            result = _stream_result(parser, model_name, pydantic_model, domain_key)
+            breaker.record_success()
+            return result, True
+        except Exception as e:
+            error = e
+            delay = _after_failure(e, attempt, max_retries, breaker, model_name, agent_name)
+        finally:
+            # Closing the generator stops the underlying request
+            close = getattr(stream, "close", None)
+            if close is not None:
+                close()
+            if message is not None:
+                usage_tracker.record(model_name, message)
+        if delay is None:
+            break
+        if delay:
+            time.sleep(delay)
+
+    default = _default_response(pydantic_model, domain_key)
+    return _fallback(default, model_name, model_provider, error), False
+
+
+async def _acall_llm_streaming(
+    llm,
+    prompt: Any,
+    model_name: str,
+    model_provider: Any,
+    pydantic_model: Type[T],
+    stream_validator: JSONStreamListener,
+    agent_name: Optional[str],
+    max_retries: int,
+    domain_key: Optional[str],
+    breaker: CircuitBreaker,
+    slots: asyncio.Semaphore,
+) -> Tuple[Any, bool]:
+    """Async counterpart of _call_llm_streaming built on astream."""
+    error: Any = "no attempts"
+    for attempt in range(max_retries):
+        if not await breaker.aacquire(_probe_wait()):
+            error = "circuit open"
+            break
+        parser = IncrementalJSONParser(stream_validator)
+        message = None
+        delay = 0.0
+        stream = llm.astream(prompt)
+        try:
+            async with slots:
+                async for chunk in stream:
+                    message = chunk if message is None else message + chunk
+                    parser.feed(_chunk_text(chunk))
+                    if parser.done:
+                        break
+            result = _stream_result(parser, model_name, pydantic_model, domain_key)
+            breaker.record_success()
+            return result, True
+        except Exception as e:
+            error = e
+            delay = _after_failure(e, attempt, max_retries, breaker, model_name, agent_name)
+        finally:
+            # Closing the generator stops the underlying request
+            aclose = getattr(stream, "aclose", None)
+            if aclose is not None:
+                await aclose()
+            if message is not None:
+                usage_tracker.record(model_name, message)
+        if delay is None:
+            break
+        if delay:
+            await asyncio.sleep(delay)
+
+    default = _default_response(pydantic_model, domain_key)
+    return _fallback(default, model_name, model_provider, error), False
+
+
+def _stream_result(
+    parser: IncrementalJSONParser,
+    model_name: str,
+    pydantic_model: Type[T],
+    domain_key: Optional[str] = None,
+) -> T:
+    """The streamed object; output that ended before the object closed is repaired locally if possible."""
+    if parser.done:
+        usage_tracker.record_json(model_name, repaired=False)
+        return pydantic_model(**parser.result)
+    try:
+        return _parse_json(parser.buffer, model_name, pydantic_model, domain_key)
+    except Exception:
+        raise StreamAborted("response ended before the JSON object was complete")
+
+
+def _chunk_text(chunk: Any) -> str:
+    """Extracts the text of a streamed message chunk (string or content-block list)."""
+    content = getattr(chunk, "content", chunk)
+    if isinstance(content, str):
+        return content
+    return "".join(
+        part.get("text", "") if isinstance(part, dict) else str(part)
+        for part in content
+    )
+
+
 def create_basic_default(model_class: Type[T]) -> T:
     """Creates a basic default response for non-domain models."""
     default_values = {}
@@ -144,16 +932,58 @@ def create_basic_default(model_class: Type[T]) -> T:
     return model_class(**default_values)
 
 
+def _parse_json(
+    text: str, model_name: str, pydantic_model: Type[T], domain_key: Optional[str] = None
+) -> T:
+    """
+    Validates pydantic_model from the JSON object in a response, repairing common formatting
+    problems first; counts the response (and whether it needed repair) per model.
+
+    Output that ended before the object closed is repaired by dropping the unfinished member
+    and closing the brackets, which can silently lose signal answers; such a domain judgement
+    is accepted only if it still answers every signal question of domain_key.
+    """
+    data, repaired = parse_json_response(text)
+    result = pydantic_model.model_validate(data)
+    if repaired and is_truncated(text):
+        missing = _missing_signals(result, domain_key)
+        if missing:
+            raise ValueError(f"truncated response is missing signals: {', '.join(missing)}")
+    usage_tracker.record_json(model_name, repaired)
+    return result
+
+
+def _missing_signals(result: Any, domain_key: Optional[str]) -> List[str]:
+    """Signal questions of the domain that a judgement does not answer"""
+    signals = getattr(result, "signals", None)
+    if signals is None or not domain_key:
+        return []
+    schema = DOMAIN_SCHEMAS.get(domain_key)
+    if schema is None:
+        return []
+    return [signal["id"] for signal in schema["signals"] if signal["id"] not in signals]
+
+
+def parse_response_text(
+    text: str,
+    model_name: str,
+    pydantic_model: Optional[Type[T]] = None,
+    domain_key: Optional[str] = None,
+) -> Any:
+    """
+    Turns a raw completion into what call_llm returns: the answer text without reasoning
+    blocks, or pydantic_model validated from the (repaired if necessary) JSON object in it.
+
+    Raises ValueError (or pydantic's ValidationError) when no valid object can be read.
+    """
+    if pydantic_model is None:
+        return strip_reasoning(text)
+    return _parse_json(text, model_name, pydantic_model, domain_key)
+
+
 def extract_json_from_response(content: str) -> Optional[dict]:
-    """Extracts JSON from markdown-formatted response."""
+    """Extracts the JSON object from a response (fenced, bare or slightly malformed)."""
     try:
-        json_start = content.find("```json")
-        if json_start != -1:
-            json_text = content[json_start + 7 :]  # Skip past ```json
-            json_end = json_text.find("```")
-            if json_end != -1:
-                json_text = json_text[:json_end].strip()
-                return json.loads(json_text)
-    except Exception as e:
-        print(f"Error extracting JSON from response: {e}")
-    return None
+        return parse_json_response(content)[0]
+    except ValueError:
+        return None
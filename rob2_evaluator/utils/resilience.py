@@ -0,0 +1,311 @@
+"""LLM 调用的退避重试、按提供商的熔断与异步并发限制"""
+
+import asyncio
+import random
+import threading
+import time
+import weakref
+from email.utils import parsedate_to_datetime
+from typing import Any, Dict, Optional
+
+# 视为暂时性故障（限流、过载、服务端错误）的 HTTP 状态码
+TRANSIENT_STATUS_CODES = {408, 409, 425, 429, 500, 502, 503, 504, 529}
+
+# 无状态码时按异常类名判断的暂时性故障（连接、超时、限流）
+TRANSIENT_ERROR_NAMES = ("Timeout", "Connection", "RateLimit", "Overloaded", "Unavailable")
+
+# 异步调用时每个提供商默认同时在途的请求数
+DEFAULT_PROVIDER_CONCURRENCY = 64
+
+
+def _provider_key(provider: Any) -> str:
+    return str(getattr(provider, "value", provider))
+
+
+def _status_code(exc: BaseException) -> Optional[int]:
+    status = getattr(exc, "status_code", None)
+    if status is None:
+        status = getattr(getattr(exc, "response", None), "status_code", None)
+    return status if isinstance(status, int) else None
+
+
+def is_transient(exc: BaseException) -> bool:
+    """限流、超时、连接错误与 5xx 属于暂时性故障；解析失败等模型输出问题不是"""
+    status = _status_code(exc)
+    if status is not None:
+        return status in TRANSIENT_STATUS_CODES
+    name = type(exc).__name__
+    return any(part in name for part in TRANSIENT_ERROR_NAMES)
+
+
+def is_request_error(exc: BaseException) -> bool:
+    """鉴权失败、模型不存在、请求无效等 4xx 错误：重试也不会成功"""
+    status = _status_code(exc)
+    return status is not None and 400 <= status < 500 and status not in TRANSIENT_STATUS_CODES
+
+
+def retry_after_seconds(exc: BaseException) -> Optional[float]:
+    """从异常附带的响应头读取 Retry-After（秒数或 HTTP 日期，另支持 retry-after-ms）"""
+    headers = getattr(getattr(exc, "response", None), "headers", None)
+    if not headers:
+        return None
+    try:
+        millis = headers.get("retry-after-ms")
+        if millis is not None:
+            return max(float(millis) / 1000, 0.0)
+        value = headers.get("retry-after")
+        if value is None:
+            return None
+        try:
+            return max(float(value), 0.0)
+        except ValueError:
+            return max(parsedate_to_datetime(value).timestamp() - time.time(), 0.0)
+    except (TypeError, ValueError):
+        return None
+
+
+def backoff_delay(
+    attempt: int,
+    retry_after: Optional[float] = None,
+    base: float = 1.0,
+    cap: float = 60.0,
+) -> float:
+    """
+    第 attempt 次（从 0 开始）失败后的等待时间：全抖动指数退避，
+    服务商给出 Retry-After 时至少等待该时长（上限 cap）
+    """
+    delay = random.uniform(0, min(cap, base * 2**attempt))
+    if retry_after is not None:
+        delay = min(max(delay, retry_after), cap)
+    return delay
+
+
+class CircuitOpenError(Exception):
+    """熔断器处于打开状态，调用被直接拒绝"""
+
+
+class CircuitBreaker:
+    """
+    连续 failure_threshold 次暂时性故障后打开，reset_timeout 秒内的调用直接失败；
+    之后进入半开状态，只放行一次探测调用，成功则关闭，失败则重新打开。
+    探测进行期间，acquire/aacquire 的其他调用等待探测结果，而不是直接失败。
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        if failure_threshold < 1:
+            raise ValueError(f"failure_threshold 必须大于 0: {failure_threshold}")
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._lock = threading.Lock()
+        # 探测结束（record_success/record_failure）时唤醒等待的调用
+        self._probe_done = threading.Condition(self._lock)
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._current_state(time.monotonic())
+
+    def _current_state(self, now: float) -> str:
+        if self._state == self.OPEN and now - self._opened_at >= self.reset_timeout:
+            self._state = self.HALF_OPEN
+            self._probe_in_flight = False
+        return self._state
+
+    def allow(self) -> bool:
+        """是否放行一次调用（半开状态下只放行一次探测）"""
+        with self._lock:
+            return bool(self._try_acquire())
+
+    def admit(self) -> Optional[str]:
+        """与 allow 相同，但返回放行方式：普通调用为 CLOSED，半开探测为 HALF_OPEN，拒绝为 None"""
+        with self._lock:
+            state = self._current_state(time.monotonic())
+            return state if self._try_acquire() else None
+
+    def release_probe(self) -> None:
+        """放弃结果未知的探测（如落败或被取消的对冲请求），让下一个调用重新探测"""
+        with self._lock:
+            if self._state == self.HALF_OPEN and self._probe_in_flight:
+                self._probe_in_flight = False
+                self._probe_done.notify_all()
+
+    def _try_acquire(self) -> Optional[bool]:
+        """放行为 True，拒绝为 False；探测进行中、结果未知时为 None（调用方需持有锁）"""
+        state = self._current_state(time.monotonic())
+        if state == self.CLOSED:
+            return True
+        if state == self.HALF_OPEN:
+            if not self._probe_in_flight:
+                self._probe_in_flight = True
+                return True
+            return None
+        return False
+
+    def acquire(self, timeout: float) -> bool:
+        """
+        与 allow 相同，但探测进行期间等待其结果（至多 timeout 秒）：
+        探测成功则放行，失败（熔断器重新打开）或等待超时则拒绝
+        """
+        deadline = time.monotonic() + timeout
+        with self._lock:
+            while True:
+                allowed = self._try_acquire()
+                if allowed is not None:
+                    return allowed
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self._probe_done.wait(remaining)
+
+    async def aacquire(self, timeout: float, poll_interval: float = 0.1) -> bool:
+        """acquire 的异步版本，等待探测结果期间不阻塞事件循环"""
+        deadline = time.monotonic() + timeout
+        while True:
+            with self._lock:
+                allowed = self._try_acquire()
+            if allowed is not None:
+                return allowed
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return False
+            await asyncio.sleep(min(poll_interval, remaining))
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._state = self.CLOSED
+            self._failures = 0
+            self._probe_in_flight = False
+            self._probe_done.notify_all()
+
+    def record_failure(self) -> None:
+        with self._lock:
+            now = time.monotonic()
+            state = self._current_state(now)
+            self._failures += 1
+            if state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                self._state = self.OPEN
+                self._opened_at = now
+                self._probe_in_flight = False
+                self._probe_done.notify_all()
+
+    def remaining_open_seconds(self) -> float:
+        """距离允许探测还需等待的秒数，未打开时为 0"""
+        with self._lock:
+            now = time.monotonic()
+            if self._current_state(now) != self.OPEN:
+                return 0.0
+            return max(self.reset_timeout - (now - self._opened_at), 0.0)
+
+
+class CircuitBreakerRegistry:
+    """按提供商维护熔断器，可在多线程间共享"""
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._lock = threading.Lock()
+        self._breakers: Dict[str, CircuitBreaker] = {}
+
+    def get(self, provider: Any) -> CircuitBreaker:
+        key = _provider_key(provider)
+        with self._lock:
+            breaker = self._breakers.get(key)
+            if breaker is None:
+                breaker = CircuitBreaker(self.failure_threshold, self.reset_timeout)
+                self._breakers[key] = breaker
+            return breaker
+
+    def open_providers(self) -> Dict[str, float]:
+        """处于打开状态的提供商及其剩余等待秒数"""
+        with self._lock:
+            breakers = dict(self._breakers)
+        waits = {key: b.remaining_open_seconds() for key, b in breakers.items()}
+        return {key: wait for key, wait in waits.items() if wait > 0}
+
+    def wait_until_closed(self, poll_interval: float = 1.0) -> float:
+        """
+        阻塞到没有打开的熔断器（可进行探测）为止，返回等待的总秒数；
+        半开状态下除探测外的调用在 CircuitBreaker.acquire 中等待探测结果
+        """
+        waited = 0.0
+        while True:
+            open_providers = self.open_providers()
+            if not open_providers:
+                return waited
+            delay = min(max(open_providers.values()), poll_interval)
+            time.sleep(delay)
+            waited += delay
+
+    async def await_until_closed(self, poll_interval: float = 1.0) -> float:
+        """wait_until_closed 的异步版本，等待期间不阻塞事件循环"""
+        waited = 0.0
+        while True:
+            open_providers = self.open_providers()
+            if not open_providers:
+                return waited
+            delay = min(max(open_providers.values()), poll_interval)
+            await asyncio.sleep(delay)
+            waited += delay
+
+    def reset(self) -> None:
+        with self._lock:
+            self._breakers.clear()
+
+
+class ProviderConcurrency:
+    """
+    按提供商限制异步调用（acall_llm）同时在途的请求数，同一提供商的所有调用共享一个信号量。
+
+    asyncio.Semaphore 绑定创建它的事件循环，因此每个事件循环各自持有一组信号量；
+    configure 修改上限后，新建的信号量使用新值。
+    """
+
+    def __init__(self, default_limit: int = DEFAULT_PROVIDER_CONCURRENCY):
+        if default_limit < 1:
+            raise ValueError(f"并发上限必须大于 0: {default_limit}")
+        self.default_limit = default_limit
+        self._limits: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        # 事件循环 -> {提供商: 信号量}
+        self._semaphores = weakref.WeakKeyDictionary()
+
+    def configure(self, limit: int, provider: Any = None) -> None:
+        """设置某个提供商（provider 为 None 时为默认）的在途请求上限"""
+        if limit < 1:
+            raise ValueError(f"并发上限必须大于 0: {limit}")
+        with self._lock:
+            if provider is None:
+                self.default_limit = limit
+            else:
+                self._limits[_provider_key(provider)] = limit
+            self._semaphores.clear()
+
+    def limit(self, provider: Any) -> int:
+        return self._limits.get(_provider_key(provider), self.default_limit)
+
+    def semaphore(self, provider: Any) -> asyncio.Semaphore:
+        """当前事件循环中该提供商的信号量（须在协程中调用）"""
+        loop = asyncio.get_running_loop()
+        key = _provider_key(provider)
+        with self._lock:
+            semaphores = self._semaphores.setdefault(loop, {})
+            semaphore = semaphores.get(key)
+            if semaphore is None:
+                semaphore = asyncio.Semaphore(self._limits.get(key, self.default_limit))
+                semaphores[key] = semaphore
+            return semaphore
+
+
+# 全局熔断器，call_llm 与批量调度共享
+circuit_breakers = CircuitBreakerRegistry()
+
+# 全局异步并发限制，acall_llm 共享
+provider_concurrency = ProviderConcurrency()
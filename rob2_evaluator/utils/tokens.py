@@ -0,0 +1,96 @@
+"""Token counting helpers"""
+
+import math
+from functools import lru_cache
+from typing import Any, Callable, Dict, List, Optional
+
+try:
+    import tiktoken
+except ImportError:  # optional: token counts fall back to the character heuristic
+    tiktoken = None
+
+# 英文文本平均约 4 个字符对应 1 个 token
+CHARS_PER_TOKEN = 4
+
+# 为模型输出预留的 token 数（领域判断 JSON 含逐条证据，通常在 2k 以内）
+RESPONSE_TOKEN_RESERVE = 4096
+
+
+def estimate_tokens(text: str) -> int:
+    """Roughly estimates the number of tokens in a text without a tokenizer."""
+    if not text:
+        return 0
+    return max(1, math.ceil(len(text) / CHARS_PER_TOKEN))
+
+
+@lru_cache(maxsize=None)
+def _encoding(model_name: str):
+    """Returns the tiktoken encoding for a model, or None when it cannot be loaded."""
+    if tiktoken is None:
+        return None
+    try:
+        try:
+            return tiktoken.encoding_for_model(model_name)
+        except KeyError:
+            # Non-OpenAI models: o200k_base is a close enough approximation for budgeting
+            return tiktoken.get_encoding("o200k_base")
+    except Exception:
+        # Encodings are downloaded on first use and may be unavailable offline
+        return None
+
+
+def count_tokens(text: str, model_name: Optional[str] = None) -> int:
+    """
+    Counts the tokens in a text with a local tokenizer (tiktoken), falling back to
+    estimate_tokens when no tokenizer is available.
+    """
+    if not text:
+        return 0
+    encoding = _encoding(model_name or "gpt-4o")
+    if encoding is None:
+        return estimate_tokens(text)
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def context_budget(
+    model_name: str, overhead_tokens: int = 0, max_context_tokens: Optional[int] = None
+) -> int:
+    """
+    Tokens available for document context in a single call to the model.
+
+    The model's context length (from the LLMModel registry) minus the prompt overhead
+    and RESPONSE_TOKEN_RESERVE, optionally capped by max_context_tokens.
+    """
+    from rob2_evaluator.llm.models import get_context_length
+
+    budget = get_context_length(model_name) - overhead_tokens - RESPONSE_TOKEN_RESERVE
+    if max_context_tokens is not None:
+        budget = min(budget, max_context_tokens)
+    return max(budget, 1)
+
+
+def group_by_token_budget(
+    items: List[Dict[str, Any]],
+    indices: List[int],
+    budget: int,
+    max_items: int,
+    counter: Callable[[str], int] = estimate_tokens,
+) -> List[List[int]]:
+    """
+    Splits consecutive indices into groups whose token total (by counter) stays within budget.
+
+    An item larger than the budget on its own forms a single-item group.
+    """
+    groups: List[List[int]] = []
+    current: List[int] = []
+    current_tokens = 0
+    for idx in indices:
+        tokens = counter(items[idx].get("text", ""))
+        if current and (current_tokens + tokens > budget or len(current) >= max_items):
+            groups.append(current)
+            current, current_tokens = [], 0
+        current.append(idx)
+        current_tokens += tokens
+    if current:
+        groups.append(current)
+    return groups
@@ -0,0 +1,129 @@
+"""LLM token 用量与前缀缓存命中统计"""
+
+import threading
+from dataclasses import dataclass, asdict
+from typing import Any, Dict, Optional
+
+
+@dataclass
+class ModelUsage:
+    calls: int = 0
+    input_tokens: int = 0
+    cached_input_tokens: int = 0
+    cache_creation_tokens: int = 0
+    output_tokens: int = 0
+    # 重试次数，以及重试耗尽（或熔断）后返回默认响应的次数
+    retries: int = 0
+    fallbacks: int = 0
+    # 自适应超时次数，以及发出的对冲请求数
+    timeouts: int = 0
+    hedges: int = 0
+    # 解析成功的结构化（JSON）响应数，以及其中经本地修复才能解析的数量
+    json_responses: int = 0
+    json_repairs: int = 0
+
+    @property
+    def cache_hit_rate(self) -> float:
+        """输入 token 中命中服务商前缀缓存的比例"""
+        if not self.input_tokens:
+            return 0.0
+        return self.cached_input_tokens / self.input_tokens
+
+    @property
+    def json_repair_rate(self) -> float:
+        """结构化响应中经本地修复才能解析的比例"""
+        if not self.json_responses:
+            return 0.0
+        return self.json_repairs / self.json_responses
+
+
+def extract_usage(message: Any) -> Optional[Dict[str, int]]:
+    """
+    从 LangChain 消息的 usage_metadata 中提取用量
+
+    OpenAI 与 Anthropic 均在 input_token_details.cache_read 中报告缓存命中的输入 token；
+    未报告用量的服务商返回 None。
+    """
+    usage = getattr(message, "usage_metadata", None)
+    if not usage:
+        return None
+    details = usage.get("input_token_details") or {}
+    return {
+        "input_tokens": usage.get("input_tokens", 0) or 0,
+        "cached_input_tokens": details.get("cache_read", 0) or 0,
+        "cache_creation_tokens": details.get("cache_creation", 0) or 0,
+        "output_tokens": usage.get("output_tokens", 0) or 0,
+    }
+
+
+class UsageTracker:
+    """按模型累计 token 用量，可在多线程间共享"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._models: Dict[str, ModelUsage] = {}
+
+    def record(self, model: str, message: Any) -> None:
+        usage = extract_usage(message)
+        if usage is None:
+            return
+        with self._lock:
+            entry = self._models.setdefault(model, ModelUsage())
+            entry.calls += 1
+            for key, value in usage.items():
+                setattr(entry, key, getattr(entry, key) + value)
+
+    def record_retry(self, model: str) -> None:
+        self._increment(model, "retries")
+
+    def record_fallback(self, model: str) -> None:
+        self._increment(model, "fallbacks")
+
+    def record_timeout(self, model: str) -> None:
+        self._increment(model, "timeouts")
+
+    def record_hedge(self, model: str) -> None:
+        self._increment(model, "hedges")
+
+    def record_json(self, model: str, repaired: bool) -> None:
+        """记录一次解析成功的结构化响应，repaired 表示经过了本地修复"""
+        self._increment(model, "json_responses")
+        if repaired:
+            self._increment(model, "json_repairs")
+
+    def _increment(self, model: str, field: str) -> None:
+        with self._lock:
+            entry = self._models.setdefault(model, ModelUsage())
+            setattr(entry, field, getattr(entry, field) + 1)
+
+    def get(self, model: str) -> ModelUsage:
+        with self._lock:
+            return ModelUsage(**asdict(self._models.get(model, ModelUsage())))
+
+    def total(self) -> ModelUsage:
+        total = ModelUsage()
+        with self._lock:
+            for entry in self._models.values():
+                for key, value in asdict(entry).items():
+                    setattr(total, key, getattr(total, key) + value)
+        return total
+
+    def summary(self) -> Dict[str, Dict[str, Any]]:
+        """各模型用量、缓存命中率与 JSON 修复率"""
+        with self._lock:
+            return {
+                model: {
+                    **asdict(entry),
+                    "cache_hit_rate": entry.cache_hit_rate,
+                    "json_repair_rate": entry.json_repair_rate,
+                }
+                for model, entry in self._models.items()
+            }
+
+    def reset(self) -> None:
+        with self._lock:
+            self._models.clear()
+
+
+# 进程级用量统计，由 call_llm 记录
+usage_tracker = UsageTracker()
@@ -0,0 +1,266 @@
+"""
+Local stand-in for the OpenAI and Anthropic batch endpoints, for exercising batch mode offline.
+
+The SDK clients are pointed at it through base_url; completions come from a responder
+function instead of a model.
+"""
+
+import json
+import threading
+import time
+from email.parser import BytesParser
+from email.policy import default as default_policy
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, List, Optional
+
+# responder(provider, request) -> completion text; provider is "OpenAI" or "Anthropic" and
+# request the chat-completions body or the Messages params of one batch entry.
+# Raising marks that entry as errored.
+Responder = Callable[[str, Dict[str, Any]], str]
+
+
+class FakeBatchServer:
+    """
+    Implements the endpoints used by OpenAIBatchClient (files, batches) and
+    AnthropicBatchClient (messages/batches) in memory.
+
+    Jobs report in progress for the first polls_until_done status requests and are
+    then answered all at once; submitted requests are kept in `submitted` for assertions.
+    """
+
+    def __init__(self, responder: Responder, polls_until_done: int = 1):
+        self.responder = responder
+        self.polls_until_done = polls_until_done
+        self.submitted: List[Dict[str, Any]] = []
+        self._files: Dict[str, bytes] = {}
+        self._batches: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler_class())
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def openai_client(self) -> Any:
+        from openai import OpenAI
+
+        return OpenAI(api_key="test", base_url=f"{self.base_url}/v1", max_retries=0)
+
+    def anthropic_client(self) -> Any:
+        from anthropic import Anthropic
+
+        return Anthropic(api_key="test", base_url=self.base_url, max_retries=0)
+
+    def start(self) -> "FakeBatchServer":
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self) -> "FakeBatchServer":
+        return self.start()
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.stop()
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args: Any) -> None:
+                pass
+
+            def do_GET(self) -> None:
+                server._dispatch(self, "GET")
+
+            def do_POST(self) -> None:
+                server._dispatch(self, "POST")
+
+        return Handler
+
+    def _dispatch(self, handler: BaseHTTPRequestHandler, method: str) -> None:
+        length = int(handler.headers.get("Content-Length") or 0)
+        body = handler.rfile.read(length) if length else b""
+        parts = handler.path.split("?")[0].strip("/").split("/")
+        try:
+            with self._lock:
+                status, payload = self._route(method, parts, handler.headers, body)
+        except KeyError as e:
+            status, payload = 404, {"error": {"message": f"not found: {e}"}}
+        data = payload if isinstance(payload, bytes) else json.dumps(payload).encode()
+        handler.send_response(status)
+        handler.send_header(
+            "Content-Type",
+            "application/octet-stream" if isinstance(payload, bytes) else "application/json",
+        )
+        handler.send_header("Content-Length", str(len(data)))
+        handler.end_headers()
+        handler.wfile.write(data)
+
+    def _route(self, method: str, parts: List[str], headers: Any, body: bytes):
+        if parts[:2] == ["v1", "files"]:
+            if method == "POST":
+                return 200, self._create_file(headers, body)
+            # GET /v1/files/{id}/content
+            return 200, self._files[parts[2]]
+        if parts[:2] == ["v1", "batches"]:
+            if method == "POST":
+                return 200, self._create_openai_batch(json.loads(body))
+            return 200, self._poll(parts[2])
+        if parts[:3] == ["v1", "messages", "batches"]:
+            if method == "POST":
+                return 200, self._create_anthropic_batch(json.loads(body))
+            if len(parts) == 5 and parts[4] == "results":
+                return 200, self._files[self._batches[parts[3]]["_results"]]
+            return 200, self._poll(parts[3])
+        raise KeyError("/".join(parts))
+
+    def _new_id(self, prefix: str) -> str:
+        return f"{prefix}_{len(self._files) + len(self._batches) + 1}"
+
+    def _create_file(self, headers: Any, body: bytes) -> Dict[str, Any]:
+        message = BytesParser(policy=default_policy).parsebytes(
+            f"Content-Type: {headers['Content-Type']}\r\n\r\n".encode() + body
+        )
+        content = next(
+            part.get_payload(decode=True)
+            for part in message.iter_parts()
+            if part.get_param("name", header="content-disposition") == "file"
+        )
+        file_id = self._new_id("file")
+        self._files[file_id] = content
+        return {
+            "id": file_id,
+            "object": "file",
+            "bytes": len(content),
+            "created_at": int(time.time()),
+            "filename": "requests.jsonl",
+            "purpose": "batch",
+            "status": "processed",
+        }
+
+    def _create_openai_batch(self, params: Dict[str, Any]) -> Dict[str, Any]:
+        requests = [
+            json.loads(line)
+            for line in self._files[params["input_file_id"]].decode().splitlines()
+            if line.strip()
+        ]
+        batch_id = self._new_id("batch")
+        self.submitted.append({"provider": "OpenAI", "id": batch_id, "requests": requests})
+        lines = [self._openai_line(request) for request in requests]
+        self._files[f"{batch_id}_output"] = "\n".join(lines).encode()
+        self._batches[batch_id] = {
+            "id": batch_id,
+            "object": "batch",
+            "endpoint": params["endpoint"],
+            "input_file_id": params["input_file_id"],
+            "completion_window": params["completion_window"],
+            "created_at": int(time.time()),
+            "status": "in_progress",
+            "_done": "completed",
+            "_done_fields": {"output_file_id": f"{batch_id}_output"},
+            "_polls": 0,
+        }
+        return self._public(self._batches[batch_id])
+
+    def _openai_line(self, request: Dict[str, Any]) -> str:
+        try:
+            text = self.responder("OpenAI", request["body"])
+        except Exception as e:
+            return json.dumps(
+                {
+                    "custom_id": request["custom_id"],
+                    "response": {"status_code": 400, "body": {"error": {"message": str(e)}}},
+                    "error": None,
+                }
+            )
+        return json.dumps(
+            {
+                "custom_id": request["custom_id"],
+                "response": {
+                    "status_code": 200,
+                    "body": {
+                        "choices": [{"index": 0, "message": {"role": "assistant", "content": text}}],
+                        "usage": {"prompt_tokens": 10, "completion_tokens": 5, "total_tokens": 15},
+                    },
+                },
+                "error": None,
+            }
+        )
+
+    def _create_anthropic_batch(self, params: Dict[str, Any]) -> Dict[str, Any]:
+        requests = params["requests"]
+        batch_id = self._new_id("msgbatch")
+        self.submitted.append({"provider": "Anthropic", "id": batch_id, "requests": requests})
+        lines = [self._anthropic_line(request) for request in requests]
+        self._files[f"{batch_id}_results"] = "\n".join(lines).encode()
+        now = time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())
+        self._batches[batch_id] = {
+            "id": batch_id,
+            "type": "message_batch",
+            "processing_status": "in_progress",
+            "request_counts": {
+                "processing": len(requests),
+                "succeeded": 0,
+                "errored": 0,
+                "canceled": 0,
+                "expired": 0,
+            },
+            "created_at": now,
+            "expires_at": now,
+            "results_url": None,
+            "_done": "ended",
+            "_done_fields": {
+                "results_url": f"{self.base_url}/v1/messages/batches/{batch_id}/results"
+            },
+            "_results": f"{batch_id}_results",
+            "_polls": 0,
+        }
+        return self._public(self._batches[batch_id])
+
+    def _anthropic_line(self, request: Dict[str, Any]) -> str:
+        try:
+            text = self.responder("Anthropic", request["params"])
+        except Exception as e:
+            result = {
+                "type": "errored",
+                "error": {"type": "error", "error": {"type": "invalid_request_error", "message": str(e)}},
+            }
+        else:
+            result = {
+                "type": "succeeded",
+                "message": {
+                    "id": f"msg_{request['custom_id'][:16]}",
+                    "type": "message",
+                    "role": "assistant",
+                    "model": request["params"]["model"],
+                    "content": [{"type": "text", "text": text}],
+                    "stop_reason": "end_turn",
+                    "stop_sequence": None,
+                    "usage": {
+                        "input_tokens": 10,
+                        "output_tokens": 5,
+                        "cache_read_input_tokens": 0,
+                        "cache_creation_input_tokens": 0,
+                    },
+                },
+            }
+        return json.dumps({"custom_id": request["custom_id"], "result": result})
+
+    def _poll(self, batch_id: str) -> Dict[str, Any]:
+        batch = self._batches[batch_id]
+        batch["_polls"] += 1
+        if batch["_polls"] > self.polls_until_done:
+            state_field = "status" if "status" in batch else "processing_status"
+            batch[state_field] = batch["_done"]
+            batch.update(batch["_done_fields"])
+        return self._public(batch)
+
+    @staticmethod
+    def _public(batch: Dict[str, Any]) -> Dict[str, Any]:
+        return {key: value for key, value in batch.items() if not key.startswith("_")}
@@ -0,0 +1,131 @@
+from unittest.mock import MagicMock, patch
+
+from rob2_evaluator.agents.all_domains_agent import AllDomainsAgent
+from rob2_evaluator.factories import DomainAgentFactory
+from rob2_evaluator.schema.rob2_schema import (
+    DOMAIN_SCHEMAS,
+    AllDomainsJudgement,
+    DomainJudgement,
+    GenericDomainJudgement,
+    SignalJudgement,
+)
+from rob2_evaluator.services.evaluation_service import EvaluationService
+from tests.fixtures.sample_content import sample_content
+
+
+def domain_output(domain_key, answer="Y", risk="Low risk"):
+    return {
+        "signals": {
+            signal["id"]: {
+                "answer": answer,
+                "reason": "reason",
+                "evidence": [{"text": "randomized", "page_idx": 0}],
+            }
+            for signal in DOMAIN_SCHEMAS[domain_key]["signals"]
+        },
+        "overall": {"risk": risk, "reason": "reason", "evidence": []},
+    }
+
+
+KEYS = ["randomization", "deviation_assignment", "missing_data", "measurement", "selection"]
+
+
+def test_combined_output_is_split_per_domain(sample_content):
+    agents = DomainAgentFactory.create_agents("assignment")
+    response = AllDomainsJudgement(domains={key: domain_output(key) for key in KEYS})
+    with patch(
+        "rob2_evaluator.agents.all_domains_agent.call_llm", return_value=response
+    ) as mocked:
+        results = AllDomainsAgent().evaluate(sample_content, agents)
+
+    mocked.assert_called_once()
+    prompt = mocked.call_args.kwargs["prompt"]
+    for agent in agents:
+        assert agent.schema["domain_name"] in prompt
+    assert [r["domain"] for r in results] == [a.schema["domain_name"] for a in agents]
+    assert all(r["overall"]["risk"] == "Low risk" for r in results)
+
+
+def test_invalid_domains_are_rejected():
+    schema = DOMAIN_SCHEMAS["missing_data"]
+    validate = AllDomainsAgent.validate_domain
+    assert validate(schema, domain_output("missing_data")) is not None
+    assert validate(schema, None) is None
+    assert validate(schema, {"signals": {}}) is None
+    # 信号编号属于其他领域
+    assert validate(schema, domain_output("randomization")) is None
+    # q3_2 不允许 NI
+    assert validate(schema, domain_output("missing_data", answer="NI")) is None
+    assert validate(schema, domain_output("missing_data", risk="Unclear")) is None
+
+
+def test_service_falls_back_per_domain_for_failed_sections(sample_content):
+    domains = {key: domain_output(key) for key in KEYS}
+    domains["selection"] = {"signals": "malformed"}
+    del domains["measurement"]
+
+    fallback = GenericDomainJudgement(
+        signals={
+            "q": SignalJudgement(answer="N", reason="r", evidence=[]),
+        },
+        overall=DomainJudgement(risk="High risk", reason="r", evidence=[]),
+    )
+    analysis_type_agent = MagicMock()
+    analysis_type_agent.infer_analysis_type.return_value = "assignment"
+    service = EvaluationService(
+        analysis_type_agent=analysis_type_agent, evaluation_mode="all_domains"
+    )
+    with patch(
+        "rob2_evaluator.agents.all_domains_agent.call_llm",
+        return_value=AllDomainsJudgement(domains=domains),
+    ), patch(
+        "rob2_evaluator.agents.domain_agent.call_llm", return_value=fallback
+    ) as per_domain:
+        results = service.evaluate(sample_content)
+
+    assert per_domain.call_count == 2
+    assert [r["overall"]["risk"] for r in results[:-1]] == [
+        "Low risk",
+        "Low risk",
+        "Low risk",
+        "High risk",
+        "High risk",
+    ]
+    assert results[-1]["judgement"]["overall"] == "High risk"
+
+
+def test_combined_prompt_cites_passages_in_passage_mode(sample_content):
+    agents = DomainAgentFactory.create_agents("assignment", evidence_mode="passage")
+    domains = {key: domain_output(key) for key in KEYS}
+    domains["randomization"]["signals"]["q1_1"]["evidence"] = [
+        {"passage": "P2", "span": "Method: Clients recruited"}
+    ]
+    with patch(
+        "rob2_evaluator.agents.all_domains_agent.call_llm",
+        return_value=AllDomainsJudgement(domains=domains),
+    ) as mocked:
+        results = AllDomainsAgent().evaluate(sample_content, agents)
+
+    prompt = mocked.call_args.kwargs["prompt"]
+    assert "[P2 | Page 0]" in prompt
+    assert '"passage": "<Passage ID' in prompt
+    assert "quote the text **exactly**" not in prompt
+    (evidence,) = results[0]["signals"]["q1_1"]["evidence"]
+    assert evidence["passage"] == "P2"
+    assert evidence["text"].startswith("Method: Clients recruited")
+
+
+def test_rules_mode_combined_prompt_omits_overall(sample_content):
+    agents = DomainAgentFactory.create_agents("assignment", judgement_mode="rules")
+    domains = {key: {"signals": domain_output(key)["signals"]} for key in KEYS}
+    with patch(
+        "rob2_evaluator.agents.all_domains_agent.call_llm",
+        return_value=AllDomainsJudgement(domains=domains),
+    ) as mocked:
+        results = AllDomainsAgent().evaluate(sample_content, agents)
+
+    prompt = mocked.call_args.kwargs["prompt"]
+    assert '"overall"' not in prompt
+    assert "Domain-level risk of bias judgment options" not in prompt
+    assert all(result is not None for result in results)
+    assert results[0]["overall"]["reason"].startswith("Derived from the signalling answers")
@@ -29,3 +29,18 @@ def test_infer_analysis_type_default_assignment(sample_content):
     ):
         result = agent.infer_analysis_type(sample_content)
         assert result == "assignment"
+
+
+def test_long_document_votes_over_segments():
+    agent = AnalysisTypeAgent(max_context_tokens=300)
+    items = [{"text": "Outcomes were collected at each visit. " * 10} for _ in range(12)]
+    answers = iter(["unclear", "adherence", "unclear", "adherence", "assignment", "unclear"] * 4)
+    with patch(
+        "rob2_evaluator.agents.analysis_type_agent.call_llm",
+        side_effect=lambda **kwargs: next(answers),
+    ) as mocked:
+        result = agent.infer_analysis_type(items)
+
+    assert mocked.call_count > 1
+    assert "'unclear'" in mocked.call_args.kwargs["prompt"]
+    assert result == "adherence"
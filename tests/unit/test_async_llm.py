@@ -0,0 +1,193 @@
+import asyncio
+import time
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+from langchain_core.messages import AIMessage
+from rob2_evaluator.agents.domain_agent import DomainAgent
+from rob2_evaluator.agents.entry_agent import EntryAgent
+from rob2_evaluator.agents.voting import VotingDomainAgent
+from rob2_evaluator.schema.rob2_schema import DOMAIN_SCHEMAS, GenericDomainJudgement
+from rob2_evaluator.services.evaluation_service import EvaluationService
+from rob2_evaluator.utils.llm import acall_llm, track_fallbacks
+from rob2_evaluator.utils.resilience import CircuitBreakerRegistry, ProviderConcurrency
+
+
+def judgement(answer="Y", risk="Low risk", domain="randomization"):
+    return GenericDomainJudgement(
+        signals={
+            signal["id"]: {"answer": answer, "reason": "r", "evidence": []}
+            for signal in DOMAIN_SCHEMAS[domain]["signals"]
+        },
+        overall={"risk": risk, "reason": "r", "evidence": []},
+    )
+
+
+@pytest.fixture
+def limits():
+    concurrency = ProviderConcurrency(default_limit=2)
+    with patch("rob2_evaluator.utils.llm.provider_concurrency", concurrency), patch(
+        "rob2_evaluator.utils.llm.circuit_breakers", CircuitBreakerRegistry()
+    ):
+        yield concurrency
+
+
+def test_acall_llm_bounds_requests_in_flight_per_provider(limits):
+    in_flight = {"now": 0, "max": 0}
+
+    async def ainvoke(prompt):
+        in_flight["now"] += 1
+        in_flight["max"] = max(in_flight["max"], in_flight["now"])
+        await asyncio.sleep(0.01)
+        in_flight["now"] -= 1
+        return AIMessage(content=f"yes {prompt}")
+
+    llm = MagicMock()
+    llm.ainvoke.side_effect = ainvoke
+
+    async def run():
+        return await asyncio.gather(
+            *(acall_llm(str(i), "gpt-4o", "OpenAI") for i in range(10))
+        )
+
+    with patch("rob2_evaluator.llm.models.get_model", return_value=llm):
+        results = asyncio.run(run())
+
+    assert results == [f"yes {i}" for i in range(10)]
+    assert in_flight["max"] == 2
+    llm.invoke.assert_not_called()
+
+
+def test_acall_llm_parses_structured_output_and_retries(limits):
+    llm = MagicMock()
+    llm.with_structured_output.return_value.ainvoke = AsyncMock(
+        side_effect=[
+            {"raw": AIMessage(content="?"), "parsed": None, "parsing_error": ValueError("bad")},
+            {"raw": AIMessage(content="{}"), "parsed": judgement(), "parsing_error": None},
+        ]
+    )
+    with patch("rob2_evaluator.llm.models.get_model", return_value=llm):
+        result = asyncio.run(
+            acall_llm("p", "gpt-4o", "OpenAI", pydantic_model=GenericDomainJudgement)
+        )
+    assert result == judgement()
+
+
+def test_fallbacks_are_tracked_per_task(limits):
+    async def ainvoke(prompt):
+        await asyncio.sleep(0)
+        if prompt == "fail":
+            raise ValueError("unparsable")
+        return AIMessage(content="yes")
+
+    llm = MagicMock()
+    llm.ainvoke.side_effect = ainvoke
+
+    async def tracked(prompt):
+        with track_fallbacks() as fallbacks:
+            await acall_llm(prompt, "gpt-4o", "OpenAI", max_retries=2)
+        return fallbacks.count
+
+    async def run():
+        return await asyncio.gather(tracked("fail"), tracked("ok"))
+
+    with patch("rob2_evaluator.llm.models.get_model", return_value=llm):
+        assert asyncio.run(run()) == [1, 0]
+
+
+def test_domain_agent_aevaluate_matches_evaluate():
+    agent = DomainAgent("randomization", "gpt-4o", "OpenAI")
+    items = [{"text": "randomised by computer", "page_idx": 1}]
+    with patch(
+        "rob2_evaluator.agents.domain_agent.call_llm", return_value=judgement()
+    ), patch(
+        "rob2_evaluator.agents.domain_agent.acall_llm",
+        AsyncMock(return_value=judgement()),
+    ) as acall:
+        assert asyncio.run(agent.aevaluate(items)) == agent.evaluate(items)
+    assert acall.await_args.kwargs["pydantic_model"] is GenericDomainJudgement
+
+
+def test_entry_agent_afilter_relevant_matches_filter_relevant():
+    content = [{"text": f"paragraph {i} " + "x" * 120} for i in range(8)]
+    oracle = lambda item: "paragraph 3" in item["text"]
+    agent = EntryAgent(max_concurrency=3)
+
+    async def ais_relevant(item):
+        await asyncio.sleep(0)
+        return oracle(item)
+
+    with patch.object(agent, "is_relevant_llm", side_effect=oracle), patch.object(
+        agent, "ais_relevant_llm", side_effect=ais_relevant
+    ):
+        expected = agent.filter_relevant(content)
+        assert asyncio.run(agent.afilter_relevant(content)) == expected
+    assert [item["text"][:11] for item in expected] == [
+        "paragraph 2",
+        "paragraph 3",
+        "paragraph 4",
+    ]
+
+
+class AsyncFakeAgent(DomainAgent):
+    def __init__(self, answer, delay):
+        super().__init__("randomization")
+        self.answer = answer
+        self.delay = delay
+        self.cancelled = False
+
+    async def aevaluate(self, items):
+        try:
+            await asyncio.sleep(self.delay)
+        except asyncio.CancelledError:
+            self.cancelled = True
+            raise
+        return self._to_result(judgement(self.answer))
+
+
+def test_voting_aevaluate_cancels_requests_once_decided():
+    # 全部样本同时发出，四个快速样本返回后多数确定，慢样本被取消
+    agents = [
+        AsyncFakeAgent("Y", 0.01),
+        AsyncFakeAgent("N", 0.01),
+        AsyncFakeAgent("Y", 0.01),
+        AsyncFakeAgent("Y", 0.01),
+        AsyncFakeAgent("N", 5),
+    ]
+    result = asyncio.run(VotingDomainAgent(agents).aevaluate([{"text": "x"}]))
+    assert result["votes"] == {"samples": 4, "requested": 5}
+    assert all(signal["answer"] == "Y" for signal in result["signals"].values())
+    assert agents[4].cancelled
+
+
+def test_voting_aevaluate_launches_every_sample_at_once():
+    agents = [AsyncFakeAgent(answer, 0.2) for answer in "YNYNY"]
+    start = time.perf_counter()
+    result = asyncio.run(VotingDomainAgent(agents).aevaluate([{"text": "x"}]))
+    assert time.perf_counter() - start < 0.35
+    assert result["votes"] == {"samples": 5, "requested": 5}
+
+
+def test_evaluation_service_aevaluate_orders_domains():
+    analysis_type_agent = MagicMock()
+    analysis_type_agent.ainfer_analysis_type = AsyncMock(return_value="adherence")
+    service = EvaluationService(analysis_type_agent=analysis_type_agent)
+
+    async def fake_acall(prompt, domain_key=None, **kwargs):
+        await asyncio.sleep(0)
+        return judgement(domain=domain_key)
+
+    with patch("rob2_evaluator.agents.domain_agent.acall_llm", side_effect=fake_acall):
+        results = asyncio.run(service.aevaluate([{"text": "x", "page_idx": 0}]))
+
+    assert [r["domain"] for r in results[:5]] == [
+        DOMAIN_SCHEMAS[key]["domain_name"]
+        for key in (
+            "randomization",
+            "deviation_adherence",
+            "missing_data",
+            "measurement",
+            "selection",
+        )
+    ]
+    assert results[-1]["judgement"]["overall"] == "Low risk"
@@ -0,0 +1,215 @@
+import json
+import re
+from unittest.mock import MagicMock, patch
+
+import pytest
+from langchain_core.messages import AIMessage, HumanMessage
+from rob2_evaluator.agents.analysis_type_agent import AnalysisTypeAgent
+from rob2_evaluator.agents.domain_agent import DomainAgent
+from rob2_evaluator.agents.entry_agent import EntryAgent
+from rob2_evaluator.llm.batch import AnthropicBatchClient, BatchRequest, OpenAIBatchClient
+from rob2_evaluator.llm.models import ModelProvider
+from rob2_evaluator.main import ROB2Evaluator
+from rob2_evaluator.processors.rob2_processor import JSONDocumentProcessor, ROB2ContentProcessor
+from rob2_evaluator.schema.rob2_schema import DOMAIN_SCHEMAS, GenericDomainJudgement
+from rob2_evaluator.services.batch_api_service import BatchAPIService
+from rob2_evaluator.services.evaluation_service import EvaluationService
+from rob2_evaluator.utils.cache import LLMResponseCache
+from rob2_evaluator.utils.llm import response_cache_key, set_response_cache
+from tests.fixtures.fake_batch_server import FakeBatchServer
+
+DOMAIN_TITLE = re.compile(r'Evaluate the risk of bias for the domain: "([^"]+)"')
+
+
+def judgement(domain_key, risk="Low risk"):
+    return {
+        "signals": {
+            signal["id"]: {"answer": "Y", "reason": "r", "evidence": []}
+            for signal in DOMAIN_SCHEMAS[domain_key]["signals"]
+        },
+        "overall": {"risk": risk, "reason": "r", "evidence": []},
+    }
+
+
+def prompt_text(request):
+    return "".join(
+        message["content"]
+        if isinstance(message["content"], str)
+        else "".join(block["text"] for block in message["content"])
+        for message in request["messages"]
+    )
+
+
+def responder(provider, request):
+    """按 prompt 内容扮演模型：相关性回答 yes，分析类型回答 assignment，领域返回判断 JSON"""
+    text = prompt_text(request)
+    title = DOMAIN_TITLE.search(text)
+    if title:
+        domain_key = next(
+            key
+            for key, schema in DOMAIN_SCHEMAS.items()
+            if schema["domain_name"] == title.group(1)
+        )
+        return json.dumps(judgement(domain_key))
+    if "analysis type" in text:
+        return "assignment"
+    return "yes"
+
+
+@pytest.fixture
+def response_cache(tmp_path):
+    cache = LLMResponseCache(str(tmp_path / "llm.sqlite"))
+    set_response_cache(cache)
+    yield cache
+    set_response_cache(None)
+
+
+@pytest.mark.parametrize(
+    "client_cls, factory",
+    [(OpenAIBatchClient, "openai_client"), (AnthropicBatchClient, "anthropic_client")],
+)
+def test_batch_clients_round_trip_through_fake_server(client_cls, factory):
+    def answer(provider, request):
+        if "fail" in prompt_text(request):
+            raise ValueError("rejected")
+        return f"{provider}: {prompt_text(request)}"
+
+    prompt = [
+        HumanMessage(
+            content=[{"type": "text", "text": "cached", "cache_control": {"type": "ephemeral"}}]
+        )
+    ]
+    with FakeBatchServer(answer, polls_until_done=2) as server:
+        client = client_cls(getattr(server, factory)())
+        results = client.run(
+            [
+                BatchRequest("a", "m", "hello"),
+                BatchRequest("b", "m", "fail"),
+                BatchRequest("c", "m", prompt),
+            ],
+            poll_interval=0.01,
+        )
+
+    by_id = {result.custom_id: result for result in results}
+    provider = client.provider.value
+    assert by_id["a"].text == f"{provider}: hello"
+    assert by_id["a"].as_message().usage_metadata["input_tokens"] == 10
+    assert not by_id["b"].succeeded and "rejected" in by_id["b"].error
+    assert by_id["c"].text == f"{provider}: cached"
+
+
+def test_domain_agent_requests_merge_once_segments_are_cached(response_cache):
+    agent = DomainAgent("randomization", "gpt-4o", ModelProvider.OPENAI, max_context_tokens=60)
+    items = [{"text": f"passage {i} " + "word " * 40, "page_idx": i} for i in range(3)]
+
+    map_requests = agent.llm_requests(items)
+    assert len(map_requests) == 3
+    assert all("Merge" not in request["prompt"] for request in map_requests)
+
+    for request in map_requests:
+        key = response_cache_key(
+            response_cache,
+            request["prompt"],
+            request["model_name"],
+            request["model_provider"],
+            request["pydantic_model"],
+        )
+        response_cache.set_response(key, {"signals": judgement("randomization")["signals"]})
+
+    (merge_request,) = agent.llm_requests(items)
+    assert "split into 3 consecutive segments" in merge_request["prompt"]
+    assert merge_request["pydantic_model"] is GenericDomainJudgement
+    assert "stream_validator" not in merge_request
+
+
+def make_evaluator(tmp_path, monkeypatch):
+    monkeypatch.setenv("MODEL_PROVIDER", "OPENAI")
+    monkeypatch.setenv("MODEL_NAME", "gpt-4o")
+    return ROB2Evaluator(
+        document_processor=JSONDocumentProcessor(),
+        content_processor=ROB2ContentProcessor(EntryAgent()),
+        evaluation_service=EvaluationService(analysis_type_agent=AnalysisTypeAgent()),
+        cache_dir=str(tmp_path / "results"),
+    )
+
+
+def make_docs(tmp_path, n):
+    paths = []
+    for i in range(n):
+        path = tmp_path / f"study{i}.json"
+        content = [
+            {"text": f"Study {i}: participants were randomly assigned " + "x" * 100, "page_idx": 0},
+            {"text": f"Outcome assessors in study {i} were blinded " + "y" * 100, "page_idx": 1},
+        ]
+        path.write_text(json.dumps(content), encoding="utf-8")
+        paths.append(path)
+    return paths
+
+
+def test_batch_api_service_evaluates_corpus_without_live_calls(
+    tmp_path, monkeypatch, response_cache
+):
+    evaluator = make_evaluator(tmp_path, monkeypatch)
+    paths = make_docs(tmp_path, 2)
+
+    with FakeBatchServer(responder) as server, patch(
+        "rob2_evaluator.llm.models.get_model"
+    ) as get_model:
+        service = BatchAPIService(
+            evaluator,
+            clients={"OpenAI": OpenAIBatchClient(server.openai_client())},
+            poll_interval=0.01,
+        )
+        outcomes = service.run(paths)
+
+    get_model.assert_not_called()
+    # 入口筛选、分析类型与四个基础领域、Domain 2 各一个批处理任务
+    assert [len(batch["requests"]) for batch in server.submitted] == [4, 10, 2]
+    assert service.stats.succeeded == service.stats.submitted == 16
+    for path in paths:
+        assert outcomes[path]["status"] == "ok"
+        result = outcomes[path]["result"]
+        assert len(result) == 6
+        assert not any(domain.get("fallback") for domain in result)
+        assert evaluator.cache.get_cached_result(path) == result
+
+
+def test_invalid_batch_results_are_called_live(tmp_path, monkeypatch, response_cache):
+    evaluator = make_evaluator(tmp_path, monkeypatch)
+    (path,) = make_docs(tmp_path, 1)
+
+    def broken_randomization(provider, request):
+        answer = responder(provider, request)
+        if DOMAIN_SCHEMAS["randomization"]["domain_name"] in prompt_text(request):
+            return "not json"
+        return answer
+
+    llm = MagicMock()
+    llm.with_structured_output.return_value.invoke.return_value = {
+        "raw": AIMessage(content="{}"),
+        "parsed": GenericDomainJudgement(**judgement("randomization", risk="High risk")),
+        "parsing_error": None,
+    }
+    with FakeBatchServer(broken_randomization) as server, patch(
+        "rob2_evaluator.llm.models.get_model", return_value=llm
+    ):
+        service = BatchAPIService(
+            evaluator,
+            clients={"OpenAI": OpenAIBatchClient(server.openai_client())},
+            poll_interval=0.01,
+        )
+        outcomes = service.run([path])
+
+    assert service.stats.invalid == 1
+    assert llm.with_structured_output.return_value.invoke.call_count == 1
+    assert outcomes[path]["result"][0]["overall"]["risk"] == "High risk"
+
+
+def test_batch_api_service_rejects_all_domains_mode(tmp_path):
+    evaluator = ROB2Evaluator(
+        document_processor=JSONDocumentProcessor(),
+        evaluation_service=EvaluationService(evaluation_mode="all_domains"),
+        cache_dir=str(tmp_path),
+    )
+    with pytest.raises(ValueError):
+        BatchAPIService(evaluator)
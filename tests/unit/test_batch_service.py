@@ -0,0 +1,168 @@
+import asyncio
+import json
+import threading
+import time
+
+import pytest
+from rob2_evaluator.services.batch_service import BatchService
+from rob2_evaluator.utils.cache import FileCache
+
+
+class FakeEvaluator:
+    def __init__(self, cache, delay=0.0, fail_on=()):
+        self.cache = cache
+        self.delay = delay
+        self.fail_on = set(fail_on)
+        self.calls = []
+        self.active = 0
+        self.max_active = 0
+        self._lock = threading.Lock()
+
+    def process_file(self, input_path):
+        with self._lock:
+            self.calls.append(input_path.name)
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+        try:
+            time.sleep(self.delay)
+            if input_path.name in self.fail_on:
+                raise RuntimeError("parse failed")
+            return [
+                {"domain": "D1", "overall": {"risk": "Low risk"}},
+                {"domain": "Overall risk of bias", "judgement": {"overall": "Low risk"}},
+            ]
+        finally:
+            with self._lock:
+                self.active -= 1
+
+
+def make_docs(tmp_path, n):
+    docs = tmp_path / "docs"
+    docs.mkdir()
+    for i in range(n):
+        (docs / f"{i:02d}.json").write_text(json.dumps([{"text": f"doc {i}"}]))
+    return docs
+
+
+def test_collect_inputs_directory_and_manifest(tmp_path):
+    docs = make_docs(tmp_path, 3)
+    (docs / "notes.txt").write_text("ignored")
+    assert [p.name for p in BatchService.collect_inputs(docs)] == [
+        "00.json",
+        "01.json",
+        "02.json",
+    ]
+
+    manifest = tmp_path / "manifest.txt"
+    manifest.write_text("# corpus\ndocs/02.json\n\ndocs/00.json\ndocs/02.json\n")
+    assert [p.name for p in BatchService.collect_inputs(manifest)] == [
+        "02.json",
+        "00.json",
+    ]
+
+
+def test_run_parallel_skips_cached_and_keeps_order(tmp_path):
+    docs = make_docs(tmp_path, 6)
+    cache = FileCache(str(tmp_path / "cache"))
+    cache.save_result(docs / "01.json", [{"domain": "cached"}])
+    evaluator = FakeEvaluator(cache, delay=0.05, fail_on={"03.json"})
+
+    service = BatchService(evaluator, max_workers=3)
+    records = service.run(BatchService.collect_inputs(docs))
+
+    assert [r["study"] for r in records] == ["00", "01", "02", "03", "04", "05"]
+    assert records[1]["status"] == "cached"
+    assert records[1]["results"] == [{"domain": "cached"}]
+    assert records[3]["status"] == "error"
+    assert "01.json" not in evaluator.calls
+    assert 1 < evaluator.max_active <= 3
+
+
+def test_write_output_csv_and_json(tmp_path):
+    records = [
+        {
+            "study": "a",
+            "source": "a.pdf",
+            "status": "ok",
+            "results": [
+                {"domain": "D1", "overall": {"risk": "High risk"}},
+                {"domain": "Overall risk of bias", "judgement": {"overall": "High risk"}},
+            ],
+        },
+        {"study": "b", "source": "b.pdf", "status": "error", "error": "boom"},
+    ]
+    service = BatchService(FakeEvaluator(None))
+
+    csv_path = tmp_path / "out.csv"
+    service.write_output(records, str(csv_path))
+    lines = csv_path.read_text(encoding="utf-8").splitlines()
+    assert lines[0].startswith("Study,Status,D1,Overall")
+    assert lines[1].startswith("a,ok,High risk,High risk")
+
+    json_path = tmp_path / "out.json"
+    service.write_output(records, str(json_path))
+    assert json.loads(json_path.read_text(encoding="utf-8")) == records
+
+
+def test_invalid_worker_count():
+    with pytest.raises(ValueError):
+        BatchService(FakeEvaluator(None), max_workers=0)
+
+
+def test_batch_pauses_while_a_provider_circuit_is_open(tmp_path):
+    from unittest.mock import patch
+    from rob2_evaluator.utils.resilience import CircuitBreakerRegistry
+
+    registry = CircuitBreakerRegistry(failure_threshold=1, reset_timeout=0.3)
+    registry.get("OpenAI").record_failure()
+    evaluator = FakeEvaluator(FileCache(str(tmp_path / "cache")))
+    docs = make_docs(tmp_path, 2)
+
+    start = time.perf_counter()
+    with patch("rob2_evaluator.services.batch_service.circuit_breakers", registry):
+        records = BatchService(evaluator, max_workers=2).run(
+            BatchService.collect_inputs(docs)
+        )
+    assert time.perf_counter() - start >= 0.25
+    assert all(r["status"] == "ok" for r in records)
+
+
+def test_fallback_domains_are_reported():
+    record = BatchService._make_record(
+        "doc.pdf",
+        "ok",
+        results=[
+            {"domain": "D1", "overall": {"risk": "Some concerns"}, "fallback": True},
+            {"domain": "D2", "overall": {"risk": "Low risk"}},
+        ],
+    )
+    assert record["fallback_domains"] == ["D1"]
+    assert BatchService._summary_row(record)["Fallback"] == "D1"
+
+
+class AsyncFakeEvaluator(FakeEvaluator):
+    async def aprocess_file(self, input_path):
+        self.calls.append(input_path.name)
+        self.active += 1
+        self.max_active = max(self.max_active, self.active)
+        try:
+            await asyncio.sleep(self.delay)
+            if input_path.name in self.fail_on:
+                raise RuntimeError("parse failed")
+            return [{"domain": "D1", "overall": {"risk": "Low risk"}}]
+        finally:
+            self.active -= 1
+
+
+def test_arun_bounds_documents_in_flight(tmp_path):
+    docs = make_docs(tmp_path, 6)
+    cache = FileCache(str(tmp_path / "cache"))
+    cache.save_result(docs / "00.json", [{"domain": "cached"}])
+    evaluator = AsyncFakeEvaluator(cache, delay=0.02, fail_on={"04.json"})
+
+    service = BatchService(evaluator, max_workers=2)
+    records = asyncio.run(service.arun(BatchService.collect_inputs(docs)))
+
+    assert [r["status"] for r in records] == ["cached", "ok", "ok", "ok", "error", "ok"]
+    assert "00.json" not in evaluator.calls
+    assert evaluator.max_active == 2
@@ -2,8 +2,17 @@
 
 import json
 from pathlib import Path
+from unittest.mock import MagicMock, patch
 import pytest
-from rob2_evaluator.utils.cache import FileCache
+from langchain_core.messages import AIMessage, HumanMessage
+from rob2_evaluator.schema.rob2_schema import RelevantPassages
+from rob2_evaluator.utils.cache import (
+    FileCache,
+    LLMResponseCache,
+    RelevanceCache,
+    SQLiteLRUCache,
+)
+from rob2_evaluator.utils.llm import call_llm, set_response_cache
 
 
 def test_file_cache_creation(tmp_path):
@@ -53,3 +62,118 @@ def test_cache_invalid_file(tmp_path):
 
     with pytest.raises(FileNotFoundError):
         cache.get_cached_result(non_existent_file)
+
+
+def test_sqlite_lru_cache_evicts_least_recently_used(tmp_path):
+    """测试超出容量时淘汰最久未访问的条目"""
+    cache = SQLiteLRUCache(str(tmp_path / "lru.sqlite"), max_entries=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1  # 访问 a，使 b 成为最久未访问
+    cache.set("c", 3)
+
+    assert len(cache) == 2
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+
+
+def test_sqlite_lru_cache_persists(tmp_path):
+    """测试缓存在重新打开后仍然可用"""
+    db_path = str(tmp_path / "lru.sqlite")
+    cache = SQLiteLRUCache(db_path)
+    cache.set("key", {"value": [1, 2]})
+    cache.close()
+
+    assert SQLiteLRUCache(db_path).get("key") == {"value": [1, 2]}
+
+
+def test_relevance_cache_key_normalization(tmp_path):
+    """测试空白与大小写差异不影响命中，模型与提示词版本不同则不命中"""
+    cache = RelevanceCache(str(tmp_path / "relevance.sqlite"))
+    cache.set_verdict("Patients were  randomly\nassigned.", "openai:gpt-4o", "v1", True)
+
+    assert cache.get_verdict("patients were randomly assigned.", "openai:gpt-4o", "v1")
+    assert cache.get_verdict("patients were randomly assigned.", "openai:gpt-4o", "v2") is None
+    assert cache.get_verdict("patients were randomly assigned.", "other:model", "v1") is None
+    assert cache.hits == 1
+    assert cache.misses == 2
+
+
+def test_sqlite_lru_cache_expires_old_entries(tmp_path):
+    cache = SQLiteLRUCache(str(tmp_path / "c.sqlite"), max_age_seconds=60)
+    with patch("rob2_evaluator.utils.cache.time.time", return_value=1000.0):
+        cache.set("a", 1)
+        cache.set("b", 2)
+    with patch("rob2_evaluator.utils.cache.time.time", return_value=1030.0):
+        assert cache.get("a") == 1
+    with patch("rob2_evaluator.utils.cache.time.time", return_value=1100.0):
+        assert cache.get("a") is None
+        cache.set("c", 3)
+    # 写入时清除其余过期条目
+    assert len(cache) == 1
+    assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 1
+
+
+def test_llm_response_cache_key_covers_prompt_schema_and_params(tmp_path):
+    cache = LLMResponseCache(str(tmp_path / "llm.sqlite"))
+    key = cache.make_key("OpenAI", "gpt-4o", "prompt", RelevantPassages)
+    assert key == cache.make_key("OpenAI", "gpt-4o", "prompt", RelevantPassages)
+    assert key != cache.make_key("OpenAI", "gpt-4o", "prompt 2", RelevantPassages)
+    assert key != cache.make_key("OpenAI", "gpt-4o-mini", "prompt", RelevantPassages)
+    assert key != cache.make_key("OpenAI", "gpt-4o", "prompt", None)
+    assert key != cache.make_key(
+        "OpenAI", "gpt-4o", "prompt", RelevantPassages, {"temperature": 0.5}
+    )
+    messages = [HumanMessage(content=[{"type": "text", "text": "prompt"}])]
+    assert cache.make_key("Anthropic", "m", messages) == cache.make_key(
+        "Anthropic", "m", [HumanMessage(content=[{"type": "text", "text": "prompt"}])]
+    )
+
+
+@pytest.fixture
+def response_cache(tmp_path):
+    cache = LLMResponseCache(str(tmp_path / "llm.sqlite"))
+    set_response_cache(cache)
+    yield cache
+    set_response_cache(None)
+
+
+def structured_llm(*responses):
+    llm = MagicMock()
+    llm.with_structured_output.return_value.invoke.side_effect = list(responses)
+    return llm
+
+
+def test_call_llm_replays_cached_responses(response_cache):
+    parsed = RelevantPassages(relevant_indices=[1, 3])
+    llm = structured_llm(
+        {"raw": AIMessage(content="{}"), "parsed": parsed, "parsing_error": None}
+    )
+    with patch("rob2_evaluator.llm.models.get_model", return_value=llm) as get_model:
+        first = call_llm("p", "gpt-4o", "OpenAI", pydantic_model=RelevantPassages)
+        second = call_llm("p", "gpt-4o", "OpenAI", pydantic_model=RelevantPassages)
+        call_llm("p", "gpt-4o", "OpenAI", pydantic_model=RelevantPassages, use_cache=False)
+
+    assert first == second == parsed
+    # 第二次调用命中缓存，use_cache=False 时绕过缓存
+    assert get_model.call_count == 2
+    assert response_cache.stats()["hits"] == 1
+
+
+def test_call_llm_does_not_cache_fallback_defaults(response_cache):
+    llm = structured_llm(*[RuntimeError("down")] * 2)
+    with patch("rob2_evaluator.llm.models.get_model", return_value=llm):
+        call_llm("p", "gpt-4o", "OpenAI", pydantic_model=RelevantPassages, max_retries=2)
+    assert len(response_cache) == 0
+
+
+def test_refresh_ignores_cached_responses(response_cache):
+    response_cache.refresh = True
+    llm = MagicMock()
+    llm.invoke.return_value = AIMessage(content="adherence")
+    with patch("rob2_evaluator.llm.models.get_model", return_value=llm):
+        call_llm("p", "gpt-4o", "OpenAI")
+        call_llm("p", "gpt-4o", "OpenAI")
+    assert llm.invoke.call_count == 2
+    assert len(response_cache) == 1
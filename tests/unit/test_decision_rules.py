@@ -0,0 +1,153 @@
+from unittest.mock import patch
+
+import pytest
+from rob2_evaluator.agents.decision_rules import (
+    HIGH,
+    LOW,
+    SOME_CONCERNS,
+    judge_domain,
+    propagate_na,
+)
+from rob2_evaluator.agents.domain_agent import DomainAgent
+from rob2_evaluator.schema.rob2_schema import (
+    DOMAIN_SCHEMAS,
+    SignalJudgement,
+    SignalsOnlyJudgement,
+)
+from tests.fixtures.sample_content import sample_content
+
+
+def judge(domain_key, answers):
+    signal_ids = [s["id"] for s in DOMAIN_SCHEMAS[domain_key]["signals"]]
+    ordered = dict(zip(signal_ids, answers.split()))
+    return judge_domain(domain_key, signal_ids, ordered)
+
+
+@pytest.mark.parametrize(
+    "domain_key, answers, risk",
+    [
+        ("randomization", "Y Y N", LOW),
+        ("randomization", "NI PY NI", LOW),
+        ("randomization", "Y Y Y", SOME_CONCERNS),
+        ("randomization", "N Y N", SOME_CONCERNS),
+        ("randomization", "Y NI N", SOME_CONCERNS),
+        ("randomization", "Y NI Y", HIGH),
+        ("randomization", "Y N N", HIGH),
+        ("deviation_assignment", "N N NA NA NA Y NA", LOW),
+        ("deviation_assignment", "Y Y N NA NA Y NA", LOW),
+        ("deviation_assignment", "Y Y NI NA NA Y NA", SOME_CONCERNS),
+        ("deviation_assignment", "Y Y Y N NA Y NA", SOME_CONCERNS),
+        ("deviation_assignment", "Y Y Y Y Y Y NA", SOME_CONCERNS),
+        ("deviation_assignment", "Y Y Y Y N Y NA", HIGH),
+        ("deviation_assignment", "N N NA NA NA N N", SOME_CONCERNS),
+        ("deviation_assignment", "N N NA NA NA N Y", HIGH),
+        ("deviation_adherence", "N N NA N N NA", LOW),
+        ("deviation_adherence", "Y Y Y N N NA", LOW),
+        ("deviation_adherence", "Y Y N N N Y", SOME_CONCERNS),
+        ("deviation_adherence", "N N NA Y N N", HIGH),
+        ("deviation_adherence", "N N NA NA N NA", LOW),
+        ("deviation_adherence", "N N NA NA Y N", HIGH),
+        ("deviation_adherence", "Y Y NA NA NA NA", LOW),
+        ("deviation_adherence", "Y Y NA NA Y N", HIGH),
+        ("missing_data", "Y NA NA NA", LOW),
+        ("missing_data", "N Y NA NA", LOW),
+        ("missing_data", "N N N NA", LOW),
+        ("missing_data", "N N Y N", SOME_CONCERNS),
+        ("missing_data", "NI N PY NI", HIGH),
+        ("measurement", "N N N NA NA", LOW),
+        ("measurement", "N N Y N NA", LOW),
+        ("measurement", "N NI N NA NA", SOME_CONCERNS),
+        ("measurement", "N N Y Y N", SOME_CONCERNS),
+        ("measurement", "N N Y Y Y", HIGH),
+        ("measurement", "Y N NA NA NA", HIGH),
+        ("selection", "Y N N", LOW),
+        ("selection", "NI N N", SOME_CONCERNS),
+        ("selection", "Y NI N", SOME_CONCERNS),
+        ("selection", "Y N PY", HIGH),
+    ],
+)
+def test_domain_algorithms(domain_key, answers, risk):
+    assert judge(domain_key, answers)[1] == risk
+
+
+def test_na_propagation_follows_condition_chain():
+    signal_ids = ["q3_1", "q3_2", "q3_3", "q3_4"]
+    # 3.1 为 Y 时后续问题均不适用
+    assert propagate_na("missing_data", signal_ids, {"q3_1": "Y", "q3_2": "N", "q3_3": "Y"}) == {
+        "q3_1": "Y",
+        "q3_2": "NA",
+        "q3_3": "NA",
+        "q3_4": "NA",
+    }
+    # 适用的问题回答 NA 视为信息不足，缺失的答案同样视为 NI
+    assert propagate_na("missing_data", signal_ids, {"q3_1": "N", "q3_2": "NA"}) == {
+        "q3_1": "N",
+        "q3_2": "NI",
+        "q3_3": "NI",
+        "q3_4": "NI",
+    }
+
+
+def test_missing_data_continues_past_an_uninformative_q3_2():
+    # 3.2 为 NI 时 3.3 仍适用：缺失与真实值无关时为低风险
+    resolved, risk = judge("missing_data", "N NI N NA")
+    assert resolved == {"q3_1": "N", "q3_2": "NI", "q3_3": "N", "q3_4": "NA"}
+    assert risk == LOW
+
+
+def test_prompt_lists_each_signal_options(sample_content):
+    agent = DomainAgent("missing_data", judgement_mode="rules")
+    prompt = agent._build_prompt(sample_content, agent.schema["signals"])
+    assert "q3_1: " in prompt and "(options: Y/PY/PN/N/NI)" in prompt
+    # 3.2 没有 NI 选项
+    assert '"answer": "<Select one: NA/Y/PY/PN/N>"' in prompt
+
+
+def test_rules_mode_drops_overall_and_computes_risk(sample_content):
+    agent = DomainAgent("missing_data", judgement_mode="rules")
+    prompt = agent._build_prompt(sample_content, agent.schema["signals"])
+    assert '"overall"' not in prompt
+    assert "Overall Risk Assessment" not in prompt
+
+    response = SignalsOnlyJudgement(
+        signals={
+            "q3_1": SignalJudgement(
+                answer="N",
+                reason="r",
+                evidence=[{"text": "12 lost to follow-up", "page_idx": 3}],
+            ),
+            "q3_2": SignalJudgement(answer="N", reason="r", evidence=[]),
+            "q3_3": SignalJudgement(answer="PY", reason="r", evidence=[]),
+            "q3_4": SignalJudgement(answer="Y", reason="r", evidence=[]),
+        }
+    )
+    with patch(
+        "rob2_evaluator.agents.domain_agent.call_llm", return_value=response
+    ) as mocked:
+        result = agent.evaluate(sample_content)
+
+    assert mocked.call_args.kwargs["pydantic_model"] is SignalsOnlyJudgement
+    assert result["overall"]["risk"] == HIGH
+    assert result["overall"]["evidence"] == [{"text": "12 lost to follow-up", "page_idx": 3}]
+    assert [s["answer"] for s in result["signals"].values()] == ["N", "N", "PY", "Y"]
+
+
+def test_invalid_judgement_mode():
+    with pytest.raises(ValueError):
+        DomainAgent("selection", judgement_mode="vote")
+
+
+def test_adherence_questions_accept_na():
+    # 2.4、2.5 为 "if applicable" 问题，NA 不改写为 NI，也不触发 2.6
+    resolved, risk = judge("deviation_adherence", "N N NA NA N NA")
+    assert resolved["q2_4"] == "NA"
+    assert resolved["q2_6"] == "NA"
+    assert risk == LOW
+
+
+def test_adherence_cointervention_question_accepts_na():
+    # 参与者知情但不存在协议外干预时 2.3 为 NA，不视为信息不足
+    resolved, risk = judge("deviation_adherence", "Y Y NA NA NA")
+    assert resolved["q2_3"] == "NA"
+    assert resolved["q2_6"] == "NA"
+    assert risk == LOW
@@ -0,0 +1,168 @@
+from unittest.mock import patch
+
+from langchain_core.messages import HumanMessage
+from rob2_evaluator.agents.domain_agent import (
+    DomainAgent,
+    assign_passage_ids,
+    render_context,
+)
+from rob2_evaluator.factories import DomainAgentFactory
+from rob2_evaluator.llm.models import ModelProvider
+from rob2_evaluator.schema.rob2_schema import (
+    DomainJudgement,
+    EvidenceItem,
+    GenericDomainJudgement,
+    SignalJudgement,
+    SignalsOnlyJudgement,
+)
+from tests.fixtures.sample_content import sample_content
+
+
+def test_domain_prompts_share_document_context_prefix(sample_content):
+    agents = DomainAgentFactory.create_agents("assignment")
+    parts = [agent._build_prompt_parts(sample_content, agent.schema["signals"]) for agent in agents]
+
+    prefixes = {prefix for prefix, _ in parts}
+    assert len(prefixes) == 1
+    prefix = prefixes.pop()
+    # 前缀不包含任何领域信息，领域标题只出现在后缀中
+    for agent, (_, suffix) in zip(agents, parts):
+        assert agent.schema["domain_name"] not in prefix
+        assert agent.schema["domain_name"] in suffix
+    assert sample_content[0]["text"] in prefix
+
+
+def test_anthropic_prompt_marks_context_cache_breakpoint(sample_content):
+    agent = DomainAgent("randomization", "claude-3-5-haiku-latest", ModelProvider.ANTHROPIC)
+    messages = agent._build_messages(sample_content, agent.schema["signals"])
+
+    assert len(messages) == 1 and isinstance(messages[0], HumanMessage)
+    context_block, domain_block = messages[0].content
+    assert context_block["cache_control"] == {"type": "ephemeral"}
+    assert "cache_control" not in domain_block
+    assert context_block["text"] + domain_block["text"] == agent._build_prompt(
+        sample_content, agent.schema["signals"]
+    )
+
+
+def test_other_providers_receive_plain_prompt(sample_content):
+    agent = DomainAgent("selection", "gpt-4o", ModelProvider.OPENAI)
+    prompt = agent._build_messages(sample_content, agent.schema["signals"])
+    assert prompt == agent._build_prompt(sample_content, agent.schema["signals"])
+
+
+CITED_ITEMS = [
+    {"text": "Background text.", "page_idx": 0, "passage_id": "P1"},
+    {
+        "text": "Patients were enrolled at two sites. Allocation used a computer-generated list. Envelopes were sealed.",
+        "page_idx": 3,
+        "passage_id": "P2",
+    },
+]
+
+
+def cited_judgement(evidence):
+    return GenericDomainJudgement(
+        signals={
+            "q1_1": SignalJudgement(answer="Y", reason="r", evidence=evidence),
+        },
+        overall=DomainJudgement(risk="Low risk", reason="r", evidence=evidence[:1]),
+    )
+
+
+def test_passage_mode_prompt_tags_passages_and_drops_quotes():
+    agent = DomainAgent("randomization", evidence_mode="passage")
+    prompt = agent._build_prompt(CITED_ITEMS, agent.schema["signals"])
+    assert "[P2 | Page 3] Patients were enrolled" in prompt
+    assert '"passage": "<Passage ID' in prompt
+    assert "Exact quote" not in prompt
+
+
+def test_passage_citations_expand_locally():
+    agent = DomainAgent("randomization", evidence_mode="passage")
+    evidence = [
+        EvidenceItem(passage="P2", span="allocation used a computer-generated"),
+        EvidenceItem(passage="p1"),
+        EvidenceItem(passage="P9", span="unknown"),
+    ]
+    with patch(
+        "rob2_evaluator.agents.domain_agent.call_llm",
+        return_value=cited_judgement(evidence),
+    ):
+        result = agent.evaluate(CITED_ITEMS)
+
+    assert result["signals"]["q1_1"]["evidence"] == [
+        {"text": "Allocation used a computer-generated list.", "page_idx": 3, "passage": "P2"},
+        {"text": "Background text.", "page_idx": 0, "passage": "P1"},
+        {"text": "unknown", "page_idx": -1},
+    ]
+    assert result["overall"]["evidence"][0]["page_idx"] == 3
+
+
+def test_passage_ids_are_assigned_once_per_document():
+    items = assign_passage_ids([{"text": "a"}, {"text": "b"}, {"text": "c"}])
+    assert [item["passage_id"] for item in items] == ["P1", "P2", "P3"]
+    # 检索后的子集保留原编号
+    assert render_context(items[1:], cite_passages=True).startswith("[P2 | Page ?] b")
+
+
+def long_document(n=40):
+    return [
+        {"text": f"Paragraph {i}. " + "Participants were followed up at regular visits. " * 6, "page_idx": i // 4}
+        for i in range(n)
+    ]
+
+
+def test_long_document_is_evaluated_by_segments_then_merged():
+    agent = DomainAgent("randomization", max_context_tokens=400)
+    items = long_document()
+    assert not agent.fits_context(items)
+    segments = agent._segments(items)
+    assert len(segments) > 1
+    assert [item for segment in segments for item in segment] == items
+
+    prompts = []
+
+    def fake_llm(prompt, pydantic_model, **kwargs):
+        prompts.append((prompt, pydantic_model))
+        if pydantic_model is SignalsOnlyJudgement:
+            return SignalsOnlyJudgement(
+                signals={
+                    "q1_1": SignalJudgement(
+                        answer="Y",
+                        reason="sequence described",
+                        evidence=[EvidenceItem(text="computer-generated sequence", page_idx=2)],
+                    )
+                }
+            )
+        return GenericDomainJudgement(
+            signals={"q1_1": SignalJudgement(answer="Y", reason="merged", evidence=[])},
+            overall=DomainJudgement(risk="Low risk", reason="merged", evidence=[]),
+        )
+
+    with patch("rob2_evaluator.agents.domain_agent.call_llm", side_effect=fake_llm):
+        result = agent.evaluate(items)
+
+    map_prompts = [p for p, model in prompts if model is SignalsOnlyJudgement]
+    merge_prompt = prompts[-1][0]
+    assert len(map_prompts) == len(segments)
+    assert prompts[-1][1] is GenericDomainJudgement
+    # 合并调用只包含各分段的答案与证据，不再包含原文
+    assert merge_prompt.count("### Segment") == len(segments)
+    assert "[Page 2] computer-generated sequence" in merge_prompt
+    assert items[0]["text"] not in merge_prompt
+    assert '"overall"' in merge_prompt
+    assert result["overall"]["risk"] == "Low risk"
+
+
+def test_short_document_uses_a_single_call(sample_content):
+    agent = DomainAgent("randomization")
+    assert agent.fits_context(sample_content)
+    with patch(
+        "rob2_evaluator.agents.domain_agent.call_llm",
+        return_value=GenericDomainJudgement(
+            signals={}, overall=DomainJudgement(risk="Low risk", reason="r", evidence=[])
+        ),
+    ) as mocked:
+        agent.evaluate(sample_content)
+    assert mocked.call_count == 1
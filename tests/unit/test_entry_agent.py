@@ -1,6 +1,15 @@
+import re
+import threading
+import time
+
 import pytest
 from unittest.mock import patch
 from rob2_evaluator.agents.entry_agent import EntryAgent
+from rob2_evaluator.retrieval import LexicalPreFilter, SectionRouter
+from rob2_evaluator.schema.rob2_schema import RelevantPassages
+from rob2_evaluator.utils.cache import RelevanceCache
+from rob2_evaluator.utils.llm import _fallback
+from rob2_evaluator.utils.tokens import group_by_token_budget
 from tests.fixtures.sample_content import sample_content
 
 
@@ -27,3 +36,214 @@ def test_filter_relevant_all_irrelevant(sample_content):
     with patch.object(agent, "is_relevant_llm", return_value=False):
         result = agent.filter_relevant(sample_content)
         assert result == []
+
+
+def make_content(n, long_every=2, references_at=None):
+    content = []
+    for i in range(n):
+        if i == references_at:
+            content.append({"text": "References", "text_level": 1, "page_idx": 9})
+            continue
+        text = f"item {i} randomized" if i % 3 == 0 else f"item {i}"
+        if i % long_every == 0:
+            text = text + " " + "x" * 120
+        content.append({"text": text, "page_idx": i // 5})
+    return content
+
+
+def oracle(item):
+    time.sleep(0.005)
+    return "randomized" in item["text"]
+
+
+def test_filter_relevant_concurrent_matches_serial():
+    content = make_content(40, references_at=31)
+    serial = EntryAgent(max_concurrency=1)
+    concurrent = EntryAgent(max_concurrency=8)
+    with patch.object(serial, "is_relevant_llm", side_effect=oracle), patch.object(
+        concurrent, "is_relevant_llm", side_effect=oracle
+    ) as mocked:
+        expected = serial.filter_relevant(content)
+        result = concurrent.filter_relevant(content)
+    assert result == expected
+    assert all(item["text"] != "References" for item in result)
+    # 参考文献之后的内容不会被评估
+    evaluated = "\n".join(call.args[0]["text"] for call in mocked.call_args_list)
+    assert not re.search(r"item 3[2-9]", evaluated)
+
+
+def test_filter_relevant_respects_concurrency_limit():
+    active = 0
+    peak = 0
+    lock = threading.Lock()
+
+    def slow(item):
+        nonlocal active, peak
+        with lock:
+            active += 1
+            peak = max(peak, active)
+        time.sleep(0.01)
+        with lock:
+            active -= 1
+        return False
+
+    agent = EntryAgent(max_concurrency=3)
+    with patch.object(agent, "is_relevant_llm", side_effect=slow):
+        assert agent.filter_relevant(make_content(30, long_every=1)) == []
+    assert peak == 3
+
+
+def test_invalid_concurrency():
+    with pytest.raises(ValueError):
+        EntryAgent(max_concurrency=0)
+
+
+def fake_multi_llm(prompt, **kwargs):
+    # 按提示词中的编号段落回答：含 randomized 的段落相关
+    passages = re.findall(r"^\[(\d+)\] (.*)$", prompt, re.MULTILINE)
+    return RelevantPassages(
+        relevant_ids=[int(n) for n, text in passages if "randomized" in text]
+    )
+
+
+def test_multi_passage_mode_keeps_per_passage_verdicts():
+    content = make_content(30, references_at=25)
+    agent = EntryAgent(
+        context_window=0, classification_mode="multi", passage_token_budget=100
+    )
+    with patch(
+        "rob2_evaluator.agents.entry_agent.call_llm", side_effect=fake_multi_llm
+    ) as mocked:
+        result = agent.filter_relevant(content)
+
+    assert [item["text"].split()[1] for item in result] == [
+        str(i) for i in range(0, 25, 3)
+    ]
+    # 25 项被装入少量按预算切分的调用
+    assert 1 < mocked.call_count < 25
+
+
+def test_multi_passage_mode_single_call_when_budget_allows(sample_content):
+    agent = EntryAgent(context_window=0, classification_mode="multi")
+    with patch(
+        "rob2_evaluator.agents.entry_agent.call_llm",
+        return_value=RelevantPassages(relevant_ids=[2, 7]),
+    ) as mocked:
+        result = agent.filter_relevant(sample_content)
+    mocked.assert_called_once()
+    assert mocked.call_args.kwargs["pydantic_model"] is RelevantPassages
+    assert result == [sample_content[1]]
+
+
+def test_group_by_token_budget():
+    items = [{"text": "x" * 40}] * 5 + [{"text": "y" * 400}] + [{"text": "z"}]
+    groups = group_by_token_budget(items, list(range(7)), budget=25, max_items=10)
+    assert groups == [[0, 1], [2, 3], [4], [5], [6]]
+    assert group_by_token_budget(items, [0, 1, 2], budget=1000, max_items=2) == [
+        [0, 1],
+        [2],
+    ]
+
+
+def test_invalid_classification_mode():
+    with pytest.raises(ValueError):
+        EntryAgent(classification_mode="batch")
+
+
+def test_prefilter_only_sends_uncertain_items_to_llm():
+    content = [
+        {"text": "Department of Medicine, University Hospital. Correspondence: a@b.org " + "x" * 100},
+        {"text": "Participants were randomly assigned and outcome assessors were blinded. " + "x" * 100},
+        {"text": "Alcohol consumption was recorded with the Form-90 interview at each visit. " + "x" * 100},
+    ]
+    agent = EntryAgent(context_window=0, prefilter=LexicalPreFilter())
+    with patch.object(agent, "is_relevant_llm", return_value=True) as mocked:
+        result = agent.filter_relevant(content)
+
+    mocked.assert_called_once_with(content[2])
+    assert result == content[1:]
+    assert agent.stats.candidates == 3
+    assert agent.stats.auto_accepted == 1
+    assert agent.stats.auto_rejected == 1
+    assert agent.stats.llm_calls == 1
+    assert agent.stats.locally_decided_ratio == pytest.approx(2 / 3)
+
+
+def test_section_routing_skips_llm_for_decided_sections():
+    content = [
+        {"text": "Abstract: participants were randomized " + "x" * 100, "headings": ["Abstract"]},
+        {"text": "Alcoholism is a public health problem " + "x" * 100, "headings": ["Introduction"]},
+        {"text": "Allocation used sealed envelopes " + "x" * 100, "headings": ["Methods", "Allocation"]},
+        {"text": "Future trials are needed " + "x" * 100, "headings": ["Discussion"]},
+        {"text": "Smith J. A trial. 1999.", "headings": ["References"]},
+    ]
+    agent = EntryAgent(context_window=0, section_router=SectionRouter())
+    with patch.object(agent, "is_relevant_llm", return_value=True) as mocked:
+        result = agent.filter_relevant(content)
+
+    mocked.assert_called_once_with(content[0])
+    assert result == [content[0], content[2]]
+    assert agent.stats.candidates == 4
+    assert agent.stats.section_included == 1
+    assert agent.stats.section_excluded == 2
+    assert agent.stats.locally_decided == 3
+
+
+def test_references_detected_from_docling_headings():
+    agent = EntryAgent()
+    assert agent.is_references_section({"text": "Smith J.", "headings": ["References"]})
+    assert not agent.is_references_section({"text": "x", "headings": ["Methods"]})
+
+
+@pytest.mark.parametrize("mode", ["single", "multi"])
+def test_verdict_cache_makes_rerun_free(tmp_path, mode):
+    content = make_content(30, references_at=25)
+    cache = RelevanceCache(str(tmp_path / "relevance.sqlite"))
+    llm = fake_multi_llm if mode == "multi" else (lambda prompt, **kwargs: "no")
+
+    first = EntryAgent(classification_mode=mode, verdict_cache=cache)
+    with patch(
+        "rob2_evaluator.agents.entry_agent.call_llm", side_effect=llm
+    ) as mocked:
+        expected = first.filter_relevant(content)
+    assert mocked.call_count > 0
+
+    # 新的 EntryAgent（如修改领域提示词后重跑）共享同一缓存
+    second = EntryAgent(classification_mode=mode, verdict_cache=cache)
+    with patch(
+        "rob2_evaluator.agents.entry_agent.call_llm", side_effect=llm
+    ) as mocked:
+        assert second.filter_relevant(content) == expected
+    mocked.assert_not_called()
+    assert second.stats.cache_hits == second.stats.candidates
+    assert second.stats.llm_calls == 0
+
+
+@pytest.mark.parametrize("mode", ["single", "multi"])
+def test_fallback_verdicts_are_not_cached(tmp_path, mode):
+    content = make_content(30, references_at=25)
+    cache = RelevanceCache(str(tmp_path / "relevance.sqlite"))
+    default = RelevantPassages(relevant_ids=[]) if mode == "multi" else "no"
+
+    def failing_llm(prompt, model_name="gpt-4o", model_provider="OpenAI", **kwargs):
+        return _fallback(default, model_name, model_provider, "API unavailable")
+
+    agent = EntryAgent(classification_mode=mode, verdict_cache=cache)
+    with patch("rob2_evaluator.agents.entry_agent.call_llm", side_effect=failing_llm):
+        kept = agent.filter_relevant(content)
+    assert agent.stats.llm_fallbacks == agent.stats.llm_calls > 0
+    assert len(cache) == 0
+    # 失败的单元不当作无关丢弃，全部交给领域评估
+    assert all(item in kept for item in content[:25])
+
+
+def test_verdict_cache_shared_across_documents(tmp_path):
+    # 不同文档中的相同样板文本只判断一次
+    boilerplate = {"text": "This trial was registered at ClinicalTrials.gov. " * 4}
+    cache = RelevanceCache(str(tmp_path / "relevance.sqlite"))
+    agent = EntryAgent(verdict_cache=cache)
+    with patch.object(agent, "is_relevant_llm", return_value=True) as mocked:
+        agent.filter_relevant([{"text": "Paper A " + "x" * 120}, boilerplate])
+        agent.filter_relevant([{"text": "Paper B " + "y" * 120}, boilerplate])
+    assert mocked.call_count == 3
+    assert agent.stats.cache_hits == 1
@@ -0,0 +1,140 @@
+import threading
+import time
+from contextlib import contextmanager
+from unittest.mock import MagicMock, patch
+
+import pytest
+from rob2_evaluator.services.evaluation_service import EvaluationService
+
+
+class SlowAgent:
+    def __init__(self, name, barrier=None, delay=0.0):
+        self.name = name
+        self.barrier = barrier
+        self.delay = delay
+
+    def evaluate(self, items):
+        if self.barrier is not None:
+            # 所有领域必须同时处于执行中才能通过屏障
+            self.barrier.wait(timeout=2)
+        time.sleep(self.delay)
+        return {"domain": self.name, "overall": {"risk": "Low risk"}}
+
+
+def make_service(**kwargs):
+    analysis_type_agent = MagicMock()
+    analysis_type_agent.infer_analysis_type.return_value = "assignment"
+    return EvaluationService(analysis_type_agent=analysis_type_agent, **kwargs)
+
+
+@contextmanager
+def patch_factory(agents):
+    """同时替换串行与重叠两种执行模式使用的工厂方法，agents[1] 为 Domain 2"""
+    factory = "rob2_evaluator.services.evaluation_service.DomainAgentFactory"
+    with patch(f"{factory}.create_agents", return_value=list(agents)), patch(
+        f"{factory}.create_base_agents", return_value=[agents[0], *agents[2:]]
+    ), patch(f"{factory}.create_deviation_agent", return_value=agents[1]) as dev:
+        yield dev
+
+
+def test_domains_run_concurrently_in_factory_order():
+    barrier = threading.Barrier(5)
+    # 靠前的领域更慢，验证结果仍按工厂顺序返回
+    agents = [SlowAgent(f"D{i}", barrier, delay=(5 - i) * 0.01) for i in range(5)]
+    service = make_service()
+    with patch_factory(agents):
+        results = service.evaluate([{"text": "x"}])
+
+    assert [r["domain"] for r in results] == [
+        "D0",
+        "D1",
+        "D2",
+        "D3",
+        "D4",
+        "Overall risk of bias",
+    ]
+    assert results[-1]["judgement"]["overall"] == "Low risk"
+
+
+def test_parallelism_cap_is_respected():
+    active = 0
+    peak = 0
+    lock = threading.Lock()
+
+    class CountingAgent(SlowAgent):
+        def evaluate(self, items):
+            nonlocal active, peak
+            with lock:
+                active += 1
+                peak = max(peak, active)
+            time.sleep(0.02)
+            with lock:
+                active -= 1
+            return super().evaluate(items)
+
+    for overlap in (True, False):
+        peak = 0
+        service = make_service(max_parallel_domains=2, overlap_analysis_type=overlap)
+        with patch_factory([CountingAgent(f"D{i}") for i in range(5)]):
+            service.evaluate([])
+        assert peak == 2
+
+
+def test_domain_error_propagates():
+    failing = MagicMock()
+    failing.evaluate.side_effect = RuntimeError("LLM Error")
+    service = make_service()
+    with patch_factory([SlowAgent("D0"), failing]):
+        with pytest.raises(RuntimeError, match="LLM Error"):
+            service.evaluate([])
+
+
+def test_analysis_type_overlaps_with_independent_domains():
+    base_started = threading.Barrier(5)
+    analysis_done = threading.Event()
+    deviation_started_early = []
+
+    def infer(items):
+        # 四个与分析类型无关的领域必须与分析类型推断同时运行
+        base_started.wait(timeout=2)
+        analysis_done.set()
+        return "adherence"
+
+    class DeviationAgent(SlowAgent):
+        def evaluate(self, items):
+            deviation_started_early.append(not analysis_done.is_set())
+            return super().evaluate(items)
+
+    service = make_service()
+    service.analysis_type_agent.infer_analysis_type.side_effect = infer
+    agents = [SlowAgent("D0", base_started), DeviationAgent("D2")]
+    agents += [SlowAgent(f"D{i}", base_started) for i in (3, 4, 5)]
+    with patch_factory(agents) as create_deviation_agent:
+        results = service.evaluate([])
+
+    create_deviation_agent.assert_called_once()
+    assert create_deviation_agent.call_args.args[0] == "adherence"
+    assert deviation_started_early == [False]
+    assert [r["domain"] for r in results[:5]] == ["D0", "D2", "D3", "D4", "D5"]
+
+
+def test_serial_mode_infers_analysis_type_first():
+    calls = []
+    service = make_service(max_parallel_domains=1)
+    service.analysis_type_agent.infer_analysis_type.side_effect = (
+        lambda items: calls.append("analysis") or "assignment"
+    )
+
+    class RecordingAgent(SlowAgent):
+        def evaluate(self, items):
+            calls.append(self.name)
+            return super().evaluate(items)
+
+    with patch_factory([RecordingAgent(f"D{i}") for i in range(5)]):
+        service.evaluate([])
+    assert calls == ["analysis", "D0", "D1", "D2", "D3", "D4"]
+
+
+def test_invalid_parallelism():
+    with pytest.raises(ValueError):
+        make_service(max_parallel_domains=0)
@@ -0,0 +1,84 @@
+import time
+
+from rob2_evaluator.retrieval import EvidenceAligner
+
+ITEMS = [
+    {"text": "Background: alcohol use disorder is common in primary care.", "page_idx": 0},
+    {"text": "Participants were randomly assigned using a computer-generated sequence stratified by site.", "page_idx": 2},
+    {"text": "Outcome assessors were blinded to treatment allocation throughout follow-up.", "page_idx": 4},
+]
+
+
+def test_locates_quotes_and_corrects_page():
+    aligner = EvidenceAligner(ITEMS)
+    aligned = aligner.align(
+        {"text": "participants were randomly assigned using a computer generated sequence", "page_idx": 7}
+    )
+    assert aligned["verified"] is True
+    assert aligned["page_idx"] == 2
+    assert aligned["match_score"] == 1.0
+
+    # 缺失页码时补全
+    assert aligner.align({"text": "assessors were blinded to treatment", "page_idx": -1})["page_idx"] == 4
+
+
+def test_paraphrase_is_flagged_but_page_kept():
+    aligned = EvidenceAligner(ITEMS).align(
+        {"text": "The investigators concealed allocation with sealed envelopes", "page_idx": 3}
+    )
+    assert aligned["verified"] is False
+    assert aligned["page_idx"] == 3
+    assert aligned["match_score"] < 0.6
+
+
+def test_short_quotes_and_empty_text():
+    aligner = EvidenceAligner(ITEMS)
+    assert aligner.locate("blinded") == (2, 1.0)
+    assert aligner.locate("") == (None, 0.0)
+    # 两个词须在同一段落中相邻
+    assert aligner.locate("to treatment") == (2, 1.0)
+    assert aligner.locate("blinded site") == (None, 0.0)
+    assert aligner.locate("unseen") == (None, 0.0)
+
+
+def test_non_ascii_quotes_are_located():
+    items = [
+        {"text": "Les patients ont été répartis aléatoirement par ordinateur.", "page_idx": 0},
+        {"text": "Die Randomisierung erfolgte durch einen unabhängigen Statistiker.", "page_idx": 1},
+        {"text": "采用计算机生成的随机数字表进行分组，分配方案由独立人员保管。", "page_idx": 3},
+    ]
+    aligner = EvidenceAligner(items)
+    assert aligner.locate("ÉTÉ RÉPARTIS ALÉATOIREMENT") == (0, 1.0)
+    assert aligner.locate("durch einen unabhängigen Statistiker") == (1, 1.0)
+    assert aligner.locate("随机数字表进行分组") == (2, 1.0)
+    assert aligner.locate("été répartis par tirage au sort")[1] < 0.6
+
+
+def test_align_result_updates_signals_and_overall():
+    result = {
+        "signals": {"q1_1": {"answer": "Y", "evidence": [{"text": "computer-generated sequence stratified by site", "page_idx": -1}]}},
+        "overall": {"risk": "Low risk", "evidence": [{"text": "invented quote about nothing", "page_idx": 1}]},
+    }
+    EvidenceAligner(ITEMS).align_result(result)
+    assert result["signals"]["q1_1"]["evidence"][0]["page_idx"] == 2
+    assert result["overall"]["evidence"][0]["verified"] is False
+
+
+def test_lookup_cost_does_not_scan_document():
+    items = [{"text": f"passage {i} " + " ".join(f"w{i}_{j}" for j in range(60)), "page_idx": i} for i in range(3000)]
+    aligner = EvidenceAligner(items)
+    quote = " ".join(f"w2500_{j}" for j in range(10, 30))
+    start = time.perf_counter()
+    for _ in range(100):
+        idx, score = aligner.locate(quote)
+    elapsed = (time.perf_counter() - start) / 100
+    assert (idx, score) == (2500, 1.0)
+    assert elapsed < 0.005
+
+    # 不足 n 个词的短引用同样只访问倒排表
+    start = time.perf_counter()
+    for _ in range(100):
+        idx, score = aligner.locate("w2999_58 w2999_59")
+    elapsed = (time.perf_counter() - start) / 100
+    assert (idx, score) == (2999, 1.0)
+    assert elapsed < 0.001
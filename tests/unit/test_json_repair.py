@@ -0,0 +1,160 @@
+import json
+from unittest.mock import MagicMock, patch
+
+import pytest
+from langchain_core.messages import AIMessage, AIMessageChunk
+from rob2_evaluator.schema.rob2_schema import (
+    DOMAIN_SCHEMAS,
+    GenericDomainJudgement,
+    RelevantPassages,
+    SignalsOnlyJudgement,
+)
+from rob2_evaluator.utils.json_repair import parse_json_response, strip_reasoning
+from rob2_evaluator.utils.json_stream import DomainStreamValidator
+from rob2_evaluator.utils.llm import call_llm, extract_json_from_response
+from rob2_evaluator.utils.usage import UsageTracker, usage_tracker
+
+SCHEMA = DOMAIN_SCHEMAS["randomization"]
+
+EXPECTED = {"relevant_ids": [1, 2], "note": "a {b} c"}
+
+
+@pytest.fixture(autouse=True)
+def reset_usage():
+    usage_tracker.reset()
+    yield
+    usage_tracker.reset()
+
+
+@pytest.mark.parametrize(
+    "text",
+    [
+        '<think>maybe {"relevant_ids": []}?</think>\n{"relevant_ids": [1, 2], "note": "a {b} c"}',
+        '```\n{"relevant_ids": [1, 2], "note": "a {b} c"}\n```',
+        'Sure! The answer is {"relevant_ids": [1, 2], "note": "a {b} c"} as requested.',
+        '```json\n{"relevant_ids": [1, 2,], "note": "a {b} c",}\n```',
+        '{\n  // ids of the passages\n  "relevant_ids": [1, 2], /* done */ "note": "a {b} c"\n}',
+        '{"relevant_ids": [1, 2], "note": "a {b} c"',
+        '{"relevant_ids": [1, 2], "note": "a {b} c',
+        '{"relevant_ids": [1, 2], "note": "a {b} c", "extra": tr',
+    ],
+    ids=["think", "bare-fence", "prose", "trailing-comma", "comments", "brace", "string", "literal"],
+)
+def test_malformed_responses_are_repaired(text):
+    data, repaired = parse_json_response(text)
+    assert {key: data[key] for key in EXPECTED} == EXPECTED
+    assert repaired
+
+
+@pytest.mark.parametrize(
+    "text", ['{"relevant_ids": [1]}', 'Result:\n```json\n{"relevant_ids": [1]}\n```']
+)
+def test_well_formed_responses_are_not_counted_as_repaired(text):
+    assert parse_json_response(text) == ({"relevant_ids": [1]}, False)
+
+
+def test_unparseable_responses_raise():
+    with pytest.raises(ValueError):
+        parse_json_response("I cannot answer that.")
+    assert extract_json_from_response("I cannot answer that.") is None
+
+
+def test_strip_reasoning_removes_unclosed_think_block():
+    assert strip_reasoning("<think>The trial says</think>\nyes ") == "yes"
+    assert strip_reasoning("<think>still thinking") == ""
+
+
+def test_repair_rate_is_tracked_per_model():
+    tracker = UsageTracker()
+    tracker.record_json("deepseek-reasoner", repaired=True)
+    tracker.record_json("deepseek-reasoner", repaired=False)
+    tracker.record_json("gpt-4o", repaired=False)
+
+    assert tracker.get("deepseek-reasoner").json_repair_rate == 0.5
+    assert tracker.summary()["gpt-4o"]["json_repair_rate"] == 0.0
+    assert tracker.total().json_repairs == 1
+
+
+def test_markdown_model_response_is_repaired_without_retry():
+    llm = MagicMock()
+    llm.invoke.return_value = AIMessage(
+        content='<think>passage 3 mentions allocation</think>\n```\n{"relevant_ids": [3],}\n```'
+    )
+    with patch("rob2_evaluator.llm.models.get_model", return_value=llm):
+        result = call_llm(
+            "prompt", "deepseek-reasoner", "DeepSeek", pydantic_model=RelevantPassages
+        )
+
+    assert result.relevant_ids == [3]
+    assert llm.invoke.call_count == 1
+    assert usage_tracker.get("deepseek-reasoner").json_repairs == 1
+
+
+def test_structured_output_parsing_error_is_repaired_from_raw_text():
+    llm = MagicMock()
+    llm.with_structured_output.return_value.invoke.return_value = {
+        "raw": AIMessage(content='{"relevant_ids": [4, 5]'),
+        "parsed": None,
+        "parsing_error": ValueError("Invalid json output"),
+    }
+    with patch("rob2_evaluator.llm.models.get_model", return_value=llm):
+        result = call_llm("prompt", "gpt-4o", "OpenAI", pydantic_model=RelevantPassages)
+
+    assert result.relevant_ids == [4, 5]
+    assert llm.with_structured_output.return_value.invoke.call_count == 1
+    usage = usage_tracker.get("gpt-4o")
+    assert (usage.json_responses, usage.json_repairs) == (1, 1)
+
+
+def judgement():
+    return {
+        "signals": {
+            signal["id"]: {"answer": "Y", "reason": "r", "evidence": []}
+            for signal in SCHEMA["signals"]
+        },
+        "overall": {"risk": "Low risk", "reason": "r", "evidence": []},
+    }
+
+
+def test_truncated_stream_is_repaired_without_retry():
+    # 输出在最后两个闭合括号之前结束
+    text = json.dumps(judgement())[:-2]
+    llm = MagicMock()
+    llm.stream.return_value = iter(
+        [AIMessageChunk(content=text[i : i + 20]) for i in range(0, len(text), 20)]
+    )
+    with patch("rob2_evaluator.llm.models.get_model", return_value=llm):
+        result = call_llm(
+            "prompt",
+            "gpt-4o",
+            "OpenAI",
+            pydantic_model=GenericDomainJudgement,
+            domain_key="randomization",
+            stream_validator=DomainStreamValidator(SCHEMA),
+        )
+
+    assert result.overall.risk == "Low risk"
+    assert llm.stream.call_count == 1
+    assert usage_tracker.get("gpt-4o").json_repairs == 1
+
+
+def test_truncated_judgement_missing_signals_is_retried():
+    text = json.dumps({"signals": judgement()["signals"]})
+    # 输出在第三个信号问题的键名中间结束，回退后只剩 q1_1、q1_2
+    partial = text[: text.index('"q1_3"') + 4]
+    llm = MagicMock()
+    llm.invoke.side_effect = [AIMessage(content=partial), AIMessage(content=text)]
+    with patch("rob2_evaluator.llm.models.get_model", return_value=llm), patch(
+        "rob2_evaluator.utils.llm.time.sleep"
+    ):
+        result = call_llm(
+            "prompt",
+            "deepseek-reasoner",
+            "DeepSeek",
+            pydantic_model=SignalsOnlyJudgement,
+            domain_key="randomization",
+        )
+
+    assert llm.invoke.call_count == 2
+    assert set(result.signals) == {"q1_1", "q1_2", "q1_3"}
+    assert usage_tracker.get("deepseek-reasoner").json_repairs == 0
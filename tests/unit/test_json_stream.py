@@ -0,0 +1,111 @@
+import json
+from unittest.mock import MagicMock, patch
+
+import pytest
+from langchain_core.messages import AIMessageChunk
+from rob2_evaluator.agents.domain_agent import DomainAgent
+from rob2_evaluator.schema.rob2_schema import DOMAIN_SCHEMAS, GenericDomainJudgement
+from rob2_evaluator.utils.json_stream import (
+    DomainStreamValidator,
+    IncrementalJSONParser,
+    StreamAborted,
+)
+from rob2_evaluator.utils.llm import call_llm
+
+SCHEMA = DOMAIN_SCHEMAS["randomization"]
+
+
+def judgement(answer="Y", risk="Low risk"):
+    return {
+        "signals": {
+            signal["id"]: {
+                "answer": answer,
+                "reason": 'quoted "text" with \\ backslash',
+                "evidence": [{"text": "randomized", "page_idx": 2}],
+            }
+            for signal in SCHEMA["signals"]
+        },
+        "overall": {"risk": risk, "reason": "r", "evidence": []},
+    }
+
+
+def feed_in_chunks(parser, text, size=5):
+    for i in range(0, len(text), size):
+        parser.feed(text[i : i + size])
+
+
+def test_parser_reassembles_chunked_json_and_reports_signals():
+    seen = []
+    validator = DomainStreamValidator(SCHEMA, on_signal=lambda sid, data: seen.append(sid))
+    parser = IncrementalJSONParser(validator)
+    text = "Here is the result:\n```json\n" + json.dumps(judgement(), indent=2) + "\n```"
+    feed_in_chunks(parser, text)
+
+    assert parser.done
+    assert parser.result == judgement()
+    assert seen == ["q1_1", "q1_2", "q1_3"]
+
+
+@pytest.mark.parametrize(
+    "partial, reason",
+    [
+        ('{"signal": {', "unexpected key"),
+        ('{"signals": {"q9_9": {', "unexpected key"),
+        ('{"signals": {"q1_1": {"answer": "Probably", ', "invalid answer"),
+        ('{"signals": {}, "overall": {"risk": "Unclear"', "invalid risk"),
+        ('{"signals": {"q1_1": {"reason": "' + "x" * 5000, "runaway"),
+        ('{"signals": {"q1_1": {"answer": "Y"]', "invalid JSON"),
+    ],
+)
+def test_validator_aborts_clearly_invalid_output(partial, reason):
+    parser = IncrementalJSONParser(DomainStreamValidator(SCHEMA))
+    with pytest.raises(StreamAborted, match=reason):
+        feed_in_chunks(parser, partial, size=50)
+
+
+def test_rules_mode_rejects_overall_block():
+    parser = IncrementalJSONParser(DomainStreamValidator(SCHEMA, include_overall=False))
+    with pytest.raises(StreamAborted):
+        parser.feed('{"signals": {}, "overall": {')
+
+
+def stream_of(text, consumed, size=20):
+    def generate():
+        for i in range(0, len(text), size):
+            consumed.append(i)
+            yield AIMessageChunk(content=text[i : i + size])
+
+    return generate()
+
+
+def test_call_llm_aborts_bad_stream_early_and_retries():
+    bad = json.dumps(judgement(answer="Probably")) + " " * 2000
+    good = json.dumps(judgement())
+    consumed_bad, consumed_good = [], []
+    llm = MagicMock()
+    llm.stream.side_effect = [stream_of(bad, consumed_bad), stream_of(good, consumed_good)]
+
+    with patch("rob2_evaluator.llm.models.get_model", return_value=llm):
+        result = call_llm(
+            "prompt",
+            "gpt-4o",
+            "OpenAI",
+            pydantic_model=GenericDomainJudgement,
+            stream_validator=DomainStreamValidator(SCHEMA),
+        )
+
+    assert isinstance(result, GenericDomainJudgement)
+    assert result.overall.risk == "Low risk"
+    # 第一次生成在第一个非法答案处中止，没有读完
+    assert len(consumed_bad) < len(bad) // 20
+    assert llm.stream.call_count == 2
+
+
+def test_domain_agent_streams_when_enabled():
+    agent = DomainAgent("randomization", stream=True)
+    with patch(
+        "rob2_evaluator.agents.domain_agent.call_llm",
+        return_value=GenericDomainJudgement(**judgement()),
+    ) as mocked:
+        agent.evaluate([{"text": "x", "page_idx": 0}])
+    assert isinstance(mocked.call_args.kwargs["stream_validator"], DomainStreamValidator)
@@ -0,0 +1,201 @@
+import asyncio
+import threading
+import time
+from unittest.mock import MagicMock, patch
+
+import httpx
+import pytest
+from langchain_core.messages import AIMessage
+from rob2_evaluator.llm import models
+from rob2_evaluator.utils.latency import HedgePolicy, LatencyTracker
+from rob2_evaluator.utils.llm import acall_llm, call_llm, set_hedge_policy
+from rob2_evaluator.utils.resilience import (
+    CircuitBreaker,
+    CircuitBreakerRegistry,
+    ProviderConcurrency,
+)
+from rob2_evaluator.utils.usage import usage_tracker
+
+
+def test_percentiles_need_enough_samples():
+    tracker = LatencyTracker(min_samples=5, min_timeout=1, max_timeout=60)
+    for seconds in (1, 2, 3, 4):
+        tracker.record("m", seconds)
+    assert tracker.percentile("m") is None
+    assert tracker.timeout_for("m") == 60
+
+    tracker.record("m", 10)
+    assert tracker.percentile("m", 0.5) == 3
+    assert tracker.percentile("m", 0.95) == 10
+    assert tracker.timeout_for("m") == 30
+    assert HedgePolicy().delay_for("m", tracker) == 10
+    assert HedgePolicy(delay=0.5).delay_for("other", tracker) == 0.5
+
+
+def test_timeouts_are_clamped_and_window_slides():
+    tracker = LatencyTracker(window=3, min_samples=1, min_timeout=2, max_timeout=20)
+    tracker.record("m", 0.1)
+    assert tracker.timeout_for("m") == 2
+    for _ in range(3):
+        tracker.record("m", 100)
+    assert tracker.timeout_for("m") == 20
+    with pytest.raises(ValueError):
+        LatencyTracker(min_timeout=10, max_timeout=1)
+
+
+@pytest.fixture
+def isolated():
+    tracker = LatencyTracker(min_samples=3, min_timeout=0.05, max_timeout=2)
+    usage_tracker.reset()
+    with patch("rob2_evaluator.utils.llm.latency_tracker", tracker), patch(
+        "rob2_evaluator.utils.llm.circuit_breakers", CircuitBreakerRegistry()
+    ), patch(
+        "rob2_evaluator.utils.llm.provider_concurrency", ProviderConcurrency()
+    ), patch("rob2_evaluator.utils.llm.backoff_delay", return_value=0):
+        yield tracker
+    set_hedge_policy(None)
+    usage_tracker.reset()
+
+
+def test_hedged_request_wins_over_a_stuck_one(isolated):
+    release = threading.Event()
+    calls = []
+
+    def invoke(prompt):
+        calls.append(prompt)
+        if len(calls) == 1:
+            release.wait(5)
+            return AIMessage(content="late")
+        return AIMessage(content="hedged")
+
+    llm = MagicMock()
+    llm.invoke.side_effect = invoke
+    set_hedge_policy(HedgePolicy(delay=0.05))
+    try:
+        with patch("rob2_evaluator.llm.models.get_model", return_value=llm):
+            assert call_llm("p", "gpt-4o", "OpenAI") == "hedged"
+        # 第一个请求仍未返回
+        assert not release.is_set() and calls == ["p", "p"]
+    finally:
+        release.set()
+    assert usage_tracker.get("gpt-4o").hedges == 1
+
+
+def test_stuck_request_times_out_and_falls_back(isolated):
+    threads = []
+
+    def invoke(prompt):
+        # 模拟传输层：请求在截止时间被关闭
+        threads.append(threading.current_thread())
+        time.sleep(max(models._request_deadline.get() - time.monotonic(), 0))
+        raise httpx.ReadTimeout("timed out")
+
+    llm = MagicMock()
+    llm.invoke.side_effect = invoke
+    # 观测到的 p95 很小，超时收紧到 min_timeout
+    for _ in range(3):
+        isolated.record("gpt-4o", 0.001)
+    with patch("rob2_evaluator.llm.models.get_model", return_value=llm):
+        assert call_llm("p", "gpt-4o", "OpenAI", max_retries=2) == "no"
+    # 未启用对冲时请求在调用方线程上发出
+    assert threads == [threading.current_thread()] * 2
+    usage = usage_tracker.get("gpt-4o")
+    assert usage.timeouts == 2 and usage.fallbacks == 1
+
+
+def test_unbounded_client_times_out_on_a_worker_thread(isolated):
+    # Anthropic 客户端的传输层不受截止时间约束，仍由工作线程计时
+    release = threading.Event()
+    llm = MagicMock()
+    llm.invoke.side_effect = lambda prompt: release.wait(5)
+    for _ in range(3):
+        isolated.record("claude-3-5-haiku-latest", 0.001)
+    try:
+        with patch("rob2_evaluator.llm.models.get_model", return_value=llm):
+            result = call_llm("p", "claude-3-5-haiku-latest", "Anthropic", max_retries=1)
+        assert result == "no" and not release.is_set()
+    finally:
+        release.set()
+    assert usage_tracker.get("claude-3-5-haiku-latest").timeouts == 1
+
+
+def test_async_hedge_to_secondary_cancels_the_loser(isolated):
+    cancelled = []
+
+    async def slow(prompt):
+        try:
+            await asyncio.sleep(5)
+        except asyncio.CancelledError:
+            cancelled.append(True)
+            raise
+
+    async def fast(prompt):
+        return AIMessage(content="secondary")
+
+    primary, secondary = MagicMock(), MagicMock()
+    primary.ainvoke.side_effect = slow
+    secondary.ainvoke.side_effect = fast
+    clients = {"gpt-4o": primary, "claude-3-5-haiku-latest": secondary}
+    set_hedge_policy(
+        HedgePolicy(delay=0.02, secondary=("claude-3-5-haiku-latest", "Anthropic"))
+    )
+    with patch(
+        "rob2_evaluator.llm.models.get_model",
+        side_effect=lambda name, provider, **params: clients[name],
+    ):
+        assert asyncio.run(acall_llm("p", "gpt-4o", "OpenAI")) == "secondary"
+    assert cancelled == [True]
+    assert isolated.percentile("claude-3-5-haiku-latest", 0.5) is None
+
+
+def test_async_adaptive_timeout(isolated):
+    async def hang(prompt):
+        await asyncio.sleep(5)
+
+    llm = MagicMock()
+    llm.ainvoke.side_effect = hang
+    for _ in range(3):
+        isolated.record("gpt-4o", 0.001)
+    with patch("rob2_evaluator.llm.models.get_model", return_value=llm):
+        assert asyncio.run(acall_llm("p", "gpt-4o", "OpenAI", max_retries=2)) == "no"
+    assert usage_tracker.get("gpt-4o").timeouts == 2
+
+
+@pytest.mark.parametrize("use_async", [False, True], ids=["sync", "async"])
+def test_losing_half_open_hedge_releases_the_probe(isolated, use_async):
+    breakers = CircuitBreakerRegistry(failure_threshold=1, reset_timeout=0.05)
+    secondary_breaker = breakers.get("Anthropic")
+    secondary_breaker.record_failure()
+    time.sleep(0.06)
+    release = threading.Event()
+
+    async def aslow(prompt):
+        await asyncio.sleep(0.2)
+        return AIMessage(content="primary")
+
+    async def ahang(prompt):
+        await asyncio.sleep(5)
+
+    primary, secondary = MagicMock(), MagicMock()
+    primary.invoke.side_effect = lambda prompt: time.sleep(0.2) or AIMessage(content="primary")
+    secondary.invoke.side_effect = lambda prompt: release.wait(5)
+    primary.ainvoke.side_effect = aslow
+    secondary.ainvoke.side_effect = ahang
+    clients = {"gpt-4o": primary, "claude-3-5-haiku-latest": secondary}
+    set_hedge_policy(
+        HedgePolicy(delay=0.02, secondary=("claude-3-5-haiku-latest", "Anthropic"))
+    )
+    try:
+        with patch(
+            "rob2_evaluator.llm.models.get_model",
+            side_effect=lambda name, provider, **params: clients[name],
+        ), patch("rob2_evaluator.utils.llm.circuit_breakers", breakers):
+            if use_async:
+                assert asyncio.run(acall_llm("p", "gpt-4o", "OpenAI")) == "primary"
+            else:
+                assert call_llm("p", "gpt-4o", "OpenAI") == "primary"
+    finally:
+        release.set()
+    assert usage_tracker.get("gpt-4o").hedges == 1
+    # 落败的对冲请求占用的探测名额已释放，下一个调用可以探测
+    assert secondary_breaker.admit() == CircuitBreaker.HALF_OPEN
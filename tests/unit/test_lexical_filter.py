@@ -0,0 +1,42 @@
+import numpy as np
+import pytest
+from rob2_evaluator.retrieval import BM25Index, LexicalPreFilter, tokenize
+
+ITEMS = [
+    {"text": "Department of Internal Medicine, Yale University School of Medicine, New Haven. Correspondence: j.doe@yale.edu"},
+    {"text": "This work was funded by grant AA-123 from the National Institute on Alcohol Abuse. The authors declare no conflicts of interest."},
+    {"text": "Participants were randomly assigned using a computer-generated sequence; allocation was concealed in sealed opaque envelopes."},
+    {"text": "Outcome assessors were blinded to group allocation and analyses followed the intention-to-treat principle."},
+    {"text": "Alcohol consumption was recorded with the Form-90 interview at each visit."},
+]
+
+
+def test_tokenize_keeps_hyphenated_words():
+    assert tokenize("Intention-to-treat analysis, N=952.") == [
+        "intention-to-treat",
+        "analysis",
+        "n",
+        "952",
+    ]
+
+
+def test_bm25_ranks_matching_documents_first():
+    index = BM25Index(["allocation concealment envelopes", "funding statement", ""])
+    scores = index.scores("allocation concealment")
+    assert scores.shape == (3,)
+    assert scores[0] > 0
+    assert np.all(scores[1:] == 0)
+    assert BM25Index([]).scores("anything").size == 0
+
+
+def test_prefilter_accepts_rejects_and_defers():
+    decisions = LexicalPreFilter().decide(ITEMS)
+    assert decisions == [False, False, True, True, None]
+
+
+def test_prefilter_thresholds_are_configurable():
+    # 阈值放宽后全部交给 LLM
+    prefilter = LexicalPreFilter(accept_threshold=100, reject_threshold=-100)
+    assert prefilter.decide(ITEMS) == [None] * len(ITEMS)
+    with pytest.raises(ValueError):
+        LexicalPreFilter(accept_threshold=1.0, reject_threshold=1.0)
@@ -0,0 +1,114 @@
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch
+
+import httpx
+import pytest
+from rob2_evaluator.llm import models
+from rob2_evaluator.llm.models import (
+    DEFAULT_POOL_SIZE,
+    DEFAULT_REQUEST_TIMEOUT,
+    ModelProvider,
+    clear_client_pool,
+    configure_client_pool,
+    configure_request_timeout,
+    get_model,
+    request_deadline,
+)
+
+
+@pytest.fixture(autouse=True)
+def fresh_pool(monkeypatch):
+    monkeypatch.setenv("OPENAI_API_KEY", "test-key")
+    configure_client_pool(DEFAULT_POOL_SIZE)
+    yield
+    configure_client_pool(DEFAULT_POOL_SIZE)
+    configure_request_timeout(DEFAULT_REQUEST_TIMEOUT)
+
+
+def test_clients_are_reused_per_provider_model_and_params():
+    client = get_model("gpt-4o", ModelProvider.OPENAI)
+    assert get_model("gpt-4o", "OpenAI") is client
+    assert get_model("gpt-4o-mini", "OpenAI") is not client
+    assert get_model("gpt-4o", "OpenAI", temperature=0.7) is not client
+    assert get_model("gpt-4o", "OpenAI", temperature=0.7) is get_model(
+        "gpt-4o", "OpenAI", temperature=0.7
+    )
+
+
+def test_concurrent_lookups_create_a_single_client():
+    with patch.object(models, "_create_model", wraps=models._create_model) as create:
+        with ThreadPoolExecutor(max_workers=16) as executor:
+            clients = list(
+                executor.map(lambda _: get_model("gpt-4o", "OpenAI"), range(64))
+            )
+    assert create.call_count == 1
+    assert all(client is clients[0] for client in clients)
+
+
+def test_pool_size_is_configurable():
+    configure_client_pool(7)
+    client = get_model("qwen2.5", ModelProvider.OLLAMA)
+    assert client.client_kwargs["limits"].max_connections == 7
+
+    clear_client_pool()
+    assert get_model("qwen2.5", ModelProvider.OLLAMA) is not client
+    with pytest.raises(ValueError):
+        configure_client_pool(0)
+
+
+def test_pool_size_applies_to_sync_and_async_clients(monkeypatch):
+    monkeypatch.setenv("ANTHROPIC_API_KEY", "test-key")
+    configure_client_pool(7)
+    openai = get_model("gpt-4o", ModelProvider.OPENAI)
+    anthropic = get_model("claude-3-5-haiku-latest", ModelProvider.ANTHROPIC)
+    for client in (
+        openai.root_client._client,
+        openai.root_async_client._client,
+        anthropic._client._client,
+        anthropic._async_client._client,
+    ):
+        assert client._transport._pool._max_connections == 7
+
+
+def test_clients_have_a_hard_request_timeout():
+    assert get_model("gpt-4o", "OpenAI").request_timeout == DEFAULT_REQUEST_TIMEOUT
+
+    configure_request_timeout(90)
+    assert get_model("gpt-4o", "OpenAI").request_timeout == 90
+    assert get_model("gpt-4o", "OpenAI", timeout=5).request_timeout == 5
+    ollama = get_model("qwen2.5", ModelProvider.OLLAMA)
+    assert ollama.client_kwargs["timeout"] == 90
+    with pytest.raises(ValueError):
+        configure_request_timeout(0)
+
+
+def test_request_deadline_closes_a_hanging_request():
+    server = socket.create_server(("127.0.0.1", 0))
+    closed = threading.Event()
+
+    def hang():
+        conn, _ = server.accept()
+        with conn:
+            conn.recv(65536)
+            # 不回复，直到客户端关闭连接
+            if conn.recv(65536) == b"":
+                closed.set()
+
+    threading.Thread(target=hang, daemon=True).start()
+    client = models._http_client(DEFAULT_POOL_SIZE, DEFAULT_REQUEST_TIMEOUT)
+    start = time.monotonic()
+    try:
+        with pytest.raises(httpx.TimeoutException), request_deadline(0.2):
+            client.get(f"http://127.0.0.1:{server.getsockname()[1]}/")
+        assert time.monotonic() - start < 2
+        assert closed.wait(2)
+    finally:
+        client.close()
+        server.close()
+
+
+def test_ollama_requests_the_model_window_as_num_ctx():
+    assert get_model("gemma3:27b", ModelProvider.OLLAMA).num_ctx == 131_072
@@ -0,0 +1,92 @@
+from unittest.mock import MagicMock, patch
+
+import pytest
+from rob2_evaluator.retrieval import PassageRetriever
+from rob2_evaluator.services.evaluation_service import EvaluationService
+
+FILLER = "The intervention was delivered in community clinics over twelve weeks. " * 4
+
+ITEMS = [
+    {"text": "Background: alcohol use disorder is common. " * 4, "page_idx": 0},
+    {"text": "Participants were randomly assigned using a computer-generated sequence.", "page_idx": 1},
+    {"text": "Allocation was concealed in sealed opaque envelopes.", "page_idx": 1},
+    {"text": FILLER, "page_idx": 2},
+    {"text": FILLER, "page_idx": 2},
+    {"text": "Outcome assessors were blinded to the intervention received.", "page_idx": 3},
+    {"text": FILLER, "page_idx": 3},
+    {"text": "Twelve participants were lost to follow-up and missing data were imputed.", "page_idx": 4},
+    {"text": FILLER, "page_idx": 4},
+    {"text": "The statistical analysis plan was registered at ClinicalTrials.gov before unblinding.", "page_idx": 5},
+    {"text": FILLER, "page_idx": 6},
+]
+
+
+def test_domains_receive_their_own_passages_in_original_order():
+    index = PassageRetriever(top_k=2, token_budget=80, neighbors=0).build(ITEMS)
+
+    randomization = index.select_indices("randomization")
+    assert {1, 2} <= set(randomization)
+    assert randomization == sorted(randomization)
+    assert 9 in index.select_indices("selection")
+    assert 7 in index.select_indices("missing_data")
+    assert 5 in index.select_indices("measurement")
+
+
+def test_selection_respects_token_budget_and_includes_neighbors():
+    index = PassageRetriever(top_k=1, token_budget=200, neighbors=1).build(ITEMS)
+    selected = index.select_indices("selection")
+    assert selected == [8, 9, 10]
+    assert sum(index.tokens[i] for i in selected) <= 200
+
+
+def test_hit_added_as_neighbor_still_gets_its_own_neighbors():
+    # 段落 2 先作为段落 1 的邻近段落加入，作为命中段落时仍扩展到段落 3
+    index = PassageRetriever(top_k=2, token_budget=400, neighbors=1).build(ITEMS)
+    assert index.select_indices("randomization") == [0, 1, 2, 3]
+
+
+def test_short_document_is_passed_through():
+    items = ITEMS[1:3]
+    index = PassageRetriever(token_budget=2000).build(items)
+    assert index.select("selection") == items
+
+
+def test_invalid_retriever_settings():
+    with pytest.raises(ValueError):
+        PassageRetriever(top_k=0)
+    with pytest.raises(ValueError):
+        PassageRetriever(token_budget=0)
+
+
+def test_evaluation_service_sends_retrieved_passages_to_each_domain():
+    received = {}
+
+    class RecordingAgent:
+        def __init__(self, domain_key):
+            self.domain_key = domain_key
+
+        def evaluate(self, items):
+            received[self.domain_key] = items
+            return {"domain": self.domain_key, "overall": {"risk": "Low risk"}}
+
+    keys = ["randomization", "deviation_assignment", "missing_data", "measurement", "selection"]
+    agents = [RecordingAgent(key) for key in keys]
+    analysis_type_agent = MagicMock()
+    analysis_type_agent.infer_analysis_type.return_value = "assignment"
+    service = EvaluationService(
+        analysis_type_agent=analysis_type_agent,
+        passage_retriever=PassageRetriever(top_k=2, token_budget=80, neighbors=0),
+    )
+    factory = "rob2_evaluator.services.evaluation_service.DomainAgentFactory"
+    with patch(f"{factory}.create_base_agents", return_value=[agents[0], *agents[2:]]), patch(
+        f"{factory}.create_deviation_agent", return_value=agents[1]
+    ):
+        results = service.evaluate(ITEMS)
+
+    assert [r["domain"] for r in results[:-1]] == keys
+    # 分析类型推断仍使用全部内容，各领域只接收检索结果
+    analysis_type_agent.infer_analysis_type.assert_called_once_with(ITEMS)
+    for key in keys:
+        assert 0 < len(received[key]) < len(ITEMS)
+    assert ITEMS[9] in received["selection"]
+    assert ITEMS[1] in received["randomization"]
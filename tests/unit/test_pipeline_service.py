@@ -0,0 +1,124 @@
+import json
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+from rob2_evaluator.services.batch_service import BatchService
+from rob2_evaluator.services.pipeline_service import PipelineService, StagePipeline
+from rob2_evaluator.utils.cache import FileCache
+
+
+def test_stages_overlap_across_documents():
+    events = []
+    lock = threading.Lock()
+
+    def stage(name, delay):
+        def run(payload):
+            with lock:
+                events.append((name, payload, "start"))
+            time.sleep(delay)
+            with lock:
+                events.append((name, payload, "end"))
+            return payload
+
+        return run
+
+    pipeline = StagePipeline(
+        [("parse", stage("parse", 0.02), 1), ("evaluate", stage("evaluate", 0.05), 1)]
+    )
+    outcomes = pipeline.run([(i, i) for i in range(4)])
+
+    assert outcomes == {i: {"status": "ok", "result": i} for i in range(4)}
+    # 第 0 篇评估期间，第 1 篇已经开始解析
+    eval0_start = events.index(("evaluate", 0, "start"))
+    eval0_end = events.index(("evaluate", 0, "end"))
+    parse1_start = events.index(("parse", 1, "start"))
+    assert parse1_start < eval0_end
+    assert events.index(("parse", 0, "end")) < eval0_start
+
+
+def test_backpressure_bounds_in_flight_documents():
+    in_flight = 0
+    peak = 0
+    lock = threading.Lock()
+
+    def produce(payload):
+        nonlocal in_flight, peak
+        with lock:
+            in_flight += 1
+            peak = max(peak, in_flight)
+        return payload
+
+    def consume(payload):
+        nonlocal in_flight
+        time.sleep(0.01)
+        with lock:
+            in_flight -= 1
+        return payload
+
+    pipeline = StagePipeline([("fast", produce, 2), ("slow", consume, 1)], queue_size=2)
+    outcomes = pipeline.run([(i, i) for i in range(20)])
+
+    assert len(outcomes) == 20
+    # 已产出但未消费的文档数受限于下游队列容量与工作线程数
+    assert peak <= 2 + 1 + 2
+
+
+def test_stage_error_skips_downstream():
+    downstream = []
+
+    def parse(payload):
+        if payload == "bad":
+            raise ValueError("broken pdf")
+        return payload
+
+    pipeline = StagePipeline(
+        [("parse", parse, 2), ("evaluate", lambda p: downstream.append(p) or p, 2)]
+    )
+    outcomes = pipeline.run([("a", "good"), ("b", "bad")])
+
+    assert outcomes["a"] == {"status": "ok", "result": "good"}
+    assert outcomes["b"]["status"] == "error"
+    assert outcomes["b"]["stage"] == "parse"
+    assert downstream == ["good"]
+
+
+def test_invalid_stage_configuration():
+    with pytest.raises(ValueError):
+        StagePipeline([])
+    with pytest.raises(ValueError):
+        StagePipeline([("parse", lambda p: p, 0)])
+
+
+def test_pipeline_service_with_batch_service(tmp_path):
+    paths = []
+    for name in ("a", "b", "c"):
+        path = tmp_path / f"{name}.json"
+        path.write_text(json.dumps([{"text": name}]))
+        paths.append(path)
+
+    cache = FileCache(str(tmp_path / "cache"))
+    cache.save_result(paths[1], [{"domain": "cached"}])
+
+    class Loader:
+        def process_document(self, path):
+            if path.stem == "c":
+                raise ValueError("unreadable")
+            return json.loads(path.read_text())
+
+    evaluator = SimpleNamespace(
+        cache=cache,
+        select_document_processor=lambda path: Loader(),
+        content_processor=SimpleNamespace(process_content=lambda items: items),
+        evaluation_service=SimpleNamespace(
+            evaluate=lambda items: [{"domain": items[0]["text"]}]
+        ),
+    )
+    pipeline = PipelineService(evaluator, filter_workers=2, evaluate_workers=2)
+    records = BatchService(evaluator, pipeline=pipeline).run(paths)
+
+    assert [r["status"] for r in records] == ["ok", "cached", "error"]
+    assert records[0]["results"] == [{"domain": "a"}]
+    assert records[2]["error"].startswith("parse:")
+    assert cache.get_cached_result(paths[0]) == [{"domain": "a"}]
@@ -0,0 +1,286 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import httpx
+import pytest
+from langchain_core.messages import AIMessage
+from rob2_evaluator.agents.domain_agent import DomainAgent
+from rob2_evaluator.agents.entry_agent import EntryAgent
+from rob2_evaluator.schema.rob2_schema import (
+    DomainJudgement,
+    GenericDomainJudgement,
+    SignalsOnlyJudgement,
+)
+from rob2_evaluator.utils.cache import RelevanceCache
+from rob2_evaluator.utils.llm import call_llm, track_fallbacks
+from rob2_evaluator.utils.resilience import (
+    CircuitBreaker,
+    CircuitBreakerRegistry,
+    backoff_delay,
+    is_request_error,
+    is_transient,
+    retry_after_seconds,
+)
+from rob2_evaluator.utils.usage import usage_tracker
+
+
+class APIError(Exception):
+    def __init__(self, status, headers=None):
+        super().__init__(f"HTTP {status}")
+        self.status_code = status
+        self.response = httpx.Response(status, headers=headers or {})
+
+
+def test_transient_errors_and_retry_after():
+    assert is_transient(APIError(429))
+    assert is_transient(APIError(503))
+    assert not is_transient(APIError(400))
+    assert is_transient(type("APIConnectionError", (Exception,), {})())
+    assert not is_transient(ValueError("bad json"))
+
+    assert retry_after_seconds(APIError(429, {"retry-after": "7"})) == 7
+    assert retry_after_seconds(APIError(429, {"retry-after-ms": "1500"})) == 1.5
+    assert retry_after_seconds(APIError(429)) is None
+    assert retry_after_seconds(ValueError()) is None
+
+
+def test_backoff_is_jittered_exponential_and_honours_retry_after():
+    for attempt in range(6):
+        assert 0 <= backoff_delay(attempt, base=1, cap=10) <= min(10, 2**attempt)
+    assert backoff_delay(0, retry_after=5, base=1, cap=10) == 5
+    assert backoff_delay(0, retry_after=500, cap=10) == 10
+
+
+def test_circuit_breaker_opens_then_probes():
+    clock = [0.0]
+    with patch("rob2_evaluator.utils.resilience.time.monotonic", side_effect=lambda: clock[0]):
+        breaker = CircuitBreaker(failure_threshold=2, reset_timeout=10)
+        breaker.record_failure()
+        assert breaker.allow()
+        breaker.record_failure()
+        assert breaker.state == "open" and not breaker.allow()
+        assert breaker.remaining_open_seconds() == 10
+
+        clock[0] = 11
+        # 半开状态只放行一次探测
+        assert breaker.allow() and not breaker.allow()
+        breaker.record_failure()
+        assert breaker.state == "open"
+
+        clock[0] = 22
+        assert breaker.allow()
+        breaker.record_success()
+        assert breaker.state == "closed" and breaker.allow()
+
+
+@pytest.fixture
+def breakers():
+    registry = CircuitBreakerRegistry(failure_threshold=3, reset_timeout=60)
+    with patch("rob2_evaluator.utils.llm.circuit_breakers", registry):
+        yield registry
+
+
+def test_call_llm_backs_off_on_rate_limits(breakers):
+    llm = MagicMock()
+    llm.invoke.side_effect = [
+        APIError(429, {"retry-after": "2"}),
+        APIError(503),
+        AIMessage(content="adherence"),
+    ]
+    with patch("rob2_evaluator.llm.models.get_model", return_value=llm), patch(
+        "rob2_evaluator.utils.llm.time.sleep"
+    ) as sleep:
+        assert call_llm("p", "gpt-4o", "OpenAI") == "adherence"
+    assert sleep.call_count == 2
+    assert sleep.call_args_list[0].args[0] >= 2
+    assert breakers.get("OpenAI").state == "closed"
+
+
+def test_open_circuit_fails_fast_and_is_visible(breakers):
+    usage_tracker.reset()
+    llm = MagicMock()
+    llm.invoke.side_effect = APIError(429)
+    with patch("rob2_evaluator.llm.models.get_model", return_value=llm), patch(
+        "rob2_evaluator.utils.llm.time.sleep"
+    ):
+        with track_fallbacks() as fallbacks:
+            assert call_llm("p", "gpt-4o", "OpenAI") == "no"
+            assert breakers.get("OpenAI").state == "open"
+            assert call_llm("p", "gpt-4o", "OpenAI") == "no"
+    # 熔断后第二次调用不再请求服务商
+    assert llm.invoke.call_count == 3
+    assert fallbacks.count == 2
+    assert usage_tracker.get("gpt-4o").fallbacks == 2
+    usage_tracker.reset()
+
+
+def test_request_errors_fail_fast_and_count_against_the_circuit(breakers):
+    assert is_request_error(APIError(401)) and is_request_error(APIError(404))
+    assert not is_request_error(APIError(429)) and not is_request_error(ValueError())
+
+    llm = MagicMock()
+    llm.invoke.side_effect = APIError(401)
+    with patch("rob2_evaluator.llm.models.get_model", return_value=llm), patch(
+        "rob2_evaluator.utils.llm.time.sleep"
+    ):
+        for _ in range(3):
+            assert call_llm("p", "gpt-4o", "OpenAI", max_retries=3) == "no"
+    # 无效密钥不重试；连续失败后熔断，不再为每篇文档发出请求
+    assert llm.invoke.call_count == 3
+    assert breakers.get("OpenAI").state == "open"
+
+
+def test_only_answered_calls_count_as_provider_success(breakers):
+    breaker = breakers.get("OpenAI")
+    breaker.record_failure()
+    breaker.record_failure()
+    llm = MagicMock()
+    llm.invoke.side_effect = RuntimeError("client bug")
+    with patch("rob2_evaluator.llm.models.get_model", return_value=llm):
+        call_llm("p", "gpt-4o", "OpenAI", max_retries=1)
+    # 与服务商无关的错误不重置失败计数
+    breaker.record_failure()
+    assert breaker.state == "open"
+
+    breakers = CircuitBreakerRegistry(failure_threshold=3, reset_timeout=60)
+    breaker = breakers.get("OpenAI")
+    breaker.record_failure()
+    breaker.record_failure()
+    llm.invoke.side_effect = None
+    llm.with_structured_output.return_value.invoke.side_effect = ValueError("bad json")
+    with patch("rob2_evaluator.llm.models.get_model", return_value=llm), patch(
+        "rob2_evaluator.utils.llm.circuit_breakers", breakers
+    ):
+        call_llm("p", "gpt-4o", "OpenAI", pydantic_model=SignalsOnlyJudgement, max_retries=1)
+    # 无法解析的输出说明服务商已经回答
+    breaker.record_failure()
+    assert breaker.state == "closed"
+
+
+def test_domain_result_is_flagged_when_llm_falls_back(breakers):
+    llm = MagicMock()
+    llm.with_structured_output.return_value.invoke.side_effect = APIError(500)
+    agent = DomainAgent("selection", "gpt-4o", "OpenAI")
+    with patch("rob2_evaluator.llm.models.get_model", return_value=llm), patch(
+        "rob2_evaluator.utils.llm.time.sleep"
+    ):
+        result = agent.evaluate([{"text": "x", "page_idx": 0}])
+    assert result["fallback"] is True
+    assert result["overall"]["risk"] == "Some concerns"
+
+
+def test_entry_agent_keeps_and_does_not_cache_failed_units(tmp_path, breakers):
+    cache = RelevanceCache(str(tmp_path / "relevance.sqlite"))
+    agent = EntryAgent(verdict_cache=cache)
+    llm = MagicMock()
+    llm.invoke.side_effect = APIError(503)
+    content = [{"text": "Methods " + "x" * 120}]
+    with patch("rob2_evaluator.llm.models.get_model", return_value=llm), patch(
+        "rob2_evaluator.utils.llm.time.sleep"
+    ):
+        assert agent.filter_relevant(content) == content
+    assert agent.stats.llm_fallbacks == 1
+    assert len(cache) == 0
+
+
+def failing_map_phase_llm():
+    """分段调用（SignalsOnlyJudgement）全部失败，合并调用正常返回"""
+    merged = {
+        "raw": AIMessage(content="{}"),
+        "parsed": GenericDomainJudgement(
+            signals={}, overall=DomainJudgement(risk="Low risk", reason="r", evidence=[])
+        ),
+        "parsing_error": None,
+    }
+
+    def structured(pydantic_model, **kwargs):
+        runnable = MagicMock()
+        if pydantic_model is SignalsOnlyJudgement:
+            runnable.invoke.side_effect = APIError(500)
+            runnable.ainvoke = AsyncMock(side_effect=APIError(500))
+        else:
+            runnable.invoke.return_value = merged
+            runnable.ainvoke = AsyncMock(return_value=merged)
+        return runnable
+
+    llm = MagicMock()
+    llm.with_structured_output.side_effect = structured
+    return llm
+
+
+@pytest.mark.parametrize("use_async", [False, True])
+def test_map_reduce_result_is_flagged_when_segments_fall_back(use_async):
+    agent = DomainAgent("randomization", "gpt-4o", "OpenAI", max_context_tokens=400)
+    items = [{"text": "Participants were followed up. " * 40, "page_idx": i} for i in range(6)]
+    assert not agent.fits_context(items)
+    registry = CircuitBreakerRegistry(failure_threshold=100, reset_timeout=60)
+    with patch("rob2_evaluator.utils.llm.circuit_breakers", registry), patch(
+        "rob2_evaluator.llm.models.get_model", return_value=failing_map_phase_llm()
+    ), patch("rob2_evaluator.utils.llm.time.sleep"), patch(
+        "rob2_evaluator.utils.llm.asyncio.sleep", new=AsyncMock()
+    ):
+        if use_async:
+            result = asyncio.run(agent.aevaluate(items))
+        else:
+            result = agent.evaluate(items)
+
+    assert result["overall"]["risk"] == "Low risk"
+    assert result["fallback"] is True
+
+
+def test_half_open_callers_wait_for_the_probe():
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0)
+    breaker.record_failure()
+    assert breaker.acquire(timeout=1)  # 探测
+
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        waiting = executor.submit(breaker.acquire, 5)
+        time.sleep(0.05)
+        assert not waiting.done()
+        breaker.record_success()
+        assert waiting.result(timeout=1) is True
+
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0.2)
+    breaker.record_failure()
+    time.sleep(0.25)
+    assert breaker.acquire(timeout=1)
+    # 探测未返回时至多等待 timeout 秒
+    assert breaker.acquire(timeout=0) is False
+    # 探测失败后熔断器重新打开，等待的调用被拒绝
+    assert asyncio.run(_acquire_after_failure(breaker)) is False
+
+
+async def _acquire_after_failure(breaker):
+    waiting = asyncio.ensure_future(breaker.aacquire(5, poll_interval=0.01))
+    await asyncio.sleep(0.05)
+    assert not waiting.done()
+    breaker.record_failure()
+    return await waiting
+
+
+def test_call_llm_waits_for_half_open_probe_instead_of_falling_back():
+    registry = CircuitBreakerRegistry(failure_threshold=1, reset_timeout=0)
+    registry.get("OpenAI").record_failure()
+    release = threading.Event()
+
+    def invoke(prompt):
+        if prompt == "probe":
+            release.wait(5)
+        return AIMessage(content=f"answer to {prompt}")
+
+    llm = MagicMock()
+    llm.invoke.side_effect = invoke
+    with patch("rob2_evaluator.utils.llm.circuit_breakers", registry), patch(
+        "rob2_evaluator.llm.models.get_model", return_value=llm
+    ), ThreadPoolExecutor(max_workers=2) as executor:
+        probe = executor.submit(call_llm, "probe", "gpt-4o", "OpenAI")
+        time.sleep(0.05)
+        other = executor.submit(call_llm, "other", "gpt-4o", "OpenAI")
+        time.sleep(0.05)
+        assert not other.done()
+        release.set()
+        assert probe.result(timeout=5) == "answer to probe"
+        assert other.result(timeout=5) == "answer to other"
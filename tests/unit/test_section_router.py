@@ -0,0 +1,74 @@
+from rob2_evaluator.retrieval.section_router import (
+    CLASSIFY,
+    EXCLUDE,
+    INCLUDE,
+    SectionRouter,
+)
+
+
+def test_classify_heading():
+    router = SectionRouter()
+    assert router.classify_heading("2. Methods") == INCLUDE
+    assert router.classify_heading("2.3 Statistical Analysis") == INCLUDE
+    assert router.classify_heading("RESULTS") == INCLUDE
+    assert router.classify_heading("Introduction") == EXCLUDE
+    assert router.classify_heading("IV. Discussion") == EXCLUDE
+    assert router.classify_heading("Acknowledgements") == EXCLUDE
+    assert router.classify_heading("Results and Discussion") == CLASSIFY
+    assert router.classify_heading("Abstract") == CLASSIFY
+    # 过长的"标题"通常是论文题目
+    assert (
+        router.classify_heading(
+            "Randomized Controlled Trial in Alcohol Relapse Prevention: Role of Atenolol and Outcomes"
+        )
+        == CLASSIFY
+    )
+
+
+def test_classify_path_uses_innermost_decisive_heading():
+    router = SectionRouter()
+    assert router.classify_path(["Discussion", "Limitations"]) == EXCLUDE
+    assert router.classify_path(["Methods", "Ethics approval"]) == INCLUDE
+    assert router.classify_path(["Appendix", "Outcome measures"]) == INCLUDE
+    assert router.classify_path([]) == CLASSIFY
+
+
+def test_route_docling_headings_and_inline_headings():
+    router = SectionRouter()
+    docling_items = [
+        {"text": "a", "headings": ["Introduction"]},
+        {"text": "b", "headings": ["Methods", "Randomisation"]},
+        {"text": "c", "headings": []},
+    ]
+    assert router.route(docling_items) == [EXCLUDE, INCLUDE, CLASSIFY]
+
+    content_list = [
+        {"text": "A very long paper title about alcoholism treatment matching effects", "text_level": 1},
+        {"text": "Abstract text"},
+        {"text": "INTRODUCTION", "text_level": 1},
+        {"text": "Background text"},
+        {"text": "METHOD", "text_level": 1},
+        {"text": "Participants were randomized"},
+        {"text": "Ethics", "text_level": 2},
+        {"text": "Approved by the board"},
+    ]
+    assert router.route(content_list) == [
+        CLASSIFY,
+        CLASSIFY,
+        EXCLUDE,
+        EXCLUDE,
+        INCLUDE,
+        INCLUDE,
+        INCLUDE,
+        INCLUDE,
+    ]
+
+
+def test_strong_method_cues_in_excluded_sections_are_classified():
+    router = SectionRouter()
+    content_list = [
+        {"text": "INTRODUCTION", "text_level": 1},
+        {"text": "Alcoholism is common."},
+        {"text": "We randomly assigned the remaining 105 patients to atenolol or placebo."},
+    ]
+    assert router.route(content_list) == [EXCLUDE, EXCLUDE, CLASSIFY]
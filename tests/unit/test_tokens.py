@@ -0,0 +1,40 @@
+from unittest.mock import patch
+
+from rob2_evaluator.llm.models import DEFAULT_CONTEXT_LENGTH, get_context_length
+from rob2_evaluator.utils.tokens import (
+    RESPONSE_TOKEN_RESERVE,
+    context_budget,
+    count_tokens,
+    estimate_tokens,
+    group_by_token_budget,
+)
+
+
+def test_context_length_comes_from_model_registry():
+    assert get_context_length("gpt-4o") == 128_000
+    assert get_context_length("claude-3-5-haiku-latest") == 200_000
+    assert get_context_length("not-a-model") == DEFAULT_CONTEXT_LENGTH
+
+
+def test_default_ollama_model_gets_its_native_window():
+    # 默认模型 gemma3:27b 的 128k 窗口足以容纳整篇论文，无需 map-reduce
+    assert get_context_length("gemma3:27b") == 131_072
+    assert context_budget("gemma3:27b", 1500) == 131_072 - 1500 - RESPONSE_TOKEN_RESERVE
+    assert get_context_length("qwen2.5") == 32_768
+
+
+def test_context_budget_subtracts_overhead_and_respects_cap():
+    assert context_budget("gpt-4o", 1000) == 128_000 - 1000 - RESPONSE_TOKEN_RESERVE
+    assert context_budget("gpt-4o", 1000, max_context_tokens=5000) == 5000
+
+
+def test_count_tokens_falls_back_without_tokenizer():
+    with patch("rob2_evaluator.utils.tokens._encoding", return_value=None):
+        assert count_tokens("a" * 40) == estimate_tokens("a" * 40) == 10
+    assert count_tokens("") == 0
+
+
+def test_group_by_token_budget_uses_counter():
+    items = [{"text": "x"} for _ in range(5)]
+    groups = group_by_token_budget(items, list(range(5)), 4, 10, counter=lambda text: 2)
+    assert groups == [[0, 1], [2, 3], [4]]
@@ -0,0 +1,57 @@
+from unittest.mock import MagicMock, patch
+
+from langchain_core.messages import AIMessage
+from rob2_evaluator.schema.rob2_schema import RelevantPassages
+from rob2_evaluator.utils.llm import call_llm
+from rob2_evaluator.utils.usage import UsageTracker, extract_usage, usage_tracker
+
+
+def make_message(content="yes", input_tokens=1000, cache_read=800):
+    return AIMessage(
+        content=content,
+        usage_metadata={
+            "input_tokens": input_tokens,
+            "output_tokens": 5,
+            "total_tokens": input_tokens + 5,
+            "input_token_details": {"cache_read": cache_read},
+        },
+    )
+
+
+def test_extract_usage_reads_cached_tokens():
+    assert extract_usage(make_message()) == {
+        "input_tokens": 1000,
+        "cached_input_tokens": 800,
+        "cache_creation_tokens": 0,
+        "output_tokens": 5,
+    }
+    assert extract_usage(AIMessage(content="no usage")) is None
+
+
+def test_tracker_reports_cache_hit_rate_per_model():
+    tracker = UsageTracker()
+    tracker.record("gpt-4o", make_message(cache_read=0))
+    tracker.record("gpt-4o", make_message(cache_read=1000))
+    tracker.record("other", make_message(input_tokens=500, cache_read=500))
+
+    assert tracker.get("gpt-4o").calls == 2
+    assert tracker.get("gpt-4o").cache_hit_rate == 0.5
+    assert tracker.total().cache_hit_rate == 1500 / 2500
+    assert tracker.summary()["other"]["cache_hit_rate"] == 1.0
+
+
+def test_call_llm_records_usage_for_structured_output():
+    usage_tracker.reset()
+    llm = MagicMock()
+    llm.with_structured_output.return_value.invoke.return_value = {
+        "raw": make_message(),
+        "parsed": RelevantPassages(relevant_ids=[1]),
+        "parsing_error": None,
+    }
+    with patch("rob2_evaluator.llm.models.get_model", return_value=llm):
+        result = call_llm("prompt", "gpt-4o", "OpenAI", pydantic_model=RelevantPassages)
+
+    assert result.relevant_ids == [1]
+    assert llm.with_structured_output.call_args.kwargs["include_raw"] is True
+    assert usage_tracker.get("gpt-4o").cached_input_tokens == 800
+    usage_tracker.reset()
@@ -0,0 +1,126 @@
+import threading
+import time
+from collections import Counter
+
+import pytest
+from rob2_evaluator.agents.domain_agent import DomainAgent
+from rob2_evaluator.agents.voting import VotingDomainAgent, is_decided
+from rob2_evaluator.factories import DomainAgentFactory
+
+
+class FakeAgent(DomainAgent):
+    def __init__(self, answers, risk="Low risk", delay=0.0, gate=None, **kwargs):
+        super().__init__("randomization", **kwargs)
+        self.answers = answers.split()
+        self.risk = risk
+        self.delay = delay
+        self.gate = gate
+        self.calls = 0
+
+    def evaluate(self, items):
+        self.calls += 1
+        if self.gate is not None:
+            self.gate.wait(5)
+        time.sleep(self.delay)
+        signals = {
+            signal["id"]: {"answer": answer, "reason": self.risk, "evidence": []}
+            for signal, answer in zip(self.schema["signals"], self.answers)
+        }
+        return {
+            "domain": self.schema["domain_name"],
+            "signals": signals,
+            "overall": {"risk": self.risk, "reason": self.risk, "evidence": []},
+        }
+
+
+def test_is_decided():
+    assert is_decided(Counter({"Y": 3}), 2)
+    assert not is_decided(Counter({"Y": 2, "N": 1}), 1)
+    assert is_decided(Counter({"Y": 3, "N": 1}), 1)
+
+
+def test_stops_as_soon_as_majority_is_decided():
+    gate = threading.Event()
+    agents = [FakeAgent("Y Y N") for _ in range(3)] + [
+        FakeAgent("N N Y", risk="High risk", gate=gate) for _ in range(2)
+    ]
+    start = time.perf_counter()
+    result = VotingDomainAgent(agents).evaluate([])
+    elapsed = time.perf_counter() - start
+    gate.set()
+
+    assert elapsed < 1
+    assert result["votes"] == {"samples": 3, "requested": 5}
+    assert result["overall"]["risk"] == "Low risk"
+    assert result["overall"]["agreement"] == 1.0
+    assert [s["answer"] for s in result["signals"].values()] == ["Y", "Y", "N"]
+
+
+def test_samples_run_concurrently():
+    agents = [FakeAgent("Y Y N", delay=0.2) for _ in range(4)]
+    start = time.perf_counter()
+    VotingDomainAgent(agents).evaluate([])
+    assert time.perf_counter() - start < 0.6
+
+
+def test_waves_start_more_samples_only_while_undecided():
+    agents = [FakeAgent("Y Y N"), FakeAgent("N N Y"), FakeAgent("Y Y N"), FakeAgent("Y Y N")]
+    result = VotingDomainAgent(agents, waves=True).evaluate([])
+    # 首轮三个样本分歧时才补发第四个
+    assert [agent.calls for agent in agents] == [1, 1, 1, 1]
+    assert result["votes"] == {"samples": 4, "requested": 4}
+
+    agents = [FakeAgent("Y Y N") for _ in range(3)] + [
+        FakeAgent("N N Y", risk="High risk") for _ in range(2)
+    ]
+    result = VotingDomainAgent(agents, waves=True).evaluate([])
+    # 首轮三个样本已构成一致多数，其余样本不发出请求
+    assert [agent.calls for agent in agents] == [1, 1, 1, 0, 0]
+    assert result["votes"] == {"samples": 3, "requested": 5}
+
+
+def test_majority_per_signal_and_conservative_risk_tie():
+    agents = [
+        FakeAgent("Y Y N", risk="Low risk"),
+        FakeAgent("Y N N", risk="High risk"),
+        FakeAgent("N Y Y", risk="Some concerns"),
+        FakeAgent("Y Y Y", risk="High risk"),
+        FakeAgent("Y Y N", risk="Low risk"),
+    ]
+    result = VotingDomainAgent(agents).evaluate([])
+    assert result["votes"]["samples"] == 5
+    assert [s["answer"] for s in result["signals"].values()] == ["Y", "Y", "N"]
+    assert result["signals"]["q1_1"]["agreement"] == 0.8
+    # Low risk 与 High risk 各两票时取更保守的等级
+    assert result["overall"]["risk"] == "High risk"
+    assert result["overall"]["agreement"] == 0.4
+
+
+def test_rules_mode_derives_risk_from_voted_answers():
+    agents = [
+        FakeAgent("Y N N", judgement_mode="rules"),
+        FakeAgent("Y Y N", judgement_mode="rules"),
+        FakeAgent("Y Y N", judgement_mode="rules"),
+    ]
+    result = VotingDomainAgent(agents).evaluate([])
+    assert result["overall"]["risk"] == "Low risk"
+
+
+def test_failed_samples_are_ignored():
+    class Broken(FakeAgent):
+        def evaluate(self, items):
+            raise RuntimeError("boom")
+
+    result = VotingDomainAgent([Broken("Y"), FakeAgent("Y Y N"), FakeAgent("Y Y N")]).evaluate([])
+    assert result["votes"] == {"samples": 2, "requested": 3}
+    with pytest.raises(RuntimeError):
+        VotingDomainAgent([Broken("Y")]).evaluate([])
+
+
+def test_factory_builds_voting_agents():
+    agents = DomainAgentFactory.create_agents(
+        "assignment", voters=[("gpt-4o", "OpenAI"), ("claude-3-5-haiku-latest", "Anthropic")]
+    )
+    assert all(isinstance(agent, VotingDomainAgent) for agent in agents)
+    assert [a.model_name for a in agents[0].agents] == ["gpt-4o", "claude-3-5-haiku-latest"]
+    assert agents[1].domain_key == "deviation_assignment"